@@ -1,6 +1,17 @@
 import abc
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import litellm
+from langchain.agents import AgentExecutor
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+
 from backend.state import AgentState
+from backend.event_bus import event_bus
+from backend.agents.utils import create_chat_model
+from backend.agents.callbacks import EventBusCallbackHandler, TracingCallbackHandler, UsageLedgerCallbackHandler
+from backend.llm_usage import usage_metadata
+from backend.tracing import llm_attributes, tracer
+from tools.sandbox_resources import sandbox_run
 
 # This file defines the abstract base classes for our agent hierarchy.
 # It establishes the "contract" that all specialized agent groups must follow,
@@ -34,18 +45,18 @@ class GroupSupervisor(AgentBase):
     returning the final result.
     """
     
-    def __init__(self, leader_model_name: str, labor_model_list: List[str]):
+    def __init__(self, group_details: Dict[str, Any]):
         """
         Initializes the Supervisor with its designated models from the taxonomy.
         
         Args:
-            leader_model_name: The logical name (from config.yaml) of the leader model.
-            labor_model_list: A list of logical names for the laborer models.
+            group_details: The group's entry from llm_taxonomy.yaml, including
+                           its 'leader' and 'labor_model_pools'.
         """
-        self.leader_model_name = leader_model_name
-        self.labor_model_list = labor_model_list
-        # In future phases, we would initialize the LLMs here.
-        # For Phase 1, we just store their names.
+        self.group_details = group_details
+        self.group_name = group_details.get("group_name", self.__class__.__name__)
+        self.leader_model: Dict[str, Any] = group_details.get("leader", {})
+        self.labor_model_pools: Dict[str, List[str]] = group_details.get("labor_model_pools", {})
 
     def execute(self, state: AgentState) -> Dict[str, Any]:
         """
@@ -56,8 +67,8 @@ class GroupSupervisor(AgentBase):
         class_name = self.__class__.__name__
         
         print(f"--- [Supervisor Stub] Executing: {class_name} ---")
-        print(f"    - Leader Model: {self.leader_model_name}")
-        print(f"    - Labor Models Available: {len(self.labor_model_list)}")
+        print(f"    - Leader Model: {self.leader_model.get('unique_name')}")
+        print(f"    - Labor Model Pools Available: {len(self.labor_model_pools)}")
         
         # In a real implementation, this is where the supervisor would use its
         # leader model to break down the task from the state and delegate to
@@ -67,4 +78,63 @@ class GroupSupervisor(AgentBase):
         # The key is a generic placeholder to show data was produced.
         return {
             f"{class_name}_output": "This is a hardcoded result from the stubbed supervisor."
-        }
\ No newline at end of file
+        }
+
+    # --- Streaming Helpers ---
+    # Every group routes its LLM calls through these helpers so that tokens and
+    # tool events reach the run's event bus as they happen, instead of arriving
+    # all at once when the agent returns.
+
+    def _create_llm(self, temperature: float, model_name: Optional[str] = None) -> BaseChatModel:
+        """Creates a streaming chat model, defaulting to the group's leader model."""
+        return create_chat_model(
+            temperature=temperature,
+            model_name=model_name or self.leader_model.get("unique_name"),
+            streaming=True,
+        )
+
+    def _get_callbacks(self, state: AgentState) -> List[BaseCallbackHandler]:
+        """Returns the LangChain callbacks that publish, trace and account for this group's activity."""
+        run_id = state.get("run_id")
+        callbacks: List[BaseCallbackHandler] = [TracingCallbackHandler(), UsageLedgerCallbackHandler(run_id, self.group_name)]
+        if run_id:
+            callbacks.insert(0, EventBusCallbackHandler(run_id, self.group_name))
+        return callbacks
+
+    def _invoke_agent(self, agent_executor: AgentExecutor, input_content: str, state: AgentState) -> Dict[str, Any]:
+        """
+        Invokes an agent executor with this group's streaming callbacks attached.
+        Its sandbox commands run as the state's run (see tools/sandbox_resources.py).
+        """
+        with sandbox_run(state.get("run_id")):
+            return agent_executor.invoke(
+                {"input": input_content},
+                config={"callbacks": self._get_callbacks(state)},
+            )
+
+    def _stream_completion(self, state: AgentState, messages: List[Dict[str, str]], temperature: float, model: Optional[str] = None) -> str:
+        """
+        Calls the leader model through LiteLLM with streaming enabled, publishing
+        each token to the event bus, and returns the full response text.
+        """
+        run_id = state.get("run_id")
+        model = model or self.leader_model.get("unique_name")
+        event_bus.publish(run_id, "llm_start", group=self.group_name, model=model)
+
+        with tracer.span("llm.completion", kind="llm", model=model, group=self.group_name, stream=True) as span:
+            response = litellm.completion(model=model, messages=messages, temperature=temperature, stream=True,
+                                          metadata=usage_metadata(self.group_name, run_id))
+            parts: List[str] = []
+            streamed = 0
+            for chunk in response:
+                token = chunk.choices[0].delta.content or ""
+                if token:
+                    parts.append(token)
+                    streamed += 1
+                    event_bus.publish(run_id, "llm_token", group=self.group_name, token=token)
+                # Providers that report usage on a stream do so in its last chunk.
+                span.set_attributes(**llm_attributes(chunk))
+            span.set_attributes(streamed_tokens=streamed, output_bytes=sum(len(part.encode("utf-8")) for part in parts))
+
+        event_bus.publish(run_id, "llm_end", group=self.group_name)
+        return "".join(parts)
@@ -0,0 +1,166 @@
+import time
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+from backend.event_bus import event_bus
+from backend.llm_usage import llm_usage
+from backend.tracing import tracer
+
+# This file contains the LangChain callback handlers: one forwards an agent's
+# live activity (streamed LLM tokens and tool calls) onto the run's event bus,
+# one records its chat model calls as tracing spans, and one records their
+# token usage in the LLM usage ledger.
+
+# Tool inputs and outputs can be whole files; only a preview is streamed.
+_MAX_PREVIEW_CHARS = 500
+
+
+def _preview(value: Any) -> str:
+    text = str(value)
+    if len(text) > _MAX_PREVIEW_CHARS:
+        return text[:_MAX_PREVIEW_CHARS] + "..."
+    return text
+
+
+def _token_usage(response: Any) -> Dict[str, Optional[int]]:
+    """Returns the prompt/completion/total tokens of a chat model's LLMResult."""
+    usage = dict((getattr(response, "llm_output", None) or {}).get("token_usage") or {})
+    if not usage:
+        # Streaming chat models report usage on the message instead.
+        for generations in getattr(response, "generations", None) or []:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                usage = {"prompt_tokens": metadata.get("input_tokens"), "completion_tokens": metadata.get("output_tokens"),
+                         "total_tokens": metadata.get("total_tokens")}
+    return {key: usage.get(key) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+class EventBusCallbackHandler(BaseCallbackHandler):
+    """
+    Publishes LLM tokens and tool events of one group's agent to the event bus.
+    """
+
+    def __init__(self, run_id: str, group_name: str):
+        self.run_id = run_id
+        self.group_name = group_name
+        # Tool names are only given on start, so remember them until the end.
+        self._tool_names: Dict[UUID, str] = {}
+
+    def _publish(self, event_type: str, **data: Any) -> None:
+        event_bus.publish(self.run_id, event_type, group=self.group_name, **data)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self._publish("llm_start", model=self._model_name(serialized, kwargs))
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self._publish("llm_start", model=self._model_name(serialized, kwargs))
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self._publish("llm_token", token=token)
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self._publish("llm_end")
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self._publish("llm_error", error=str(error))
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        tool_name = (serialized or {}).get("name", "unknown_tool")
+        self._tool_names[run_id] = tool_name
+        self._publish("tool_start", tool=tool_name, input=_preview(input_str))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        tool_name = self._tool_names.pop(run_id, "unknown_tool")
+        self._publish("tool_end", tool=tool_name, output=_preview(output))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        tool_name = self._tool_names.pop(run_id, "unknown_tool")
+        self._publish("tool_error", tool=tool_name, error=str(error))
+
+    @staticmethod
+    def _model_name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+        params = kwargs.get("invocation_params") or {}
+        return params.get("model_name") or params.get("model") or (serialized or {}).get("name", "unknown")
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records every chat model call (e.g. ChatGroq inside an agent executor) as
+    an "llm" span, a child of the span that was current when the call
+    started. Tool calls are not recorded here; the tools trace themselves.
+    """
+
+    def __init__(self):
+        self._spans: Dict[UUID, Any] = {}
+        self._tokens_streamed: Dict[UUID, int] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, serialized, kwargs, prompt_messages=sum(len(batch) for batch in messages))
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, serialized, kwargs, prompt_bytes=sum(len(prompt.encode("utf-8")) for prompt in prompts))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id in self._tokens_streamed:
+            self._tokens_streamed[run_id] += 1
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        streamed = self._tokens_streamed.pop(run_id, 0)
+        if span is None:
+            return
+        span.set_attributes(**_token_usage(response))
+        if streamed:
+            span.set_attribute("streamed_tokens", streamed)
+        tracer.end_span(span)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._tokens_streamed.pop(run_id, None)
+        tracer.end_span(self._spans.pop(run_id, None), error=error)
+
+    def _start(self, run_id: UUID, serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any], **attributes: Any) -> None:
+        model = EventBusCallbackHandler._model_name(serialized, kwargs)
+        span = tracer.start_span("llm.chat", kind="llm", model=model, **attributes)
+        if span is not None:
+            self._spans[run_id] = span
+            self._tokens_streamed[run_id] = 0
+
+
+class UsageLedgerCallbackHandler(BaseCallbackHandler):
+    """
+    Records the tokens, latency and estimated cost of every chat model call
+    of one group (or other caller) in the LLM usage ledger.
+    """
+
+    def __init__(self, run_id: Optional[str], group_name: str):
+        self.run_id = run_id
+        self.group_name = group_name
+        # (model, start time) of the calls in flight.
+        self._calls: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._calls[run_id] = (EventBusCallbackHandler._model_name(serialized, kwargs), time.perf_counter())
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._calls[run_id] = (EventBusCallbackHandler._model_name(serialized, kwargs), time.perf_counter())
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._record(run_id, **_token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._record(run_id, error=str(error))
+
+    def _record(self, call_id: UUID, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                total_tokens: Optional[int] = None, error: Optional[str] = None) -> None:
+        call = self._calls.pop(call_id, None)
+        if call is None:
+            return
+        model, started = call
+        try:
+            llm_usage.record(self.run_id, self.group_name, model, "langchain", prompt_tokens, completion_tokens,
+                             (time.perf_counter() - started) * 1000, error=error)
+        except Exception as e:
+            # Accounting must never fail the agent itself.
+            print(f"--- [LLMUsage] ERROR recording a chat model call: {e} ---")
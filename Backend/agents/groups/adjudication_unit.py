@@ -1,5 +1,4 @@
 from typing import Dict, Any
-import litellm
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
@@ -35,8 +34,8 @@ class AdjudicationUnit(GroupSupervisor):
 
         # 3. Use the Leader model to make the final decision
         try:
-            response = litellm.completion(
-                model=self.leader_model.get("unique_name"),
+            response_text = self._stream_completion(
+                state,
                 messages=[{
                     "role": "system", 
                     "content": system_prompt
@@ -47,7 +46,7 @@ class AdjudicationUnit(GroupSupervisor):
                 temperature=0.0
             )
             
-            ruling = response.choices[0].message.content.strip().upper()
+            ruling = response_text.strip().upper()
             # Ensure the output is ONLY one of the two valid words
             if ruling not in ["UPHOLD", "OVERRULE"]:
                 ruling = "OVERRULE" # Default to overruling if output is invalid
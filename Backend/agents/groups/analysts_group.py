@@ -1,5 +1,4 @@
 from typing import Dict, Any
-from langchain_groq import ChatGroq
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
@@ -27,10 +26,7 @@ class AnalystsGroup(GroupSupervisor):
         
         # 1. Initialize the LLM for the Leader model
         # We use zero temperature for precision and adherence to format.
-        llm = ChatGroq(
-            temperature=0.0, 
-            model_name=self.leader_model.get("unique_name")
-        )
+        llm = self._create_llm(temperature=0.0)
         
         # 2. Load the prompt and define the tools for the Analyst
         system_prompt = load_prompt("analyst.md")
@@ -59,15 +55,15 @@ class AnalystsGroup(GroupSupervisor):
         
         # 5. Invoke the agent to generate the Technical Plan and Test Cases
         try:
-            response = agent_executor.invoke({"input": input_content})
+            response = self._invoke_agent(agent_executor, input_content, state)
             technical_plan_and_tests = response['output']
             
             # 6. Save the generated plan to the workspace
             print("--- [Agent] Saving Technical Plan to workspace... ---")
-            write_file(
-                path="technical_plan.md", 
-                content=technical_plan_and_tests
-            )
+            write_file.invoke({
+                "path": "technical_plan.md", 
+                "content": technical_plan_and_tests
+            })
             
         except Exception as e:
             print(f"--- [Agent] CRITICAL ERROR in {self.group_name}: {e} ---")
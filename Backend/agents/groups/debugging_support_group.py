@@ -1,10 +1,9 @@
 from typing import Dict, Any
-from langchain_groq import ChatGroq
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
 from ..utils import load_prompt, create_agent
-from tools.agent_tools import read_file, write_file, list_files, execute_in_sandbox
+from tools.agent_tools import read_file, read_files, write_file, write_files, edit_file, list_files, execute_in_sandbox
 
 class DebuggingSupportGroup(GroupSupervisor):
     """
@@ -20,13 +19,15 @@ class DebuggingSupportGroup(GroupSupervisor):
         
         review_dossier = state.get("review_dossier", {})
         qa_feedback = review_dossier.get("feedback", "No feedback provided.")
+        test_report = review_dossier.get("tests") or {}
+        failed_test_ids = test_report.get("failed_test_ids") or []
 
         print(f"    - Task: Fixing code based on QA feedback.")
 
         # 1. Initialize LLM and tools
-        llm = ChatGroq(temperature=0.0, model_name=self.leader_model.get("unique_name"))
+        llm = self._create_llm(temperature=0.0)
         system_prompt = load_prompt("debugger.md")
-        tools = [read_file, write_file, list_files, execute_in_sandbox]
+        tools = [read_file, read_files, write_file, write_files, edit_file, list_files, execute_in_sandbox]
 
         # 2. Create the agent executor
         agent_executor = create_agent(llm, system_prompt, tools)
@@ -35,12 +36,18 @@ class DebuggingSupportGroup(GroupSupervisor):
         input_content = (
             f"The code has failed the Quality Assurance check. Your task is to fix it.\n\n"
             f"Here is the feedback from the QA Council:\n--- QA FEEDBACK ---\n{qa_feedback}\n--- END QA FEEDBACK ---\n\n"
-            f"Please analyze the feedback, read the relevant files, fix the bug, and then verify your fix by re-running the tests."
         )
+        if failed_test_ids:
+            # Point the agent at the exact failing tests, so it can re-run just those.
+            input_content += (
+                f"The failing tests are:\n" + "\n".join(f"- {test_id}" for test_id in failed_test_ids[:50]) + "\n\n"
+                f"Re-run only these tests with: `{test_report.get('rerun_command')}`\n\n"
+            )
+        input_content += "Please analyze the feedback, read the relevant files, fix the bug, and then verify your fix by re-running the tests."
 
         # 4. Invoke the agent to perform the debugging task
         try:
-            response = agent_executor.invoke({"input": input_content})
+            response = self._invoke_agent(agent_executor, input_content, state)
             fix_summary = response['output']
             
         except Exception as e:
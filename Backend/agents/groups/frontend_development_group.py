@@ -1,12 +1,14 @@
 from typing import Dict, Any, List
-from langchain_groq import ChatGroq
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
 from ..utils import load_prompt, create_agent
 from tools.agent_tools import (
     read_file, 
+    read_files, 
     write_file, 
+    write_files, 
+    edit_file, 
     list_files, 
     execute_in_sandbox
 )
@@ -42,9 +44,9 @@ class FrontendDevelopmentGroup(GroupSupervisor):
         print(f"--- [Agent] {self.group_name}: Starting task '{next_task['id']}: {next_task['description']}' ---")
 
         # 2. Initialize the LLM and tools
-        llm = ChatGroq(temperature=0.0, model_name=self.leader_model.get("unique_name"))
+        llm = self._create_llm(temperature=0.0)
         system_prompt = load_prompt("frontend_developer.md")
-        tools = [read_file, write_file, list_files, execute_in_sandbox]
+        tools = [read_file, read_files, write_file, write_files, edit_file, list_files, execute_in_sandbox]
         
         # 3. Create the agent executor
         agent_executor = create_agent(llm, system_prompt, tools)
@@ -60,7 +62,7 @@ class FrontendDevelopmentGroup(GroupSupervisor):
 
         # 5. Invoke the agent to perform the coding task
         try:
-            response = agent_executor.invoke({"input": input_content})
+            response = self._invoke_agent(agent_executor, input_content, state)
             task_result = response['output']
             
             # 6. Update the task's status to 'completed'
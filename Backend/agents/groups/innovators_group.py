@@ -1,5 +1,4 @@
 from typing import Dict, Any
-from langchain_groq import ChatGroq
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
@@ -20,10 +19,7 @@ class InnovatorsGroup(GroupSupervisor):
         
         # 1. Initialize the LLM for the Leader model
         # We use a low temperature for predictable structure, but not zero for creativity.
-        llm = ChatGroq(
-            temperature=0.2, 
-            model_name=self.leader_model.get("unique_name")
-        )
+        llm = self._create_llm(temperature=0.2)
         
         # 2. Load the specific prompt and define the tools
         system_prompt = load_prompt("innovator.md")
@@ -43,15 +39,15 @@ class InnovatorsGroup(GroupSupervisor):
         
         # 5. Invoke the agent to generate the Conceptual Plan
         try:
-            response = agent_executor.invoke({"input": input_content})
+            response = self._invoke_agent(agent_executor, input_content, state)
             conceptual_plan = response['output']
             
             # 6. Save the generated plan to the workspace
             print("--- [Agent] Saving Conceptual Plan to workspace... ---")
-            write_file(
-                path="conceptual_plan.md", 
-                content=conceptual_plan
-            )
+            write_file.invoke({
+                "path": "conceptual_plan.md", 
+                "content": conceptual_plan
+            })
             
         except Exception as e:
             print(f"--- [Agent] CRITICAL ERROR in {self.group_name}: {e} ---")
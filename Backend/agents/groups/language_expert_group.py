@@ -3,7 +3,6 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.tools import BaseTool
 from langchain_groq import ChatGroq
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-import litellm
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
@@ -30,11 +29,11 @@ class LanguageExpertGroup(GroupSupervisor):
         system_prompt_template = load_prompt("language_expert.md")
         
         # 2. Create the LLM instance for the Leader model
-        # We use litellm.completion and pass the model alias from our taxonomy.
+        # We stream the completion through LiteLLM using the model alias from our taxonomy.
         # This is a simplified approach for agents that don't need complex tools.
         try:
-            response = litellm.completion(
-                model=self.leader_model.get("unique_name"),
+            response_text = self._stream_completion(
+                state,
                 messages=[{
                     "role": "system",
                     "content": system_prompt_template
@@ -45,7 +44,7 @@ class LanguageExpertGroup(GroupSupervisor):
                 temperature=0.0
             )
             
-            refined_query = response.choices[0].message.content.strip()
+            refined_query = response_text.strip()
             
         except Exception as e:
             print(f"--- [Agent] CRITICAL ERROR in {self.group_name}: {e} ---")
@@ -1,9 +1,11 @@
-from typing import Dict, Any, List
-from langchain_groq import ChatGroq
+import time
+from typing import Dict, Any, List, Tuple
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
 from ..utils import load_prompt, create_agent
+from backend.utils.test_impact import test_impact
+from backend.utils.test_results import load_test_report, results_dir
 from tools.agent_tools import read_file, list_files
 
 # This defines the sequence in which the auditors will run.
@@ -33,7 +35,7 @@ class QACouncil(GroupSupervisor):
         print(f"--- [QA Council] Running sub-group: {auditor_key} with leader: {leader_model_name} ---")
 
         # 2. Initialize LLM and tools
-        llm = ChatGroq(temperature=0.0, model_name=leader_model_name)
+        llm = self._create_llm(temperature=0.0, model_name=leader_model_name)
         system_prompt = load_prompt(f"{auditor_key}.md")
         tools = [read_file, list_files]
         
@@ -44,7 +46,7 @@ class QACouncil(GroupSupervisor):
         input_content = "Please perform your audit based on the files in the workspace. The primary file under review is likely `src/main.py` or a similar core file. The planning documents are `conceptual_plan.md` and `technical_plan.md`."
 
         try:
-            response = agent_executor.invoke({"input": input_content})
+            response = self._invoke_agent(agent_executor, input_content, state)
             return response['output']
         except Exception as e:
             return f"Error during {auditor_key} execution: {e}"
@@ -61,10 +63,10 @@ class QACouncil(GroupSupervisor):
         final_verdict = "Approved"
 
         # Step 1: Run automated tests first.
-        test_results_feedback = self._run_automated_tests(state)
+        test_results_feedback, test_report = self._run_automated_tests(state)
         full_feedback.append(f"## Automated Test Results\n{test_results_feedback}")
 
-        if "failed" in test_results_feedback.lower():
+        if test_report["failed_test_ids"] or (test_report["format"] is None and test_report["status"] != "success"):
             final_verdict = "Revision Required"
         else:
             # Step 2: If tests pass, proceed with the manual audit sequence.
@@ -84,31 +86,64 @@ class QACouncil(GroupSupervisor):
 
         return {
             "history_log": state.get("history_log", []) + [f"The {self.group_name} has completed its review. Verdict: {final_verdict}"],
-            "review_dossier": {"feedback": final_dossier_content}
+            "review_dossier": {"feedback": final_dossier_content, "verdict": final_verdict, "tests": test_report}
         }
         
-    def _run_automated_tests(self, state: AgentState) -> str:
-        """Helper function to run the automated tests defined in the technical plan."""
+    def _run_automated_tests(self, state: AgentState) -> Tuple[str, Dict[str, Any]]:
+        """
+        Runs the project's tests in the sandbox with a machine-readable reporter
+        (JUnit XML for pytest, JSON for Jest) and parses the per-test results.
+
+        Returns:
+            The feedback for the dossier, and the parsed test report
+            (see `backend.utils.test_results.load_test_report`).
+        """
         print(f"--- [QA Council] Running Automated Tests... ---")
         
-        # In a real system, this agent would read the `test_cases` from the
-        # technical plan and construct the correct command (e.g., "pytest", "npm test").
-        # For Phase 4, we will simulate this by running a generic command.
-        
-        test_command = "python -m unittest discover tests" # A common Python test command
-        
-        # We can directly call the tool function here
-        from tools.agent_tools import execute_in_sandbox
-        
-        # We need a run_id for streaming, we can use a generic one for this internal process
-        run_id = f"qa-test-run-{state.get('initial_request', 'test')[:10]}"
+        from tools.agent_tools import execute_in_sandbox, _WORKSPACE_DIR
+        from tools.sandbox_resources import BACKGROUND_RUN, sandbox_run
 
-        test_results = execute_in_sandbox(test_command, run_id)
+        # Only the tests affected by the changes since the previous run are executed, when that can be determined.
+        plan = test_impact.plan(_WORKSPACE_DIR)
+        runner, test_command = plan["runner"], plan["command"]
 
-        # A simple check to see if the tests passed. A real system would parse the output.
-        if "FAILED" in test_results or "Error" in test_results:
-            print(f"--- [QA Council] Automated Tests FAILED. ---")
-            return f"Automated tests failed.\n\n{test_results}"
-        else:
-            print(f"--- [QA Council] Automated Tests PASSED. ---")
-            return "All automated tests passed."
\ No newline at end of file
+        started = time.perf_counter()
+        # Runs with the run's limits and trust level, and streams the test output to its watchers.
+        run_id = state.get("run_id") or BACKGROUND_RUN
+        with sandbox_run(run_id):
+            result = execute_in_sandbox.invoke({"command": test_command})
+        wall_time = time.perf_counter() - started
+        output = f"{result.get('stdout', '')}\n{result.get('stderr', '')}"
+        # The sandbox writes the reports to the run's results directory, outside the workspace.
+        reports_dir = results_dir(run_id)
+        report = load_test_report(runner, reports_dir, output, command=test_command)
+        report["status"] = result.get("status")
+        report["impact"] = test_impact.record(_WORKSPACE_DIR, plan, report, wall_time, reports_dir)
+        summary = report["summary"]
+
+        if report["format"] is None:
+            # No results could be read: the run itself failed (e.g. a collection or build error).
+            report["error_locations"] = result.get("error_locations", [])
+            if result.get("status") == "success":
+                print(f"--- [QA Council] Automated Tests PASSED (no per-test results). ---")
+                return "All automated tests passed.", report
+            print(f"--- [QA Council] Automated Tests FAILED to run. ---")
+            details = result.get("error") or result.get("stderr") or result.get("stdout", "")
+            return f"Automated tests failed: the test run produced no results.\n\n{details[-4000:]}", report
+
+        counts = f"{summary['passed']} passed, {summary['failed']} failed, {summary['error']} errors, {summary['skipped']} skipped in {summary['duration']}s"
+        if plan["mode"] == "selected":
+            counts += f"; only the tests affected by {len(plan['changed_files'])} changed file(s) were run, saving ~{report['impact']['saved_seconds']}s"
+        if not report["failed_test_ids"]:
+            print(f"--- [QA Council] Automated Tests PASSED ({counts}). ---")
+            return f"All automated tests passed ({counts}).", report
+
+        print(f"--- [QA Council] Automated Tests FAILED ({counts}). ---")
+        failures = "\n".join(
+            f"- `{test['id']}` ({test['outcome']}): {test['message'].strip().splitlines()[0] if test['message'].strip() else 'no message'}"
+            for test in report["tests"] if test["outcome"] in ("failed", "error")
+        )
+        return (
+            f"Automated tests failed ({counts}).\n\nFailing tests:\n{failures}\n\n"
+            f"Re-run only these with: `{report['rerun_command']}`"
+        ), report
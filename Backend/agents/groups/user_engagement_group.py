@@ -1,5 +1,4 @@
 from typing import Dict, Any
-import litellm
 
 from backend.agents.base import GroupSupervisor
 from backend.state import AgentState
@@ -33,8 +32,8 @@ class UserEngagementGroup(GroupSupervisor):
         
         # 3. Create the LLM instance for the Leader model and get the questions
         try:
-            response = litellm.completion(
-                model=self.leader_model.get("unique_name"),
+            response_text = self._stream_completion(
+                state,
                 messages=[{
                     "role": "system",
                     "content": system_prompt_template
@@ -45,7 +44,7 @@ class UserEngagementGroup(GroupSupervisor):
                 temperature=0.1 # A little creativity is okay for questions
             )
             
-            generated_questions = response.choices[0].message.content.strip()
+            generated_questions = response_text.strip()
             
         except Exception as e:
             print(f"--- [Agent] CRITICAL ERROR in {self.group_name}: {e} ---")
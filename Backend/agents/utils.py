@@ -30,6 +30,18 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.tools import BaseTool
 from langchain_groq import ChatGroq
 from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from backend.mock_llm import MockChatModel, mock_llm
+
+def create_chat_model(temperature: float, model_name: str, streaming: bool = False) -> BaseChatModel:
+    """
+    Creates the chat model for an agent: ChatGroq, or the mock provider's
+    model while it is installed (MOCK_LLM, see backend/mock_llm.py).
+    """
+    if mock_llm.enabled:
+        return MockChatModel(temperature=temperature, model_name=model_name, streaming=streaming)
+    return ChatGroq(temperature=temperature, model_name=model_name, streaming=streaming)
 
 # Add this new function to the file
 
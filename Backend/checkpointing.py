@@ -0,0 +1,352 @@
+import os
+import random
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+# This file implements the durable LangGraph checkpointer for our workflow.
+# After every node the graph saves a checkpoint, so a crashed or restarted run
+# can be resumed from its last completed node (or any earlier one) instead of
+# starting again from step 1, and a run can be forked from any checkpoint.
+#
+# Checkpoints are stored as compact diffs: the checkpoint row itself only holds
+# channel *versions*, and a channel's value is written to the blobs table only
+# when that channel changed in the step. Unchanged fields (plans, briefs, ...)
+# are therefore stored once, not once per step.
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+_CHECKPOINT_DB_PATH = os.environ.get("CHECKPOINT_DB_PATH", os.path.join(_DATA_DIR, "checkpoints.sqlite3"))
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT,
+        type TEXT,
+        checkpoint BLOB,
+        metadata_type TEXT,
+        metadata BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    );
+    CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        channel TEXT NOT NULL,
+        version TEXT NOT NULL,
+        type TEXT NOT NULL,
+        blob BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+    );
+    CREATE TABLE IF NOT EXISTS checkpoint_writes (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        type TEXT,
+        blob BLOB,
+        task_path TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    );
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    A LangGraph checkpoint saver backed by a local SQLite database (WAL mode).
+    The thread_id of a checkpoint is the API run_id.
+    """
+
+    def __init__(self, path: str = _CHECKPOINT_DB_PATH, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        print(f"--- [Checkpoints] SQLite checkpointer ready at: {path} ---")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+    def _load_channel_values(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            row = conn.execute(
+                "SELECT type, blob FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _load_writes(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = conn.execute(
+            "SELECT task_id, channel, type, blob FROM checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, blob))) for task_id, channel, type_, blob in rows]
+
+    def _row_to_tuple(self, conn: sqlite3.Connection, row: Tuple[Any, ...]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint_blob, metadata_type, metadata_blob = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_blob))
+        return CheckpointTuple(
+            config=self._config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channel_values(conn, thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=self._config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=self._load_writes(conn, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    # --- BaseCheckpointSaver interface ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        conn = self._connect()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            row = conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            row = conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        return self._row_to_tuple(conn, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        conn = self._connect()
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            f"FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+            params,
+        ).fetchall()
+
+        remaining = limit
+        for row in rows:
+            if remaining is not None and remaining <= 0:
+                break
+            checkpoint_tuple = self._row_to_tuple(conn, row)
+            if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if remaining is not None:
+                remaining -= 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        type_, checkpoint_blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(metadata)
+
+        with self._connect() as conn:
+            # Only the channels that changed in this step get a new blob.
+            for channel, version in new_versions.items():
+                blob_type, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)
+                conn.execute(
+                    "INSERT OR IGNORE INTO checkpoint_blobs (thread_id, checkpoint_ns, channel, version, type, blob) VALUES (?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), blob_type, blob),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_, checkpoint_blob, metadata_type, metadata_blob),
+            )
+        return self._config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._connect() as conn:
+            for idx, (channel, value) in enumerate(writes):
+                # Special writes (errors, interrupts) have fixed negative indexes and
+                # replace earlier ones; regular writes are never overwritten.
+                verb = "INSERT OR REPLACE" if channel in WRITES_IDX_MAP else "INSERT OR IGNORE"
+                type_, blob = self.serde.dumps_typed(value)
+                conn.execute(
+                    f"{verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, blob, task_path) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, blob, task_path),
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._connect() as conn:
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        # Versions carry a random suffix so that a branch created by resuming or
+        # forking from an older checkpoint never reuses a version (and thus a blob)
+        # of the original timeline.
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Forking ---
+
+    def fork_thread(
+        self,
+        source_thread_id: str,
+        checkpoint_id: str,
+        target_thread_id: str,
+        values: Optional[Dict[str, Any]] = None,
+        checkpoint_ns: str = "",
+    ) -> RunnableConfig:
+        """
+        Copies a checkpoint and all of its ancestors to a new thread, so the new
+        thread can continue from that point without recomputing earlier steps.
+
+        Args:
+            source_thread_id: The run to fork.
+            checkpoint_id: The checkpoint to fork from.
+            target_thread_id: The new run's thread id.
+            values: State fields to overwrite in the forked checkpoint, e.g. to try
+                    an alternative plan. Unlike `graph.update_state`, this does not
+                    re-run the router, so the next node stays the same.
+            checkpoint_ns: The checkpoint namespace (the root graph uses '').
+
+        Returns:
+            The config addressing the forked checkpoint in the new thread.
+
+        Raises:
+            KeyError: If the checkpoint does not exist.
+        """
+        with self._connect() as conn:
+            chain: List[str] = []
+            current: Optional[str] = checkpoint_id
+            while current:
+                row = conn.execute(
+                    "SELECT parent_checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (source_thread_id, checkpoint_ns, current),
+                ).fetchone()
+                if row is None:
+                    raise KeyError(f"Checkpoint '{current}' not found for run '{source_thread_id}'.")
+                chain.append(current)
+                current = row[0]
+
+            placeholders = ",".join("?" for _ in chain)
+            conn.execute(
+                "INSERT OR IGNORE INTO checkpoints SELECT ?, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                f"FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({placeholders})",
+                (target_thread_id, source_thread_id, checkpoint_ns, *chain),
+            )
+            # The fork point's own pending writes belong to the original timeline's
+            # next step; copying them would make the fork skip that step.
+            ancestors = chain[1:]
+            if ancestors:
+                conn.execute(
+                    "INSERT OR IGNORE INTO checkpoint_writes SELECT ?, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, blob, task_path "
+                    f"FROM checkpoint_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({','.join('?' for _ in ancestors)})",
+                    (target_thread_id, source_thread_id, checkpoint_ns, *ancestors),
+                )
+            # Blobs are shared by many checkpoints; copying the thread's blobs is
+            # simpler than resolving exactly which versions the chain references.
+            conn.execute(
+                "INSERT OR IGNORE INTO checkpoint_blobs SELECT ?, checkpoint_ns, channel, version, type, blob "
+                "FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                (target_thread_id, source_thread_id, checkpoint_ns),
+            )
+            if values:
+                self._overwrite_values(conn, target_thread_id, checkpoint_ns, checkpoint_id, values)
+        print(f"--- [Checkpoints] Forked run '{source_thread_id}' at checkpoint '{checkpoint_id}' into '{target_thread_id}'. ---")
+        return self._config(target_thread_id, checkpoint_ns, checkpoint_id)
+
+    def _overwrite_values(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, checkpoint_id: str, values: Dict[str, Any]) -> None:
+        """Gives the listed channels new versions (and blobs) in one stored checkpoint."""
+        type_, checkpoint_blob = conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchone()
+        checkpoint = self.serde.loads_typed((type_, checkpoint_blob))
+        for channel, value in values.items():
+            version = self.get_next_version(checkpoint["channel_versions"].get(channel), None)
+            blob_type, blob = self.serde.dumps_typed(value)
+            conn.execute(
+                "INSERT INTO checkpoint_blobs (thread_id, checkpoint_ns, channel, version, type, blob) VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, channel, version, blob_type, blob),
+            )
+            checkpoint["channel_versions"][channel] = version
+        type_, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        conn.execute(
+            "UPDATE checkpoints SET type = ?, checkpoint = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (type_, checkpoint_blob, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+
+# A single instance for the application to import and use.
+checkpointer = SQLiteCheckpointSaver()
@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+# This file implements the per-run event bus. Agents running inside the graph
+# publish their live activity (LLM tokens, tool calls, sandbox output) here,
+# and anything watching a run (e.g. the terminal WebSocket) subscribes to it.
+# Publishing never blocks: every subscriber gets its own bounded queue that is
+# drained by a dedicated thread, so a slow client cannot stall an agent.
+
+_DEFAULT_MAX_QUEUE_SIZE = 1000
+
+EventCallback = Callable[[Dict[str, Any]], None]
+
+
+class Subscription:
+    """
+    A single subscriber of one run's events.
+
+    Events are buffered in a bounded queue and delivered to the callback by a
+    daemon thread. When the queue is full, the oldest buffered event is
+    discarded to make room for the new one (backpressure by dropping, never
+    by blocking the publisher).
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, run_id: str, callback: EventCallback, max_queue_size: int):
+        self.run_id = run_id
+        self.callback = callback
+        self.dropped_events = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue_size)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._drain, name=f"event-bus-{run_id}", daemon=True
+        )
+        self._thread.start()
+
+    def offer(self, event: Any) -> None:
+        """Enqueues an event without blocking, dropping the oldest one if full."""
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped_events += 1
+                except queue.Empty:
+                    pass
+
+    def close(self) -> None:
+        """Stops delivery. Events still buffered are discarded."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.offer(self._CLOSE)
+
+    def _drain(self) -> None:
+        while not self._closed.is_set():
+            event = self._queue.get()
+            if event is self._CLOSE:
+                break
+            try:
+                self.callback(event)
+            except Exception as e:
+                print(f"--- [EventBus] WARNING: Subscriber for run '{self.run_id}' failed: {e} ---")
+
+
+class EventBus:
+    """
+    A thread-safe publish/subscribe hub keyed by run_id.
+    """
+
+    def __init__(self, max_queue_size: int = _DEFAULT_MAX_QUEUE_SIZE):
+        self.max_queue_size = max_queue_size
+        self._subscriptions: Dict[str, List[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, run_id: str, callback: EventCallback) -> Subscription:
+        """
+        Registers a callback for every event published on a run.
+
+        Args:
+            run_id: The unique ID of the agent run to follow.
+            callback: Called with each event dict, from the subscription's own thread.
+
+        Returns:
+            The Subscription handle, to be passed to `unsubscribe`.
+        """
+        subscription = Subscription(run_id, callback, self.max_queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(run_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Removes a subscription and stops its delivery thread."""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.run_id, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.run_id, None)
+        subscription.close()
+
+    def has_subscribers(self, run_id: str) -> bool:
+        """Cheap check so publishers can skip building events nobody will read."""
+        return bool(self._subscriptions.get(run_id))
+
+    def publish(self, run_id: str, event_type: str, **data: Any) -> None:
+        """
+        Publishes an event to every subscriber of a run. Never blocks.
+
+        Args:
+            run_id: The unique ID of the agent run the event belongs to.
+            event_type: A short type tag (e.g. 'llm_token', 'tool_start').
+            **data: The event payload.
+        """
+        if not run_id:
+            return
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(run_id, []))
+        if not subscriptions:
+            return
+
+        event = {"type": event_type, "run_id": run_id, "timestamp": time.time(), **data}
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+
+def format_event_for_terminal(event: Dict[str, Any]) -> str:
+    """
+    Renders a bus event as text for the xterm-based agent activity terminal.
+
+    Args:
+        event: An event dict as published on the bus.
+
+    Returns:
+        The text to write to the terminal (may be an empty string).
+    """
+    event_type = event.get("type")
+    group = event.get("group", "agent")
+
+    if event_type == "llm_token":
+        return event.get("token", "")
+    if event_type == "sandbox_output":
+        return event.get("text", "")
+    if event_type == "llm_start":
+        return f"\r\n~ [{group}] Thinking with {event.get('model', 'unknown model')}...\r\n"
+    if event_type == "llm_end":
+        return "\r\n"
+    if event_type == "tool_start":
+        return f"\r\n~ [{group}] Using tool '{event.get('tool')}' with input: {event.get('input', '')}\r\n"
+    if event_type == "tool_end":
+        return f"~ [{group}] Tool '{event.get('tool')}' finished.\r\n"
+    if event_type == "tool_error":
+        return f"~ [{group}] Tool '{event.get('tool')}' failed: {event.get('error')}\r\n"
+    return ""
+
+
+# A single instance for the application to import and use.
+event_bus = EventBus()
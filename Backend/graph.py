@@ -1,8 +1,12 @@
+import functools
 import json
 import litellm
 from langgraph.graph import StateGraph, END
 from backend.state import AgentState
+from backend.checkpointing import checkpointer
 from backend.graph_nodes import *
+from backend.llm_usage import usage_metadata
+from backend.tracing import llm_attributes, tracer
 
 # This file assembles our entire agentic workflow and includes the intelligent router.
 
@@ -65,7 +69,10 @@ def intelligent_router(state: AgentState) -> str:
     state_str = json.dumps(state, indent=2, default=str)
     prompt = ROUTER_PROMPT.format(state=state_str)
     try:
-        response = litellm.completion(model="fast-router", messages=[{"role": "user", "content": prompt}], temperature=0.0)
+        with tracer.span("llm.completion", kind="llm", model="fast-router", prompt_bytes=len(prompt.encode("utf-8"))) as span:
+            response = litellm.completion(model="fast-router", messages=[{"role": "user", "content": prompt}], temperature=0.0,
+                                          metadata=usage_metadata("router", state.get("run_id")))
+            span.set_attributes(**llm_attributes(response))
         next_node = response.choices[0].message.content.strip().split('\n')[0]
         print(f"--- [Router] LLM decision: Routing from '{last_step}' to '{next_node}' ---")
         if next_node not in ALL_NODES and next_node != END:
@@ -75,6 +82,25 @@ def intelligent_router(state: AgentState) -> str:
     except Exception as e:
         print(f"--- [Router] CRITICAL ERROR: LLM router failed: {e}. Ending workflow. ---")
         return END
+
+def traced_router(state: AgentState) -> str:
+    """Runs the router as a span that records where it came from and what it decided."""
+    with tracer.span("router", kind="router", from_node=state.get("last_completed_step")) as span:
+        decision = intelligent_router(state)
+        span.set_attribute("decision", decision)
+        return decision
+
+def _traced_node(node_name: str, node_func):
+    """Wraps a node so each execution is a span, with the size of the state updates it returned."""
+    @functools.wraps(node_func)
+    def run_node(state: AgentState):
+        with tracer.span(f"node.{node_name}", kind="node", run_id=state.get("run_id")) as span:
+            updates = node_func(state)
+            if isinstance(updates, dict):
+                span.set_attributes(updated_keys=sorted(updates), update_bytes=len(json.dumps(updates, default=str)))
+            return updates
+    return run_node
+
 workflow = StateGraph(AgentState)
 
 ALL_NODES = {
@@ -90,13 +116,16 @@ ALL_NODES = {
     "step_dispute_resolution": step_dispute_resolution,
 }
 
+# Every node and every routing decision is traced (see backend/tracing.py).
 for node_name, node_func in ALL_NODES.items():
-    workflow.add_node(node_name, node_func)
+    workflow.add_node(node_name, _traced_node(node_name, node_func))
 
 workflow.set_entry_point("step_1_initial_request")
 
 for node_name in ALL_NODES.keys():
-    workflow.add_conditional_edges(node_name, intelligent_router)
+    workflow.add_conditional_edges(node_name, traced_router)
 
-app = workflow.compile()
+# Every node's result is checkpointed per run (thread_id = run_id), so runs can
+# be resumed after a crash or forked from any earlier step.
+app = workflow.compile(checkpointer=checkpointer)
 print("--- [Graph] Intelligent workflow compiled successfully with all nodes. ---")
\ No newline at end of file
@@ -3,7 +3,7 @@ import litellm
 from typing import Dict, Any
 from backend.state import AgentState
 from backend.taxonomy_registry import taxonomy_registry
-from .utils import load_prompt
+from backend.agents.utils import load_prompt
 
 # Import all agent group classes
 from backend.agents.groups.user_engagement_group import UserEngagementGroup
@@ -16,10 +16,12 @@ from backend.agents.groups.debugging_support_group import DebuggingSupportGroup
 from backend.agents.groups.qa_council import QACouncil
 from backend.agents.groups.adjudication_unit import AdjudicationUnit
 # We will create a one-off "specialist" for this purpose.
-from ..utils import create_agent
-from ..agents.utils import load_prompt
-from tools.agent_tools import list_files, read_file, write_file
-from langchain_groq import ChatGroq
+from backend.agents.utils import create_agent, create_chat_model
+from tools.agent_tools import list_files, read_file, write_file, _WORKSPACE_DIR
+from tools.sandbox_images import sandbox_images
+from backend.agents.callbacks import TracingCallbackHandler, UsageLedgerCallbackHandler
+from backend.llm_usage import usage_metadata
+from backend.tracing import llm_attributes, tracer
 
 # Add the new import at the top of the file
 from tools.notification_tool import send_completion_notification
@@ -46,7 +48,7 @@ def _create_and_execute_agent(group_name: str, state: AgentState) -> Dict[str, A
     if not agent_class:
         raise ValueError(f"No agent class found for group: {group_name} in the AGENT_CLASS_MAP.")
         
-    supervisor = agent_class(group_details)
+    supervisor = agent_class({"group_name": group_name, **group_details})
     return supervisor.execute(state)
 
 # --- Node Definitions for each of the 17+ Workflow Steps ---
@@ -120,11 +122,18 @@ def step_12a_decompose_plan(state: AgentState) -> Dict[str, Any]:
     system_prompt_template = load_prompt("task_decomposer.md")
     technical_plan = state.get("technical_plan", "No technical plan found.")
     try:
-        response = litellm.completion(model="analyst-pro", messages=[{"role": "system", "content": system_prompt_template}, {"role": "user", "content": technical_plan}], response_format={"type": "json_object"}, temperature=0.0)
+        with tracer.span("llm.completion", kind="llm", model="analyst-pro") as span:
+            response = litellm.completion(model="analyst-pro", messages=[{"role": "system", "content": system_prompt_template}, {"role": "user", "content": technical_plan}], response_format={"type": "json_object"}, temperature=0.0, metadata=usage_metadata("task_decomposer", state.get("run_id")))
+            span.set_attributes(**llm_attributes(response))
         task_list = json.loads(response.choices[0].message.content)
     except Exception as e:
         print(f"--- [Node] CRITICAL ERROR in Task Decomposition: {e} ---")
         task_list = [{"id": "error", "description": f"Failed to parse plan: {e}", "group": "debugger", "dependencies": []}]
+    # Start preinstalling the project's dependencies into a sandbox image while the tasks are worked on.
+    try:
+        sandbox_images.prebuild_async(_WORKSPACE_DIR)
+    except Exception as e:
+        print(f"--- [Node] Warning: could not start the sandbox image prebuild: {e} ---")
     return {"history_log": state.get("history_log", []) + ["Step 12a: Decomposed plan into tasks."], "task_list": task_list, "last_completed_step": "step_12a_decompose_plan"}
 
 def step_13_task_execution(state: AgentState) -> Dict[str, Any]:
@@ -149,15 +158,15 @@ def step_15_project_completion(state: AgentState) -> Dict[str, Any]:
     print("--- [Node] Executing Step 15: Project Completion & Professional Packaging ---")
     
     # --- Generate README ---
-    readme_agent_llm = ChatGroq(temperature=0.1, model_name="analyst-pro")
+    readme_agent_llm = create_chat_model(temperature=0.1, model_name="analyst-pro")
     readme_prompt = load_prompt("readme_generator.md")
     readme_tools = [list_files, read_file]
     readme_agent = create_agent(readme_agent_llm, readme_prompt, readme_tools)
     
     try:
         print("--- [Agent] Generating README.md... ---")
-        readme_content = readme_agent.invoke({"input": "Analyze the workspace and generate a README.md."})['output']
-        write_file("README.md", readme_content)
+        readme_content = readme_agent.invoke({"input": "Analyze the workspace and generate a README.md."}, config={"callbacks": [TracingCallbackHandler(), UsageLedgerCallbackHandler(state.get("run_id"), "readme_generator")]})['output']
+        write_file.invoke({"path": "README.md", "content": readme_content})
         readme_status = "README.md generated successfully."
     except Exception as e:
         readme_status = f"Error generating README: {e}"
@@ -166,10 +175,10 @@ def step_15_project_completion(state: AgentState) -> Dict[str, Any]:
     # --- Send Notification ---
     summary = state.get("project_brief", {}).get("summary", state.get("initial_request", "N/A"))
     run_id_for_log = state.get('initial_request', 'unknown')[:20] # a pseudo run_id
-    notification_status = send_completion_notification(
-        project_summary=summary, 
-        run_id=run_id_for_log
-    )
+    notification_status = send_completion_notification.invoke({
+        "project_summary": summary, 
+        "run_id": run_id_for_log
+    })
     
     history_log_entry = f"Step 15: Project packaged. README status: [{readme_status}]. Notification status: [{notification_status}]."
 
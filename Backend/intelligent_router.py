@@ -3,6 +3,7 @@ import litellm
 from typing import Dict, Any
 from backend.state import AgentState
 from backend.config import GROQ_API_KEY # Import the configured API key
+from backend.llm_usage import usage_metadata
 
 # Configure litellm to use the Groq API key
 litellm.api_key = GROQ_API_KEY
@@ -60,6 +61,7 @@ def route(state: AgentState) -> str:
             ],
             temperature=0.0, # We want deterministic routing
             max_tokens=50,
+            metadata=usage_metadata("router", state.get("run_id")),
         )
         
         decision = response.choices[0].message.content.strip()
@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from backend.tracing import BACKGROUND_RUN, tracer
+
+# This file implements the LLM usage ledger: one record per LLM request with
+# its prompt and completion tokens, latency and estimated cost, tagged with
+# the run, the caller and the model.
+#
+# - The caller ("group") is the taxonomy_registry group that made the call
+#   (e.g. "qa_council"), or the name of a non-group caller: "router",
+#   "task_decomposer", "readme_generator" or "diagram_service".
+# - LiteLLM calls are recorded by `LLMUsageLogger`, a LiteLLM callback that is
+#   registered when this module is imported. Call sites pass their run and
+#   group as `metadata=usage_metadata(...)`.
+# - LangChain chat models (ChatGroq inside the agent executors) are recorded
+#   by `UsageLedgerCallbackHandler` (see backend/agents/callbacks.py).
+# - The cost comes from LLM_PRICES if the model is listed there, else from
+#   LiteLLM's own price table; models it does not know have no cost.
+# - The records are kept in SQLite, per run, and summed up per group and per
+#   model by GET /project/{run_id}/usage.
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+
+# --- Configuration ---
+_LLM_USAGE_PATH = os.environ.get("LLM_USAGE_PATH", os.path.join(_DATA_DIR, "llm_usage.sqlite3"))
+# Prices for models LiteLLM does not know (e.g. the aliases of the portfolio),
+# as JSON: {"<model>": [<USD per 1M prompt tokens>, <USD per 1M completion tokens>]}.
+_LLM_PRICES: Dict[str, List[float]] = json.loads(os.environ.get("LLM_PRICES", "{}"))
+
+# Upper bounds (in ms) of the latency histogram buckets; the last bucket is open.
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    """
+    Estimates the cost of one request in USD.
+
+    Returns:
+        The cost, or None if the token counts are unknown or the model has no price.
+    """
+    if not model or prompt_tokens is None or completion_tokens is None:
+        return None
+    if model in _LLM_PRICES:
+        prompt_price, completion_price = _LLM_PRICES[model]
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+    try:
+        prompt_cost, completion_cost = litellm.cost_per_token(model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return prompt_cost + completion_cost
+    except Exception:
+        return None
+
+
+def usage_metadata(group: str, run_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns the `metadata` to pass to `litellm.completion` so the request is
+    recorded for a run and group. Without a `run_id`, the run of the current
+    tracing span is used.
+    """
+    if run_id is None:
+        span = tracer.current_span()
+        run_id = span.run_id if span is not None else None
+    return {"run_id": run_id, "group": group}
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def _latency_histogram(latencies_ms: List[float]) -> Dict[str, int]:
+    histogram = {f"<={bound}ms": 0 for bound in LATENCY_BUCKETS_MS}
+    histogram[f">{LATENCY_BUCKETS_MS[-1]}ms"] = 0
+    for latency in latencies_ms:
+        for bound in LATENCY_BUCKETS_MS:
+            if latency <= bound:
+                histogram[f"<={bound}ms"] += 1
+                break
+        else:
+            histogram[f">{LATENCY_BUCKETS_MS[-1]}ms"] += 1
+    return histogram
+
+
+def _aggregate(rows: List[tuple]) -> Dict[str, Any]:
+    """Sums up (prompt_tokens, completion_tokens, latency_ms, cost_usd, cache_hit, error) rows."""
+    latencies = sorted(row[2] for row in rows)
+    costs = [row[3] for row in rows if row[3] is not None]
+    return {
+        "requests": len(rows),
+        "errors": sum(1 for row in rows if row[5]),
+        "cache_hits": sum(row[4] for row in rows),
+        "prompt_tokens": sum(row[0] or 0 for row in rows),
+        "completion_tokens": sum(row[1] or 0 for row in rows),
+        "total_tokens": sum((row[0] or 0) + (row[1] or 0) for row in rows),
+        # Requests of models without a price are not included in the cost.
+        "cost_usd": round(sum(costs), 6) if costs else None,
+        "unpriced_requests": sum(1 for row in rows if row[3] is None and not row[4] and not row[5]),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "max": latencies[-1] if latencies else None,
+            "histogram": _latency_histogram(latencies),
+        },
+    }
+
+
+class LLMUsageLedger:
+    """
+    Keeps the token usage, latency and cost of every LLM request in SQLite,
+    per run. Thread-safe.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS llm_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            grp TEXT NOT NULL,
+            model TEXT NOT NULL,
+            source TEXT NOT NULL,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            latency_ms REAL NOT NULL,
+            cost_usd REAL,
+            cache_hit INTEGER NOT NULL,
+            error TEXT,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_requests_run_id ON llm_requests (run_id);
+    """
+
+    def __init__(self, path: str = _LLM_USAGE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self._SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, run_id: Optional[str], group: Optional[str], model: Optional[str], source: str,
+               prompt_tokens: Optional[int], completion_tokens: Optional[int], latency_ms: float,
+               cost_usd: Optional[float] = None, cache_hit: bool = False, error: Optional[str] = None) -> None:
+        """
+        Stores one LLM request. Requests outside a run are kept under `_background`.
+
+        Args:
+            source: What reported the request ("litellm" or "langchain").
+            cost_usd: The cost, if the caller knows it; estimated otherwise (and
+                always for models listed in LLM_PRICES).
+        """
+        if (cost_usd is None or model in _LLM_PRICES) and not cache_hit:
+            cost_usd = estimate_cost(model, prompt_tokens, completion_tokens)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO llm_requests (run_id, grp, model, source, prompt_tokens, completion_tokens, latency_ms, cost_usd, "
+                "cache_hit, error, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id or BACKGROUND_RUN, group or "unknown", model or "unknown", source, prompt_tokens, completion_tokens,
+                 round(latency_ms, 1), cost_usd, int(cache_hit), error[:2000] if error else None, time.time()),
+            )
+
+    def summary(self, run_id: str) -> Dict[str, Any]:
+        """
+        Sums up a run's LLM usage.
+
+        Returns:
+            The `totals`, the same figures `by_group`, `by_model` and
+            `by_group_model` (keyed "<group>/<model>"): `requests`, `errors`,
+            `cache_hits`, prompt/completion/total tokens, `cost_usd`, how many
+            successful requests had no price, and the latency (mean, p50, p95, max and a
+            histogram in LATENCY_BUCKETS_MS).
+        """
+        rows = self._connect().execute(
+            "SELECT grp, model, prompt_tokens, completion_tokens, latency_ms, cost_usd, cache_hit, error "
+            "FROM llm_requests WHERE run_id = ? ORDER BY id",
+            (run_id,),
+        ).fetchall()
+        groups: Dict[str, List[tuple]] = {}
+        models: Dict[str, List[tuple]] = {}
+        pairs: Dict[str, List[tuple]] = {}
+        for group, model, *values in rows:
+            groups.setdefault(group, []).append(tuple(values))
+            models.setdefault(model, []).append(tuple(values))
+            pairs.setdefault(f"{group}/{model}", []).append(tuple(values))
+        return {
+            "totals": _aggregate([tuple(row[2:]) for row in rows]),
+            "by_group": {group: _aggregate(values) for group, values in groups.items()},
+            "by_model": {model: _aggregate(values) for model, values in models.items()},
+            "by_group_model": {pair: _aggregate(values) for pair, values in pairs.items()},
+        }
+
+    def delete_run(self, run_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_requests WHERE run_id = ?", (run_id,))
+
+
+# A single instance for the application to import and use.
+llm_usage = LLMUsageLedger()
+
+
+class LLMUsageLogger(CustomLogger):
+    """
+    A LiteLLM callback that records every `litellm.completion` in the ledger.
+    For streaming calls, LiteLLM reports once the stream is consumed, with the
+    usage of the assembled response.
+    """
+
+    def log_success_event(self, kwargs: Dict[str, Any], response_obj: Any, start_time: datetime, end_time: datetime) -> None:
+        usage = getattr(response_obj, "usage", None)
+        self._record(
+            kwargs, start_time, end_time,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+    def log_failure_event(self, kwargs: Dict[str, Any], response_obj: Any, start_time: datetime, end_time: datetime) -> None:
+        self._record(kwargs, start_time, end_time, error=str(kwargs.get("exception") or "unknown error"))
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time) -> None:
+        self.log_success_event(kwargs, response_obj, start_time, end_time)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time) -> None:
+        self.log_failure_event(kwargs, response_obj, start_time, end_time)
+
+    @staticmethod
+    def _record(kwargs: Dict[str, Any], start_time: datetime, end_time: datetime, prompt_tokens: Optional[int] = None,
+                completion_tokens: Optional[int] = None, error: Optional[str] = None) -> None:
+        metadata = (kwargs.get("litellm_params") or {}).get("metadata") or {}
+        try:
+            llm_usage.record(
+                metadata.get("run_id"), metadata.get("group"), kwargs.get("model"), "litellm",
+                prompt_tokens, completion_tokens, (end_time - start_time).total_seconds() * 1000,
+                cost_usd=kwargs.get("response_cost"), cache_hit=bool(kwargs.get("cache_hit")), error=error,
+            )
+        except Exception as e:
+            # Accounting must never fail the LLM call itself.
+            print(f"--- [LLMUsage] ERROR recording a LiteLLM request: {e} ---")
+
+
+llm_usage_logger = LLMUsageLogger()
+if not any(isinstance(callback, LLMUsageLogger) for callback in litellm.callbacks):
+    litellm.callbacks.append(llm_usage_logger)
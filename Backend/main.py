@@ -1,3 +1,4 @@
+import uuid
 from backend.graph import app
 from backend.state import AgentState
 
@@ -32,7 +33,9 @@ def run_agent():
     #    The `stream` method runs the graph step-by-step, allowing us to see
     #    the output from each node as it executes.
     final_state = None
-    for event in app.stream(initial_state, stream_mode="values"):
+    # The graph is checkpointed, so every run needs its own thread_id.
+    config = {"configurable": {"thread_id": f"cli-{uuid.uuid4()}"}}
+    for event in app.stream(initial_state, config=config, stream_mode="values"):
         # The `stream` yields the entire state after each node execution.
         # We can print it to see the progress.
         print("\n" + "="*40)
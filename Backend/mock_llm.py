@@ -0,0 +1,428 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+
+import litellm
+from litellm import CustomLLM, ModelResponse
+from litellm.types.utils import GenericStreamingChunk
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+from backend.taxonomy_registry import taxonomy_registry
+
+# This file implements a deterministic fake LLM provider, so the workflow can
+# run without API keys or network access: in CI, in benchmarks (see
+# benchmarks/graph_overhead.py) and in load tests.
+#
+# - It plugs into LiteLLM as the custom provider "mock": once installed, every
+#   model alias the code uses (the taxonomy's leaders, "fast-router",
+#   "analyst-pro") is mapped to "mock/<alias>". LangChain agents get a
+#   `MockChatModel` instead of ChatGroq (see `create_chat_model` in
+#   backend/agents/utils.py).
+# - Replies come from a script: router decisions per last completed step, the
+#   task list for JSON-mode requests, and ordered rules that match the last
+#   user message and answer with text and/or tool calls (one tool call per
+#   agent turn, then the text).
+# - Latency is sampled from a configurable distribution. The sample is seeded
+#   by the request itself, so the same request always takes the same time.
+# - Token counts are estimated (4 characters per token) and reported as usage,
+#   so the tracing spans and the LLM usage ledger work as with a real provider.
+#
+# It is used when MOCK_LLM is set; MOCK_LLM_SCRIPT can point to a JSON file
+# with "routes", "tasks", "responses" and "latency" that extend the defaults.
+
+# --- Configuration ---
+_MOCK_LLM = os.environ.get("MOCK_LLM", "").lower() in ("1", "true", "yes")
+# "fixed:<ms>", "uniform:<min ms>,<max ms>", "normal:<mean ms>,<stddev ms>" or "lognormal:<median ms>,<sigma>".
+_MOCK_LLM_LATENCY = os.environ.get("MOCK_LLM_LATENCY", "fixed:0")
+_MOCK_LLM_SEED = os.environ.get("MOCK_LLM_SEED", "0")
+_MOCK_LLM_SCRIPT = os.environ.get("MOCK_LLM_SCRIPT")
+# Further model names to send to the mock, comma-separated.
+_MOCK_LLM_MODELS = [name.strip() for name in os.environ.get("MOCK_LLM_MODELS", "").split(",") if name.strip()]
+
+PROVIDER = "mock"
+END = "__end__"  # LangGraph's END node.
+# Model aliases used in the code rather than in the taxonomy.
+_CODE_MODEL_ALIASES = ("fast-router", "analyst-pro")
+
+# The workflow's standard progression, as the router prompt describes it.
+DEFAULT_ROUTES: Dict[str, str] = {
+    "step_1_initial_request": "step_2_polish_query",
+    "step_2_polish_query": "step_3_user_confirmation_1",
+    "step_3_user_confirmation_1": "step_4_deep_clarification",
+    "step_4_deep_clarification": "step_5_final_project_brief",
+    "step_5_final_project_brief": "step_6_market_analysis",
+    "step_6_market_analysis": "step_7_creative_ideation",
+    "step_7_creative_ideation": "step_8_internal_review_1",
+    "step_8_internal_review_1": "step_9_technical_planning",
+    "step_9_technical_planning": "step_10_internal_review_2",
+    "step_10_internal_review_2": "step_11_present_plan_to_user",
+    "step_11_present_plan_to_user": "step_12_user_feedback_loop",
+    "step_12_user_feedback_loop": "step_12a_decompose_plan",
+    "step_12a_decompose_plan": "step_13_task_execution",
+    "step_13_task_execution": "step_14_qa_loop",
+    "step_14_qa_loop": "step_15_project_completion",
+    "step_15_project_completion": "step_16_post_delivery_review",
+    "step_dispute_resolution": "step_9_technical_planning",
+    "step_17_reengage_workflow": END,
+}
+
+DEFAULT_TASKS: List[Dict[str, Any]] = [
+    {"id": "task_01", "description": "Create the application entry point in `src/main.py`.",
+     "group": "backend_development_group", "dependencies": []},
+    {"id": "task_02", "description": "Add unit tests for `src/main.py` in `tests/test_main.py`.",
+     "group": "backend_development_group", "dependencies": ["task_01"]},
+]
+
+_MAIN_PY = 'def greet(name: str) -> str:\n    return f"Hello, {name}!"\n\n\nif __name__ == "__main__":\n    print(greet("world"))\n'
+_TEST_MAIN_PY = "import unittest\n\nfrom src.main import greet\n\n\nclass GreetTest(unittest.TestCase):\n    def test_greet(self):\n        self.assertEqual(greet(\"Ada\"), \"Hello, Ada!\")\n"
+
+# Matched in order against the last user message; the last rule matches everything.
+DEFAULT_RESPONSES: List[Dict[str, Any]] = [
+    {"match": "Your current task is", "tool_calls": [
+        {"name": "write_files", "args": {"files": {"src/main.py": _MAIN_PY, "tests/test_main.py": _TEST_MAIN_PY}}},
+        {"name": "execute_in_sandbox", "args": {"command": "python -m unittest discover -s tests"}},
+    ], "content": "Implemented the task in `src/main.py` with tests in `tests/test_main.py`."},
+    {"match": "Please perform your audit", "tool_calls": [
+        {"name": "list_files", "args": {"path": "."}},
+        {"name": "read_file", "args": {"path": "src/main.py"}},
+    ], "content": "No blocking issues found.\n\nVerdict: Approved"},
+    {"match": "Technical Plan", "tool_calls": [{"name": "list_files", "args": {"path": "."}}], "content": (
+        "# Technical Plan\n\n## Technology Stack\n- Python 3.11\n\n## File Structure\n- `src/main.py`\n- `tests/test_main.py`\n\n"
+        "## Test Cases\n1. `greet('Ada')` returns `Hello, Ada!`.\n"
+    )},
+    {"match": "project brief", "content": (
+        "# Conceptual Plan\n\nA small command-line application that greets its user.\n\n"
+        "## Features\n1. Greets a user by name.\n"
+    )},
+    {"match": "README", "tool_calls": [{"name": "list_files", "args": {"path": "."}}],
+     "content": "# Greeter\n\nA small command-line application that greets its user.\n\n## Usage\n\n    python src/main.py\n"},
+    {"match": "refined project query", "content": "1. Who are the users of the application?\n2. Which platforms must it support?"},
+    {"match": "A dispute has been raised", "content": "OVERRULE"},
+    {"match": "", "content": "{input}"},
+]
+
+_ROUTER_MARKER = "workflow router"
+_LAST_STEP = re.compile(r'"last_completed_step":\s*"([^"]+)"')
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parses a latency distribution, e.g. 'fixed:200' or 'lognormal:800,0.5'.
+
+    Returns:
+        A function that samples a latency in seconds from a random generator.
+
+    Raises:
+        ValueError: If the distribution is unknown or its parameters are invalid.
+    """
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",")] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters in '{spec}'.")
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if kind not in expected:
+        raise ValueError(f"Unknown latency distribution '{kind}'. Expected one of {sorted(expected)}.")
+    if len(values) != expected[kind] or any(value < 0 for value in values):
+        raise ValueError(f"'{kind}' latency takes {expected[kind]} non-negative parameter(s), got '{params}'.")
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    return lambda rng: values[0] * rng.lognormvariate(0.0, values[1]) / 1000
+
+
+def count_tokens(text: str) -> int:
+    """Estimates the number of tokens of a text (4 characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class MockReply:
+    """What the mock answers to one request."""
+
+    def __init__(self, kind: str, content: str, tool_calls: List[Dict[str, Any]], prompt_tokens: int, latency: float):
+        self.kind = kind
+        self.content = content
+        self.tool_calls = tool_calls
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = count_tokens(content + "".join(json.dumps(call["args"]) for call in tool_calls))
+        self.latency = latency
+
+
+class MockScript:
+    """
+    The scripted replies of the mock provider: router decisions, the task
+    list and the rules for everything else.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, str]] = None, tasks: Optional[List[Dict[str, Any]]] = None,
+                 responses: Optional[List[Dict[str, Any]]] = None, latency: str = _MOCK_LLM_LATENCY):
+        self.routes = {**DEFAULT_ROUTES, **(routes or {})}
+        self.tasks = tasks if tasks is not None else DEFAULT_TASKS
+        # A script's own rules take precedence over the defaults.
+        self.responses = (responses or []) + DEFAULT_RESPONSES
+        self.latency = parse_latency(latency)
+        self._rule_latency = {id(rule): parse_latency(rule["latency"]) for rule in self.responses if "latency" in rule}
+
+    @classmethod
+    def from_file(cls, path: str, latency: str = _MOCK_LLM_LATENCY) -> "MockScript":
+        """
+        Loads a script from a JSON file with any of "routes", "tasks",
+        "responses" and "latency"; they extend the defaults.
+
+        Raises:
+            ValueError: If the file is not a valid script.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            script = json.load(f)
+        if not isinstance(script, dict):
+            raise ValueError(f"The mock LLM script '{path}' must be a JSON object.")
+        return cls(script.get("routes"), script.get("tasks"), script.get("responses"), script.get("latency", latency))
+
+    def reply(self, messages: List[Dict[str, Any]], tool_names: Sequence[str], json_mode: bool, rng: random.Random) -> MockReply:
+        """
+        Decides the reply to a conversation.
+
+        Args:
+            messages: The conversation, as {"role", "content"} dicts.
+            tool_names: The tools the model may call.
+            json_mode: Whether a JSON object was requested (the task decomposer).
+            rng: The request's random generator, for the latency.
+        """
+        prompt_tokens = sum(count_tokens(str(message.get("content") or "")) + 4 for message in messages)
+        last_user = next((i for i in range(len(messages) - 1, -1, -1) if messages[i]["role"] == "user"), None)
+        user_text = str(messages[last_user]["content"] or "") if last_user is not None else ""
+
+        if _ROUTER_MARKER in user_text:
+            match = _LAST_STEP.search(user_text)
+            decision = self.routes.get(match.group(1) if match else "", END)
+            return MockReply("router", decision, [], prompt_tokens, self.latency(rng))
+        if json_mode:
+            return MockReply("task_list", json.dumps(self.tasks, indent=2), [], prompt_tokens, self.latency(rng))
+
+        rule = next(rule for rule in self.responses if rule.get("match", "") in user_text)
+        latency = self._rule_latency.get(id(rule), self.latency)(rng)
+        # One tool call per agent turn: the n-th turn after the user message makes the n-th call.
+        turn = sum(1 for message in messages[(last_user or 0) + 1:] if message["role"] == "tool")
+        calls = [call for call in rule.get("tool_calls", []) if call["name"] in tool_names]
+        if turn < len(calls):
+            return MockReply("tool_call", "", [{"id": f"call_{turn + 1}", **copy.deepcopy(calls[turn])}], prompt_tokens, latency)
+        content = rule.get("content", "").replace("{input}", user_text[:500])
+        return MockReply("response", content, [], prompt_tokens, latency)
+
+
+def _chunks(text: str) -> List[str]:
+    """Splits a reply into the word-sized pieces it is streamed in."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class MockLLM(CustomLLM):
+    """
+    The mock provider: answers LiteLLM requests for "mock/<model>" and the
+    requests of `MockChatModel`s from its script. Thread-safe.
+    """
+
+    def __init__(self, script: Optional[MockScript] = None, seed: str = _MOCK_LLM_SEED):
+        super().__init__()
+        self.script = script or MockScript()
+        self.seed = seed
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # --- Replies ---
+
+    def reply(self, model: str, messages: List[Dict[str, Any]], tool_names: Sequence[str] = (), json_mode: bool = False) -> MockReply:
+        """Decides the reply to a request, without waiting for its latency."""
+        digest = hashlib.sha256(json.dumps([self.seed, model, messages], default=str, sort_keys=True).encode("utf-8")).hexdigest()
+        reply = self.script.reply(messages, tool_names, json_mode, random.Random(digest))
+        with self._lock:
+            stats = self._stats.setdefault(reply.kind, {"calls": 0, "latency_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+            stats["calls"] += 1
+            stats["latency_seconds"] += reply.latency
+            stats["prompt_tokens"] += reply.prompt_tokens
+            stats["completion_tokens"] += reply.completion_tokens
+        return reply
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns the requests, simulated latency and tokens so far, per kind of reply."""
+        with self._lock:
+            return copy.deepcopy(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    # --- LiteLLM provider ---
+
+    def _litellm_reply(self, model: str, messages: list, optional_params: dict) -> MockReply:
+        tools = optional_params.get("tools") or []
+        json_mode = (optional_params.get("response_format") or {}).get("type") == "json_object"
+        return self.reply(model, messages, [tool["function"]["name"] for tool in tools], json_mode)
+
+    @staticmethod
+    def _model_response(model: str, reply: MockReply) -> ModelResponse:
+        message: Dict[str, Any] = {"role": "assistant", "content": reply.content or None}
+        if reply.tool_calls:
+            message["tool_calls"] = [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": json.dumps(call["args"])}}
+                for call in reply.tool_calls
+            ]
+        return ModelResponse(
+            model=f"{PROVIDER}/{model}",
+            choices=[{"index": 0, "message": message, "finish_reason": "tool_calls" if reply.tool_calls else "stop"}],
+            usage={"prompt_tokens": reply.prompt_tokens, "completion_tokens": reply.completion_tokens,
+                   "total_tokens": reply.prompt_tokens + reply.completion_tokens},
+        )
+
+    @staticmethod
+    def _stream_chunks(reply: MockReply) -> Iterator[GenericStreamingChunk]:
+        for piece in _chunks(reply.content):
+            yield {"text": piece, "tool_use": None, "is_finished": False, "finish_reason": "", "usage": None, "index": 0}
+        for index, call in enumerate(reply.tool_calls):
+            yield {"text": "", "is_finished": False, "finish_reason": "", "usage": None, "index": 0, "tool_use": {
+                "id": call["id"], "type": "function", "index": index,
+                "function": {"name": call["name"], "arguments": json.dumps(call["args"])},
+            }}
+        yield {"text": "", "tool_use": None, "is_finished": True, "index": 0,
+               "finish_reason": "tool_calls" if reply.tool_calls else "stop",
+               "usage": {"prompt_tokens": reply.prompt_tokens, "completion_tokens": reply.completion_tokens,
+                         "total_tokens": reply.prompt_tokens + reply.completion_tokens}}
+
+    def completion(self, model: str, messages: list, *args: Any, optional_params: Optional[dict] = None, **kwargs: Any) -> ModelResponse:
+        reply = self._litellm_reply(model, messages, optional_params or {})
+        time.sleep(reply.latency)
+        return self._model_response(model, reply)
+
+    def streaming(self, model: str, messages: list, *args: Any, optional_params: Optional[dict] = None, **kwargs: Any) -> Iterator[GenericStreamingChunk]:
+        reply = self._litellm_reply(model, messages, optional_params or {})
+        time.sleep(reply.latency)
+        yield from self._stream_chunks(reply)
+
+    async def acompletion(self, model: str, messages: list, *args: Any, optional_params: Optional[dict] = None, **kwargs: Any) -> ModelResponse:
+        reply = self._litellm_reply(model, messages, optional_params or {})
+        await asyncio.sleep(reply.latency)
+        return self._model_response(model, reply)
+
+    async def astreaming(self, model: str, messages: list, *args: Any, optional_params: Optional[dict] = None, **kwargs: Any) -> AsyncIterator[GenericStreamingChunk]:
+        reply = self._litellm_reply(model, messages, optional_params or {})
+        await asyncio.sleep(reply.latency)
+        for chunk in self._stream_chunks(reply):
+            yield chunk
+
+    def install(self, models: Sequence[str] = ()) -> None:
+        """
+        Registers the provider with LiteLLM and sends the taxonomy's models,
+        the aliases used in the code, MOCK_LLM_MODELS and `models` to it.
+        Agents created from now on use `MockChatModel`.
+        """
+        if not any(entry["provider"] == PROVIDER for entry in litellm.custom_provider_map):
+            litellm.custom_provider_map.append({"provider": PROVIDER, "custom_handler": self})
+        for name in set(_taxonomy_models()) | set(_CODE_MODEL_ALIASES) | set(_MOCK_LLM_MODELS) | set(models):
+            litellm.model_alias_map[name] = f"{PROVIDER}/{name}"
+        # LiteLLM cannot price the mock's models and would print its provider list for each request.
+        litellm.suppress_debug_info = True
+        self.enabled = True
+        print(f"--- [MockLLM] Mock LLM provider installed ({len(litellm.model_alias_map)} models). ---")
+
+
+def _taxonomy_models() -> List[str]:
+    """Returns the unique_name of every leader in the taxonomy, sub-groups included."""
+    names: List[str] = []
+
+    def _walk(node: Any) -> None:
+        if isinstance(node, dict):
+            if isinstance(node.get("unique_name"), str):
+                names.append(node["unique_name"])
+            for value in node.values():
+                _walk(value)
+
+    _walk(taxonomy_registry.get_registry())
+    return names
+
+
+# --- LangChain chat model ---
+
+_ROLES = {"system": "system", "human": "user", "ai": "assistant", "tool": "tool"}
+
+
+def _message_dicts(messages: List[BaseMessage]) -> List[Dict[str, Any]]:
+    return [{"role": _ROLES.get(message.type, message.type), "content": message.content} for message in messages]
+
+
+def _tool_names(tools: Optional[List[Dict[str, Any]]]) -> List[str]:
+    return [tool["function"]["name"] for tool in tools or []]
+
+
+class MockChatModel(BaseChatModel):
+    """
+    A LangChain chat model backed by the mock provider; stands in for ChatGroq
+    in agent executors, with tool calling and streaming.
+    """
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str = "mock"
+    temperature: float = 0.0
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "temperature": self.temperature}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _usage(self, reply: MockReply) -> Dict[str, int]:
+        return {"input_tokens": reply.prompt_tokens, "output_tokens": reply.completion_tokens,
+                "total_tokens": reply.prompt_tokens + reply.completion_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        reply = mock_llm.reply(self.model_name, _message_dicts(messages), _tool_names(kwargs.get("tools")))
+        time.sleep(reply.latency)
+        message = AIMessage(
+            content=reply.content,
+            tool_calls=[{"id": call["id"], "name": call["name"], "args": call["args"]} for call in reply.tool_calls],
+            usage_metadata=self._usage(reply),
+        )
+        token_usage = {"prompt_tokens": reply.prompt_tokens, "completion_tokens": reply.completion_tokens,
+                       "total_tokens": reply.prompt_tokens + reply.completion_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"token_usage": token_usage, "model_name": self.model_name})
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        reply = mock_llm.reply(self.model_name, _message_dicts(messages), _tool_names(kwargs.get("tools")))
+        time.sleep(reply.latency)
+        for piece in _chunks(reply.content):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[{"id": call["id"], "name": call["name"], "args": json.dumps(call["args"]), "index": index}
+                              for index, call in enumerate(reply.tool_calls)],
+            usage_metadata=self._usage(reply),
+        ))
+
+
+# A single instance for the application to import and use.
+mock_llm = MockLLM(MockScript.from_file(_MOCK_LLM_SCRIPT) if _MOCK_LLM_SCRIPT else None)
+if _MOCK_LLM:
+    mock_llm.install()
@@ -0,0 +1,119 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# This file turns the raw output of `agent_app.stream` into the typed progress
+# events that dashboards follow (see the `/project/{run_id}/events` endpoint).
+#
+# The runner streams the graph with stream_mode=["updates", "debug"]. "debug"
+# chunks tell us when a node starts and finishes; "updates" chunks carry the
+# state changes, from which task status changes and review verdicts are read.
+# The router's decisions are not visible in the stream directly, but since the
+# workflow runs one node at a time, the node that starts after another one
+# finished is the router's choice.
+
+PROGRESS_EVENT_TYPES = ("run_status", "node_started", "node_finished", "router_decision", "task_status", "verdict")
+
+ProgressEvent = Tuple[str, Dict[str, Any]]
+
+
+class ProgressEventTranslator:
+    """
+    Translates the stream chunks of one run into progress events. Keeps the
+    little state it needs (running nodes, last node, known task statuses).
+    """
+
+    def __init__(self):
+        self._running: Dict[str, Tuple[str, float]] = {}  # task id -> (node, start time)
+        self._last_node: Optional[str] = None
+        self._task_statuses: Optional[Dict[str, Any]] = None
+
+    def translate(self, mode: str, chunk: Any) -> List[ProgressEvent]:
+        """
+        Args:
+            mode: The stream mode the chunk came from ("updates" or "debug").
+            chunk: The chunk as yielded by `agent_app.stream`.
+
+        Returns:
+            The progress events for this chunk, in order.
+        """
+        if mode == "debug":
+            return self._translate_debug(chunk)
+        if mode == "updates":
+            events: List[ProgressEvent] = []
+            for node_name, updates in chunk.items():
+                if isinstance(updates, dict):
+                    events.extend(self._task_status_events(node_name, updates))
+                    events.extend(self._verdict_events(node_name, updates))
+            return events
+        return []
+
+    def finish(self) -> List[ProgressEvent]:
+        """Returns the final routing decision once the graph has ended normally."""
+        if self._last_node is None:
+            return []
+        return [("router_decision", {"from_node": self._last_node, "to_node": "END"})]
+
+    def _translate_debug(self, chunk: Dict[str, Any]) -> List[ProgressEvent]:
+        payload = chunk.get("payload") or {}
+        node_name = payload.get("name")
+        task_id = payload.get("id")
+        step = chunk.get("step")
+
+        if chunk.get("type") == "task":
+            events: List[ProgressEvent] = []
+            if self._task_statuses is None and isinstance(payload.get("input"), dict):
+                # Seed from the node's input so a resumed run does not re-announce old statuses.
+                self._task_statuses = self._statuses_of(payload["input"].get("task_list"))
+            if self._last_node is not None:
+                events.append(("router_decision", {"from_node": self._last_node, "to_node": node_name}))
+            self._running[task_id] = (node_name, time.monotonic())
+            events.append(("node_started", {"node": node_name, "step": step}))
+            return events
+
+        if chunk.get("type") == "task_result":
+            _, started_at = self._running.pop(task_id, (node_name, None))
+            duration_ms = round((time.monotonic() - started_at) * 1000, 1) if started_at is not None else None
+            self._last_node = node_name
+            return [("node_finished", {
+                "node": node_name,
+                "step": step,
+                "duration_ms": duration_ms,
+                "error": str(payload["error"]) if payload.get("error") else None,
+            })]
+
+        return []
+
+    @staticmethod
+    def _statuses_of(task_list: Any) -> Dict[str, Any]:
+        if not isinstance(task_list, list):
+            return {}
+        return {task["id"]: task.get("status") for task in task_list if isinstance(task, dict) and "id" in task}
+
+    def _task_status_events(self, node_name: str, updates: Dict[str, Any]) -> List[ProgressEvent]:
+        if not isinstance(updates.get("task_list"), list):
+            return []
+        previous = self._task_statuses or {}
+        events: List[ProgressEvent] = []
+        for task in updates["task_list"]:
+            if not isinstance(task, dict) or "id" not in task:
+                continue
+            if task["id"] not in previous or previous[task["id"]] != task.get("status"):
+                events.append(("task_status", {
+                    "node": node_name,
+                    "task_id": task["id"],
+                    "status": task.get("status"),
+                    "group": task.get("group"),
+                }))
+        self._task_statuses = self._statuses_of(updates["task_list"])
+        return events
+
+    @staticmethod
+    def _verdict_events(node_name: str, updates: Dict[str, Any]) -> List[ProgressEvent]:
+        events: List[ProgressEvent] = []
+        dossier = updates.get("review_dossier")
+        if isinstance(dossier, dict) and dossier.get("verdict"):
+            tests = dossier.get("tests") or {}
+            events.append(("verdict", {"node": node_name, "source": "qa_council", "verdict": dossier["verdict"], "tests": tests.get("summary")}))
+        if updates.get("dispute_ruling"):
+            events.append(("verdict", {"node": node_name, "source": "adjudication", "verdict": updates["dispute_ruling"]}))
+        return events
@@ -1,14 +1,29 @@
 import os
-from typing import List
+import threading
+from typing import Any, Dict, List, Tuple
 
 # Import our RAG components
 from .chunking import chunk_file
 from .embedding_model import embedding_model
 from .vector_store import collection as vector_store_collection
-from tools.agent_tools import read_file # Use our own secure read_file
+from backend.utils.workspace_listing import DEFAULT_IGNORE
+# Every indexing call and its chunk/embed/upsert stages are tracing spans
+from backend.tracing import tracer
 
 # This file contains the core logic for the indexing pipeline.
 
+# (mtime_ns, size) of every file at the time it was last indexed. Lets us skip
+# files whose content cannot have changed, e.g. when the workspace watcher
+# reports a file the write_file tool has already indexed.
+_indexed_signatures: Dict[str, Tuple[int, int]] = {}
+_signatures_lock = threading.Lock()
+
+
+def _file_signature(file_path: str) -> Tuple[int, int]:
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+@tracer.traced("indexer.index_file", kind="indexer")
 def index_file(file_path: str, workspace_root: str) -> bool:
     """
     Reads a single file, chunks it, creates embeddings, and upserts to ChromaDB.
@@ -27,8 +42,18 @@ def index_file(file_path: str, workspace_root: str) -> bool:
         return False
         
     try:
+        # Use our own secure read_file. Imported here because tools/agent_tools.py imports this module.
+        from tools.agent_tools import read_file
+
         # The 'read_file' tool expects a relative path, so we create it.
         relative_path = os.path.relpath(file_path, workspace_root)
+        signature = _file_signature(file_path)
+        tracer.set_attributes(file=relative_path, bytes=signature[1])
+        with _signatures_lock:
+            if _indexed_signatures.get(relative_path) == signature:
+                print(f"--- [Indexer] {relative_path} is unchanged since it was last indexed. Skipping. ---")
+                tracer.set_attributes(cache_hit=True)
+                return True
         file_content = read_file(relative_path)
         
         if file_content.startswith("Error:"):
@@ -36,13 +61,16 @@ def index_file(file_path: str, workspace_root: str) -> bool:
             return False
 
         # 1. Chunk the file
-        chunks = chunk_file(file_content, file_name=relative_path)
+        with tracer.span("indexer.chunk", kind="indexer") as span:
+            chunks = chunk_file(file_content, file_name=relative_path)
+            span.set_attribute("chunks", len(chunks))
         if not chunks:
             print(f"--- [Indexer] No chunks were created for {relative_path}. Skipping. ---")
             return True # Not an error if the file is empty
 
         # 2. Create embeddings for each chunk
-        embeddings = embedding_model.encode(chunks).tolist()
+        with tracer.span("indexer.embed", kind="indexer", chunks=len(chunks)):
+            embeddings = embedding_model.encode(chunks).tolist()
         
         # 3. Prepare data for ChromaDB
         # We need a unique ID for each chunk. A good practice is hash-based or path-based.
@@ -50,14 +78,17 @@ def index_file(file_path: str, workspace_root: str) -> bool:
         metadata = [{"source_file": relative_path} for _ in range(len(chunks))]
 
         # 4. Upsert the data into the vector store
-        vector_store_collection.upsert(
-            ids=ids,
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadata
-        )
+        with tracer.span("indexer.upsert", kind="indexer", chunks=len(chunks)):
+            vector_store_collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=chunks,
+                metadatas=metadata
+            )
         
         print(f"--- [Indexer] Successfully indexed {len(chunks)} chunks for {relative_path}. ---")
+        with _signatures_lock:
+            _indexed_signatures[relative_path] = signature
         return True
         
     except Exception as e:
@@ -65,6 +96,125 @@ def index_file(file_path: str, workspace_root: str) -> bool:
         return False
 
 
+@tracer.traced("indexer.index_files", kind="indexer")
+def index_files(file_paths: List[str], workspace_root: str) -> int:
+    """
+    Indexes several files as one batch: the chunks of all files are embedded
+    with a single call to the embedding model and upserted at once.
+
+    Args:
+        file_paths: The absolute paths of the files to be indexed.
+        workspace_root: The absolute path to the root of the workspace, for display names.
+
+    Returns:
+        The number of files that were (re-)indexed.
+    """
+    print(f"--- [Indexer] Starting to index a batch of {len(file_paths)} files ---")
+
+    if not embedding_model:
+        print("--- [Indexer] ERROR: Embedding model is not available. Skipping indexing. ---")
+        return 0
+
+    documents: List[str] = []
+    ids: List[str] = []
+    metadata: List[Dict[str, str]] = []
+    signatures: Dict[str, Tuple[int, int]] = {}
+    for file_path in file_paths:
+        relative_path = os.path.relpath(file_path, workspace_root)
+        try:
+            signature = _file_signature(file_path)
+            with _signatures_lock:
+                if _indexed_signatures.get(relative_path) == signature:
+                    continue
+            with open(file_path, 'r', encoding='utf-8') as f:
+                file_content = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"--- [Indexer] Could not read file {relative_path}: {e}. Skipping. ---")
+            continue
+
+        with tracer.span("indexer.chunk", kind="indexer", file=relative_path, bytes=signature[1]) as span:
+            chunks = chunk_file(file_content, file_name=relative_path)
+            span.set_attribute("chunks", len(chunks))
+        signatures[relative_path] = signature
+        documents.extend(chunks)
+        ids.extend(f"{relative_path}_chunk_{i}" for i in range(len(chunks)))
+        metadata.extend({"source_file": relative_path} for _ in range(len(chunks)))
+
+    # Files unchanged since they were last indexed are the cache hits of a batch.
+    tracer.set_attributes(files=len(file_paths), cache_hits=len(file_paths) - len(signatures), chunks=len(documents))
+    if documents:
+        try:
+            with tracer.span("indexer.embed", kind="indexer", chunks=len(documents)):
+                embeddings = embedding_model.encode(documents).tolist()
+            with tracer.span("indexer.upsert", kind="indexer", chunks=len(documents)):
+                vector_store_collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadata)
+        except Exception as e:
+            print(f"--- [Indexer] CRITICAL ERROR indexing a batch of files: {e} ---")
+            return 0
+
+    with _signatures_lock:
+        _indexed_signatures.update(signatures)
+    print(f"--- [Indexer] Successfully indexed {len(documents)} chunks from {len(signatures)} files. ---")
+    return len(signatures)
+
+
+@tracer.traced("indexer.reindex_changed_chunks", kind="indexer")
+def reindex_changed_chunks(file_path: str, workspace_root: str) -> Tuple[int, int]:
+    """
+    Re-indexes a file after a small edit. The file is re-chunked (cheap), but
+    only chunks whose text differs from what the vector store holds for that
+    position are embedded again; chunks past the new end are deleted.
+
+    Args:
+        file_path: The absolute path to the file to be re-indexed.
+        workspace_root: The absolute path to the root of the workspace, for display names.
+
+    Returns:
+        The number of chunks that were embedded and the total number of chunks.
+    """
+    if not embedding_model:
+        print("--- [Indexer] ERROR: Embedding model is not available. Skipping indexing. ---")
+        return 0, 0
+
+    relative_path = os.path.relpath(file_path, workspace_root)
+    try:
+        signature = _file_signature(file_path)
+        with tracer.span("indexer.chunk", kind="indexer", file=relative_path, bytes=signature[1]) as span:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                chunks = chunk_file(f.read(), file_name=relative_path)
+            span.set_attribute("chunks", len(chunks))
+        stored = vector_store_collection.get(where={"source_file": relative_path}, include=["documents"])
+        stored_documents = dict(zip(stored["ids"], stored["documents"]))
+
+        ids = [f"{relative_path}_chunk_{i}" for i in range(len(chunks))]
+        changed = [i for i, chunk in enumerate(chunks) if stored_documents.get(ids[i]) != chunk]
+        # Chunks that are already stored unchanged are the cache hits of a re-index.
+        tracer.set_attributes(file=relative_path, chunks=len(chunks), changed_chunks=len(changed), cache_hits=len(chunks) - len(changed))
+        if changed:
+            with tracer.span("indexer.embed", kind="indexer", chunks=len(changed)):
+                embeddings = embedding_model.encode([chunks[i] for i in changed]).tolist()
+            with tracer.span("indexer.upsert", kind="indexer", chunks=len(changed)):
+                vector_store_collection.upsert(
+                    ids=[ids[i] for i in changed],
+                    embeddings=embeddings,
+                    documents=[chunks[i] for i in changed],
+                    metadatas=[{"source_file": relative_path} for _ in changed],
+                )
+        stale = sorted(set(stored_documents) - set(ids))
+        if stale:
+            vector_store_collection.delete(ids=stale)
+
+        print(f"--- [Indexer] Re-embedded {len(changed)} of {len(chunks)} chunks for {relative_path}. ---")
+        with _signatures_lock:
+            _indexed_signatures[relative_path] = signature
+        return len(changed), len(chunks)
+
+    except Exception as e:
+        print(f"--- [Indexer] CRITICAL ERROR re-indexing file {file_path}: {e} ---")
+        return 0, 0
+
+
+@tracer.traced("indexer.index_workspace", kind="indexer")
 def index_workspace():
     """
     Scans the entire /workspace directory, ignoring specified files/folders,
@@ -72,7 +222,7 @@ def index_workspace():
     """
     print("--- [Indexer] Starting full workspace scan and index... ---")
     workspace_path = os.path.join(os.getcwd(), "workspace")
-    ignore_list = {".chroma_db", ".git", "__pycache__"}
+    ignore_list = DEFAULT_IGNORE
 
     for root, dirs, files in os.walk(workspace_path):
         # Modify the list of directories in-place to prevent os.walk from descending
@@ -83,4 +233,41 @@ def index_workspace():
             # Recursively call the single-file indexer
             index_file(file_path, workspace_root=workspace_path)
             
-    print("--- [Indexer] Full workspace scan complete. ---")
\ No newline at end of file
+    print("--- [Indexer] Full workspace scan complete. ---")
+
+
+def remove_file_from_index(relative_path: str) -> None:
+    """
+    Deletes all chunks of a file from the vector store.
+
+    Args:
+        relative_path: The path of the file relative to the workspace root.
+    """
+    try:
+        vector_store_collection.delete(where={"source_file": relative_path})
+        with _signatures_lock:
+            _indexed_signatures.pop(relative_path, None)
+        print(f"--- [Indexer] Removed {relative_path} from the index. ---")
+    except Exception as e:
+        print(f"--- [Indexer] ERROR removing {relative_path} from the index: {e} ---")
+
+
+def apply_workspace_changes(event: Dict[str, Any]) -> None:
+    """
+    Keeps the index in sync with the workspace watcher's change feed
+    (see backend/workspace_watcher.py). Only the changed files are re-indexed.
+
+    Args:
+        event: A 'workspace_changes' event from the event bus.
+    """
+    workspace_path = os.path.join(os.getcwd(), "workspace")
+    for change in event.get("changes", []):
+        if change.get("is_dir"):
+            continue
+        if change["type"] in ("deleted", "moved"):
+            remove_file_from_index(change["path"])
+        target = change["dest_path"] if change["type"] == "moved" else change["path"]
+        if change["type"] in ("created", "modified", "moved"):
+            file_path = os.path.join(workspace_path, target)
+            if os.path.isfile(file_path):
+                index_file(file_path, workspace_root=workspace_path)
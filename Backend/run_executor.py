@@ -0,0 +1,214 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# This file implements the executor that runs agent workflows in the background.
+#
+# A run takes minutes to hours of synchronous work, so runs are not executed on
+# the web server's request threadpool. Instead a fixed number of dedicated
+# worker threads take runs from a bounded priority queue (FIFO within the same
+# priority). When the queue is full, new runs are rejected instead of piling up.
+# Cancellation is cooperative: a queued run is simply removed, while a running
+# run is asked to stop via an Event that the run checks between graph steps.
+
+# --- Configuration ---
+# Number of runs executed at the same time.
+_RUN_WORKERS = int(os.environ.get("RUN_WORKERS", 4))
+# Maximum number of runs waiting for a free worker.
+_RUN_QUEUE_SIZE = int(os.environ.get("RUN_QUEUE_SIZE", 20))
+
+# A run function receives the Event that is set when the run is cancelled.
+RunFunction = Callable[[threading.Event], Any]
+
+
+class QueueFullError(Exception):
+    """Raised when a run is submitted while the queue is at capacity."""
+
+    def __init__(self, queue_size: int):
+        super().__init__(f"The run queue is full ({queue_size} runs waiting).")
+        self.queue_size = queue_size
+
+
+class _Job:
+    def __init__(self, run_id: str, fn: RunFunction, priority: int, seq: int):
+        self.run_id = run_id
+        self.fn = fn
+        self.priority = priority
+        self.seq = seq
+        self.submitted_at = time.time()
+        self.cancel_event = threading.Event()
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.name = f"run-worker-{index}"
+        self.started_at = time.time()
+        self.current: Optional[_Job] = None
+        self.busy_since: Optional[float] = None
+        self.busy_seconds = 0.0
+        self.runs_completed = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        busy_seconds = self.busy_seconds + (now - self.busy_since if self.busy_since else 0.0)
+        uptime = max(now - self.started_at, 1e-9)
+        return {
+            "worker": self.name,
+            "busy": self.current is not None,
+            "run_id": self.current.run_id if self.current else None,
+            "runs_completed": self.runs_completed,
+            "busy_seconds": round(busy_seconds, 3),
+            "utilization": round(busy_seconds / uptime, 4),
+        }
+
+
+class RunExecutor:
+    """
+    A bounded pool of worker threads fed by a bounded priority queue of runs.
+    """
+
+    def __init__(self, max_workers: int = _RUN_WORKERS, max_queue_size: int = _RUN_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._queue: List[_Job] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = [_Worker(i) for i in range(max_workers)]
+        self._running: Dict[str, _Job] = {}
+        self._shutdown = False
+        for worker in self._workers:
+            worker.thread = threading.Thread(target=self._work, args=(worker,), name=worker.name, daemon=True)
+            worker.thread.start()
+        print(f"--- [Executor] Run executor ready with {max_workers} workers and a queue of {max_queue_size}. ---")
+
+    def submit(self, run_id: str, fn: RunFunction, priority: int = 0) -> int:
+        """
+        Queues a run for execution.
+
+        Args:
+            run_id: The unique ID of the agent run.
+            fn: The function executing the run. It is called with the run's cancel Event.
+            priority: Lower values run first; equal priorities run in submission order.
+
+        Returns:
+            The run's position in the queue (0 means it starts on the next free worker).
+
+        Raises:
+            QueueFullError: If `max_queue_size` runs are already waiting.
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("The run executor has been shut down.")
+            if len(self._queue) >= self.max_queue_size:
+                raise QueueFullError(len(self._queue))
+            job = _Job(run_id, fn, priority, next(self._seq))
+            heapq.heappush(self._queue, job)
+            self._cond.notify()
+            return self._position(job)
+
+    def queue_position(self, run_id: str) -> Optional[int]:
+        """Returns the 0-based queue position of a waiting run, or None if it is not queued."""
+        with self._cond:
+            for job in self._queue:
+                if job.run_id == run_id:
+                    return self._position(job)
+        return None
+
+    def _position(self, job: _Job) -> int:
+        return sum(1 for other in self._queue if other < job)
+
+    def cancel(self, run_id: str) -> Optional[str]:
+        """
+        Cancels a run.
+
+        Returns:
+            "dequeued" if the run was still waiting and has been removed,
+            "cancelling" if it is running and has been asked to stop,
+            or None if the executor does not know the run.
+        """
+        with self._cond:
+            for i, job in enumerate(self._queue):
+                if job.run_id == run_id:
+                    self._queue.pop(i)
+                    heapq.heapify(self._queue)
+                    return "dequeued"
+            job = self._running.get(run_id)
+            if job:
+                job.cancel_event.set()
+                return "cancelling"
+        return None
+
+    def is_active(self, run_id: str) -> bool:
+        """True if the run is queued or running."""
+        with self._cond:
+            return run_id in self._running or any(job.run_id == run_id for job in self._queue)
+
+    def active_runs(self) -> List[str]:
+        """Returns the IDs of the runs that are queued or running."""
+        with self._cond:
+            return list(self._running) + [job.run_id for job in self._queue]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns queue depth and per-worker utilization."""
+        now = time.time()
+        with self._cond:
+            workers = [worker.stats(now) for worker in self._workers]
+            queued = [
+                {"run_id": job.run_id, "priority": job.priority, "waiting_seconds": round(now - job.submitted_at, 3)}
+                for job in sorted(self._queue)
+            ]
+        return {
+            "max_workers": self.max_workers,
+            "busy_workers": sum(1 for worker in workers if worker["busy"]),
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": len(queued),
+            "queued": queued,
+            "workers": workers,
+        }
+
+    def shutdown(self, cancel_running: bool = True) -> None:
+        """
+        Stops accepting runs, drops the queue and optionally cancels running runs.
+        Dropped runs keep their "queued" status in the run store; once their lease
+        expires, the API submits them again (see `recover_interrupted_runs`).
+        """
+        with self._cond:
+            self._shutdown = True
+            self._queue.clear()
+            if cancel_running:
+                for job in self._running.values():
+                    job.cancel_event.set()
+            self._cond.notify_all()
+
+    def _work(self, worker: _Worker) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                job = heapq.heappop(self._queue)
+                self._running[job.run_id] = job
+                worker.current = job
+                worker.busy_since = time.time()
+            try:
+                job.fn(job.cancel_event)
+            except Exception as e:
+                print(f"--- [Executor] ERROR: Run '{job.run_id}' raised: {e} ---")
+            finally:
+                with self._cond:
+                    self._running.pop(job.run_id, None)
+                    worker.busy_seconds += time.time() - worker.busy_since
+                    worker.busy_since = None
+                    worker.current = None
+                    worker.runs_completed += 1
+
+
+# A single instance for the application to import and use.
+run_executor = RunExecutor()
@@ -0,0 +1,655 @@
+import abc
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+# This file implements the persistent store for agent runs. It replaces the
+# API's in-memory `agent_runs` dictionary so that runs survive restarts, are
+# visible to every API worker process, and do not grow memory without bound.
+#
+# For each run we keep its metadata, the materialized latest state (for cheap
+# status lookups) and the sequence of per-step state deltas.
+#
+# A queued or running run is owned by the worker process executing it, which
+# holds a lease on it and renews it while the run is in its executor. A run
+# whose lease expired was left behind by a worker that crashed, restarted or
+# shut down; another worker may then claim it (see `claim_expired_runs`).
+# Leases end when a run finishes.
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+
+# --- Configuration ---
+# "sqlite" (default, persistent) or "memory" (single process, for development).
+_RUN_STORE_BACKEND = os.environ.get("RUN_STORE_BACKEND", "sqlite")
+_RUN_STORE_PATH = os.environ.get("RUN_STORE_PATH", os.path.join(_DATA_DIR, "runs.sqlite3"))
+# Finished runs older than this are deleted by the retention policy.
+_RUN_RETENTION_DAYS = float(os.environ.get("RUN_RETENTION_DAYS", 30))
+# The retention policy also caps the number of finished runs kept.
+_RUN_RETENTION_MAX_RUNS = int(os.environ.get("RUN_RETENTION_MAX_RUNS", 1000))
+# Clients further behind than this many steps get the full state instead of a delta.
+_MAX_DELTA_STEPS = int(os.environ.get("RUN_MAX_DELTA_STEPS", 500))
+# How long a run stays owned by its worker without a renewal.
+RUN_LEASE_SECONDS = float(os.environ.get("RUN_LEASE_SECONDS", 60))
+
+# Identifies this worker process as the owner of the runs it executes.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+RUN_STATUSES = ("queued", "running", "completed", "failed", "cancelled")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _to_json(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+def compute_state_delta(previous: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns only the fields of `updates` whose value differs from `previous`.
+
+    Args:
+        previous: The materialized state before the step.
+        updates: The state updates produced by the step.
+
+    Returns:
+        The changed fields.
+    """
+    return {key: value for key, value in updates.items() if previous.get(key) != value}
+
+
+def split_appended_fields(previous: Dict[str, Any], delta: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Any]]]:
+    """
+    Separates list fields that only grew (e.g. `history_log`) from the other
+    changes, so a step records just the new entries instead of the whole list.
+
+    Args:
+        previous: The materialized state before the step.
+        delta: The changed fields, as returned by `compute_state_delta`.
+
+    Returns:
+        The replaced fields and, per appended list field, the new entries.
+    """
+    replaced, appended = {}, {}
+    for key, value in delta.items():
+        old = previous.get(key)
+        if isinstance(old, list) and isinstance(value, list) and len(value) > len(old) and value[:len(old)] == old:
+            appended[key] = value[len(old):]
+        else:
+            replaced[key] = value
+    return replaced, appended
+
+
+class RunStore(abc.ABC):
+    """
+    The contract every run store backend must fulfil.
+    """
+
+    @abc.abstractmethod
+    def create_run(self, run_id: str, initial_state: Dict[str, Any], status: str = "queued", owner: Optional[str] = None) -> None:
+        """Registers a new run with its initial state, leased to `owner` if given."""
+
+    @abc.abstractmethod
+    def append_step(self, run_id: str, node: str, updates: Dict[str, Any]) -> int:
+        """
+        Records the updates produced by one graph step.
+
+        Returns:
+            The sequence number of the recorded step.
+        """
+
+    @abc.abstractmethod
+    def set_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        """Updates the lifecycle status of a run. A finished status ends its lease."""
+
+    @abc.abstractmethod
+    def claim_run(self, run_id: str, owner: str, lease_seconds: float = RUN_LEASE_SECONDS) -> bool:
+        """
+        Leases a run to `owner`, unless another owner holds an unexpired lease on it.
+
+        Returns:
+            Whether `owner` now holds the lease.
+        """
+
+    @abc.abstractmethod
+    def renew_leases(self, owner: str, run_ids: List[str], lease_seconds: float = RUN_LEASE_SECONDS) -> None:
+        """Extends the leases `owner` holds on the given runs."""
+
+    @abc.abstractmethod
+    def claim_expired_runs(self, owner: str, lease_seconds: float = RUN_LEASE_SECONDS) -> List[Dict[str, Any]]:
+        """
+        Atomically leases to `owner` every queued or running run without a valid
+        lease, i.e. left behind by a worker that is gone.
+
+        Returns:
+            The claimed runs (metadata only), oldest first.
+        """
+
+    @abc.abstractmethod
+    def get_run(self, run_id: str, include_state: bool = True) -> Optional[Dict[str, Any]]:
+        """Returns the metadata (and by default the latest state) of a run, or None if unknown."""
+
+    @abc.abstractmethod
+    def get_steps(self, run_id: str, after_seq: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Returns the recorded steps of a run with a sequence number above `after_seq`.
+        Each step has the replaced fields under "delta" and the new entries of
+        list fields that only grew under "appended".
+        """
+
+    @abc.abstractmethod
+    def append_event(self, run_id: str, event_type: str, data: Dict[str, Any]) -> int:
+        """
+        Records a progress event of a run (see backend/progress_events.py).
+
+        Returns:
+            The event's ID, which increases monotonically within the run.
+        """
+
+    @abc.abstractmethod
+    def get_events(self, run_id: str, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """Returns the progress events of a run with an ID above `after_id`, oldest first."""
+
+    @abc.abstractmethod
+    def list_runs(self, status: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Lists runs, newest first.
+
+        Args:
+            status: Only return runs with this status.
+            limit: The maximum number of runs to return.
+            cursor: The opaque cursor returned by the previous page.
+
+        Returns:
+            The runs of this page and the cursor of the next page (None at the end).
+        """
+
+    @abc.abstractmethod
+    def delete_run(self, run_id: str) -> None:
+        """Deletes a run and its steps, e.g. when it was never admitted for execution."""
+
+    @abc.abstractmethod
+    def apply_retention(self, max_age_days: float = _RUN_RETENTION_DAYS, max_runs: int = _RUN_RETENTION_MAX_RUNS) -> List[str]:
+        """
+        Deletes finished runs older than `max_age_days` and any finished runs
+        beyond the newest `max_runs`.
+
+        Returns:
+            The IDs of the deleted runs.
+        """
+
+    def get_changes(self, run_id: str, since: int, max_steps: int = _MAX_DELTA_STEPS) -> Optional[Dict[str, Any]]:
+        """
+        Returns what changed in a run's state after step `since`.
+
+        Args:
+            run_id: The unique ID of the agent run.
+            since: The last step sequence number the client has applied (0 for none).
+            max_steps: Beyond this many missed steps the full state is returned instead.
+
+        Returns:
+            A dict with the run's status, the new `seq` to pass as `since` next
+            time, the `changed` fields (replace their values) and the `appended`
+            entries (add them to the end of the list fields). When `full` is
+            True, `changed` is the complete state. None if the run is unknown.
+        """
+        run = self.get_run(run_id, include_state=False)
+        if not run:
+            return None
+        changes = {
+            "run_id": run_id, "status": run["status"], "error": run["error"], "last_node": run["last_node"],
+            "since": since, "seq": since, "full": False, "changed": {}, "appended": {},
+        }
+        if since <= 0 or since > run["last_seq"] or run["last_seq"] - since > max_steps:
+            full_run = self.get_run(run_id)
+            changes.update(seq=full_run["last_seq"], full=True, changed=full_run["state"], last_node=full_run["last_node"])
+            return changes
+
+        changed: Dict[str, Any] = {}
+        appended: Dict[str, List[Any]] = {}
+        for step in self.get_steps(run_id, after_seq=since, limit=max_steps):
+            for key, value in step["delta"].items():
+                changed[key] = value
+                appended.pop(key, None)
+            for key, entries in step["appended"].items():
+                if key in changed:
+                    changed[key] = changed[key] + entries
+                else:
+                    appended[key] = appended.get(key, []) + entries
+            changes.update(seq=step["seq"], last_node=step["node"])
+        changes.update(changed=changed, appended=appended)
+        return changes
+
+
+def _encode_cursor(created_at: float, run_id: str) -> str:
+    return f"{created_at!r}:{run_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    created_at, run_id = cursor.split(":", 1)
+    return float(created_at), run_id
+
+
+class SQLiteRunStore(RunStore):
+    """
+    The default run store, backed by a SQLite database in WAL mode so that
+    several API worker processes can read while one writes.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            initial_request TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            finished_at REAL,
+            last_node TEXT,
+            last_seq INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            state_json TEXT NOT NULL,
+            owner TEXT,
+            lease_expires_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_runs_status_created ON runs (status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at);
+
+        CREATE TABLE IF NOT EXISTS run_steps (
+            run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+            seq INTEGER NOT NULL,
+            node TEXT NOT NULL,
+            delta_json TEXT NOT NULL,
+            appended_json TEXT NOT NULL DEFAULT '{}',
+            created_at REAL NOT NULL,
+            PRIMARY KEY (run_id, seq)
+        );
+
+        CREATE TABLE IF NOT EXISTS run_events (
+            run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+            event_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            data_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (run_id, event_id)
+        );
+    """
+
+    _METADATA_COLUMNS = "run_id, status, initial_request, created_at, updated_at, finished_at, last_node, last_seq, error"
+
+    def __init__(self, path: str = _RUN_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self._SCHEMA)
+            # Databases created before per-step appends were recorded lack the column.
+            step_columns = {row["name"] for row in conn.execute("PRAGMA table_info(run_steps)")}
+            if "appended_json" not in step_columns:
+                conn.execute("ALTER TABLE run_steps ADD COLUMN appended_json TEXT NOT NULL DEFAULT '{}'")
+            # Nor do those created before runs were leased to their workers.
+            run_columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "owner" not in run_columns:
+                conn.execute("ALTER TABLE runs ADD COLUMN owner TEXT")
+                conn.execute("ALTER TABLE runs ADD COLUMN lease_expires_at REAL")
+        print(f"--- [RunStore] SQLite run store ready at: {path} ---")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_run(row: sqlite3.Row, include_state: bool = True) -> Dict[str, Any]:
+        run = {
+            "run_id": row["run_id"],
+            "status": row["status"],
+            "initial_request": row["initial_request"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "finished_at": row["finished_at"],
+            "last_node": row["last_node"],
+            "last_seq": row["last_seq"],
+            "error": row["error"],
+        }
+        if include_state:
+            run["state"] = json.loads(row["state_json"])
+        return run
+
+    def create_run(self, run_id: str, initial_state: Dict[str, Any], status: str = "queued", owner: Optional[str] = None) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO runs (run_id, status, initial_request, created_at, updated_at, state_json, owner, lease_expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, status, initial_state.get("initial_request"), now, now, _to_json(initial_state),
+                 owner, now + RUN_LEASE_SECONDS if owner else None),
+            )
+
+    def append_step(self, run_id: str, node: str, updates: Dict[str, Any]) -> int:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock up front, so the read-modify-write
+            # of the materialized state cannot interleave with another writer.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT last_seq, state_json FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown run: {run_id}")
+            state = json.loads(row["state_json"])
+            # Round-trip through JSON so the comparison sees what will be stored.
+            delta = compute_state_delta(state, json.loads(_to_json(updates)))
+            replaced, appended = split_appended_fields(state, delta)
+            state.update(delta)
+            seq = row["last_seq"] + 1
+            conn.execute(
+                "INSERT INTO run_steps (run_id, seq, node, delta_json, appended_json, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, seq, node, _to_json(replaced), _to_json(appended), now),
+            )
+            conn.execute(
+                "UPDATE runs SET last_seq = ?, last_node = ?, state_json = ?, updated_at = ? WHERE run_id = ?",
+                (seq, node, _to_json(state), now, run_id),
+            )
+        return seq
+
+    def set_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        if status not in RUN_STATUSES:
+            raise ValueError(f"Invalid run status '{status}'. Expected one of {RUN_STATUSES}.")
+        now = time.time()
+        finished_at = now if status in FINISHED_STATUSES else None
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE runs SET status = ?, error = COALESCE(?, error), updated_at = ?, finished_at = COALESCE(?, finished_at) WHERE run_id = ?",
+                (status, error, now, finished_at, run_id),
+            )
+            if finished_at:
+                conn.execute("UPDATE runs SET owner = NULL, lease_expires_at = NULL WHERE run_id = ?", (run_id,))
+
+    def claim_run(self, run_id: str, owner: str, lease_seconds: float = RUN_LEASE_SECONDS) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE runs SET owner = ?, lease_expires_at = ? WHERE run_id = ? "
+                "AND (owner IS NULL OR owner = ? OR lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (owner, now + lease_seconds, run_id, owner, now),
+            ).rowcount
+        return claimed == 1
+
+    def renew_leases(self, owner: str, run_ids: List[str], lease_seconds: float = RUN_LEASE_SECONDS) -> None:
+        expires_at = time.time() + lease_seconds
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE runs SET lease_expires_at = ? WHERE run_id = ? AND owner = ?",
+                [(expires_at, run_id, owner) for run_id in run_ids],
+            )
+
+    def claim_expired_runs(self, owner: str, lease_seconds: float = RUN_LEASE_SECONDS) -> List[Dict[str, Any]]:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            # The write lock is taken before reading, so two workers never claim the same run.
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                f"SELECT {self._METADATA_COLUMNS} FROM runs WHERE status IN ('queued', 'running') "
+                "AND (lease_expires_at IS NULL OR lease_expires_at < ?) ORDER BY created_at, run_id",
+                (now,),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE runs SET owner = ?, lease_expires_at = ? WHERE run_id = ?",
+                [(owner, now + lease_seconds, row["run_id"]) for row in rows],
+            )
+        return [self._row_to_run(row, include_state=False) for row in rows]
+
+    def get_run(self, run_id: str, include_state: bool = True) -> Optional[Dict[str, Any]]:
+        columns = "*" if include_state else self._METADATA_COLUMNS
+        row = self._connect().execute(f"SELECT {columns} FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._row_to_run(row, include_state) if row else None
+
+    def get_steps(self, run_id: str, after_seq: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT seq, node, delta_json, appended_json, created_at FROM run_steps WHERE run_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (run_id, after_seq, limit),
+        ).fetchall()
+        return [
+            {
+                "seq": row["seq"], "node": row["node"], "delta": json.loads(row["delta_json"]),
+                "appended": json.loads(row["appended_json"]), "created_at": row["created_at"],
+            }
+            for row in rows
+        ]
+
+    def append_event(self, run_id: str, event_type: str, data: Dict[str, Any]) -> int:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            event_id = conn.execute(
+                "SELECT COALESCE(MAX(event_id), 0) + 1 FROM run_events WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO run_events (run_id, event_id, type, data_json, created_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, event_id, event_type, _to_json(data), now),
+            )
+        return event_id
+
+    def get_events(self, run_id: str, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT event_id, type, data_json, created_at FROM run_events WHERE run_id = ? AND event_id > ? ORDER BY event_id LIMIT ?",
+            (run_id, after_id, limit),
+        ).fetchall()
+        return [
+            {"id": row["event_id"], "type": row["type"], "data": json.loads(row["data_json"]), "created_at": row["created_at"]}
+            for row in rows
+        ]
+
+    def list_runs(self, status: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if cursor:
+            created_at, run_id = _decode_cursor(cursor)
+            clauses.append("(created_at < ? OR (created_at = ? AND run_id < ?))")
+            params.extend([created_at, created_at, run_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM runs {where} ORDER BY created_at DESC, run_id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+        runs = [self._row_to_run(row, include_state=False) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = runs[-1]
+            next_cursor = _encode_cursor(last["created_at"], last["run_id"])
+        return runs, next_cursor
+
+    def delete_run(self, run_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    def apply_retention(self, max_age_days: float = _RUN_RETENTION_DAYS, max_runs: int = _RUN_RETENTION_MAX_RUNS) -> List[str]:
+        cutoff = time.time() - max_age_days * 86400
+        placeholders = ",".join("?" for _ in FINISHED_STATUSES)
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute(
+                f"""SELECT run_id FROM runs WHERE status IN ({placeholders}) AND created_at < ?
+                    UNION
+                    SELECT run_id FROM (
+                        SELECT run_id FROM runs WHERE status IN ({placeholders})
+                        ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                    )""",
+                (*FINISHED_STATUSES, cutoff, *FINISHED_STATUSES, max_runs),
+            )]
+            conn.executemany("DELETE FROM runs WHERE run_id = ?", [(run_id,) for run_id in expired])
+        if expired:
+            print(f"--- [RunStore] Retention policy deleted {len(expired)} finished runs. ---")
+        return expired
+
+
+class InMemoryRunStore(RunStore):
+    """
+    A process-local run store. Runs are lost on restart and not shared between
+    workers; useful for development and tests.
+    """
+
+    def __init__(self):
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._steps: Dict[str, List[Dict[str, Any]]] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        # The owner and expiry of each run's lease.
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def create_run(self, run_id: str, initial_state: Dict[str, Any], status: str = "queued", owner: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            if owner:
+                self._leases[run_id] = (owner, now + RUN_LEASE_SECONDS)
+            self._runs[run_id] = {
+                "run_id": run_id, "status": status, "initial_request": initial_state.get("initial_request"),
+                "created_at": now, "updated_at": now, "finished_at": None, "last_node": None,
+                "last_seq": 0, "error": None, "state": json.loads(_to_json(initial_state)),
+            }
+            self._steps[run_id] = []
+
+    def append_step(self, run_id: str, node: str, updates: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock:
+            run = self._runs[run_id]
+            delta = compute_state_delta(run["state"], json.loads(_to_json(updates)))
+            replaced, appended = split_appended_fields(run["state"], delta)
+            run["state"].update(delta)
+            run["last_seq"] += 1
+            run.update(last_node=node, updated_at=now)
+            self._steps[run_id].append(
+                {"seq": run["last_seq"], "node": node, "delta": replaced, "appended": appended, "created_at": now}
+            )
+            return run["last_seq"]
+
+    def set_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        if status not in RUN_STATUSES:
+            raise ValueError(f"Invalid run status '{status}'. Expected one of {RUN_STATUSES}.")
+        now = time.time()
+        with self._lock:
+            run = self._runs[run_id]
+            run.update(status=status, updated_at=now)
+            if error is not None:
+                run["error"] = error
+            if status in FINISHED_STATUSES:
+                run["finished_at"] = now
+                self._leases.pop(run_id, None)
+
+    def claim_run(self, run_id: str, owner: str, lease_seconds: float = RUN_LEASE_SECONDS) -> bool:
+        now = time.time()
+        with self._lock:
+            if run_id not in self._runs:
+                return False
+            holder, expires_at = self._leases.get(run_id, (owner, now))
+            if holder != owner and expires_at >= now:
+                return False
+            self._leases[run_id] = (owner, now + lease_seconds)
+            return True
+
+    def renew_leases(self, owner: str, run_ids: List[str], lease_seconds: float = RUN_LEASE_SECONDS) -> None:
+        expires_at = time.time() + lease_seconds
+        with self._lock:
+            for run_id in run_ids:
+                if self._leases.get(run_id, (None,))[0] == owner:
+                    self._leases[run_id] = (owner, expires_at)
+
+    def claim_expired_runs(self, owner: str, lease_seconds: float = RUN_LEASE_SECONDS) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            expired = sorted(
+                (run for run in self._runs.values()
+                 if run["status"] in ("queued", "running") and self._leases.get(run["run_id"], (None, 0.0))[1] < now),
+                key=lambda run: (run["created_at"], run["run_id"]),
+            )
+            for run in expired:
+                self._leases[run["run_id"]] = (owner, now + lease_seconds)
+            return [{key: value for key, value in run.items() if key != "state"} for run in expired]
+
+    def get_run(self, run_id: str, include_state: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if not run:
+                return None
+            if not include_state:
+                return {key: value for key, value in run.items() if key != "state"}
+            return json.loads(_to_json(run))
+
+    def get_steps(self, run_id: str, after_seq: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [step for step in self._steps.get(run_id, []) if step["seq"] > after_seq][:limit]
+
+    def append_event(self, run_id: str, event_type: str, data: Dict[str, Any]) -> int:
+        with self._lock:
+            events = self._events.setdefault(run_id, [])
+            event_id = len(events) + 1
+            events.append({"id": event_id, "type": event_type, "data": json.loads(_to_json(data)), "created_at": time.time()})
+            return event_id
+
+    def get_events(self, run_id: str, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._events.get(run_id, [])[after_id:after_id + limit]
+
+    def list_runs(self, status: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        with self._lock:
+            runs = sorted(self._runs.values(), key=lambda run: (run["created_at"], run["run_id"]), reverse=True)
+        if status:
+            runs = [run for run in runs if run["status"] == status]
+        if cursor:
+            position = _decode_cursor(cursor)
+            runs = [run for run in runs if (run["created_at"], run["run_id"]) < position]
+        page = [{key: value for key, value in run.items() if key != "state"} for run in runs[:limit]]
+        next_cursor = _encode_cursor(page[-1]["created_at"], page[-1]["run_id"]) if len(runs) > limit else None
+        return page, next_cursor
+
+    def delete_run(self, run_id: str) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+            self._steps.pop(run_id, None)
+            self._events.pop(run_id, None)
+            self._leases.pop(run_id, None)
+
+    def apply_retention(self, max_age_days: float = _RUN_RETENTION_DAYS, max_runs: int = _RUN_RETENTION_MAX_RUNS) -> List[str]:
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            finished = sorted(
+                (run for run in self._runs.values() if run["status"] in FINISHED_STATUSES),
+                key=lambda run: run["created_at"], reverse=True,
+            )
+            expired = [run["run_id"] for i, run in enumerate(finished) if run["created_at"] < cutoff or i >= max_runs]
+            for run_id in expired:
+                self._runs.pop(run_id, None)
+                self._steps.pop(run_id, None)
+                self._events.pop(run_id, None)
+        return expired
+
+
+def create_run_store(backend: str = _RUN_STORE_BACKEND) -> RunStore:
+    """
+    Creates the run store selected by the RUN_STORE_BACKEND setting.
+
+    Args:
+        backend: "sqlite" or "memory".
+    """
+    if backend == "sqlite":
+        return SQLiteRunStore()
+    if backend == "memory":
+        return InMemoryRunStore()
+    raise ValueError(f"Unknown run store backend '{backend}'. Expected 'sqlite' or 'memory'.")
+
+
+# A single instance for the application to import and use.
+run_store = create_run_store()
@@ -44,6 +44,7 @@ class AgentState(TypedDict):
     dispute_raised: bool
 
     # --- User Interaction & Workflow Tracking ---
+    run_id: Optional[str] # The API run this state belongs to; used to stream live activity.
     user_feedback: Optional[str]
     last_completed_step: Optional[str] # e.g., "step_8_internal_review_1"
     history_log: List[str] # A human-readable log of all actions taken
\ No newline at end of file
@@ -0,0 +1,463 @@
+import argparse
+import contextvars
+import functools
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# This file implements end-to-end tracing of agent runs. A span is opened
+# around every graph node, router decision, LLM call, tool invocation and
+# indexer stage; spans nest through a context variable, so a tool's span is a
+# child of the node that called it and an LLM call inside an agent is a child
+# of that agent's node. Every span records its duration and attributes such as
+# the model, token counts, bytes read or written and cache hits.
+#
+# Finished spans are appended to one file per run under TRACE_DIR, either as
+# plain JSON lines or in the OTLP/JSON file format (one ExportTraceServiceRequest
+# per line, as written by the OpenTelemetry collector's file exporter), which
+# tools like Jaeger or otel-desktop-viewer can load. Spans outside any run (the
+# indexer following the workspace watcher) go to `_background`.
+#
+# Print a run's flame-style summary with:
+#   python -m backend.tracing <run_id> [--min-percent 0.5] [--depth 6] [--top 10]
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+
+# --- Configuration ---
+_TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+# "jsonl" or "otlp".
+_TRACE_EXPORT_FORMAT = os.environ.get("TRACE_EXPORT_FORMAT", "jsonl")
+_TRACE_DIR = os.environ.get("TRACE_DIR", os.path.join(_DATA_DIR, "traces"))
+
+SPAN_KINDS = ("run", "node", "router", "llm", "tool", "indexer", "internal")
+BACKGROUND_RUN = "_background"
+_FILE_SUFFIXES = {"jsonl": ".jsonl", "otlp": ".otlp.jsonl"}
+# OTLP span kinds: LLM calls are requests to another service, everything else is in-process.
+_OTLP_KIND_INTERNAL, _OTLP_KIND_CLIENT = 1, 3
+_OTLP_STATUS_OK, _OTLP_STATUS_ERROR = 1, 2
+_MAX_ATTRIBUTE_CHARS = 500
+
+
+class Span:
+    """One timed operation with attributes; see `Tracer.span`."""
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str], run_id: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.run_id = run_id
+        self.attributes: Dict[str, Any] = {}
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+        self.set_attributes(**attributes)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is None:
+            return
+        if not isinstance(value, (bool, int, float, str)):
+            value = json.dumps(value, default=str)
+        if isinstance(value, str) and len(value) > _MAX_ATTRIBUTE_CHARS:
+            value = value[:_MAX_ATTRIBUTE_CHARS] + "..."
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "run_id": self.run_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is disabled."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+# --- Export ---
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(span: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts an exported span into an OTLP/JSON ExportTraceServiceRequest holding just that span."""
+    start_ns = int(span["start_time"] * 1e9)
+    attributes = {"run_id": span["run_id"], "span.kind": span["kind"], "thread.name": span["thread"], **span["attributes"]}
+    otlp_span = {
+        "traceId": span["trace_id"],
+        "spanId": span["span_id"],
+        "name": span["name"],
+        "kind": _OTLP_KIND_CLIENT if span["kind"] == "llm" else _OTLP_KIND_INTERNAL,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(start_ns + int((span["duration_ms"] or 0) * 1e6)),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+        "status": {"code": _OTLP_STATUS_ERROR, "message": span["error"]} if span["error"] else {"code": _OTLP_STATUS_OK},
+    }
+    if span["parent_id"]:
+        otlp_span["parentSpanId"] = span["parent_id"]
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "ardi-agent"}}]},
+        "scopeSpans": [{"scope": {"name": "backend.tracing"}, "spans": [otlp_span]}],
+    }]}
+
+
+def from_otlp(request: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Converts an OTLP/JSON ExportTraceServiceRequest back into exported spans."""
+    spans = []
+    for resource_spans in request.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for otlp_span in scope_spans.get("spans", []):
+                attributes = {}
+                for attribute in otlp_span.get("attributes", []):
+                    value = next(iter(attribute["value"].values()), None)
+                    attributes[attribute["key"]] = int(value) if "intValue" in attribute["value"] else value
+                start_ns, end_ns = int(otlp_span["startTimeUnixNano"]), int(otlp_span["endTimeUnixNano"])
+                status = otlp_span.get("status") or {}
+                spans.append({
+                    "trace_id": otlp_span["traceId"],
+                    "span_id": otlp_span["spanId"],
+                    "parent_id": otlp_span.get("parentSpanId"),
+                    "run_id": attributes.pop("run_id", None),
+                    "name": otlp_span["name"],
+                    "kind": attributes.pop("span.kind", "internal"),
+                    "start_time": start_ns / 1e9,
+                    "duration_ms": (end_ns - start_ns) / 1e6,
+                    "status": "error" if status.get("code") == _OTLP_STATUS_ERROR else "ok",
+                    "error": status.get("message"),
+                    "thread": attributes.pop("thread.name", None),
+                    "attributes": attributes,
+                })
+    return spans
+
+
+def _text_bytes(value: Any) -> int:
+    """The UTF-8 size of a string, or of the strings in a dict's values (e.g. `write_files`)."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return sum(_text_bytes(item) for item in value.values() if isinstance(item, str))
+    return 0
+
+
+def _trace_file_name(run_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", run_id)
+
+
+class Tracer:
+    """
+    Creates spans, keeps track of the current one per context and appends
+    finished spans to the run's trace file. Thread-safe.
+    """
+
+    def __init__(self, enabled: bool = _TRACING_ENABLED, trace_dir: str = _TRACE_DIR, export_format: str = _TRACE_EXPORT_FORMAT):
+        if export_format not in _FILE_SUFFIXES:
+            raise ValueError(f"Invalid TRACE_EXPORT_FORMAT '{export_format}'. Expected one of {list(_FILE_SUFFIXES)}.")
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.export_format = export_format
+        self._lock = threading.Lock()
+
+    # --- Spans ---
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, kind: str = "internal", run_id: Optional[str] = None,
+                   parent: Optional[Span] = None, **attributes: Any) -> Optional[Span]:
+        """
+        Starts a span without making it the current one; end it with `end_span`.
+        Used where the start and end of an operation are separate callbacks.
+
+        Args:
+            name: What the span measures, e.g. 'node.step_13_task_execution'.
+            kind: One of SPAN_KINDS.
+            run_id: The run the span belongs to; inherited from the parent if not given.
+            parent: The parent span; the current span if not given.
+            **attributes: Initial attributes.
+
+        Returns:
+            The span, or None while tracing is disabled.
+        """
+        if not self.enabled:
+            return None
+        parent = parent or _current_span.get()
+        if parent is not None:
+            return Span(name, kind, parent.trace_id, parent.span_id, run_id or parent.run_id, attributes)
+        return Span(name, kind, uuid.uuid4().hex, None, run_id or BACKGROUND_RUN, attributes)
+
+    def end_span(self, span: Optional[Span], error: Optional[BaseException] = None) -> None:
+        if span is None:
+            return
+        span.end(error)
+        self._export(span)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", run_id: Optional[str] = None, **attributes: Any) -> Iterator[Any]:
+        """
+        Times the enclosed block as a span, which is the current span (the
+        parent of any span opened inside) until the block ends. An exception
+        leaving the block marks the span as failed.
+
+        Yields:
+            The span, for adding attributes; a no-op stand-in while tracing is disabled.
+        """
+        span = self.start_span(name, kind, run_id, **attributes)
+        if span is None:
+            yield _NULL_SPAN
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(e)
+            raise
+        else:
+            span.end()
+        finally:
+            _current_span.reset(token)
+            self._export(span)
+
+    def traced(self, name: Optional[str] = None, kind: str = "internal", record_io: bool = False) -> Callable:
+        """
+        Decorates a function so that each call is a span.
+
+        Args:
+            name: The span name; defaults to the function's name.
+            kind: One of SPAN_KINDS.
+            record_io: Also record the size of the text arguments and result
+                as `input_bytes` and `output_bytes` (for tools).
+        """
+        def decorator(function: Callable) -> Callable:
+            span_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.span(span_name, kind) as span:
+                    if record_io:
+                        span.set_attribute("input_bytes", sum(_text_bytes(value) for value in list(args) + list(kwargs.values())))
+                    result = function(*args, **kwargs)
+                    if record_io and isinstance(result, str):
+                        span.set_attribute("output_bytes", len(result.encode("utf-8")))
+                    return result
+            return wrapper
+        return decorator
+
+    def set_attributes(self, **attributes: Any) -> None:
+        """Adds attributes to the current span, if there is one."""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attributes(**attributes)
+
+    # --- Files ---
+
+    def trace_path(self, run_id: str, export_format: Optional[str] = None) -> str:
+        suffix = _FILE_SUFFIXES[export_format or self.export_format]
+        return os.path.join(self.trace_dir, _trace_file_name(run_id) + suffix)
+
+    def _export(self, span: Span) -> None:
+        record = span.to_dict()
+        line = json.dumps(to_otlp(record) if self.export_format == "otlp" else record, default=str)
+        try:
+            with self._lock:
+                os.makedirs(self.trace_dir, exist_ok=True)
+                with open(self.trace_path(span.run_id), "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            print(f"--- [Tracing] Warning: could not write span '{span.name}': {e} ---")
+
+    def load_spans(self, run_id: str) -> List[Dict[str, Any]]:
+        """Reads a run's exported spans, from whichever format was written."""
+        spans: List[Dict[str, Any]] = []
+        for export_format in _FILE_SUFFIXES:
+            try:
+                with open(self.trace_path(run_id, export_format), "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            spans.extend(from_otlp(record) if "resourceSpans" in record else [record])
+            except FileNotFoundError:
+                continue
+        return spans
+
+    def delete_run(self, run_id: str) -> None:
+        for export_format in _FILE_SUFFIXES:
+            try:
+                os.remove(self.trace_path(run_id, export_format))
+            except FileNotFoundError:
+                pass
+
+
+def llm_attributes(response: Any) -> Dict[str, Any]:
+    """Returns the token counts and cache hit of a LiteLLM response, as span attributes."""
+    attributes: Dict[str, Any] = {}
+    usage = getattr(response, "usage", None)
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = getattr(usage, key, None)
+        if value is not None:
+            attributes[key] = value
+    hidden = getattr(response, "_hidden_params", None) or {}
+    if hidden.get("cache_hit") is not None:
+        attributes["cache_hit"] = bool(hidden["cache_hit"])
+    return attributes
+
+
+# A single instance for the application to import and use.
+tracer = Tracer()
+
+
+# --- Summary ---
+
+def summarize_spans(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merges a run's spans into a call tree: spans with the same name under the
+    same path are one node, with their call count, total and self time (the
+    part not covered by child spans), token counts and errors. Also totals
+    the time, tokens and cache hits per span kind, and lists the slowest
+    individual operations.
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in spans:
+        parent_id = span["parent_id"] if span["parent_id"] in by_id else None
+        children.setdefault(parent_id, []).append(span)
+
+    def _merge(group: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        merged: Dict[str, Dict[str, Any]] = {}
+        for span in sorted(group, key=lambda span: span["start_time"]):
+            node = merged.setdefault(span["name"], {"name": span["name"], "kind": span["kind"], "calls": 0, "total_ms": 0.0,
+                                                    "self_ms": 0.0, "tokens": 0, "errors": 0, "_children": []})
+            kids = children.get(span["span_id"], [])
+            duration = span["duration_ms"] or 0.0
+            node["calls"] += 1
+            node["total_ms"] += duration
+            node["self_ms"] += max(0.0, duration - sum(kid["duration_ms"] or 0.0 for kid in kids))
+            node["tokens"] += span["attributes"].get("total_tokens") or 0
+            node["errors"] += span["status"] == "error"
+            node["_children"].extend(kids)
+        nodes = sorted(merged.values(), key=lambda node: node["total_ms"], reverse=True)
+        for node in nodes:
+            node["children"] = _merge(node.pop("_children"))
+        return nodes
+
+    by_kind: Dict[str, Dict[str, Any]] = {}
+    for span in spans:
+        totals = by_kind.setdefault(span["kind"], {"calls": 0, "total_ms": 0.0, "tokens": 0, "cache_hits": 0})
+        totals["calls"] += 1
+        totals["total_ms"] += span["duration_ms"] or 0.0
+        totals["tokens"] += span["attributes"].get("total_tokens") or 0
+        totals["cache_hits"] += (span["attributes"].get("cache_hit") is True) + int(span["attributes"].get("cache_hits") or 0)
+    roots = children.get(None, [])
+    return {
+        "spans": len(spans),
+        "traces": len({span["trace_id"] for span in spans}),
+        "wall_ms": sum(root["duration_ms"] or 0.0 for root in roots),
+        "tree": _merge(roots),
+        "by_kind": by_kind,
+        # Runs and nodes contain everything else; the slowest operations are more telling.
+        "slowest": sorted((span for span in spans if span["kind"] not in ("run", "node")),
+                          key=lambda span: span["duration_ms"] or 0.0, reverse=True),
+    }
+
+
+def format_summary(run_id: str, summary: Dict[str, Any], min_percent: float = 0.5, depth: int = 8, top: int = 10) -> str:
+    """Renders a summary as a flame-style text tree, the totals per kind and the slowest spans."""
+    wall = summary["wall_ms"] or 1.0
+    lines = [
+        f"Run {run_id}: {summary['spans']} spans in {summary['traces']} trace(s), {summary['wall_ms'] / 1000:.1f}s",
+        "",
+        f"{'total s':>9} {'self s':>9} {'calls':>6} {'%':>6}  span",
+    ]
+
+    def _render(nodes: List[Dict[str, Any]], level: int) -> None:
+        for node in nodes:
+            percent = 100.0 * node["total_ms"] / wall
+            if percent < min_percent:
+                continue
+            bar = "█" * max(1, round(percent / 4))
+            extras = []
+            if node["tokens"]:
+                extras.append(f"{node['tokens']} tok")
+            if node["errors"]:
+                extras.append(f"{node['errors']} err")
+            suffix = f"  ({', '.join(extras)})" if extras else ""
+            lines.append(f"{node['total_ms'] / 1000:>9.2f} {node['self_ms'] / 1000:>9.2f} {node['calls']:>6} {percent:>6.1f}  "
+                         f"{'  ' * level}{node['name']} {bar}{suffix}")
+            if level + 1 < depth:
+                _render(node["children"], level + 1)
+
+    _render(summary["tree"], 0)
+    lines += ["", f"{'kind':<10}{'calls':>7}{'total s':>10}{'tokens':>10}{'cache hits':>12}"]
+    for kind, totals in sorted(summary["by_kind"].items(), key=lambda item: item[1]["total_ms"], reverse=True):
+        lines.append(f"{kind:<10}{totals['calls']:>7}{totals['total_ms'] / 1000:>10.2f}{totals['tokens']:>10}{totals['cache_hits']:>12}")
+    if top:
+        lines += ["", f"Slowest {min(top, len(summary['slowest']))} operations:"]
+        for span in summary["slowest"][:top]:
+            lines.append(f"{(span['duration_ms'] or 0) / 1000:>9.2f}s  {span['name']}  "
+                         f"{json.dumps(span['attributes'], default=str)[:120]}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Print a flame-style summary of a run's trace.")
+    parser.add_argument("run_id", help=f"The run to summarize ('{BACKGROUND_RUN}' for spans outside runs).")
+    parser.add_argument("--dir", default=_TRACE_DIR, help="The trace directory (TRACE_DIR).")
+    parser.add_argument("--min-percent", type=float, default=0.5, help="Hide spans below this share of the run's time.")
+    parser.add_argument("--depth", type=int, default=8, help="How many levels of the tree to print.")
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest individual spans to list.")
+    args = parser.parse_args(argv)
+
+    spans = Tracer(enabled=False, trace_dir=args.dir).load_spans(args.run_id)
+    if not spans:
+        print(f"No trace found for run '{args.run_id}' in {args.dir}.", file=sys.stderr)
+        return 1
+    print(format_summary(args.run_id, summarize_spans(spans), args.min_percent, args.depth, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
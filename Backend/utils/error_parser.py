@@ -1,92 +1,431 @@
 import re
-from typing import Dict, Optional, Any
+from typing import Any, Dict, List, Optional
 
-# This file contains helper functions to parse structured information from shell error logs.
+# This file contains the parser that extracts structured errors from the
+# output of commands run in the sandbox.
+#
+# `ErrorLogParser` consumes output incrementally, line by line, as it streams
+# from the container. It recognizes Python tracebacks, pytest failures, Node.js
+# and Jest stack traces, TypeScript (tsc) diagnostics, Go build errors, test
+# failures and panics, Rust compiler errors and panics, and gcc/clang
+# diagnostics. For each error it keeps the exception type, the message and all
+# stack frames, and from those it builds a ranked list of source locations for
+# the debugger: errors before warnings, the project's own code before
+# libraries, earlier errors before later ones, and the innermost frame first.
 
-def parse_python_traceback(stderr: str) -> Optional[Dict[str, Any]]:
-    """
-    Parses a standard Python traceback to find the file and line number.
-    Looks for the last 'File "..."', line ...' pattern.
-    
-    Args:
-        stderr: The standard error string from a command execution.
-        
-    Returns:
-        A dictionary with 'file_path' and 'line_number' or None if not found.
-    """
-    # Regex to find the last occurrence of 'File "<path>", line <number>'
-    # This is a common pattern in Python tracebacks.
-    match = re.search(
-        r'File "([^"]+)", line (\d+)', 
-        stderr, 
-        re.MULTILINE
-    )
-    
-    if match:
-        file_path = match.group(1)
-        line_number = int(match.group(2))
-        
-        # Often paths in tracebacks are absolute from within the container.
-        # We want to make them relative to the workspace for consistency.
-        if '/home/agentuser/workspace/' in file_path:
-            file_path = file_path.split('/home/agentuser/workspace/')[1]
-            
-        return {"file_path": file_path, "line_number": line_number}
-        
-    return None
-
-def parse_generic_error(stderr: str) -> Optional[Dict[str, Any]]:
+# Paths inside the sandbox are reported relative to the workspace.
+_SANDBOX_WORKSPACE = "/home/agentuser/workspace/"
+
+# Caps that keep memory bounded on multi-megabyte logs.
+_MAX_ERRORS = 100
+_MAX_FRAMES = 200
+
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+# --- Python / pytest ---
+_PY_TRACEBACK_START = "Traceback (most recent call last):"
+_PY_FRAME = re.compile(r'^\s*File "([^"]+)", line (\d+)(?:, in (.+))?$')
+_PY_EXCEPTION = re.compile(r"^([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Warning|Failure|Fault)|[A-Z]\w*Error)(?::\s?(.*))?$")
+_PYTEST_LOCATION = re.compile(r"^([^\s:][^:]*\.py):(\d+): (?:in (\S+)|([A-Za-z_][\w.]*))$")
+_PYTEST_HEADER = re.compile(r"^_{3,} (.+?) _{3,}$")
+_PYTEST_FAILED = re.compile(r"^(?:FAILED|ERROR) (\S+?\.py)(?:::(\S+))?(?: - (.*))?$")
+
+# --- Node.js / Jest / Rust backtraces ---
+_STACK_FRAME = re.compile(r"^\s+at (?:(.+?) \((.+?):(\d+):(\d+)\)|(.+?):(\d+):(\d+))$")
+_JS_ERROR_HEADER = re.compile(r"^\s*(?:Uncaught )?([A-Z]\w*(?:Error|Exception)|Error)(?: \[\w+\])?(?::\s?(.*))?$")
+_JEST_TEST = re.compile(r"^\s*● (.+)$")
+
+# --- TypeScript ---
+_TSC = re.compile(r"^(.+?)(?:\((\d+),(\d+)\): |:(\d+):(\d+) - )(error|warning) (TS\d+): (.*)$")
+
+# --- gcc / clang / Go build ---
+_C_DIAGNOSTIC = re.compile(r"^(.+?):(\d+):(\d+): (fatal error|error|warning|note): (.*)$")
+_GO_BUILD = re.compile(r"^(\S+\.go):(\d+):(\d+): (.*)$")
+_GO_TEST = re.compile(r"^\s+(\S+\.go):(\d+): (.*)$")
+_GO_PANIC = re.compile(r"^panic: (.*?)(?: \[recovered\])?$")
+_GO_FRAME_FILE = re.compile(r"^\t(.+\.go):(\d+)(?: \+0x[0-9a-f]+)?$")
+_GO_FRAME_FUNCTION = re.compile(r"^([\w./*()\[\]-]+)\(.*\)$")
+
+# --- Rust ---
+_RUST_DIAGNOSTIC = re.compile(r"^(error|warning)(?:\[(E\d+)\])?: (.*)$")
+_RUST_LOCATION = re.compile(r"^\s*--> (.+?):(\d+):(\d+)$")
+_RUST_PANIC = re.compile(r"^thread '(.*?)' panicked at (?:'(.*)', )?(.+?):(\d+):(\d+):?$")
+
+# Frames in these places are library or runtime code, not the project's own.
+_LIBRARY_PATH = re.compile(
+    r"site-packages|dist-packages|/usr/lib/|/usr/local/lib/|/lib/python\d|node_modules|^node:|internal/|"
+    r"<frozen|^<|/rustc/|\.cargo/registry|/go/src/|/usr/include/"
+)
+
+_SEVERITY_SCORE = {"error": 1000, "warning": 100, "note": 10}
+
+
+def _clean_path(path: str) -> str:
+    path = path.strip()
+    if path.startswith("file://"):
+        path = path[len("file://"):]
+    if _SANDBOX_WORKSPACE in path:
+        path = path.split(_SANDBOX_WORKSPACE, 1)[1]
+    return path[2:] if path.startswith("./") else path
+
+
+def _frame(path: str, line: Optional[str], column: Optional[str] = None, function: Optional[str] = None) -> Dict[str, Any]:
+    file_path = _clean_path(path)
+    return {
+        "file_path": file_path,
+        "line_number": int(line) if line else None,
+        "column": int(column) if column else None,
+        "function": function,
+        "in_user_code": not _LIBRARY_PATH.search(file_path),
+    }
+
+
+class ErrorLogParser:
     """
-    A generic parser for other common error formats (e.g., Node.js).
-    Looks for patterns like 'path/to/file.js:line:column'.
-    
-    Args:
-        stderr: The standard error string from a command execution.
-        
-    Returns:
-        A dictionary with 'file_path' and 'line_number' or None if not found.
+    Parses command output into structured errors. Feed it text as it arrives
+    (`feed`) or line by line (`feed_line`), then call `finish`.
     """
-    # Regex for patterns like 'file.js:12:5' or '/path/to/file.ts:12'
-    match = re.search(
-        r'([\/\w\.-]+\.(?:js|ts|tsx|jsx)):(\d+)',
-        stderr,
-        re.MULTILINE
-    )
 
-    if match:
-        file_path = match.group(1)
-        line_number = int(match.group(2))
-        return {"file_path": file_path, "line_number": line_number}
-        
-    return None
+    def __init__(self):
+        self.errors: List[Dict[str, Any]] = []
+        self.dropped_errors = 0
+        self._partial = ""
+        # The error that stack frames currently attach to, and how to read the next lines.
+        self._current: Optional[Dict[str, Any]] = None
+        self._mode: Optional[str] = None  # "python", "stack", "jest", "go_panic", "rust", "pytest", "message"
+        self._js_header: Optional[Dict[str, Optional[str]]] = None
+        self._go_function: Optional[str] = None
+
+    # --- Input ---
+
+    def feed(self, text: str) -> None:
+        """Consumes a chunk of output; lines may be split across chunks."""
+        text = self._partial + text
+        lines = text.split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self.feed_line(line)
+
+    def feed_line(self, line: str) -> None:
+        """Consumes one complete line of output."""
+        line = line.rstrip("\r\n")
+        if "\x1b" in line:
+            line = _ANSI_ESCAPE.sub("", line)
+        if not line.strip():
+            if self._mode in ("python", "go_panic", "rust", "pytest"):
+                return  # Blank lines occur inside these blocks.
+            if self._mode == "jest" and not self._current["frames"]:
+                return
+            self._end_block()
+            return
+
+        mode = self._mode
+        if mode == "python" and self._python_line(line):
+            return
+        if mode == "go_panic" and self._go_panic_line(line):
+            return
+        if mode == "rust":
+            match = _RUST_LOCATION.match(line)
+            if match:
+                if not self._current["frames"]:
+                    self._current["frames"].append(_frame(match.group(1), match.group(2), match.group(3)))
+                return
+            if line.startswith((" ", "=", "|")) or line[:1].isdigit():
+                return  # The code excerpt and notes under a Rust diagnostic.
+            self._end_block()
+        if mode == "message":
+            # The line after 'thread panicked at file:line:col:' is the panic message. The
+            # panic stays current so that a following backtrace attaches to it.
+            self._current["message"] = line.strip()
+            self._mode = None
+            return
+
+        first = line.lstrip()[:1]
+        if first == "a" and line.lstrip().startswith("at "):
+            if self._stack_line(line):
+                return
+        if mode == "jest" and not self._current["frames"]:
+            if not self._current["message"]:
+                self._current["message"] = line.strip()
+            return
+        if mode == "pytest" and line.startswith("E "):
+            message = line[1:].strip()
+            self._current["message"] = f"{self._current['message']}\n{message}".strip() if self._current["message"] else message
+            return
+
+        self._dispatch(line)
+
+    def _dispatch(self, line: str) -> None:
+        if line.startswith(_PY_TRACEBACK_START):
+            self._start("python", "Error", "", mode="python", frames_order="outer_first")
+            return
+        if line.startswith(("___", "===")):
+            self._end_block()
+            match = _PYTEST_HEADER.match(line)
+            if match:
+                # '____ test_name ____' opens the report of one failed test.
+                self._start("pytest", "Failed", "", mode="pytest", test=match.group(1), frames_order="outer_first")
+            return
+        if 'File "' in line:
+            match = _PY_FRAME.match(line)
+            if match:
+                # A SyntaxError is reported without a 'Traceback' header.
+                self._start("python", "SyntaxError", "", mode="python", frames_order="outer_first")
+                self._add_frame(_frame(match.group(1), match.group(2), None, match.group(3)))
+                return
+        if ":" in line:
+            if self._match_compiler(line):
+                return
+            if line.startswith("thread '"):
+                match = _RUST_PANIC.match(line)
+                if match:
+                    error = self._start("rust", "panic", match.group(2) or "", mode=None)
+                    error["frames"].append(_frame(match.group(3), match.group(4), match.group(5), f"thread '{match.group(1)}'"))
+                    if match.group(2) is None:
+                        self._mode = "message"
+                    return
+            if line.startswith("panic: "):
+                match = _GO_PANIC.match(line)
+                self._start("go", "panic", match.group(1), mode="go_panic")
+                return
+            if line.startswith(("FAILED ", "ERROR ")):
+                match = _PYTEST_FAILED.match(line)
+                if match:
+                    self._pytest_summary(match)
+                    return
+            match = _PYTEST_LOCATION.match(line)
+            if match:
+                self._pytest_location(match)
+                return
+            match = _GO_TEST.match(line)
+            if match:
+                error = self._start("go", "test failure", match.group(3), mode=None)
+                error["frames"].append(_frame(match.group(1), match.group(2)))
+                return
+        match = _JEST_TEST.match(line)
+        if match:
+            self._start("jest", "test failure", "", mode="jest", test=match.group(1).strip(), frames_order="inner_first")
+            return
+        match = _JS_ERROR_HEADER.match(line)
+        if match:
+            self._js_header = {"type": match.group(1), "message": match.group(2) or ""}
+            if self._mode == "pytest" and self._current is not None and not self._current["message"]:
+                self._current["message"] = line.strip()
+
+    # --- Block handlers ---
+
+    def _python_line(self, line: str) -> bool:
+        match = _PY_FRAME.match(line)
+        if match:
+            self._add_frame(_frame(match.group(1), match.group(2), None, match.group(3)))
+            return True
+        if line.startswith((" ", "\t")):
+            return True  # Source lines and carets under a frame.
+        if line.startswith(("During handling", "The above exception")):
+            self._end_block()
+            return True
+        match = _PY_EXCEPTION.match(line)
+        if match:
+            self._current["error_type"] = match.group(1)
+            self._current["message"] = (match.group(2) or "").strip()
+            self._end_block()
+            return True
+        # Something else interrupted the traceback (e.g. 'KeyboardInterrupt' without a message).
+        self._current["error_type"] = line.split(":", 1)[0].strip() or "Error"
+        self._current["message"] = line.split(":", 1)[1].strip() if ":" in line else ""
+        self._end_block()
+        return True
+
+    def _stack_line(self, line: str) -> bool:
+        match = _STACK_FRAME.match(line)
+        if not match:
+            return False
+        if match.group(2):
+            frame = _frame(match.group(2), match.group(3), match.group(4), match.group(1))
+        else:
+            frame = _frame(match.group(5), match.group(6), match.group(7))
+        if self._mode not in ("stack", "jest") or self._current is None:
+            if self._current is not None and self._current["language"] == "rust":
+                self._mode = "stack"  # The backtrace of a Rust panic.
+            else:
+                header = self._js_header or {"type": "Error", "message": ""}
+                self._start("node", header["type"], header["message"], mode="stack", frames_order="inner_first")
+        self._js_header = None
+        self._add_frame(frame)
+        return True
+
+    def _go_panic_line(self, line: str) -> bool:
+        if line.startswith("goroutine ") or line.startswith("[signal"):
+            return True
+        match = _GO_FRAME_FILE.match(line)
+        if match:
+            self._add_frame(_frame(match.group(1), match.group(2), None, self._go_function))
+            self._go_function = None
+            return True
+        match = _GO_FRAME_FUNCTION.match(line)
+        if match:
+            self._go_function = match.group(1)
+            return True
+        if line.startswith("exit status"):
+            self._end_block()
+            return True
+        self._end_block()
+        return False
+
+    def _pytest_location(self, match: "re.Match") -> None:
+        frame = _frame(match.group(1), match.group(2), None, match.group(3))
+        if self._mode != "pytest" or self._current is None:
+            self._start("pytest", "Failed", "", mode="pytest", frames_order="outer_first")
+        self._add_frame(frame)
+        if match.group(4):
+            # 'test_x.py:12: AssertionError' ends one failure's traceback.
+            self._current["error_type"] = match.group(4)
+            self._end_block()
+
+    def _pytest_summary(self, match: "re.Match") -> None:
+        """Handles 'FAILED tests/test_x.py::test_y - AssertionError: ...' from the short summary."""
+        file_path, test, summary = match.group(1), match.group(2), match.group(3) or ""
+        error_type, separator, message = summary.partition(": ")
+        if not separator or " " in error_type:
+            error_type, message = "Failed", summary
+        node_id = f"{file_path}::{test}" if test else file_path
+        for error in self.errors:
+            # The test's full report was already parsed; only fill in what it lacks.
+            if error["language"] == "pytest" and error["test"] and node_id.endswith(("::" + error["test"], error["test"])):
+                error["message"] = error["message"] or message
+                return
+        error = self._start("pytest", error_type, message, mode=None, test=node_id)
+        error["frames"].append(_frame(file_path, None))
+
+    def _match_compiler(self, line: str) -> bool:
+        if "error" in line or "warning" in line:
+            match = _TSC.match(line)
+            if match:
+                line_number, column = (match.group(2), match.group(3)) if match.group(2) else (match.group(4), match.group(5))
+                error = self._start("typescript", match.group(7), match.group(8), mode=None, severity=match.group(6))
+                error["frames"].append(_frame(match.group(1), line_number, column))
+                return True
+            match = _RUST_DIAGNOSTIC.match(line)
+            if match:
+                self._start("rust", match.group(2) or match.group(1), match.group(3), mode="rust", severity=match.group(1))
+                return True
+        if ": " in line and line[:1] not in (" ", "\t"):
+            match = _C_DIAGNOSTIC.match(line)
+            if match:
+                severity = "error" if "error" in match.group(4) else match.group(4)
+                language = "go" if match.group(1).endswith(".go") else "c"
+                error = self._start(language, match.group(4), match.group(5), mode=None, severity=severity)
+                error["frames"].append(_frame(match.group(1), match.group(2), match.group(3)))
+                return True
+            match = _GO_BUILD.match(line)
+            if match:
+                error = self._start("go", "build error", match.group(4), mode=None)
+                error["frames"].append(_frame(match.group(1), match.group(2), match.group(3)))
+                return True
+        return False
+
+    # --- Bookkeeping ---
+
+    def _start(self, language: str, error_type: str, message: str, mode: Optional[str],
+               severity: str = "error", test: Optional[str] = None, frames_order: str = "inner_first") -> Dict[str, Any]:
+        error = {
+            "language": language,
+            "error_type": error_type,
+            "message": message,
+            "severity": severity,
+            "test": test,
+            "frames": [],
+            "frames_order": frames_order,
+        }
+        if len(self.errors) < _MAX_ERRORS:
+            self.errors.append(error)
+        else:
+            self.dropped_errors += 1
+        self._current = error
+        self._mode = mode
+        self._js_header = None
+        return error
+
+    def _add_frame(self, frame: Dict[str, Any]) -> None:
+        if self._current is not None and len(self._current["frames"]) < _MAX_FRAMES:
+            self._current["frames"].append(frame)
+
+    def _end_block(self) -> None:
+        self._mode = None
+        self._go_function = None
+        self._current = None
+
+    # --- Output ---
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Flushes any incomplete last line and returns the result.
+
+        Returns:
+            A dict with the `errors` found (language, error_type, message,
+            severity, test and frames) and the ranked `locations`, best first.
+        """
+        if self._partial:
+            self.feed_line(self._partial)
+            self._partial = ""
+        self._end_block()
+        return {"errors": self.errors, "locations": self.ranked_locations(), "dropped_errors": self.dropped_errors}
+
+    def ranked_locations(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Returns the distinct source locations of all errors, best first. Each
+        location carries its file, line, column and function, plus the type,
+        message and language of the error it belongs to and its `score`.
+        """
+        candidates: Dict[Any, Dict[str, Any]] = {}
+        for index, error in enumerate(self.errors):
+            frames = error["frames"]
+            count = len(frames)
+            for position, frame in enumerate(frames):
+                # How far the frame is from where the error was raised.
+                depth = (count - 1 - position) if error["frames_order"] == "outer_first" else position
+                score = (
+                    _SEVERITY_SCORE.get(error["severity"], 0)
+                    + (500 if frame["in_user_code"] else 0)
+                    + (50 if frame["line_number"] is not None else 0)
+                    - min(index, 99)
+                    - min(depth, 49) * 0.5
+                )
+                key = (frame["file_path"], frame["line_number"])
+                if key in candidates and candidates[key]["score"] >= score:
+                    continue
+                candidates[key] = {
+                    **{k: v for k, v in frame.items()},
+                    "language": error["language"],
+                    "error_type": error["error_type"],
+                    "message": error["message"],
+                    "score": score,
+                }
+        return sorted(candidates.values(), key=lambda location: -location["score"])[:limit]
+
+
+def parse_error_log(output: str) -> Dict[str, Any]:
+    """Parses a complete log at once. See `ErrorLogParser.finish` for the result."""
+    parser = ErrorLogParser()
+    parser.feed(output)
+    return parser.finish()
 
 
 def parse_error_for_location(stderr: str) -> Optional[Dict[str, Any]]:
     """
-    The main parsing function. It tries different parsers to find an error location.
-    
+    Returns the most likely location of the error in a log.
+
     Args:
-        stderr: The standard error string.
-        
+        stderr: The output of the failed command.
+
     Returns:
-        A dictionary with location info, or None.
+        The best-ranked location (with at least 'file_path' and 'line_number'), or None.
     """
     if not stderr:
         return None
-        
-    print("--- [Error Parser] Attempting to parse error log for location... ---")
-    
-    # Prioritize the Python parser as it's more specific.
-    location = parse_python_traceback(stderr)
-    if location:
-        print(f"--- [Error Parser] Found Python error at: {location} ---")
-        return location
-        
-    # If not a Python error, try the generic one.
-    location = parse_generic_error(stderr)
-    if location:
-        print(f"--- [Error Parser] Found generic error at: {location} ---")
-        return location
-        
-    print("--- [Error Parser] Could not determine specific error location from logs. ---")
-    return None
\ No newline at end of file
+    locations = parse_error_log(stderr)["locations"]
+    if not locations:
+        print("--- [Error Parser] Could not determine specific error location from logs. ---")
+        return None
+    print(f"--- [Error Parser] Found {locations[0]['language']} error at: {locations[0]['file_path']}:{locations[0]['line_number']} ---")
+    return locations[0]
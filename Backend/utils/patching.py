@@ -0,0 +1,244 @@
+import difflib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# This file implements the patch engine behind the `edit_file` agent tool. An
+# agent sends only the lines it wants to change, either as a unified diff or as
+# SEARCH/REPLACE blocks, instead of re-emitting the whole file.
+#
+# Hunks are located by their context, not trusted line numbers: first an exact
+# match (closest to the line number the hunk claims, if any), then a match that
+# ignores indentation and trailing whitespace, and finally a similarity match
+# for context that has drifted slightly. All hunks are applied to an in-memory
+# copy; if any hunk cannot be placed nothing is changed.
+
+# The minimum similarity (0..1) for a fuzzy match of a hunk's context.
+FUZZY_THRESHOLD = 0.85
+# How many lines around its claimed position a unified diff hunk is fuzzily searched for first.
+_FUZZY_SEARCH_RADIUS = 50
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_SEARCH_MARKER = re.compile(r"^<{5,9} SEARCH\s*$")
+_DIVIDER_MARKER = re.compile(r"^={5,9}\s*$")
+_REPLACE_MARKER = re.compile(r"^>{5,9} REPLACE\s*$")
+
+# One operation of a hunk: " " keeps a line, "-" removes it, "+" inserts it.
+_Op = Tuple[str, str]
+
+
+class PatchError(ValueError):
+    """Raised when a patch is malformed or one of its hunks cannot be placed."""
+
+
+class _Hunk:
+    def __init__(self, ops: List[_Op], start_hint: Optional[int]):
+        self.ops = ops
+        # 0-based line the hunk claims to start at (unified diffs only).
+        self.start_hint = start_hint
+
+    @property
+    def old_lines(self) -> List[str]:
+        return [text for op, text in self.ops if op != "+"]
+
+    def describe(self, index: int) -> str:
+        preview = "\n".join(self.old_lines[:5]) or "(no context lines)"
+        return f"Hunk {index + 1} (expected lines:\n{preview}\n)"
+
+
+def _parse_unified_diff(patch: str) -> List[_Hunk]:
+    hunks: List[_Hunk] = []
+    current: Optional[_Hunk] = None
+    targets = 0
+    for line in patch.splitlines():
+        if line.startswith("+++ "):
+            targets += 1
+            if targets > 1:
+                raise PatchError("The patch changes more than one file; send one patch per file.")
+            current = None
+            continue
+        if line.startswith("--- ") and current is None:
+            continue
+        match = _HUNK_HEADER.match(line)
+        if match:
+            old_start, old_count = int(match.group(1)), int(match.group(2) or 1)
+            # With an empty old side ('-5,0') the new lines go after line 5, not at it.
+            current = _Hunk([], old_start if old_count == 0 else max(old_start - 1, 0))
+            hunks.append(current)
+            continue
+        if current is None or line.startswith("\\"):
+            continue  # Preamble (e.g. 'diff --git') or '\ No newline at end of file'.
+        if line[:1] in (" ", "-", "+"):
+            current.ops.append((line[0], line[1:]))
+        elif line == "":
+            current.ops.append((" ", ""))  # Some tools strip the space of empty context lines.
+        else:
+            raise PatchError(f"Unexpected line in unified diff: {line!r}")
+    return hunks
+
+
+def _parse_search_replace(patch: str) -> List[_Hunk]:
+    hunks: List[_Hunk] = []
+    lines = patch.splitlines()
+    i = 0
+    while i < len(lines):
+        if not _SEARCH_MARKER.match(lines[i]):
+            i += 1
+            continue
+        search: List[str] = []
+        replace: List[str] = []
+        i += 1
+        while i < len(lines) and not _DIVIDER_MARKER.match(lines[i]):
+            search.append(lines[i])
+            i += 1
+        i += 1
+        while i < len(lines) and not _REPLACE_MARKER.match(lines[i]):
+            replace.append(lines[i])
+            i += 1
+        if i >= len(lines):
+            raise PatchError("A SEARCH/REPLACE block is missing its '>>>>>>> REPLACE' marker.")
+        i += 1
+        if not search:
+            raise PatchError("A SEARCH block is empty; include the lines to be replaced.")
+        hunks.append(_Hunk([("-", text) for text in search] + [("+", text) for text in replace], None))
+    return hunks
+
+
+def parse_patch(patch: str) -> List[_Hunk]:
+    """
+    Parses a patch in either supported format.
+
+    Raises:
+        PatchError: If the patch is malformed or contains no hunks.
+    """
+    if any(_SEARCH_MARKER.match(line) for line in patch.splitlines()):
+        hunks = _parse_search_replace(patch)
+    else:
+        hunks = _parse_unified_diff(patch)
+    if not hunks:
+        raise PatchError("The patch contains no hunks. Use a unified diff ('@@ ... @@') or SEARCH/REPLACE blocks.")
+    return hunks
+
+
+def _closest(candidates: List[int], hint: Optional[int]) -> Optional[int]:
+    if not candidates:
+        return None
+    if hint is None:
+        if len(candidates) > 1:
+            raise PatchError(f"matches {len(candidates)} places in the file; include more surrounding lines")
+        return candidates[0]
+    return min(candidates, key=lambda position: abs(position - hint))
+
+
+def _locate(lines: List[str], old: List[str], hint: Optional[int]) -> Tuple[int, str]:
+    """Returns where the old lines of a hunk start in the file, and how they were matched."""
+    size = len(old)
+    positions = range(len(lines) - size + 1)
+
+    exact = [p for p in positions if lines[p:p + size] == old]
+    position = _closest(exact, hint)
+    if position is not None:
+        return position, "exact"
+
+    stripped_old = [text.strip() for text in old]
+    stripped = [text.strip() for text in lines]
+    loose = [p for p in positions if stripped[p:p + size] == stripped_old]
+    position = _closest(loose, hint)
+    if position is not None:
+        return position, "whitespace"
+
+    # Similar-looking code elsewhere (e.g. 'line 98' vs 'line 998') can score as
+    # well as the drifted original, so near a claimed position only that area is searched.
+    if hint is not None:
+        areas = [range(max(hint - _FUZZY_SEARCH_RADIUS, 0), min(hint + _FUZZY_SEARCH_RADIUS, len(positions))), positions]
+    else:
+        areas = [positions]
+    target = "\n".join(stripped_old)
+    for area in areas:
+        scores = []
+        for p in area:
+            matcher = difflib.SequenceMatcher(None, "\n".join(stripped[p:p + size]), target, autojunk=False)
+            if matcher.real_quick_ratio() >= FUZZY_THRESHOLD and matcher.quick_ratio() >= FUZZY_THRESHOLD:
+                ratio = matcher.ratio()
+                if ratio >= FUZZY_THRESHOLD:
+                    scores.append((ratio, p))
+        if not scores:
+            continue
+        best_ratio = max(ratio for ratio, _ in scores)
+        best = _closest([p for ratio, p in scores if ratio == best_ratio], hint)
+        if hint is None and sum(1 for ratio, _ in scores if ratio >= best_ratio - 0.02) > 1:
+            raise PatchError("is similar to several places in the file; include more surrounding lines")
+        return best, f"fuzzy ({best_ratio:.0%})"
+    raise PatchError("does not match the file")
+
+
+def apply_patch(content: str, patch: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Applies a patch to the content of a file.
+
+    Args:
+        content: The current content of the file ("" for a new file).
+        patch: A unified diff, or one or more blocks of the form
+               '<<<<<<< SEARCH' / old lines / '=======' / new lines / '>>>>>>> REPLACE'.
+
+    Returns:
+        The new content, and a summary dict with `hunks`, the 1-based inclusive
+        `changed_lines` (first, last) of the new content, `changed_bytes` (the
+        size of the inserted lines) and how each hunk was `matched`.
+
+    Raises:
+        PatchError: If the patch is malformed or any hunk cannot be placed. The
+            content is then left unchanged.
+    """
+    hunks = parse_patch(patch)
+    newline = "\r\n" if "\r\n" in content else "\n"
+    lines = content.splitlines()
+    trailing_newline = content.endswith(("\n", "\r")) or not content
+
+    offset = 0  # How far earlier hunks have shifted the claimed line numbers.
+    matched: List[str] = []
+    first_changed, last_changed = None, None
+    changed_bytes = 0
+    for index, hunk in enumerate(hunks):
+        old = hunk.old_lines
+        hint = hunk.start_hint + offset if hunk.start_hint is not None else None
+        if not old:
+            # A pure insertion (e.g. into a new file) can only go where the diff says.
+            start, how = min(hint or 0, len(lines)), "position"
+        else:
+            try:
+                start, how = _locate(lines, old, hint)
+            except PatchError as e:
+                raise PatchError(f"{hunk.describe(index)} {e}. No changes were made.")
+
+        replacement: List[str] = []
+        changed = [start]  # Lines of the new content touched by this hunk.
+        cursor = start
+        for op, text in hunk.ops:
+            if op == " ":
+                replacement.append(lines[cursor])  # Keep the file's own version of context lines.
+                cursor += 1
+            elif op == "-":
+                changed.append(start + len(replacement))
+                cursor += 1
+            else:
+                changed.append(start + len(replacement))
+                replacement.append(text)
+                changed_bytes += len(text.encode("utf-8")) + len(newline)
+        lines[start:cursor] = replacement
+
+        if len(changed) > 1:
+            changed = changed[1:]
+        first_changed = min(changed) if first_changed is None else min(first_changed, *changed)
+        last_changed = max(changed) if last_changed is None else max(last_changed, *changed)
+        if hunk.start_hint is not None:
+            # Later hunks are expected to be shifted by as much as this one was.
+            offset = start + len(replacement) - (hunk.start_hint + len(old))
+        matched.append(how)
+
+    new_content = newline.join(lines) + (newline if lines and trailing_newline else "")
+    return new_content, {
+        "hunks": len(hunks),
+        "changed_lines": (first_changed + 1, last_changed + 1),
+        "changed_bytes": changed_bytes,
+        "matched": matched,
+    }
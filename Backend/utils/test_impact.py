@@ -0,0 +1,331 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from backend.utils.test_results import COVERAGE_REPORT, QA_RESULTS_PATH, build_test_command
+from backend.utils.workspace_listing import DEFAULT_IGNORE, list_tree
+
+# This file implements test impact analysis for the QA/debug loop (steps 13 →
+# 14 → debugging → 14 ...). Re-running the whole suite after the debugger
+# changed one file is wasteful, so:
+#
+# - Python test runs record, with coverage.py's per-test contexts, which
+#   workspace files every test executed.
+# - Before the next run, the files that changed since the previous run are
+#   mapped to the tests that executed them, and only those run, together with
+#   the tests that failed last time and any changed test files. Jest projects
+#   use Jest's own dependency graph (--findRelatedTests) instead.
+# - The whole suite still runs when there is no map yet, when a change cannot
+#   be mapped (a new or deleted module, a dependency or config file), and every
+#   TEST_IMPACT_FULL_RUN_EVERY runs as a safety net.
+#
+# The map and the file hashes it was built against are kept per workspace,
+# outside of it, under QA_RESULTS_PATH. Each run reports the wall time it saved compared with the
+# last full run.
+
+# --- Configuration ---
+_TEST_IMPACT_ENABLED = os.environ.get("TEST_IMPACT_ENABLED", "true").lower() == "true"
+_TEST_IMPACT_FULL_RUN_EVERY = int(os.environ.get("TEST_IMPACT_FULL_RUN_EVERY", 5))
+
+# Directories written by the tools themselves while testing, which are not changes to the project.
+_SNAPSHOT_IGNORE = DEFAULT_IGNORE | {".pytest_cache", ".mypy_cache", ".ruff_cache", ".tox", ".venv", "venv", "coverage", ".nyc_output"}
+_PYTHON_SOURCE = (".py",)
+_JS_SOURCE = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+# Changes to these files cannot affect test outcomes.
+_INERT_SUFFIXES = (".md", ".rst", ".png", ".jpg", ".jpeg", ".gif", ".svg")
+_TEST_FILE = re.compile(r"(^|/)(tests?/|test_[^/]*\.py$|[^/]*_test\.py$|[^/]*\.(test|spec)\.[jt]sx?$)")
+_PARAMETERS = re.compile(r"\[.*\]$")
+# Changes to these always trigger a full run, even though tests never "execute" them.
+_PYTHON_GLOBAL_FILES = {"conftest.py", "pytest.ini", "setup.cfg", "tox.ini", "pyproject.toml", "setup.py"}
+
+
+def _context_key(test_id: str) -> str:
+    """
+    Returns the dotted name coverage.py gives a test's context, e.g.
+    'tests/test_x.py::TestY::test_z[1]' -> 'tests.test_x.TestY.test_z'.
+    unittest ids are already dotted.
+    """
+    if "::" not in test_id:
+        return test_id
+    path, _, rest = test_id.partition("::")
+    module = path[:-3].replace("/", ".") if path.endswith(".py") else path
+    name = _PARAMETERS.sub("", rest).replace("::", ".")
+    return f"{module}.{name}"
+
+
+def map_coverage_to_tests(coverage_json: Dict[str, Any], test_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    Maps each test to the workspace files it executed, from a coverage.py JSON
+    report with contexts (`coverage json --show-contexts`) of a run with
+    `dynamic_context = test_function`.
+
+    Contexts are qualified by the module's import name, which can be shorter
+    than its path ('test_x.TestY.test_z' for tests/test_x.py), so a context
+    matches every test whose dotted name ends with it.
+    """
+    by_name: Dict[str, List[str]] = {}
+    for test_id in test_ids:
+        key = _context_key(test_id)
+        by_name.setdefault(key.rsplit(".", 1)[-1], []).append(test_id)
+
+    files_by_test: Dict[str, Set[str]] = {test_id: set() for test_id in test_ids}
+    for path, data in coverage_json.get("files", {}).items():
+        contexts = {context for line_contexts in data.get("contexts", {}).values() for context in line_contexts}
+        for context in contexts:
+            if not context:
+                continue  # Lines executed outside any test (e.g. at import).
+            for test_id in by_name.get(context.rsplit(".", 1)[-1], []):
+                key = _context_key(test_id)
+                if key == context or key.endswith(f".{context}"):
+                    files_by_test[test_id].add(path)
+    return {test_id: sorted(files) for test_id, files in files_by_test.items()}
+
+
+class TestImpactSelector:
+    """
+    Plans which tests to run after a change, and learns from each run. Plans
+    and records are serialized per process.
+    """
+
+    def __init__(self, enabled: bool = _TEST_IMPACT_ENABLED, full_run_every: int = _TEST_IMPACT_FULL_RUN_EVERY):
+        self.enabled = enabled
+        self.full_run_every = max(1, full_run_every)
+        self._lock = threading.Lock()
+
+    # --- State ---
+
+    @staticmethod
+    def _state_path(workspace_dir: str) -> str:
+        workspace_hash = hashlib.sha1(os.path.realpath(workspace_dir).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(QA_RESULTS_PATH, f"impact-{workspace_hash}.json")
+
+    def _load_state(self, workspace_dir: str) -> Dict[str, Any]:
+        try:
+            with open(self._state_path(workspace_dir), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self, workspace_dir: str, state: Dict[str, Any]) -> None:
+        path = self._state_path(workspace_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    @staticmethod
+    def _snapshot(workspace_dir: str, previous: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        """
+        Returns {path: [size, mtime, sha256]} for every workspace file. Files
+        whose size and mtime are unchanged keep their previous hash unread.
+        """
+        snapshot: Dict[str, List[Any]] = {}
+        cursor = None
+        while True:
+            listing = list_tree(workspace_dir, max_depth=64, ignore=_SNAPSHOT_IGNORE, cursor=cursor, limit=5000)
+            for entry in listing["entries"]:
+                if entry["is_dir"] or entry["is_symlink"]:
+                    continue
+                path = entry["path"]
+                old = previous.get(path)
+                if old and old[0] == entry["size"] and old[1] == entry["mtime"]:
+                    snapshot[path] = old
+                    continue
+                try:
+                    with open(os.path.join(workspace_dir, path), "rb") as f:
+                        digest = hashlib.sha256(f.read()).hexdigest()
+                except OSError:
+                    continue
+                snapshot[path] = [entry["size"], entry["mtime"], digest]
+            cursor = listing["next_cursor"]
+            if cursor is None:
+                return snapshot
+
+    # --- Planning ---
+
+    def plan(self, workspace_dir: str) -> Dict[str, Any]:
+        """
+        Decides which tests the next QA run should execute.
+
+        Args:
+            workspace_dir: The workspace on the host.
+
+        Returns:
+            A dict with the `runner` and `command` to run, the `mode` ("full"
+            or "selected"), the `reason` for it, the `selected` test ids or
+            files, and the `changed_files` since the previous run.
+        """
+        with self._lock:
+            state = self._load_state(workspace_dir)
+            snapshot = self._snapshot(workspace_dir, state.get("files", {}))
+            previous = state.get("files")
+            changed = [] if previous is None else sorted(
+                path for path in set(previous) | set(snapshot)
+                if (previous.get(path) or [None] * 3)[2] != (snapshot.get(path) or [None] * 3)[2]
+            )
+            runner, _ = build_test_command(workspace_dir)
+
+            selected: List[str] = []
+            reason = self._full_run_reason(state, runner, previous, changed)
+            if reason is None:
+                if runner == "jest":
+                    selected = self._select_jest(state, changed, snapshot)
+                else:
+                    selected = self._select_python(state, changed, snapshot)
+                if not selected:
+                    reason = "the changes could not be narrowed down to specific tests"
+
+            if reason is None:
+                mode = "selected"
+                reason = f"{len(changed)} changed file(s) affect {len(selected)} test(s) or test file(s)"
+                if runner == "jest":
+                    _, command = build_test_command(workspace_dir, related_files=selected)
+                else:
+                    _, command = build_test_command(workspace_dir, test_ids=selected, coverage=True)
+            else:
+                mode = "full"
+                selected = []
+                _, command = build_test_command(workspace_dir, coverage=runner == "python")
+
+            print(f"--- [TestImpact] {mode.capitalize()} test run: {reason}. ---")
+            return {
+                "runner": runner,
+                "command": command,
+                "mode": mode,
+                "reason": reason,
+                "selected": selected,
+                "changed_files": changed,
+                "files": snapshot,
+            }
+
+    def _full_run_reason(self, state: Dict[str, Any], runner: str, previous: Optional[Dict[str, Any]], changed: List[str]) -> Optional[str]:
+        if not self.enabled:
+            return "test impact analysis is disabled"
+        if previous is None or state.get("runner") != runner:
+            return "no previous run to compare with"
+        if runner == "python" and not state.get("tests"):
+            return "no per-test coverage recorded yet"
+        if state.get("runs_since_full", 0) + 1 >= self.full_run_every:
+            return f"periodic full run (every {self.full_run_every} runs)"
+        if not changed:
+            return "no files changed since the previous run"
+        source = _JS_SOURCE if runner == "jest" else _PYTHON_SOURCE
+        for path in changed:
+            if path.endswith(_INERT_SUFFIXES):
+                continue
+            name = os.path.basename(path)
+            if not path.endswith(source) or name in _PYTHON_GLOBAL_FILES or name == "package.json":
+                return f"'{path}' changed and cannot be mapped to tests"
+        return None
+
+    def _select_python(self, state: Dict[str, Any], changed: List[str], snapshot: Dict[str, Any]) -> List[str]:
+        covered_by: Dict[str, List[str]] = {}
+        for test_id, files in state.get("tests", {}).items():
+            for path in files:
+                covered_by.setdefault(path, []).append(test_id)
+
+        selected: Set[str] = set()
+        selected_files: Set[str] = set()
+        for path in changed:
+            if path.endswith(_INERT_SUFFIXES):
+                continue
+            if path not in snapshot:
+                return []  # A deleted module: only a full run shows what broke.
+            if path in covered_by:
+                selected.update(covered_by[path])
+            elif _TEST_FILE.search(path) and state.get("pytest", True):
+                selected_files.add(path)  # A new test file (pytest accepts file paths).
+            else:
+                return []  # A new module, or a test file unittest cannot select by path.
+        # The tests that failed last time are re-checked, unless their file is run whole anyway.
+        for test_id in state.get("failed_test_ids", []):
+            if test_id.split("::")[0] not in selected_files:
+                selected.add(test_id)
+        if selected_files and any("::" not in test_id for test_id in selected):
+            return []  # pytest file paths and unittest ids cannot be mixed in one command.
+        # A test file that is run whole makes its individual ids redundant.
+        selected = {test_id for test_id in selected if test_id.split("::")[0] not in selected_files}
+        return sorted(selected_files) + sorted(selected)
+
+    def _select_jest(self, state: Dict[str, Any], changed: List[str], snapshot: Dict[str, Any]) -> List[str]:
+        if any(path not in snapshot for path in changed if not path.endswith(_INERT_SUFFIXES)):
+            return []
+        related = {path for path in changed if path.endswith(_JS_SOURCE)}
+        related.update(test_id.split("::")[0] for test_id in state.get("failed_test_ids", []))
+        return sorted(path for path in related if path in snapshot)
+
+    # --- Learning ---
+
+    def record(self, workspace_dir: str, plan: Dict[str, Any], report: Dict[str, Any], wall_time: float,
+               reports_dir: str) -> Dict[str, Any]:
+        """
+        Updates the impact map after a run, and reports the time saved.
+
+        Args:
+            workspace_dir: The workspace on the host.
+            plan: The plan the run followed.
+            report: The parsed test report (see `backend.utils.test_results.load_test_report`).
+            wall_time: The wall time of the run, in seconds.
+            reports_dir: Where the run's reports were written on the host
+                (see `backend.utils.test_results.results_dir`).
+
+        Returns:
+            The impact summary stored with the test report: the `mode`,
+            `reason`, `changed_files`, number of `selected_tests` run,
+            `wall_time`, `full_run_wall_time` and `saved_seconds`.
+        """
+        with self._lock:
+            state = self._load_state(workspace_dir)
+            full = plan["mode"] == "full"
+            tests = report.get("tests", [])
+
+            coverage_path = os.path.join(reports_dir, COVERAGE_REPORT)
+            if plan["runner"] == "python" and os.path.isfile(coverage_path) and tests:
+                try:
+                    with open(coverage_path, "r", encoding="utf-8") as f:
+                        files_by_test = map_coverage_to_tests(json.load(f), [test["id"] for test in tests])
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"--- [TestImpact] Warning: could not read the coverage report: {e} ---")
+                    files_by_test = {}
+                if full:
+                    state["tests"] = files_by_test
+                else:
+                    state.setdefault("tests", {}).update(files_by_test)
+            elif full:
+                state["tests"] = {}
+            if tests:
+                state["pytest"] = report.get("format") != "unittest-text"
+
+            state["runner"] = plan["runner"]
+            state["files"] = plan["files"]
+            state["failed_test_ids"] = report.get("failed_test_ids", [])
+            if full:
+                state["runs_since_full"] = 0
+                state["full_run_wall_time"] = wall_time
+            else:
+                state["runs_since_full"] = state.get("runs_since_full", 0) + 1
+
+            full_wall_time = state.get("full_run_wall_time")
+            saved = max(0.0, full_wall_time - wall_time) if not full and full_wall_time else 0.0
+            state["total_saved_seconds"] = state.get("total_saved_seconds", 0.0) + saved
+            self._save_state(workspace_dir, state)
+
+        impact = {
+            "mode": plan["mode"],
+            "reason": plan["reason"],
+            "changed_files": plan["changed_files"],
+            "selected_tests": len(tests),
+            "wall_time": round(wall_time, 2),
+            "full_run_wall_time": round(full_wall_time, 2) if full_wall_time else None,
+            "saved_seconds": round(saved, 2),
+            "total_saved_seconds": round(state["total_saved_seconds"], 2),
+        }
+        if not full:
+            print(f"--- [TestImpact] Ran {len(tests)} test(s) in {wall_time:.1f}s; saved ~{saved:.1f}s versus a full run. ---")
+        return impact
+
+
+# A single instance for the application to import and use.
+test_impact = TestImpactSelector()
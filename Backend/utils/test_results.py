@@ -0,0 +1,365 @@
+import json
+import os
+import re
+import shlex
+import shutil
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional, Tuple
+
+# This file turns the results of a test run in the sandbox into per-test
+# outcomes. The QA Council runs the project's tests so that they write a
+# machine-readable report (JUnit XML from pytest, or Jest's JSON), and this
+# module parses it. pytest-json-report files are understood
+# too, and unittest's verbose console output is the fallback when pytest is not
+# installed in the sandbox.
+#
+# Every parser returns a list of test dicts:
+#   {"id", "name", "file", "outcome", "duration", "message"}
+# where `outcome` is one of TEST_OUTCOMES and `duration` is in seconds. The `id`
+# is what the runner accepts to run just that test again.
+
+TEST_OUTCOMES = ("passed", "failed", "error", "skipped")
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+# Reports are kept out of the workspace, so they are never listed, indexed or
+# delivered with the project: the sandbox writes them to RESULTS_DIR, which is
+# mounted from the run's own directory under QA_RESULTS_PATH (see `results_dir`).
+QA_RESULTS_PATH = os.environ.get("QA_RESULTS_PATH", os.path.join(_DATA_DIR, "qa"))
+RESULTS_DIR = "/home/agentuser/qa-results"
+# The report files, relative to the results directory.
+JUNIT_REPORT = "junit.xml"
+JEST_REPORT = "jest-results.json"
+COVERAGE_REPORT = "coverage.json"
+_PYTEST_JSON_REPORT = "report.json"
+
+# Tests discovered in 'tests/' without an __init__.py have ids relative to that directory.
+_UNITTEST_PATH = "PYTHONPATH=tests"
+_UNITTEST_RERUN = f"{_UNITTEST_PATH} python -m unittest -v"
+# coverage.py settings for recording which test executed which lines (written with printf).
+_COVERAGE_RC = (
+    "[run]\\nsource = .\\nrelative_files = True\\ndynamic_context = test_function\\n"
+    f"data_file = {RESULTS_DIR}/.coverage\\n"
+)
+_SANDBOX_WORKSPACE = "/home/agentuser/workspace/"
+_MAX_MESSAGE_CHARS = 2000
+
+_UNITTEST_RESULT = re.compile(
+    r"^(\w+) \(([\w.]+)\)(?:\n.*?)? \.\.\. (ok|FAIL|ERROR|skipped.*|expected failure|unexpected success)$",
+    re.MULTILINE,
+)
+_JS_REGEX_SPECIAL = re.compile(r"[.*+?^${}()|[\]\\/]")
+_UNITTEST_FAILURE_HEADER = re.compile(r"^(FAIL|ERROR): (\w+) \(([\w.]+)\)", re.MULTILINE)
+
+
+def _relative(path: str) -> str:
+    if _SANDBOX_WORKSPACE in path:
+        path = path.split(_SANDBOX_WORKSPACE, 1)[1]
+    return path[2:] if path.startswith("./") else path
+
+
+def _test(test_id: str, name: str, file: Optional[str], outcome: str, duration: Optional[float], message: str = "") -> Dict[str, Any]:
+    return {
+        "id": test_id,
+        "name": name,
+        "file": file,
+        "outcome": outcome,
+        "duration": round(duration, 4) if duration is not None else None,
+        "message": message[:_MAX_MESSAGE_CHARS],
+    }
+
+
+# --- Parsers ---
+
+def parse_junit_xml(text: str) -> List[Dict[str, Any]]:
+    """
+    Parses a JUnit XML report (e.g. `pytest --junitxml`). Test ids are pytest
+    node ids ('tests/test_x.py::TestY::test_z') when the report carries file
+    names (junit_family=xunit1), otherwise 'classname.name'.
+
+    Raises:
+        ValueError: If the XML is malformed.
+    """
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as e:
+        raise ValueError(f"Malformed JUnit XML: {e}")
+
+    tests = []
+    for case in root.iter("testcase"):
+        name = case.get("name", "")
+        classname = case.get("classname", "")
+        file = case.get("file")
+        if file:
+            module = file[:-3].replace("/", ".") if file.endswith(".py") else ""
+            inner = classname[len(module):].lstrip(".") if module and classname.startswith(module) else ""
+            test_id = "::".join(part for part in (file, inner.replace(".", "::"), name) if part)
+        else:
+            test_id = f"{classname}.{name}" if classname else name
+
+        outcome, message = "passed", ""
+        for tag in ("failure", "error", "skipped"):
+            element = case.find(tag)
+            if element is not None:
+                outcome = {"failure": "failed", "error": "error", "skipped": "skipped"}[tag]
+                message = element.get("message") or (element.text or "").strip()
+                if tag != "skipped" and element.text:
+                    message = f"{message}\n{element.text.strip()}" if element.get("message") else element.text.strip()
+                break
+        time_value = case.get("time")
+        tests.append(_test(test_id, name, file, outcome, float(time_value) if time_value else None, message))
+    return tests
+
+
+def parse_pytest_json(text: str) -> List[Dict[str, Any]]:
+    """
+    Parses a pytest-json-report file (`pytest --json-report`).
+
+    Raises:
+        ValueError: If the JSON is malformed.
+    """
+    try:
+        report = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed pytest JSON report: {e}")
+
+    tests = []
+    for entry in report.get("tests", []):
+        phases = [entry.get(phase) or {} for phase in ("setup", "call", "teardown")]
+        duration = sum(phase.get("duration", 0) or 0 for phase in phases)
+        outcome = entry.get("outcome", "failed")
+        # An exception outside the test body (setup/teardown) is an error, not a failure.
+        if outcome == "failed" and any(phases[i].get("outcome") == "failed" for i in (0, 2)):
+            outcome = "error"
+        elif outcome not in TEST_OUTCOMES:
+            outcome = {"xfailed": "skipped", "xpassed": "passed"}.get(outcome, "error")
+        failed_phase = next((phase for phase in phases if phase.get("outcome") == "failed"), {})
+        crash = failed_phase.get("crash") or {}
+        message = crash.get("message") or str(failed_phase.get("longrepr") or "")
+        node_id = entry.get("nodeid", "")
+        tests.append(_test(node_id, node_id.split("::")[-1], node_id.split("::")[0] or None, outcome, duration, message))
+    return tests
+
+
+def parse_jest_json(text: str) -> List[Dict[str, Any]]:
+    """
+    Parses the report of `jest --json`. Test ids are 'file::full test name'.
+
+    Raises:
+        ValueError: If the JSON is malformed.
+    """
+    try:
+        report = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed Jest JSON report: {e}")
+
+    tests = []
+    for suite in report.get("testResults", []):
+        file = _relative(suite.get("name", ""))
+        assertions = suite.get("assertionResults") or []
+        if not assertions and suite.get("status") == "failed":
+            # The suite itself failed to run (e.g. a syntax error in the test file).
+            tests.append(_test(file, file, file, "error", None, suite.get("message", "")))
+            continue
+        for assertion in assertions:
+            full_name = assertion.get("fullName") or assertion.get("title", "")
+            status = assertion.get("status")
+            outcome = {"passed": "passed", "failed": "failed"}.get(status, "skipped")
+            duration = assertion.get("duration")
+            message = "\n".join(assertion.get("failureMessages") or [])
+            tests.append(_test(f"{file}::{full_name}", full_name, file, outcome,
+                               duration / 1000 if duration is not None else None, message))
+    return tests
+
+
+def parse_unittest_output(text: str) -> List[Dict[str, Any]]:
+    """Parses the console output of `python -m unittest -v` (no durations are available)."""
+    messages: Dict[str, str] = {}
+    sections = _UNITTEST_FAILURE_HEADER.split(text)
+    # split() yields [before, kind, name, where, body, kind, name, where, body, ...]
+    for i in range(1, len(sections) - 3, 4):
+        name, where, body = sections[i + 1], sections[i + 2], sections[i + 3]
+        # The traceback sits between a '-----' rule and the next rule; its last line is the exception.
+        traceback = re.split(r"^(?:-{70}|={70})$", body, flags=re.MULTILINE)
+        lines = [line for line in traceback[1].splitlines() if line.strip()] if len(traceback) > 1 else []
+        messages[_unittest_id(name, where)] = lines[-1] if lines else ""
+
+    tests = []
+    for match in _UNITTEST_RESULT.finditer(text):
+        name, where, result = match.groups()
+        test_id = _unittest_id(name, where)
+        if result == "ok" or result == "unexpected success":
+            outcome = "passed"
+        elif result == "FAIL":
+            outcome = "failed"
+        elif result == "ERROR":
+            outcome = "error"
+        else:
+            outcome = "skipped"
+        tests.append(_test(test_id, name, None, outcome, None, messages.get(test_id, "")))
+    return tests
+
+
+def _jest_selection(test_ids: List[str]) -> str:
+    """Returns the Jest arguments that select the given tests: their files, and a -t pattern of their names."""
+    files = sorted({test_id.split("::")[0] for test_id in test_ids})
+    names = "|".join(_JS_REGEX_SPECIAL.sub(r"\\\g<0>", test_id.split("::", 1)[1]) for test_id in test_ids if "::" in test_id)
+    selection = " ".join(shlex.quote(file) for file in files)
+    return f"{selection} -t {shlex.quote(f'^({names})$')}" if names else selection
+
+
+def _unittest_id(name: str, where: str) -> str:
+    # Python 3.11+ prints 'test_x (pkg.module.Class.test_x)', older versions 'test_x (pkg.module.Class)'.
+    return where if where.endswith(f".{name}") else f"{where}.{name}"
+
+
+# --- Running and reporting ---
+
+def build_test_command(
+    workspace_dir: str,
+    test_ids: Optional[List[str]] = None,
+    coverage: bool = False,
+    related_files: Optional[List[str]] = None,
+) -> Tuple[str, str]:
+    """
+    Chooses the test runner for the project in the workspace and builds the
+    command that runs its tests and writes a machine-readable report.
+
+    Args:
+        workspace_dir: The workspace on the host, used to detect the project type.
+        test_ids: Run only these tests (ids as produced by the parsers, or test file paths).
+        coverage: For Python, also record which tests executed which files
+            (coverage.py with per-test contexts) into COVERAGE_REPORT, when
+            coverage is installed in the sandbox.
+        related_files: For Jest, run only the tests related to these files.
+
+    Returns:
+        The runner ("jest" or "python") and the shell command to run in the sandbox.
+    """
+    selected = " ".join(shlex.quote(test_id) for test_id in test_ids or [])
+    if _uses_jest(workspace_dir):
+        command = f"npx jest --json --outputFile={RESULTS_DIR}/{JEST_REPORT}"
+        if related_files:
+            command += " --findRelatedTests " + " ".join(shlex.quote(path) for path in related_files)
+        elif test_ids:
+            command += " " + _jest_selection(test_ids)
+        return "jest", f"mkdir -p {RESULTS_DIR} && rm -f {RESULTS_DIR}/{JEST_REPORT} && {command}"
+
+    prepare = f"mkdir -p {RESULTS_DIR} && rm -f {RESULTS_DIR}/{JUNIT_REPORT} {RESULTS_DIR}/{COVERAGE_REPORT} {RESULTS_DIR}/.coverage && "
+    python = "python -m"
+    finish = ""
+    if coverage:
+        prepare += (
+            f"printf '{_COVERAGE_RC}' > {RESULTS_DIR}/coveragerc && "
+            f"PY='python -m' && if python -c 'import coverage' 2>/dev/null; then PY='python -m coverage run --rcfile={RESULTS_DIR}/coveragerc -m'; fi && "
+        )
+        python = "$PY"
+        # Export the per-test coverage, keeping the exit status of the tests.
+        finish = (
+            f"; status=$?; [ -f {RESULTS_DIR}/.coverage ] && python -m coverage json -q --rcfile={RESULTS_DIR}/coveragerc "
+            f"--show-contexts -o {RESULTS_DIR}/{COVERAGE_REPORT}; exit $status"
+        )
+    pytest = f"{python} pytest -q -o junit_family=xunit1 --junitxml={RESULTS_DIR}/{JUNIT_REPORT}"
+    if test_ids and _is_pytest_selection(test_ids):
+        return "python", f"{prepare}{pytest} {selected}{finish}"
+    if test_ids:
+        return "python", f"{prepare}{_UNITTEST_PATH} {python} unittest -v {selected}{finish}"
+    # pytest also runs unittest-style tests; plain unittest is the fallback if it is not installed.
+    return "python", f"{prepare}if python -c 'import pytest' 2>/dev/null; then {pytest}; else {python} unittest discover tests -v; fi{finish}"
+
+
+def _is_pytest_selection(test_ids: List[str]) -> bool:
+    return all("::" in test_id or test_id.endswith(".py") for test_id in test_ids)
+
+
+def _uses_jest(workspace_dir: str) -> bool:
+    package_json = os.path.join(workspace_dir, "package.json")
+    if not os.path.isfile(package_json):
+        return False
+    try:
+        with open(package_json, "r", encoding="utf-8") as f:
+            package = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    dependencies = {**package.get("dependencies", {}), **package.get("devDependencies", {})}
+    return "jest" in dependencies or "jest" in str(package.get("scripts", {}).get("test", ""))
+
+
+def summarize(tests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {outcome: 0 for outcome in TEST_OUTCOMES}
+    for test in tests:
+        summary[test["outcome"]] += 1
+    summary["total"] = len(tests)
+    summary["duration"] = round(sum(test["duration"] or 0 for test in tests), 3)
+    return summary
+
+
+def rerun_command(runner: str, test_ids: List[str]) -> str:
+    """Returns the command that runs only the given tests again, for the debugger."""
+    if not test_ids:
+        return ""
+    if runner == "jest":
+        return "npx jest " + _jest_selection(test_ids)
+    if _is_pytest_selection(test_ids):
+        return "python -m pytest -q " + " ".join(shlex.quote(test_id) for test_id in test_ids)
+    return f"{_UNITTEST_RERUN} " + " ".join(shlex.quote(test_id) for test_id in test_ids)
+
+
+def results_dir(run_id: str) -> str:
+    """Returns the host directory mounted as RESULTS_DIR for a run's commands."""
+    return os.path.join(QA_RESULTS_PATH, re.sub(r"[^A-Za-z0-9_-]", "_", run_id))
+
+
+def delete_results(run_id: str) -> None:
+    """Deletes the test reports of a run."""
+    shutil.rmtree(results_dir(run_id), ignore_errors=True)
+
+
+def load_test_report(runner: str, reports_dir: str, output: str, command: str = "") -> Dict[str, Any]:
+    """
+    Reads and parses the report of a test run.
+
+    Args:
+        runner: The runner returned by `build_test_command`.
+        reports_dir: Where the report was written on the host (`results_dir`).
+        output: The console output of the run (used for unittest).
+        command: The command that was run, recorded in the report.
+
+    Returns:
+        A dict with the `runner` and `format` actually used, the `command`, the
+        per-test `tests`, a `summary`, the `failed_test_ids` (failures and
+        errors) and a `rerun_command` for just those. `format` is None if no
+        results could be read.
+    """
+    tests: List[Dict[str, Any]] = []
+    result_format = None
+    parse_error = None
+    candidates = [("jest-json", JEST_REPORT, parse_jest_json)] if runner == "jest" else [
+        ("junit-xml", JUNIT_REPORT, parse_junit_xml),
+        ("pytest-json", _PYTEST_JSON_REPORT, parse_pytest_json),
+    ]
+    for name, file_name, parse in candidates:
+        path = os.path.join(reports_dir, file_name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tests = parse(f.read())
+            result_format = name
+            break
+        except (OSError, ValueError) as e:
+            parse_error = str(e)
+    if result_format is None and runner == "python":
+        tests = parse_unittest_output(output)
+        result_format = "unittest-text" if tests else None
+
+    failed = [test["id"] for test in tests if test["outcome"] in ("failed", "error")]
+    return {
+        "runner": runner,
+        "format": result_format,
+        "command": command,
+        "tests": tests,
+        "summary": summarize(tests),
+        "failed_test_ids": failed,
+        "rerun_command": rerun_command("jest" if runner == "jest" else "python", failed),
+        "parse_error": parse_error,
+    }
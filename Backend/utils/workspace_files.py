@@ -0,0 +1,140 @@
+import base64
+import codecs
+import os
+import re
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# This file contains the helpers behind the workspace file download endpoints:
+# cheap ETags from file metadata, HTTP Range parsing, chunked reads of a byte
+# range, and the byte-window reader used by the editor. None of them loads a
+# whole file into memory.
+
+_CHUNK_SIZE = 64 * 1024
+# A window containing a NUL byte is treated as binary and returned as base64.
+_BINARY_SNIFF_BYTES = 8192
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """Returns a strong ETag derived from a file's mtime and size (no hashing of content)."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Checks an If-None-Match header (which may list several ETags, or '*') against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match.
+    return "*" in candidates or etag in {candidate.removeprefix("W/") for candidate in candidates}
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range `Range` header.
+
+    Args:
+        range_header: The header value, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-500".
+        size: The size of the file in bytes.
+
+    Returns:
+        The inclusive (start, end) byte positions, or None if the header is
+        absent or asks for several ranges (the full file is sent instead).
+
+    Raises:
+        ValueError: If the range cannot be satisfied (answer with 416).
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None  # Multi-range or unknown units: ignoring the header is allowed.
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # A suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range.")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range {range_header} not satisfiable for a file of {size} bytes.")
+    return start, end
+
+
+def iter_file_range(path: str, start: int, end: int, chunk_size: int = _CHUNK_SIZE) -> Iterator[bytes]:
+    """Yields the bytes start..end (inclusive) of a file in chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def read_window(path: str, offset: int, length: int) -> Dict[str, Any]:
+    """
+    Reads a window of a file for the editor.
+
+    Text is decoded as UTF-8. The window is adjusted so it never splits a
+    character: it starts at the next character boundary and ends before an
+    incomplete trailing character, and `next_offset` says where the next
+    window starts. Windows that look binary are returned base64-encoded.
+
+    Args:
+        path: The absolute path of the file.
+        offset: The byte offset to start reading at.
+        length: The maximum number of bytes to read.
+
+    Returns:
+        A dict with `content`, `encoding` ("utf-8" or "base64"), `offset`,
+        `next_offset`, `size` and `eof`.
+    """
+    size = os.path.getsize(path)
+    offset = min(max(offset, 0), size)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        # Read a few extra bytes so a character straddling the end can be completed.
+        data = f.read(length + 3)
+
+    if b"\x00" in data[:_BINARY_SNIFF_BYTES]:
+        data = data[:length]
+        return {
+            "content": base64.b64encode(data).decode("ascii"),
+            "encoding": "base64",
+            "offset": offset,
+            "next_offset": offset + len(data),
+            "size": size,
+            "eof": offset + len(data) >= size,
+        }
+
+    # Skip UTF-8 continuation bytes at the start: they belong to the previous window.
+    skip = 0
+    while skip < min(3, len(data)) and (data[skip] & 0xC0) == 0x80:
+        skip += 1
+    window = data[skip:skip + length]
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    text = decoder.decode(window, final=False)
+    pending = len(decoder.getstate()[0])  # Bytes of an incomplete trailing character.
+    consumed = len(window) - pending
+    at_eof = offset + skip + consumed >= size
+    if at_eof and pending:
+        text += decoder.decode(b"", final=True)
+        consumed = len(window)
+
+    next_offset = offset + skip + consumed
+    return {
+        "content": text,
+        "encoding": "utf-8",
+        "offset": offset + skip,
+        "next_offset": next_offset,
+        "size": size,
+        "eof": next_offset >= size,
+    }
@@ -0,0 +1,181 @@
+import base64
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# This file implements the recursive workspace listing used by the file
+# explorer. It walks the tree with `os.scandir` (one syscall per directory, and
+# file metadata comes mostly from the directory entry itself), returns every
+# entry with its size, mtime and type, and pages through large trees with an
+# opaque cursor.
+#
+# Entries are returned in depth-first pre-order, directories before files and
+# names sorted within each directory, so a client can rebuild the tree from
+# the flat list. The cursor is the position of the last returned entry in that
+# order; when resuming, whole subtrees before the cursor are skipped without
+# being read.
+
+# Directories that are never listed (nor indexed). Extend with WORKSPACE_IGNORE="a,b".
+DEFAULT_IGNORE = frozenset(
+    {".git", ".chroma_db", "node_modules", "__pycache__"}
+    | {name.strip() for name in os.environ.get("WORKSPACE_IGNORE", "").split(",") if name.strip()}
+)
+
+# Sort key of one path component: directories (0) before files (1), then by name.
+_Key = Tuple[int, str]
+
+
+def encode_cursor(position: List[_Key]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[_Key]:
+    """
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return [(int(is_file), str(name)) for is_file, name in position]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _matches(relative_path: str, name: str, pattern: str) -> bool:
+    # Patterns with a slash are matched against the whole path, others against the name.
+    return fnmatch.fnmatch(relative_path if "/" in pattern else name, pattern)
+
+
+def _scan_sorted(directory: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except (PermissionError, FileNotFoundError, NotADirectoryError):
+        return []
+    return sorted(entries, key=lambda entry: (not entry.is_dir(follow_symlinks=False), entry.name))
+
+
+def _walk(
+    directory: str,
+    relative_dir: str,
+    prefix: List[_Key],
+    depth: int,
+    max_depth: int,
+    cursor: List[_Key],
+    glob: Optional[str],
+    ignore: Sequence[str],
+) -> Iterator[Tuple[List[_Key], Dict[str, Any]]]:
+    for entry in _scan_sorted(directory):
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if is_dir and entry.name in ignore:
+            continue
+        position = prefix + [(0 if is_dir else 1, entry.name)]
+        on_cursor_path = cursor[:len(position)] == position
+        if not on_cursor_path and position < cursor:
+            continue  # This entry and its whole subtree were on earlier pages.
+
+        relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+        if not on_cursor_path and (is_dir or not glob or _matches(relative_path, entry.name, glob)):
+            try:
+                stat = entry.stat(follow_symlinks=False)
+                size, mtime = (None if is_dir else stat.st_size), stat.st_mtime
+            except OSError:
+                size, mtime = None, None
+            yield position, {
+                "path": relative_path,
+                "name": entry.name,
+                "is_dir": is_dir,
+                "is_symlink": entry.is_symlink(),
+                "size": size,
+                "mtime": mtime,
+                "depth": depth,
+            }
+
+        if is_dir and depth < max_depth:
+            yield from _walk(entry.path, relative_path, position, depth + 1, max_depth, cursor, glob, ignore)
+
+
+def list_tree(
+    root_dir: str,
+    max_depth: int = 1,
+    glob: Optional[str] = None,
+    ignore: Sequence[str] = DEFAULT_IGNORE,
+    cursor: Optional[str] = None,
+    limit: int = 1000,
+    relative_root: str = "",
+) -> Dict[str, Any]:
+    """
+    Lists a directory tree.
+
+    Args:
+        root_dir: The absolute path of the directory to list.
+        max_depth: How many levels to descend (1 lists only the direct children).
+        glob: Only list files matching this pattern (directories are always listed).
+        ignore: Directory names that are skipped entirely.
+        cursor: The `next_cursor` of the previous page.
+        limit: The maximum number of entries to return (at least 1).
+        relative_root: Prefix for the returned paths, i.e. `root_dir` relative to the workspace.
+
+    Returns:
+        A dict with the `entries`, the `next_cursor` (None on the last page)
+        and an `etag` that changes whenever the listed entries change.
+
+    Raises:
+        ValueError: If the cursor is malformed or the limit is below 1.
+    """
+    if limit < 1:
+        raise ValueError(f"The limit must be at least 1, not {limit}.")
+    position = decode_cursor(cursor) if cursor else []
+    entries: List[Dict[str, Any]] = []
+    last_position: List[_Key] = []
+    next_cursor = None
+    for entry_position, entry in _walk(root_dir, relative_root.strip("/"), [], 1, max_depth, position, glob, ignore):
+        if len(entries) == limit:
+            next_cursor = encode_cursor(last_position)
+            break
+        entries.append(entry)
+        last_position = entry_position
+
+    digest = hashlib.sha1()
+    digest.update(json.dumps([max_depth, glob, sorted(ignore), cursor, next_cursor]).encode("utf-8"))
+    for entry in entries:
+        digest.update(f"{entry['path']}|{entry['is_dir']}|{entry['size']}|{entry['mtime']}\n".encode("utf-8"))
+
+    return {"entries": entries, "next_cursor": next_cursor, "etag": f'"{digest.hexdigest()}"'}
+
+
+class ListingCache:
+    """
+    A small LRU cache of listings, tagged with the workspace watcher's version
+    at the time they were computed. Any published workspace change bumps the
+    version and so invalidates every cached listing. Only use it while the
+    watcher is running; otherwise changes would go unnoticed.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Any, ...], version: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, key: Tuple[Any, ...], version: int, listing: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (version, listing)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,284 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.event_bus import event_bus
+from backend.utils.workspace_listing import DEFAULT_IGNORE
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # The polling fallback is used instead.
+    FileSystemEventHandler = object
+    Observer = None
+
+# This file implements the workspace watcher: a change feed of the files in the
+# workspace, whoever changed them (an agent's tools, the user's editor, or the
+# pty terminal of frontend/Server).
+#
+# Raw filesystem events come from watchdog (inotify on Linux) or, if watchdog
+# is unavailable, from periodically diffing os.scandir snapshots. They are
+# debounced and coalesced per path (e.g. created+modified -> created,
+# created+deleted -> nothing) and published as one batch on the event bus under
+# the WORKSPACE_FEED key. Every consumer (the RAG indexer, the API's change
+# stream, the listing cache) subscribes there and gets its own queue and thread.
+
+_WORKSPACE_DIR = os.path.join(os.getcwd(), "workspace")
+
+# --- Configuration ---
+# "auto" (watchdog if installed, else polling), "watchdog" or "polling".
+_WATCH_BACKEND = os.environ.get("WORKSPACE_WATCH_BACKEND", "auto")
+# Changes are published once the workspace has been quiet for this long...
+_DEBOUNCE_MS = int(os.environ.get("WORKSPACE_WATCH_DEBOUNCE_MS", 300))
+# ...or at the latest after this long, so a continuous stream of writes is not delayed forever.
+_MAX_DELAY_MS = int(os.environ.get("WORKSPACE_WATCH_MAX_DELAY_MS", 2000))
+# Scan interval of the polling fallback.
+_POLL_INTERVAL = float(os.environ.get("WORKSPACE_POLL_INTERVAL", 2.0))
+
+# The event bus key that workspace change batches are published under.
+WORKSPACE_FEED = "workspace"
+CHANGE_TYPES = ("created", "modified", "deleted", "moved")
+
+
+def _coalesce(previous: Optional[Dict[str, Any]], change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Merges a new change of a path into its pending change. None means 'no net change'."""
+    if previous is None:
+        return change
+    before, after = previous["type"], change["type"]
+    if after == "modified":
+        return previous if before in ("created", "modified") else change
+    if after == "deleted":
+        # Something that appeared and vanished within the window never happened.
+        return None if before == "created" else change
+    if after == "created" and before == "deleted":
+        return {**change, "type": "modified"}
+    return change
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "WorkspaceWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event: Any) -> None:
+        event_type = getattr(event, "event_type", None)
+        if event_type not in CHANGE_TYPES:
+            return  # e.g. 'opened', 'closed'
+        if event_type == "modified" and event.is_directory:
+            return  # A directory's mtime changes with every entry; its entries report themselves.
+        self.watcher.record(event_type, event.src_path, getattr(event, "dest_path", None) or None, event.is_directory)
+
+
+class WorkspaceWatcher:
+    """
+    Watches the workspace and publishes debounced, coalesced change batches.
+    """
+
+    def __init__(
+        self,
+        root: str = _WORKSPACE_DIR,
+        backend: str = _WATCH_BACKEND,
+        debounce_ms: int = _DEBOUNCE_MS,
+        max_delay_ms: int = _MAX_DELAY_MS,
+        poll_interval: float = _POLL_INTERVAL,
+        ignore: Sequence[str] = DEFAULT_IGNORE,
+    ):
+        self.root = os.path.abspath(root)
+        self.backend = backend
+        self.debounce = debounce_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self.poll_interval = poll_interval
+        self.ignore = frozenset(ignore)
+        # Incremented for every published batch; caches compare it to know they are stale.
+        self.version = 0
+        self.running = False
+
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._first_pending_at: Optional[float] = None
+        self._last_event_at = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._threads: List[threading.Thread] = []
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        if self.running:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        self._stopped.clear()
+        use_watchdog = self.backend == "watchdog" or (self.backend == "auto" and Observer is not None)
+        if use_watchdog:
+            if Observer is None:
+                raise RuntimeError("WORKSPACE_WATCH_BACKEND=watchdog, but the 'watchdog' package is not installed.")
+            self._observer = Observer()
+            self._observer.schedule(_WatchdogHandler(self), self.root, recursive=True)
+            self._observer.start()
+        else:
+            self._start_thread(self._poll, "workspace-poller")
+        self._start_thread(self._flush_loop, "workspace-watcher")
+        self.running = True
+        print(f"--- [Watcher] Watching '{self.root}' using {'watchdog' if use_watchdog else 'polling'}. ---")
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        self.running = False
+
+    def _start_thread(self, target: Any, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    # --- Event intake ---
+
+    def _relative(self, path: str) -> Optional[str]:
+        """Returns the workspace-relative path, or None if it is outside or ignored."""
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative == "." or relative.startswith(".."):
+            return None
+        parts = relative.split(os.sep)
+        if any(part in self.ignore for part in parts):
+            return None
+        return "/".join(parts)
+
+    def record(self, event_type: str, path: str, dest_path: Optional[str] = None, is_dir: bool = False) -> None:
+        """
+        Records one raw filesystem event. Safe to call from any thread.
+
+        Args:
+            event_type: One of CHANGE_TYPES.
+            path: The absolute path that changed (the source path of a move).
+            dest_path: The destination of a move.
+            is_dir: Whether the path is a directory.
+        """
+        relative = self._relative(path)
+        if event_type == "moved":
+            dest_relative = self._relative(dest_path) if dest_path else None
+            if relative is None and dest_relative is None:
+                return
+            if relative is None:  # Moved in from an ignored location: a creation.
+                event_type, relative, dest_relative = "created", dest_relative, None
+            elif dest_relative is None:  # Moved away into an ignored location: a deletion.
+                event_type = "deleted"
+        elif relative is None:
+            return
+        else:
+            dest_relative = None
+
+        now = time.time()
+        change = {"type": event_type, "path": relative, "dest_path": dest_relative, "is_dir": is_dir, "timestamp": now}
+        with self._lock:
+            if event_type == "moved":
+                previous = self._pending.pop(relative, None)
+                if previous and previous["type"] == "created":
+                    # Created and renamed within the window: just a new file at the destination.
+                    change = {**change, "type": "created", "path": dest_relative, "dest_path": None}
+                self._pending.pop(change["path"], None)
+                key = change["path"] if change["type"] == "created" else relative
+                self._pending[key] = change
+            else:
+                merged = _coalesce(self._pending.pop(relative, None), change)
+                if merged is not None:
+                    self._pending[relative] = merged
+            if self._first_pending_at is None:
+                self._first_pending_at = now
+            self._last_event_at = now
+        self._wakeup.set()
+
+    # --- Publishing ---
+
+    def _flush_loop(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._stopped.is_set():
+                with self._lock:
+                    if not self._pending:
+                        self._first_pending_at = None
+                        break
+                    now = time.time()
+                    quiet_for = now - self._last_event_at
+                    waited = now - self._first_pending_at
+                    if quiet_for >= self.debounce or waited >= self.max_delay:
+                        batch = list(self._pending.values())
+                        self._pending.clear()
+                        self._first_pending_at = None
+                    else:
+                        batch = None
+                        remaining = min(self.debounce - quiet_for, self.max_delay - waited)
+                if batch is None:
+                    self._stopped.wait(remaining)
+                    continue
+                self._publish(batch)
+                break
+
+    def _publish(self, batch: List[Dict[str, Any]]) -> None:
+        self.version += 1
+        print(f"--- [Watcher] Publishing {len(batch)} workspace change(s) (version {self.version}). ---")
+        event_bus.publish(WORKSPACE_FEED, "workspace_changes", version=self.version, changes=batch)
+
+    # --- Polling fallback ---
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int, bool, int]]:
+        """Maps each relative path to (mtime_ns, size, is_dir, inode)."""
+        snapshot: Dict[str, Tuple[int, int, bool, int]] = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if is_dir and entry.name in self.ignore:
+                            continue
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        relative = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                        snapshot[relative] = (stat.st_mtime_ns, stat.st_size, is_dir, stat.st_ino)
+                        if is_dir:
+                            stack.append(entry.path)
+            except OSError:
+                continue
+        return snapshot
+
+    def _poll(self) -> None:
+        previous = self._snapshot()
+        while not self._stopped.wait(self.poll_interval):
+            current = self._snapshot()
+            deleted = {path: info for path, info in previous.items() if path not in current}
+            created = {path: info for path, info in current.items() if path not in previous}
+            # A path that vanished and one that appeared with the same inode is a rename.
+            deleted_by_inode = {info[3]: path for path, info in deleted.items()}
+            for path, info in created.items():
+                source = deleted_by_inode.pop(info[3], None)
+                if source is not None and deleted[source][2] == info[2]:
+                    deleted.pop(source)
+                    self.record("moved", os.path.join(self.root, source), os.path.join(self.root, path), info[2])
+                else:
+                    self.record("created", os.path.join(self.root, path), is_dir=info[2])
+            for path, info in deleted.items():
+                self.record("deleted", os.path.join(self.root, path), is_dir=info[2])
+            for path, info in current.items():
+                old = previous.get(path)
+                if old and not info[2] and old[:2] != info[:2]:
+                    self.record("modified", os.path.join(self.root, path), is_dir=False)
+            previous = current
+
+
+# A single instance for the application to import and use.
+workspace_watcher = WorkspaceWatcher()
@@ -1,71 +1,41 @@
 import asyncio
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import os
+import threading
+import json
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Header
+import mimetypes
+from fastapi.responses import StreamingResponse, JSONResponse, Response, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uuid
 
 from backend.graph import app as agent_app
+from backend.checkpointing import checkpointer
 from backend.state import AgentState
+from backend.run_store import run_store, RUN_STATUSES, FINISHED_STATUSES, RUN_LEASE_SECONDS, WORKER_ID
+from backend.run_executor import run_executor, QueueFullError
+from backend.progress_events import ProgressEventTranslator
 from tools.agent_tools import list_files as list_workspace_files
 from tools.agent_tools import read_file as read_workspace_file
+from tools.agent_tools import _get_safe_path as resolve_workspace_path
+from tools.sandbox_cache import sandbox_caches
+from tools.sandbox_images import sandbox_images
+from tools.sandbox_resources import sandbox_usage
+from tools.local_executor import local_executor
+from backend.tracing import tracer
+from backend.llm_usage import llm_usage
+from backend.utils.workspace_listing import list_tree, ListingCache
+from backend.utils.workspace_files import file_etag, etag_matches, parse_range, iter_file_range, read_window
+from backend.utils.test_results import delete_results as delete_test_results
+from backend.workspace_watcher import workspace_watcher, WORKSPACE_FEED
+from backend.event_bus import event_bus
+from backend.rag_components.indexer import apply_workspace_changes
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List
+from starlette.websockets import WebSocketState
+from typing import List, Optional
 
-from tools.agent_tools import STREAM_CALLBACKS # Import the shared dictionary
+from api.streaming import stream_registry, progress_notifier, workspace_changes, send_notice
 
-# ... (existing imports and app setup remain the same) ...
-
-# --- WebSocket Connection Manager ---
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, run_id: str):
-        await websocket.accept()
-        self.active_connections[run_id] = websocket
-        # Define the callback function for this specific connection
-        def stream_to_client(data: str):
-            # Since this callback is called from a sync thread (the agent),
-            # we must use a thread-safe way to call the async websocket method.
-            # asyncio.run_coroutine_threadsafe is complex, so for simplicity,
-            # we will rely on FastAPI's ability to handle this, but in a
-            # high-concurrency app, a proper async queue would be better.
-            try:
-                # This is a simplification; a real app might need an asyncio event loop here
-                asyncio.run(websocket.send_text(data))
-            except RuntimeError:
-                # This can happen if the event loop is already running.
-                # A more robust solution involves queues. For now, we proceed.
-                pass
-
-
-        STREAM_CALLBACKS[run_id] = stream_to_client
-        print(f"--- [API] WebSocket connected for run_id: {run_id} ---")
-
-    def disconnect(self, run_id: str):
-        del self.active_connections[run_id]
-        del STREAM_CALLBACKS[run_id]
-        print(f"--- [API] WebSocket disconnected for run_id: {run_id} ---")
-
-manager = ConnectionManager()
-
-# ... (existing Pydantic models and helper functions remain the same) ...
-# ... (existing /project/start and /workspace endpoints remain the same) ...
-
-# --- New WebSocket Endpoint ---
-@app.websocket("/ws/terminal/{run_id}")
-async def websocket_endpoint(websocket: WebSocket, run_id: str):
-    await manager.connect(websocket, run_id)
-    try:
-        while True:
-            # The server keeps the connection open, listening for any potential
-            # messages from the client (e.g., for interactive input in the future).
-            data = await websocket.receive_text()
-            # For now, we just echo it back or log it.
-            print(f"--- [WS] Received from client '{run_id}': {data} ---")
-            
-    except WebSocketDisconnect:
-        manager.disconnect(run_id)
 # This file creates the main FastAPI application that serves as the backend
 # for our user interface.
 
@@ -86,59 +56,571 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- In-memory storage for agent runs ---
-# In a production system, this would be a real database (e.g., Redis, PostgreSQL).
-# For now, we'll store the state of each agent run in a simple dictionary.
-agent_runs = {}
+# --- Persistent storage for agent runs ---
+# Runs, their latest state and every step's state delta live in the run store
+# (SQLite in WAL mode by default), so they survive restarts and are shared by
+# all API worker processes. See backend/run_store.py.
+
+# Each queued or running run is leased to the worker process executing it,
+# which renews the lease while the run is in its executor. Executor workers
+# are daemon threads and the queue lives in memory, so a crash, a restart or a
+# shutdown leaves runs whose lease then expires; any worker takes them over.
+
+async def recover_interrupted_runs():
+    """
+    Claims the queued and running runs whose worker is gone. Runs that were
+    running are marked failed, which lets them be resumed from their last
+    checkpoint. Queued runs are submitted again, oldest first: from their
+    latest checkpoint if they have one (resumed and forked runs), else from
+    their initial state.
+    """
+    for run in await asyncio.to_thread(run_store.claim_expired_runs, WORKER_ID):
+        run_id = run["run_id"]
+        if run_executor.is_active(run_id):
+            # Our own run, whose lease lapsed while the process was stalled; it is renewed now.
+            continue
+        if run["status"] == "running":
+            print(f"--- [API] Run '{run_id}' was interrupted by a restart. Marking it failed. ---")
+            await asyncio.to_thread(_set_run_status, run_id, "failed", "Interrupted by a server restart. Resume it from its last checkpoint.")
+            continue
+        config = _graph_config(run_id)
+        has_checkpoint = await asyncio.to_thread(checkpointer.get_tuple, config) is not None
+        graph_input = None if has_checkpoint else (await asyncio.to_thread(run_store.get_run, run_id))["state"]
+        try:
+            _submit_run(run_id, graph_input, config)
+        except HTTPException:
+            print(f"--- [API] Run '{run_id}' could not be queued again after a restart. Marking it cancelled. ---")
+            await asyncio.to_thread(_set_run_status, run_id, "cancelled", "Dropped from the queue by a server restart.")
+            continue
+        print(f"--- [API] Run '{run_id}' was queued before a restart. Queued it again. ---")
+        stream_registry.reopen(run_id)
+
+async def _keep_run_leases():
+    while True:
+        await asyncio.sleep(RUN_LEASE_SECONDS / 3)
+        try:
+            await asyncio.to_thread(run_store.renew_leases, WORKER_ID, run_executor.active_runs())
+            # Runs of workers that stopped since, e.g. one of several uvicorn workers being restarted.
+            await recover_interrupted_runs()
+        except Exception as e:
+            print(f"--- [API] Warning: could not renew the leases of this worker's runs: {e} ---")
+
+@app.on_event("startup")
+async def start_run_leases():
+    await recover_interrupted_runs()
+    app.state.run_leases = asyncio.create_task(_keep_run_leases())
+
+@app.on_event("shutdown")
+async def stop_run_leases():
+    app.state.run_leases.cancel()
+
+@app.on_event("startup")
+def apply_run_retention():
+    for expired_run_id in run_store.apply_retention():
+        checkpointer.delete_thread(expired_run_id)
+        sandbox_usage.delete_run(expired_run_id)
+        llm_usage.delete_run(expired_run_id)
+        tracer.delete_run(expired_run_id)
+        delete_test_results(expired_run_id)
+
+@app.on_event("shutdown")
+def stop_run_executor():
+    # Running runs are asked to stop after their current step. Once their leases
+    # expire, those still in the middle of a step when the process exits are
+    # marked failed, and queued runs are queued again (see recover_interrupted_runs).
+    run_executor.shutdown(cancel_running=True)
+    local_executor.shutdown()
+
+@app.on_event("startup")
+async def warm_local_executor():
+    # The local sandbox backend's workers are started before the first command needs them.
+    await asyncio.to_thread(local_executor.warm)
+
+# --- Workspace change feed ---
+# The watcher publishes debounced workspace changes (from agents, the editor or
+# the terminal) on the event bus; the indexer re-indexes just the changed files,
+# the change stream forwards them to the explorer, and the listing cache uses
+# the watcher's version to know when a cached tree is stale.
+_WORKSPACE_WATCHER_ENABLED = os.environ.get("WORKSPACE_WATCHER", "1") == "1"
+listing_cache = ListingCache()
+
+@app.on_event("startup")
+async def start_workspace_watcher():
+    if not _WORKSPACE_WATCHER_ENABLED:
+        return
+    workspace_changes.attach(asyncio.get_running_loop())
+    event_bus.subscribe(WORKSPACE_FEED, apply_workspace_changes)
+    event_bus.subscribe(WORKSPACE_FEED, workspace_changes.publish_threadsafe)
+    event_bus.subscribe(WORKSPACE_FEED, sandbox_images.apply_workspace_changes)
+    workspace_watcher.start()
+
+@app.on_event("shutdown")
+def stop_workspace_watcher():
+    workspace_watcher.stop()
 
 # --- Pydantic Models for API Requests ---
 class StartRequest(BaseModel):
     initial_request: str
+    # Lower values are started first when runs are waiting for a worker.
+    priority: int = 0
+    # Overrides of the sandbox resource limits for this run's commands:
+    # any of memory (e.g. "1g"), cpus, pids and timeout_seconds.
+    sandbox_limits: Optional[dict] = None
+    # "trusted" lets simple commands (ls, cat, python -c, a single test) skip
+    # Docker and run as restricted local subprocesses; defaults to SANDBOX_DEFAULT_TRUST.
+    sandbox_trust: Optional[str] = None
+
+class ResumeRequest(BaseModel):
+    # Resume from this checkpoint; defaults to the run's latest checkpoint.
+    checkpoint_id: Optional[str] = None
+    # Alternatively, re-run the workflow from the latest point where this node was next.
+    from_node: Optional[str] = None
+
+class ForkRequest(ResumeRequest):
+    # State fields to change in the fork, e.g. an edited technical plan.
+    state_updates: dict = {}
 
-# --- Helper function to run the agent in the background ---
-def run_agent_in_background(run_id: str, initial_state: AgentState):
+# --- Helper functions to run the agent in the background ---
+def _graph_config(run_id: str, checkpoint_id: Optional[str] = None) -> dict:
+    """Builds the graph config; the run_id doubles as the checkpointer's thread_id."""
+    configurable = {"thread_id": run_id}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"recursion_limit": 50, "configurable": configurable}
+
+def _emit_progress(run_id: str, event_type: str, data: dict) -> None:
+    """Persists a progress event for the SSE endpoint and wakes its listeners."""
+    run_store.append_event(run_id, event_type, data)
+    progress_notifier.notify_threadsafe(run_id)
+
+def _set_run_status(run_id: str, status: str, error: Optional[str] = None) -> None:
+    # The event is written first: an SSE client that sees a finished status
+    # can then rely on having read every event of the run.
+    _emit_progress(run_id, "run_status", {"status": status, "error": error})
+    run_store.set_status(run_id, status, error=error)
+
+def run_agent_in_background(run_id: str, graph_input: Optional[AgentState], config: dict, cancel_event: threading.Event):
     """
-    Invokes the agent graph and updates the in-memory state as events are received.
+    Invokes the agent graph on a run executor worker, records each step's
+    state delta in the run store and emits typed progress events. A
+    `graph_input` of None continues the run from the checkpoint in `config`.
+    Cancellation is checked between steps.
     """
-    config = {"recursion_limit": 50}
-    for event in agent_app.stream(initial_state, config=config):
-        agent_runs[run_id] = event # Store the latest state
+    _set_run_status(run_id, "running")
+    translator = ProgressEventTranslator()
+    # The root span of the run's trace; every node, router, LLM and tool span nests under it.
+    with tracer.span("run", kind="run", run_id=run_id, resumed=graph_input is None) as run_span:
+        try:
+            for mode, chunk in agent_app.stream(graph_input, config=config, stream_mode=["updates", "debug"]):
+                if mode == "updates":
+                    # Each update maps the node that just ran to the updates it produced.
+                    for node_name, updates in chunk.items():
+                        run_store.append_step(run_id, node_name, updates or {})
+                        # Wakes status requests waiting for a new step.
+                        progress_notifier.notify_threadsafe(run_id)
+                for event_type, data in translator.translate(mode, chunk):
+                    _emit_progress(run_id, event_type, data)
+                if mode == "updates" and cancel_event.is_set():
+                    print(f"--- [API] Run '{run_id}' cancelled. It can be resumed from its last checkpoint. ---")
+                    _set_run_status(run_id, "cancelled")
+                    run_span.set_attribute("status", "cancelled")
+                    break
+            else:
+                for event_type, data in translator.finish():
+                    _emit_progress(run_id, event_type, data)
+                _set_run_status(run_id, "completed")
+                run_span.set_attribute("status", "completed")
+        except Exception as e:
+            print(f"--- [API] CRITICAL ERROR in run '{run_id}': {e} ---")
+            _set_run_status(run_id, "failed", error=str(e))
+            run_span.set_attributes(status="failed", error=str(e))
+        finally:
+            # Let connected terminals drain and close once the run is over.
+            stream_registry.finish(run_id)
+            for expired_run_id in run_store.apply_retention():
+                checkpointer.delete_thread(expired_run_id)
+                sandbox_usage.delete_run(expired_run_id)
+                llm_usage.delete_run(expired_run_id)
+                tracer.delete_run(expired_run_id)
+
+def _submit_run(run_id: str, graph_input: Optional[AgentState], config: dict, priority: int = 0) -> int:
+    """
+    Hands a run to the run executor.
+
+    Returns:
+        The run's position in the queue.
+
+    Raises:
+        HTTPException: 429 if the queue is full.
+    """
+    try:
+        return run_executor.submit(
+            run_id,
+            lambda cancel_event: run_agent_in_background(run_id, graph_input, config, cancel_event),
+            priority=priority,
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail={"message": str(e), "queue_depth": e.queue_size, "max_queue_size": run_executor.max_queue_size},
+            headers={"Retry-After": "30"},
+        )
+
+def _find_checkpoint(run_id: str, request: ResumeRequest) -> Optional[str]:
+    """
+    Resolves a resume/fork request to a checkpoint_id of the run, or None for
+    the latest checkpoint.
+    """
+    if request.checkpoint_id:
+        if not checkpointer.get_tuple(_graph_config(run_id, request.checkpoint_id)):
+            raise HTTPException(status_code=404, detail="Checkpoint not found.")
+        return request.checkpoint_id
+    if request.from_node:
+        # History is newest first, so this is the most recent time the node was about to run.
+        for snapshot in agent_app.get_state_history(_graph_config(run_id)):
+            if request.from_node in snapshot.next:
+                return snapshot.config["configurable"]["checkpoint_id"]
+        raise HTTPException(status_code=404, detail=f"No checkpoint of this run precedes node '{request.from_node}'.")
+    return None
 
 # --- API Endpoints ---
 
 @app.post("/project/start", status_code=202)
-async def start_project(request: StartRequest, background_tasks: BackgroundTasks):
+async def start_project(request: StartRequest):
     """
-    Starts a new agent workflow in the background.
+    Starts a new agent workflow on the run executor. Returns 429 when too many
+    runs are already waiting for a worker.
     """
     run_id = str(uuid.uuid4())
     print(f"--- [API] Starting new agent run with ID: {run_id} ---")
     
-    initial_state: AgentState = {
+    # Initialize all other fields to None: nodes read them with state["..."].
+    initial_state: AgentState = {key: None for key in AgentState.__annotations__}
+    initial_state.update({
         "initial_request": request.initial_request,
         "history_log": [],
         "dispute_raised": False,
-        # Initialize all other fields to None or default values
-    }
-    
-    # Store the initial state immediately
-    agent_runs[run_id] = {"initial": initial_state}
+        "run_id": run_id,
+    })
     
-    # Run the main agent graph in a background task so the API can return immediately
-    background_tasks.add_task(run_agent_in_background, run_id, initial_state)
+    # The SQLite writes run off the event loop, like every store access of the async endpoints.
+    def register() -> None:
+        try:
+            if request.sandbox_limits:
+                sandbox_usage.set_run_limits(run_id, request.sandbox_limits)
+            if request.sandbox_trust:
+                sandbox_usage.set_run_trust(run_id, request.sandbox_trust)
+        except ValueError:
+            sandbox_usage.delete_run(run_id)
+            raise
+        # Store the initial state immediately
+        run_store.create_run(run_id, initial_state, owner=WORKER_ID)
+
+    try:
+        await asyncio.to_thread(register)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        queue_position = _submit_run(run_id, initial_state, _graph_config(run_id), request.priority)
+    except HTTPException:
+        await asyncio.to_thread(run_store.delete_run, run_id)
+        raise
+    # Start capturing the run's live output so terminals can replay it from the start.
+    stream_registry.open(run_id)
     
-    return {"message": "Agent workflow started.", "run_id": run_id}
+    return {"message": "Agent workflow started.", "run_id": run_id, "queue_position": queue_position}
+
+
+# --- Status long-polling ---
+# Upper bound for `wait` on the status endpoint.
+_MAX_STATUS_WAIT_SECONDS = float(os.environ.get("STATUS_MAX_WAIT_SECONDS", 30))
+# A waiting status request is woken by the progress notifier when a worker of
+# this process writes a step; it also re-checks the store this often, for steps
+# written by other API processes.
+_STATUS_POLL_INTERVAL = float(os.environ.get("STATUS_POLL_INTERVAL_MS", 2000)) / 1000
 
 
 @app.get("/project/{run_id}/status")
-async def get_project_status(run_id: str):
+async def get_project_status(
+    run_id: str,
+    since: Optional[int] = Query(None, ge=0),
+    wait: float = Query(0, ge=0, le=_MAX_STATUS_WAIT_SECONDS),
+):
     """
-    Retrieves the latest state of a specific agent run.
+    Retrieves the state of a specific agent run.
+
+    Without `since`, returns the full latest state keyed by the node that
+    produced it. With `since=<seq>`, returns only the fields changed after that
+    step and the new entries of growing lists such as `history_log`, plus the
+    `seq` to send next time (`since=0` returns the full state in that format).
+    With `wait=<seconds>`, the request is held until the run has a new step or
+    finishes, or the wait times out. Both forms include `sandbox_usage`: the
+    run's sandbox limits and the resources its commands consumed.
     """
-    if run_id not in agent_runs:
+    run = await asyncio.to_thread(run_store.get_run, run_id, False)
+    if not run:
         raise HTTPException(status_code=404, detail="Project run not found.")
-    
-    return agent_runs[run_id]
+
+    if since is None:
+        run = await asyncio.to_thread(run_store.get_run, run_id)
+        sandbox = await asyncio.to_thread(sandbox_usage.summary, run_id)
+        return {run["last_node"] or "initial": run["state"], "sandbox_usage": sandbox}
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while run["last_seq"] == since and run["status"] not in FINISHED_STATUSES:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        # Registered before re-reading the store, so a step written in between is not missed.
+        waiter = progress_notifier.register(run_id)
+        try:
+            run = await asyncio.to_thread(run_store.get_run, run_id, False)
+            if not run:
+                raise HTTPException(status_code=404, detail="Project run not found.")
+            if run["last_seq"] != since or run["status"] in FINISHED_STATUSES:
+                break
+            await progress_notifier.wait(waiter, min(remaining, _STATUS_POLL_INTERVAL))
+        finally:
+            progress_notifier.unregister(run_id, waiter)
+
+    changes = await asyncio.to_thread(run_store.get_changes, run_id, since)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    changes["sandbox_usage"] = await asyncio.to_thread(sandbox_usage.summary, run_id)
+    return changes
+
+
+@app.get("/project/{run_id}/usage")
+async def get_project_usage(run_id: str):
+    """
+    Reports a run's LLM usage: requests, errors, prompt and completion
+    tokens, estimated cost and latency histograms, in total and per taxonomy
+    group (or other caller, such as the router), per model and per group and
+    model. See backend/llm_usage.py.
+    """
+    if not await asyncio.to_thread(run_store.get_run, run_id, False):
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    return await asyncio.to_thread(llm_usage.summary, run_id)
+
+
+# --- Server-Sent Events ---
+# A comment line is sent when a stream has been idle this long, so proxies keep it open.
+_SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+# Browsers reconnect after this delay if the connection drops.
+_SSE_RETRY_MS = int(os.environ.get("SSE_RETRY_MS", 3000))
+
+
+def _format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+@app.get("/project/{run_id}/events")
+async def stream_project_events(
+    run_id: str,
+    last_event_id: Optional[int] = Query(None, ge=0),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Streams a run's progress as Server-Sent Events: run_status, node_started,
+    node_finished (with duration_ms), router_decision, task_status and verdict.
+
+    Events are read from the run store, so a client that reconnects with the
+    `Last-Event-ID` header (sent automatically by EventSource) or the
+    `last_event_id` query parameter receives exactly the events it missed.
+    The stream ends once the run is finished and all its events were sent.
+    """
+    if not await asyncio.to_thread(run_store.get_run, run_id, False):
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    after_id = last_event_id or 0
+    if last_event_id_header and last_event_id_header.isdigit():
+        after_id = int(last_event_id_header)
+
+    async def event_stream():
+        nonlocal after_id
+        yield f"retry: {_SSE_RETRY_MS}\n\n"
+        while True:
+            waiter = progress_notifier.register(run_id)
+            try:
+                # The status is read before the events: the runner writes a run's
+                # last event before marking it finished, so none can be missed.
+                run = await asyncio.to_thread(run_store.get_run, run_id, False)
+                events = await asyncio.to_thread(run_store.get_events, run_id, after_id)
+                for event in events:
+                    after_id = event["id"]
+                    yield _format_sse(event)
+                if events:
+                    continue
+                if run is None or (run["status"] in FINISHED_STATUSES and not run_executor.is_active(run_id)):
+                    return
+                if not await progress_notifier.wait(waiter, _SSE_HEARTBEAT_SECONDS):
+                    yield ": keep-alive\n\n"
+            finally:
+                progress_notifier.unregister(run_id, waiter)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/project/{run_id}/checkpoints")
+def list_project_checkpoints(run_id: str, limit: int = Query(100, ge=1, le=1000)):
+    """
+    Lists the checkpoints of a run, newest first. Any of them can be passed to
+    the resume or fork endpoints.
+    """
+    if not run_store.get_run(run_id, include_state=False):
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    checkpoints = []
+    for snapshot in agent_app.get_state_history(_graph_config(run_id), limit=limit):
+        checkpoints.append({
+            "checkpoint_id": snapshot.config["configurable"]["checkpoint_id"],
+            "step": (snapshot.metadata or {}).get("step"),
+            "next": list(snapshot.next),
+            "last_completed_step": snapshot.values.get("last_completed_step"),
+            "created_at": snapshot.created_at,
+        })
+    return {"run_id": run_id, "checkpoints": checkpoints}
+
+
+@app.post("/project/{run_id}/resume", status_code=202)
+async def resume_project(run_id: str, request: ResumeRequest):
+    """
+    Continues a stopped or failed run from its last checkpoint, or re-runs it
+    from an earlier checkpoint. Completed nodes before that point are not re-run.
+    """
+    run = await asyncio.to_thread(run_store.get_run, run_id, False)
+    if not run:
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    if run_executor.is_active(run_id):
+        raise HTTPException(status_code=409, detail="Project run is already queued or running.")
+    checkpoint_id = await asyncio.to_thread(_find_checkpoint, run_id, request)
+    config = _graph_config(run_id, checkpoint_id)
+    snapshot = await asyncio.to_thread(agent_app.get_state, config)
+    if not snapshot.next:
+        raise HTTPException(status_code=409, detail="Nothing left to run from this checkpoint.")
+
+    # Another worker process may be executing the run.
+    if not await asyncio.to_thread(run_store.claim_run, run_id, WORKER_ID):
+        raise HTTPException(status_code=409, detail="Project run is already queued or running.")
+    print(f"--- [API] Resuming run '{run_id}' from checkpoint: {checkpoint_id or 'latest'} ---")
+    await asyncio.to_thread(_set_run_status, run_id, "queued")
+    try:
+        queue_position = _submit_run(run_id, None, config)
+    except HTTPException:
+        await asyncio.to_thread(_set_run_status, run_id, run["status"], run["error"])
+        raise
+    stream_registry.reopen(run_id)
+    return {"message": "Agent workflow resumed.", "run_id": run_id, "checkpoint_id": checkpoint_id, "queue_position": queue_position}
+
+
+@app.post("/project/{run_id}/fork", status_code=202)
+async def fork_project(run_id: str, request: ForkRequest):
+    """
+    Starts a new run that continues from a checkpoint of an existing run,
+    optionally with some state fields changed. The source run is not modified.
+    """
+    if not await asyncio.to_thread(run_store.get_run, run_id, False):
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    checkpoint_id = await asyncio.to_thread(_find_checkpoint, run_id, request)
+    if checkpoint_id is None:
+        latest = await asyncio.to_thread(checkpointer.get_tuple, _graph_config(run_id))
+        if latest is None:
+            raise HTTPException(status_code=409, detail="Project run has no checkpoints yet.")
+        checkpoint_id = latest.config["configurable"]["checkpoint_id"]
+
+    new_run_id = str(uuid.uuid4())
+
+    # Copying the checkpoint chain can take a while for a long run; it must not block the event loop.
+    def fork() -> None:
+        checkpointer.fork_thread(run_id, checkpoint_id, new_run_id, values={**request.state_updates, "run_id": new_run_id})
+        run_store.create_run(new_run_id, agent_app.get_state(_graph_config(new_run_id)).values, owner=WORKER_ID)
+
+    def discard_fork() -> None:
+        run_store.delete_run(new_run_id)
+        checkpointer.delete_thread(new_run_id)
+
+    await asyncio.to_thread(fork)
+    try:
+        queue_position = _submit_run(new_run_id, None, _graph_config(new_run_id))
+    except HTTPException:
+        await asyncio.to_thread(discard_fork)
+        raise
+    stream_registry.open(new_run_id)
+    return {
+        "message": "Agent workflow forked.",
+        "run_id": new_run_id,
+        "forked_from": {"run_id": run_id, "checkpoint_id": checkpoint_id},
+        "queue_position": queue_position,
+    }
+
+
+@app.post("/project/{run_id}/cancel")
+def cancel_project(run_id: str):
+    """
+    Cancels a run. A queued run is removed from the queue; a running run stops
+    after its current step and can later be resumed from its last checkpoint.
+    """
+    if not run_store.get_run(run_id, include_state=False):
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    outcome = run_executor.cancel(run_id)
+    if outcome is None:
+        raise HTTPException(status_code=409, detail="Project run is not queued or running.")
+    if outcome == "dequeued":
+        _set_run_status(run_id, "cancelled")
+        stream_registry.finish(run_id)
+    return {"run_id": run_id, "result": outcome}
+
+
+@app.get("/project/{run_id}/queue")
+def get_project_queue_position(run_id: str):
+    """
+    Returns the position of a run in the executor queue (null once it has started).
+    """
+    if not run_store.get_run(run_id, include_state=False):
+        raise HTTPException(status_code=404, detail="Project run not found.")
+    return {"run_id": run_id, "queue_position": run_executor.queue_position(run_id)}
+
+
+@app.get("/executor/status")
+def get_executor_status():
+    """
+    Reports the run executor's queue depth and per-worker utilization.
+    """
+    return run_executor.stats()
+
+
+@app.get("/sandbox/caches")
+def get_sandbox_cache_status():
+    """
+    Reports the sandbox dependency caches: their entries and sizes, hits and misses, and evictions.
+    """
+    return sandbox_caches.get_stats()
+
+
+@app.get("/sandbox/images")
+def get_sandbox_image_status():
+    """
+    Reports the sandbox image builds: derived images built, in progress and failed, and how many runs used them.
+    """
+    return sandbox_images.get_stats()
+
+
+@app.get("/projects")
+def list_projects(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None):
+    """
+    Lists agent runs, newest first, optionally filtered by status.
+    Pass the returned `next_cursor` to fetch the following page.
+    """
+    if status and status not in RUN_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Expected one of {RUN_STATUSES}.")
+    try:
+        runs, next_cursor = run_store.list_runs(status=status, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return {"runs": runs, "next_cursor": next_cursor}
 
 
 @app.get("/workspace/files")
@@ -197,22 +679,238 @@ async def index_workspace_endpoint(background_tasks: BackgroundTasks):
     
     return {"message": "Workspace indexing process initiated."}
 
+# --- File contents ---
+# Default and maximum size of the window returned by /workspace/file.
+_FILE_WINDOW_BYTES = int(os.environ.get("WORKSPACE_FILE_WINDOW_BYTES", 1024 * 1024))
+_MAX_FILE_WINDOW_BYTES = int(os.environ.get("WORKSPACE_MAX_FILE_WINDOW_BYTES", 8 * 1024 * 1024))
+
+
+def _resolve_workspace_file(path: str) -> str:
+    """Maps a workspace-relative path to an existing regular file, or raises a 4xx."""
+    if not path:
+        raise HTTPException(status_code=400, detail="File path is required.")
+    try:
+        safe_path = resolve_workspace_path(path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.isfile(safe_path):
+        raise HTTPException(status_code=404, detail=f"Error: The file '{path}' does not exist.")
+    return safe_path
+
+
 @app.get("/workspace/file")
-async def get_file_content(path: str):
+def get_file_content(
+    path: str,
+    offset: int = Query(0, ge=0),
+    length: int = Query(_FILE_WINDOW_BYTES, ge=1, le=_MAX_FILE_WINDOW_BYTES),
+):
     """
-    Reads and returns the content of a specific file from the workspace.
+    Returns a window of a workspace file as JSON, for the editor. Only the
+    requested bytes are read. Text is returned as UTF-8 (windows never split a
+    character), binary content as base64. Keep requesting from `next_offset`
+    until `eof` to load a large file piece by piece.
     """
-    if not path:
-        raise HTTPException(status_code=400, detail="File path is required.")
+    safe_path = _resolve_workspace_file(path)
     try:
-        content = read_workspace_file(path)
-        if content.startswith("Error:"):
-            raise HTTPException(status_code=404, detail=content)
-        return {"path": path, "content": content}
-    except Exception as e:
+        return {"path": path, **read_window(safe_path, offset, length)}
+    except OSError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/workspace/raw")
+def download_workspace_file(request: Request, path: str, download: bool = False):
+    """
+    Serves a workspace file as-is (binary safe, with a guessed content type)
+    without loading it into memory. Supports single `Range` requests (206),
+    `If-Range`, and `If-None-Match` against the returned ETag (304).
+    """
+    safe_path = _resolve_workspace_file(path)
+    stat = os.stat(safe_path)
+    etag = file_etag(stat)
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(safe_path)[0] or "application/octet-stream"
+    filename = os.path.basename(safe_path) if download else None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None  # The client's partial copy is outdated: send the whole file.
+    try:
+        byte_range = parse_range(range_header, stat.st_size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat.st_size}"})
+
+    if byte_range is None:
+        return FileResponse(safe_path, media_type=media_type, headers=headers, filename=filename, stat_result=stat)
+
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{stat.st_size}", "Content-Length": str(end - start + 1)})
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(iter_file_range(safe_path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+@app.get("/workspace/tree")
+def get_workspace_tree(
+    request: Request,
+    path: str = ".",
+    depth: int = Query(1, ge=1, le=32),
+    glob: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    cursor: Optional[str] = None,
+):
+    """
+    Lists the workspace recursively in a single call, with size, mtime and
+    type for every entry. Entries come in depth-first order (directories first)
+    with their depth, so the client can rebuild the tree. Large trees are paged
+    with `cursor`; send the returned ETag as If-None-Match to get a 304 when
+    nothing changed.
+    """
+    try:
+        safe_path = resolve_workspace_path(path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.isdir(safe_path):
+        raise HTTPException(status_code=404, detail=f"The directory '{path}' does not exist.")
+    relative_root = os.path.relpath(safe_path, resolve_workspace_path("."))
+    # While the watcher runs, an unchanged tree is served from the cache without rescanning.
+    cache_key = (safe_path, depth, glob, cursor, limit)
+    version = workspace_watcher.version
+    listing = listing_cache.get(cache_key, version) if workspace_watcher.running else None
+    if listing is None:
+        try:
+            listing = list_tree(safe_path, max_depth=depth, glob=glob, cursor=cursor, limit=limit,
+                                relative_root="" if relative_root == "." else relative_root)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        if workspace_watcher.running:
+            listing_cache.put(cache_key, version, listing)
+
+    if request.headers.get("if-none-match") == listing["etag"]:
+        return Response(status_code=304, headers={"ETag": listing["etag"]})
+    return JSONResponse(
+        {"path": path, "entries": listing["entries"], "next_cursor": listing["next_cursor"]},
+        headers={"ETag": listing["etag"]},
+    )
+
+
+@app.get("/workspace/changes")
+async def stream_workspace_changes():
+    """
+    Streams workspace changes as Server-Sent Events. Each `workspace_changes`
+    event carries a batch of created/modified/deleted/moved entries with
+    workspace-relative paths. A `resync` event means changes were dropped
+    because the client was too slow; it should reload the tree.
+    """
+    if not workspace_watcher.running:
+        raise HTTPException(status_code=503, detail="The workspace watcher is not running.")
+    queue = workspace_changes.connect()
+
+    async def event_stream():
+        try:
+            yield f"retry: {_SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), _SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event.get("type") == "resync":
+                    yield "event: resync\ndata: {}\n\n"
+                    continue
+                data = json.dumps({"version": event["version"], "changes": event["changes"]})
+                yield f"id: {event['version']}\nevent: workspace_changes\ndata: {data}\n\n"
+        finally:
+            workspace_changes.disconnect(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- WebSocket Connection Manager ---
+class ConnectionManager:
+    """
+    Tracks the terminal WebSockets of each run. The actual delivery is done by
+    the run's output stream (see api/streaming.py): one async sender task per
+    client drains a bounded per-run buffer fed from the agent threads.
+    """
+    def __init__(self):
+        self.active_connections: dict[str, set[WebSocket]] = {}
+
+    async def connect(self, websocket: WebSocket, run_id: str, offset: Optional[int] = None) -> asyncio.Task:
+        await websocket.accept()
+        self.active_connections.setdefault(run_id, set()).add(websocket)
+        stream = stream_registry.open(run_id)
+        print(f"--- [API] WebSocket connected for run_id: {run_id} (offset: {offset}) ---")
+        return asyncio.create_task(stream.serve(websocket, offset))
+
+    def disconnect(self, websocket: WebSocket, run_id: str):
+        connections = self.active_connections.get(run_id, set())
+        connections.discard(websocket)
+        if not connections:
+            self.active_connections.pop(run_id, None)
+        print(f"--- [API] WebSocket disconnected for run_id: {run_id} ---")
+
+manager = ConnectionManager()
+
+# --- WebSocket Endpoint ---
+@app.websocket("/ws/terminal/{run_id}")
+async def websocket_endpoint(websocket: WebSocket, run_id: str, offset: Optional[int] = None):
+    """
+    Streams a run's live activity to the agent terminal. A reconnecting client
+    passes the `next_offset` of the last output frame it received as `offset`
+    to resume exactly where it left off. Unknown runs are closed with code 4404;
+    once the run is finished and its output sent, the server closes with 1000.
+    """
+    run = await asyncio.to_thread(run_store.get_run, run_id, False)
+    if not run:
+        # Accepted first: a close before the handshake cannot carry a code.
+        await websocket.accept()
+        await websocket.close(code=4404, reason="Project run not found.")
+        return
+    if stream_registry.get(run_id) is None and run["status"] in FINISHED_STATUSES:
+        # The run's output has aged out (or predates a restart); opening a stream would wait forever.
+        await websocket.accept()
+        await send_notice(websocket, f"\r\n~ Run '{run_id}' is {run['status']}; its live output is no longer available.\r\n")
+        await websocket.close()
+        return
+    sender = await manager.connect(websocket, run_id, offset)
+    receiver = asyncio.create_task(_receive_client_messages(websocket, run_id))
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        if sender.done():
+            error = sender.exception()
+            if error is not None:
+                print(f"--- [WS] ERROR: Streaming run '{run_id}' to a terminal failed: {error!r} ---")
+            # Unless the stream already closed the socket (a client that fell behind).
+            if websocket.application_state == WebSocketState.CONNECTED:
+                if error is not None:
+                    await websocket.close(code=1011, reason="Streaming the run's output failed.")
+                else:
+                    # The run is finished and the client has all of its output.
+                    await send_notice(websocket, f"\r\n~ Run '{run_id}' has finished. End of its output.\r\n")
+                    await websocket.close(code=1000)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        manager.disconnect(websocket, run_id)
+
+async def _receive_client_messages(websocket: WebSocket, run_id: str) -> None:
+    # Listens for messages from the client (e.g., for interactive input in the
+    # future) until it disconnects. For now, we just log them.
+    try:
+        while True:
+            data = await websocket.receive_text()
+            print(f"--- [WS] Received from client '{run_id}': {data} ---")
+    except WebSocketDisconnect:
+        pass
+
 # To run this server:
 # 1. Navigate to your project's root directory in the terminal.
 # 2. Run the command: uvicorn api.main:app --reload
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from backend.event_bus import event_bus, format_event_for_terminal, Subscription
+
+# This file bridges the agent's worker threads to the WebSocket clients.
+#
+# Every run gets one RunOutputStream: a bounded, append-only text log that is
+# fed from sync code with `loop.call_soon_threadsafe` and read by one async
+# sender task per connected client. Positions in the log are character
+# (code point) offsets. Every message is a JSON frame:
+#
+#   {"type": "output", "offset": <start>, "next_offset": <end>, "text": "..."}
+#   {"type": "notice", "text": "..."}
+#
+# A client that reconnects with `?offset=<next_offset of the last output frame>`
+# catches up on everything it missed. Notices (e.g. dropped output) are not part
+# of the log and do not move the offset.
+
+# --- Configuration ---
+# Maximum number of characters retained per run for replay and slow clients.
+_MAX_BUFFER_CHARS = int(os.environ.get("WS_STREAM_BUFFER_CHARS", 1_000_000))
+# Small frames arriving within this window are coalesced into a single send.
+_BATCH_INTERVAL_MS = int(os.environ.get("WS_STREAM_BATCH_MS", 10))
+# Upper bound for a single WebSocket message.
+_MAX_BATCH_CHARS = int(os.environ.get("WS_STREAM_MAX_BATCH_CHARS", 64_000))
+# What to do when a client falls behind the retained buffer:
+#   "drop_oldest" - skip ahead to the oldest retained output and tell the client.
+#   "disconnect"  - close the socket so the client can reconnect and resync.
+_DROP_POLICY = os.environ.get("WS_STREAM_DROP_POLICY", "drop_oldest")
+# Finished runs whose output is kept around for late (re)connections.
+_MAX_FINISHED_STREAMS = int(os.environ.get("WS_STREAM_MAX_FINISHED", 100))
+
+DROP_POLICIES = ("drop_oldest", "disconnect")
+
+
+async def send_notice(websocket: WebSocket, text: str) -> None:
+    """Sends a message that is shown in the terminal but is not part of the run's output log."""
+    await websocket.send_text(json.dumps({"type": "notice", "text": text}))
+
+
+class RunOutputStream:
+    """
+    The bounded output log of a single run. All methods except
+    `publish_threadsafe` must be called on the event loop thread.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        loop: asyncio.AbstractEventLoop,
+        max_buffer_chars: int = _MAX_BUFFER_CHARS,
+        batch_interval_ms: int = _BATCH_INTERVAL_MS,
+        max_batch_chars: int = _MAX_BATCH_CHARS,
+        drop_policy: str = _DROP_POLICY,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}'. Expected one of {DROP_POLICIES}.")
+        self.run_id = run_id
+        self.max_buffer_chars = max_buffer_chars
+        self.batch_interval = batch_interval_ms / 1000
+        self.max_batch_chars = max_batch_chars
+        self.drop_policy = drop_policy
+
+        self.start_offset = 0  # Offset of the oldest retained character
+        self.end_offset = 0    # Offset one past the newest character
+        self.finished = False
+        self.client_count = 0
+        self.dropped_chars = 0
+
+        self._loop = loop
+        self._chunks: Deque[Tuple[int, str]] = deque()  # (start offset, text)
+        self._waiters: Set[asyncio.Event] = set()
+
+    # --- Producer side (any thread) ---
+
+    def publish_threadsafe(self, text: str) -> None:
+        """Appends text to the log. Safe to call from any thread; never blocks."""
+        if text:
+            self._loop.call_soon_threadsafe(self._append, text)
+
+    def finish_threadsafe(self) -> None:
+        """Marks the run as finished so senders exit once they are drained."""
+        self._loop.call_soon_threadsafe(self._finish)
+
+    def _append(self, text: str) -> None:
+        self._chunks.append((self.end_offset, text))
+        self.end_offset += len(text)
+        # Evict whole chunks from the front once the buffer is over budget.
+        while self._chunks and self.end_offset - self._chunks[0][0] > self.max_buffer_chars:
+            self._chunks.popleft()
+            self.start_offset = self._chunks[0][0] if self._chunks else self.end_offset
+        self._wake_senders()
+
+    def _finish(self) -> None:
+        self.finished = True
+        self._wake_senders()
+
+    def _wake_senders(self) -> None:
+        for waiter in self._waiters:
+            waiter.set()
+
+    # --- Consumer side (event loop) ---
+
+    def read_from(self, offset: int, max_chars: int) -> Tuple[str, int]:
+        """
+        Returns up to `max_chars` characters starting at `offset`, and the
+        offset just past them. `offset` must not be older than `start_offset`.
+        """
+        parts = []
+        remaining = max_chars
+        cursor = offset
+        for chunk_start, text in self._chunks:
+            chunk_end = chunk_start + len(text)
+            if chunk_end <= cursor:
+                continue
+            piece = text[cursor - chunk_start:][:remaining]
+            parts.append(piece)
+            cursor += len(piece)
+            remaining -= len(piece)
+            if remaining <= 0:
+                break
+        return "".join(parts), cursor
+
+    async def serve(self, websocket: WebSocket, offset: Optional[int] = None) -> None:
+        """
+        Sends the log to one client, starting at `offset` (or at the oldest
+        retained output for a new client), until the run is finished and the
+        client has caught up, or the task is cancelled.
+        """
+        if offset is None:
+            cursor = self.start_offset
+        else:
+            cursor = max(0, min(offset, self.end_offset))
+        wakeup = asyncio.Event()
+        self._waiters.add(wakeup)
+        self.client_count += 1
+        try:
+            while True:
+                if cursor < self.start_offset:
+                    missed = self.start_offset - cursor
+                    self.dropped_chars += missed
+                    if self.drop_policy == "disconnect":
+                        print(f"--- [Stream] Client of run '{self.run_id}' fell {missed} chars behind. Disconnecting. ---")
+                        await websocket.close(code=1013, reason=f"Fell behind; resume from offset {self.start_offset}.")
+                        return
+                    await send_notice(websocket, f"\r\n~ [Stream] {missed} characters dropped because the connection was too slow.\r\n")
+                    cursor = self.start_offset
+
+                if cursor >= self.end_offset:
+                    if self.finished:
+                        return
+                    wakeup.clear()
+                    await wakeup.wait()
+                    # Give other small frames a moment to arrive so they go out together.
+                    await asyncio.sleep(self.batch_interval)
+                    continue
+
+                text, next_cursor = self.read_from(cursor, self.max_batch_chars)
+                await websocket.send_text(json.dumps({"type": "output", "offset": cursor, "next_offset": next_cursor, "text": text}))
+                cursor = next_cursor
+        finally:
+            self._waiters.discard(wakeup)
+            self.client_count -= 1
+
+
+class RunStreamRegistry:
+    """
+    Owns one RunOutputStream per run and the event bus subscription feeding it.
+    """
+
+    def __init__(self, max_finished_streams: int = _MAX_FINISHED_STREAMS):
+        self.max_finished_streams = max_finished_streams
+        self._streams: Dict[str, RunOutputStream] = {}
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+
+    def open(self, run_id: str) -> RunOutputStream:
+        """
+        Returns the stream of a run, creating it (and subscribing it to the
+        event bus) if needed. Must be called from the event loop.
+        """
+        stream = self._streams.get(run_id)
+        if stream:
+            return stream
+
+        stream = RunOutputStream(run_id, asyncio.get_running_loop())
+        self._streams[run_id] = stream
+        self._subscribe(stream)
+        return stream
+
+    def reopen(self, run_id: str) -> RunOutputStream:
+        """
+        Like `open`, but also revives a finished stream, for a run that is
+        resumed: its earlier output is kept and new output is appended.
+        """
+        stream = self.open(run_id)
+        if run_id not in self._subscriptions:
+            self._finished.pop(run_id, None)
+            stream.finished = False
+            self._subscribe(stream)
+        return stream
+
+    def _subscribe(self, stream: RunOutputStream) -> None:
+        # Called from the event bus thread: render and hand over to the loop.
+        def forward_event(event: dict):
+            stream.publish_threadsafe(format_event_for_terminal(event))
+
+        self._subscriptions[stream.run_id] = event_bus.subscribe(stream.run_id, forward_event)
+
+    def get(self, run_id: str) -> Optional[RunOutputStream]:
+        return self._streams.get(run_id)
+
+    def finish(self, run_id: str) -> None:
+        """
+        Marks a run's stream as finished. Safe to call from any thread. Its output
+        stays available for replay until it ages out of the finished-run window.
+        """
+        stream = self._streams.get(run_id)
+        if stream:
+            stream.finish_threadsafe()
+            stream._loop.call_soon_threadsafe(self._retire, run_id)
+
+    def _retire(self, run_id: str) -> None:
+        subscription = self._subscriptions.pop(run_id, None)
+        if subscription:
+            event_bus.unsubscribe(subscription)
+        self._finished[run_id] = None
+        while len(self._finished) > self.max_finished_streams:
+            old_run_id, _ = self._finished.popitem(last=False)
+            self._streams.pop(old_run_id, None)
+
+
+class RunEventNotifier:
+    """
+    Wakes requests waiting for new progress events of a run (the SSE endpoint).
+    Events themselves live in the run store; this only signals that new ones
+    were written by a worker thread of this process. Waiters should still
+    re-check the store after a timeout, as other processes may write too.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+
+    def register(self, run_id: str) -> asyncio.Event:
+        """
+        Registers a waiter. Register *before* reading the store, so that an
+        event written in between is not missed. Must be called from the event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        waiter = asyncio.Event()
+        self._waiters.setdefault(run_id, set()).add(waiter)
+        return waiter
+
+    def unregister(self, run_id: str, waiter: asyncio.Event) -> None:
+        waiters = self._waiters.get(run_id)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                self._waiters.pop(run_id, None)
+
+    async def wait(self, waiter: asyncio.Event, timeout: float) -> bool:
+        """Waits until notified or `timeout` passes. Returns True if notified."""
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def notify_threadsafe(self, run_id: str) -> None:
+        """Signals that a run has new events. Safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._notify, run_id)
+
+    def _notify(self, run_id: str) -> None:
+        for waiter in self._waiters.get(run_id, ()):
+            waiter.set()
+
+
+class WorkspaceChangeBroadcaster:
+    """
+    Fans the workspace watcher's change batches out to the connected change
+    stream clients. One event bus subscription feeds all clients; each client
+    has a bounded asyncio queue. A client that falls behind gets a "resync"
+    marker instead of the changes it missed, and should reload the tree.
+    """
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: Set[asyncio.Queue] = set()
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def connect(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._queues.add(queue)
+        return queue
+
+    def disconnect(self, queue: asyncio.Queue) -> None:
+        self._queues.discard(queue)
+
+    def publish_threadsafe(self, event: dict) -> None:
+        """Hands a change batch to the event loop. Safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event: dict) -> None:
+        for queue in self._queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+
+# A single registry for the API process.
+stream_registry = RunStreamRegistry()
+# A single notifier for the API process.
+progress_notifier = RunEventNotifier()
+# A single broadcaster for the API process.
+workspace_changes = WorkspaceChangeBroadcaster()
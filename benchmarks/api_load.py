@@ -0,0 +1,658 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+# This script load-tests one API process: how many simultaneous runs, status
+# pollers, file readers and terminal WebSockets it sustains before latency
+# collapses. For every concurrency level it starts `api.main:app` under
+# uvicorn in a subprocess (in a throwaway working directory), with the mock
+# LLM provider (backend/mock_llm.py) and a fake Docker client that "runs"
+# sandbox commands by streaming a few lines of output, and then
+#
+# - starts N runs at once with POST /project/start,
+# - polls every run's status (GET /project/{run_id}/status?since=<seq>)
+#   until it finishes,
+# - subscribes clients to every run's terminal (/ws/terminal/{run_id}),
+# - reads a workspace file in a loop (GET /workspace/file) while runs are going.
+#
+# It reports per endpoint the throughput and p50/p95/p99/max latency, the
+# runs' durations and throughput, the WebSockets' time to first output, and
+# from the server itself the event-loop lag (measured by a sampling task), its
+# memory (RSS), threads and open file descriptors. A level is within the SLO
+# if no endpoint's p99 exceeds --slo-ms, the loop lag p99 stays below
+# --lag-slo-ms, fewer than 1% of requests fail and no run fails or times
+# out; the highest such level is the sustained concurrency. Runs rejected with
+# 429 (executor queue full) are counted separately, not as errors.
+#
+# The results are appended as one JSON line per invocation to --results,
+# labelled with --label (default: `git describe`), and compared with the latest
+# earlier entry of the same configuration (or --compare-to), so regressions
+# show up release over release. The embedding model is not loaded offline,
+# so indexing is skipped, as in benchmarks/graph_overhead.py.
+#
+# Usage (from the repository root):
+#   python benchmarks/api_load.py --levels 1,4,8,16 --latency fixed:100
+#   python benchmarks/api_load.py --levels 8 --ws-clients 4 --pollers 2 --label v1.2.0 --fail-on-regression
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+
+_FINISHED_STATUSES = ("completed", "failed", "cancelled")
+_METRICS_PATH = "/_loadtest/metrics"
+# Figures compared against the baseline, and whether higher is worse.
+_COMPARED = {
+    "endpoints.start.p99_ms": True,
+    "endpoints.status.p99_ms": True,
+    "endpoints.workspace_file.p99_ms": True,
+    "websocket.first_message_p99_ms": True,
+    "server.loop_lag_ms.p99": True,
+    "server.rss_peak_bytes": True,
+    "runs.duration_p99_s": True,
+    "runs.per_minute": False,
+}
+
+
+def _percentile(sorted_values, fraction: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def _rss_bytes() -> int:
+    """The process's current resident set size (its peak where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a task that sleeps for `interval` seconds."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = deque(maxlen=200_000)
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def summary(self) -> dict:
+        lags = sorted(self.samples)
+        return {
+            "samples": len(lags),
+            "p50": round(_percentile(lags, 0.5) * 1000, 2) if lags else None,
+            "p99": round(_percentile(lags, 0.99) * 1000, 2) if lags else None,
+            "max": round(lags[-1] * 1000, 2) if lags else None,
+        }
+
+
+# --- Server side (--serve) ---
+
+class FakeContainer:
+    """A finished-looking sandbox container whose command prints `lines` lines over `seconds`."""
+
+    def __init__(self, seconds: float, lines: int):
+        self.id = uuid.uuid4().hex
+        self.short_id = self.id[:12]
+        self.attrs = {"State": {"OOMKilled": False, "ExitCode": 0}}
+        self._seconds = seconds
+        self._started = time.monotonic()
+        self._output = [f"[fake sandbox] output line {i + 1}\n".encode() for i in range(max(0, lines - 3))]
+        self._output += [b"Ran 1 test in 0.001s\n", b"\n", b"OK\n"]
+
+    def logs(self, stream: bool = False, follow: bool = False, stdout: bool = True, stderr: bool = True):
+        if stream:
+            return self._stream()
+        return b"".join(self._output) if stdout else b""
+
+    def _stream(self):
+        for line in self._output:
+            time.sleep(self._seconds / len(self._output))
+            yield line
+
+    def wait(self, timeout=None) -> dict:
+        remaining = self._started + self._seconds - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        return {"StatusCode": 0}
+
+    def get_archive(self, path: str):
+        import docker
+
+        # Without the usage probe's file, the sandbox reports empty usage.
+        raise docker.errors.NotFound(f"{path} does not exist in a fake container.")
+
+    def stats(self, stream: bool = False) -> dict:
+        return {}
+
+    def reload(self) -> None:
+        pass
+
+    def kill(self) -> None:
+        pass
+
+    def stop(self, timeout: int = 10) -> None:
+        pass
+
+    def remove(self, force: bool = False) -> None:
+        pass
+
+
+class FakeDockerClient:
+    """
+    Stands in for `docker.from_env()` in the API process: every image exists,
+    builds succeed instantly and containers are FakeContainers.
+    """
+
+    class _Images:
+        def get(self, tag: str):
+            return type("FakeImage", (), {"id": tag, "tags": [tag], "attrs": {}})()
+
+        def build(self, **kwargs):
+            return self.get(kwargs.get("tag", "fake")), []
+
+        def list(self, **kwargs):
+            return []
+
+        def remove(self, image: str, force: bool = False) -> None:
+            pass
+
+    class _Containers:
+        def __init__(self, seconds: float, lines: int):
+            self.seconds = seconds
+            self.lines = lines
+            self.started = 0
+            self._lock = threading.Lock()
+
+        def run(self, image: str, command=None, **kwargs) -> FakeContainer:
+            with self._lock:
+                self.started += 1
+            return FakeContainer(self.seconds, self.lines)
+
+    def __init__(self, seconds: float, lines: int):
+        self.images = self._Images()
+        self.containers = self._Containers(seconds, lines)
+
+    def ping(self) -> bool:
+        return True
+
+
+def _serve(args) -> None:
+    """Runs the API with the fake Docker client and the metrics endpoint, until terminated."""
+    import docker
+
+    fake_client = FakeDockerClient(args.sandbox_ms / 1000, args.sandbox_lines)
+    # Must be in place before the sandbox tools are imported: they create their client at import time.
+    docker.from_env = lambda *a, **kw: fake_client
+
+    import uvicorn
+    from api.main import app
+    from backend.run_executor import run_executor
+
+    monitor = LoopLagMonitor()
+    peaks = {"rss_bytes": 0, "threads": 0, "fds": 0, "busy_workers": 0, "queue_depth": 0}
+
+    def _metrics(reset: bool = False) -> dict:
+        if reset:
+            monitor.samples.clear()
+            peaks.update({key: 0 for key in peaks})
+        executor = run_executor.stats()
+        current = {"rss_bytes": _rss_bytes(), "threads": threading.active_count(), "fds": _open_fds() or 0,
+                   "busy_workers": executor["busy_workers"], "queue_depth": executor["queue_depth"]}
+        for key, value in current.items():
+            peaks[key] = max(peaks[key], value)
+        return {"loop_lag_ms": monitor.summary(), "current": current, "peak": dict(peaks),
+                "sandbox_containers": fake_client.containers.started}
+
+    # Declared `async` so it runs on the event loop, like the endpoints whose lag it reports.
+    async def loadtest_metrics(reset: bool = False):
+        return _metrics(reset)
+
+    app.add_api_route(_METRICS_PATH, loadtest_metrics, methods=["GET"], include_in_schema=False)
+    app.on_event("startup")(monitor.start)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- Client side ---
+
+class Recorder:
+    """Collects latencies, errors and status codes per request kind."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.status_codes = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+
+    def error(self, name: str, reason: str) -> None:
+        self.errors.setdefault(name, {}).setdefault(reason, 0)
+        self.errors[name][reason] += 1
+
+    async def timed(self, name: str, request):
+        """Awaits an httpx request; 5xx responses and exceptions count as errors. Returns the response or None."""
+        started = time.perf_counter()
+        try:
+            response = await request
+        except Exception as e:
+            self.add(name, time.perf_counter() - started)
+            self.error(name, type(e).__name__)
+            return None
+        self.add(name, time.perf_counter() - started)
+        codes = self.status_codes.setdefault(name, {})
+        codes[str(response.status_code)] = codes.get(str(response.status_code), 0) + 1
+        if response.status_code >= 500:
+            self.error(name, f"HTTP {response.status_code}")
+        return response
+
+    def endpoint_summary(self, name: str, elapsed: float) -> dict:
+        latencies = sorted(self.latencies.get(name, []))
+        return {
+            "requests": len(latencies),
+            "errors": sum(self.errors.get(name, {}).values()),
+            "status_codes": self.status_codes.get(name, {}),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+            "p50_ms": round(_percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        }
+
+
+async def _poll_status(client, recorder: Recorder, run_id: str, interval: float, deadline: float) -> str:
+    """Polls a run's status delta until it finishes; returns its final status (or 'timeout')."""
+    seq = 0
+    while time.perf_counter() < deadline:
+        response = await recorder.timed("status", client.get(f"/project/{run_id}/status", params={"since": seq}))
+        if response is not None and response.status_code == 200:
+            body = response.json()
+            seq = body.get("seq", seq)
+            if body.get("status") in _FINISHED_STATUSES:
+                return body["status"]
+        await asyncio.sleep(interval)
+    return "timeout"
+
+
+async def _subscribe(ws_url: str, recorder: Recorder, run_id: str, finished: asyncio.Event, timeout: float) -> dict:
+    """Follows a run's terminal until the server ends it, or the run timed out."""
+    import websockets
+
+    stats = {"messages": 0, "chars": 0}
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(f"{ws_url}/ws/terminal/{run_id}", open_timeout=timeout, max_size=None) as websocket:
+            recorder.add("ws_connect", time.perf_counter() - started)
+            while True:
+                try:
+                    frame = json.loads(await asyncio.wait_for(websocket.recv(), 0.5))
+                except websockets.ConnectionClosedOK:
+                    # The server closes the socket once the run is finished and its output drained.
+                    break
+                except asyncio.TimeoutError:
+                    # A run that timed out is abandoned.
+                    if finished.is_set():
+                        break
+                    continue
+                if frame["type"] != "output":
+                    continue
+                if not stats["messages"]:
+                    recorder.add("ws_first_message", time.perf_counter() - started)
+                stats["messages"] += 1
+                stats["chars"] += len(frame["text"])
+    except Exception as e:
+        recorder.error("ws_connect", type(e).__name__)
+    return stats
+
+
+async def _drive_run(client, ws_url: str, recorder: Recorder, args) -> dict:
+    """Starts one run, polls it and follows its terminal until it finishes."""
+    started = time.perf_counter()
+    response = await recorder.timed("start", client.post("/project/start", json={"initial_request": args.request}))
+    if response is None or response.status_code != 202:
+        return {"outcome": "rejected" if response is not None and response.status_code == 429 else "error"}
+    run_id = response.json()["run_id"]
+
+    finished = asyncio.Event()
+    subscribers = [asyncio.create_task(_subscribe(ws_url, recorder, run_id, finished, args.timeout))
+                   for _ in range(args.ws_clients)]
+    deadline = started + args.run_timeout
+    statuses = await asyncio.gather(*(_poll_status(client, recorder, run_id, args.poll_interval_ms / 1000, deadline)
+                                      for _ in range(args.pollers)))
+    duration = time.perf_counter() - started
+    finished.set()
+    streams = await asyncio.gather(*subscribers)
+    return {"outcome": statuses[0], "duration": duration, "streams": streams}
+
+
+async def _read_files(client, recorder: Recorder, path: str, interval: float, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        await recorder.timed("workspace_file", client.get("/workspace/file", params={"path": path}))
+        if interval:
+            await asyncio.sleep(interval)
+
+
+async def _sample_server(client, stop: asyncio.Event) -> None:
+    """Keeps the server's peaks up to date while the level runs."""
+    while not stop.is_set():
+        try:
+            await client.get(_METRICS_PATH)
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+
+
+async def _run_level(base_url: str, concurrency: int, args) -> dict:
+    import httpx
+
+    recorder = Recorder()
+    client_lag = LoopLagMonitor()
+    client_lag.start()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        baseline = (await client.get(_METRICS_PATH, params={"reset": "true"})).json()
+        stop = asyncio.Event()
+        background = [asyncio.create_task(_sample_server(client, stop))]
+        background += [asyncio.create_task(_read_files(client, recorder, args.file_name, args.read_interval_ms / 1000, stop))
+                       for _ in range(args.readers)]
+
+        started = time.perf_counter()
+        runs = await asyncio.gather(*(_drive_run(client, base_url.replace("http", "ws", 1), recorder, args)
+                                      for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*background)
+        server = (await client.get(_METRICS_PATH)).json()
+
+    outcomes = [run["outcome"] for run in runs]
+    durations = sorted(run["duration"] for run in runs if run["outcome"] in _FINISHED_STATUSES)
+    streams = [stream for run in runs for stream in run.get("streams", [])]
+    first_messages = sorted(recorder.latencies.get("ws_first_message", []))
+    endpoints = {name: recorder.endpoint_summary(name, elapsed) for name in ("start", "status", "workspace_file", "ws_connect")}
+    requests = sum(endpoint["requests"] for endpoint in endpoints.values())
+    errors = sum(endpoint["errors"] for endpoint in endpoints.values())
+
+    level = {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "runs": {
+            **{outcome: outcomes.count(outcome) for outcome in ("completed", "failed", "cancelled", "timeout", "rejected", "error")},
+            "duration_p50_s": round(_percentile(durations, 0.5), 3) if durations else None,
+            "duration_p99_s": round(_percentile(durations, 0.99), 3) if durations else None,
+            "per_minute": round(outcomes.count("completed") / elapsed * 60, 2) if elapsed else None,
+        },
+        "endpoints": endpoints,
+        "errors": recorder.errors,
+        "websocket": {
+            "clients": len(streams) + sum(recorder.errors.get("ws_connect", {}).values()),
+            "messages": sum(stream["messages"] for stream in streams),
+            "chars": sum(stream["chars"] for stream in streams),
+            "first_message_p50_ms": round(_percentile(first_messages, 0.5) * 1000, 2) if first_messages else None,
+            "first_message_p99_ms": round(_percentile(first_messages, 0.99) * 1000, 2) if first_messages else None,
+        },
+        "server": {
+            "loop_lag_ms": server["loop_lag_ms"],
+            "rss_start_bytes": baseline["current"]["rss_bytes"],
+            "rss_peak_bytes": server["peak"]["rss_bytes"],
+            "rss_end_bytes": server["current"]["rss_bytes"],
+            "threads_peak": server["peak"]["threads"],
+            "fds_peak": server["peak"]["fds"],
+            "busy_workers_peak": server["peak"]["busy_workers"],
+            "queue_depth_peak": server["peak"]["queue_depth"],
+            "sandbox_containers": server["sandbox_containers"] - baseline["sandbox_containers"],
+        },
+        # If the driver's own loop lags, the latencies above include client-side delay.
+        "client_loop_lag_ms": client_lag.summary(),
+    }
+    slowest = max((endpoint["p99_ms"] or 0 for name, endpoint in endpoints.items() if name != "ws_connect"), default=0)
+    level["within_slo"] = (slowest <= args.slo_ms and (server["loop_lag_ms"]["p99"] or 0) <= args.lag_slo_ms
+                           and errors <= 0.01 * max(1, requests) and not outcomes.count("timeout") and not outcomes.count("failed"))
+    return level
+
+
+# --- Server lifecycle ---
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(args, work_dir: str) -> tuple:
+    """Starts the API in `work_dir` and waits until it answers. Returns (process, base URL)."""
+    import httpx
+
+    os.makedirs(os.path.join(work_dir, "workspace"), exist_ok=True)
+    with open(os.path.join(work_dir, "workspace", args.file_name), "w", encoding="utf-8") as f:
+        line = "print('the quick brown fox jumps over the lazy dog')\n"
+        f.write(line * max(1, args.file_kb * 1024 // len(line)))
+
+    env = dict(os.environ, MOCK_LLM="1", MOCK_LLM_LATENCY=args.latency, MOCK_LLM_SEED=args.seed, PYTHONUNBUFFERED="1")
+    if args.script:
+        env["MOCK_LLM_SCRIPT"] = os.path.abspath(args.script)
+    for key in ("LITELLM_LOCAL_MODEL_COST_MAP", "HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE"):
+        env.setdefault(key, "True" if key == "LITELLM_LOCAL_MODEL_COST_MAP" else "1")
+    if args.run_workers:
+        env["RUN_WORKERS"] = str(args.run_workers)
+    if args.queue_size:
+        env["RUN_QUEUE_SIZE"] = str(args.queue_size)
+
+    port = _free_port()
+    log = open(os.path.join(work_dir, "server.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+         "--sandbox-ms", str(args.sandbox_ms), "--sandbox-lines", str(args.sandbox_lines)],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            if httpx.get(base_url + _METRICS_PATH, timeout=2).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    _stop_server(process)
+    with open(os.path.join(work_dir, "server.log"), encoding="utf-8", errors="replace") as f:
+        tail = "".join(f.readlines()[-20:])
+    raise RuntimeError(f"The API server did not start. Last lines of its log:\n{tail}")
+
+
+def _stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# --- Results history ---
+
+def _git_label() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--tags", "--always", "--dirty"], cwd=_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def _load_history(path: str) -> list:
+    if not os.path.isfile(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _figure(level: dict, dotted: str):
+    value = level
+    for key in dotted.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def _compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Prints the change of the compared figures per level; returns the regressions."""
+    regressions = []
+    levels = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nCompared with '{baseline['label']}' ({baseline['timestamp']}):")
+    for level in current["levels"]:
+        previous = levels.get(level["concurrency"])
+        if previous is None:
+            continue
+        for dotted, higher_is_worse in _COMPARED.items():
+            now, before = _figure(level, dotted), _figure(previous, dotted)
+            if not now or not before:
+                continue
+            change = (now - before) / before
+            regressed = change > threshold if higher_is_worse else change < -threshold
+            if regressed:
+                regressions.append(f"{level['concurrency']}:{dotted}")
+            print(f"  {level['concurrency']:>4}  {dotted:<34}{before:>14,.2f} -> {now:>14,.2f}  {change:>+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def _print_level(level: dict) -> None:
+    runs, server = level["runs"], level["server"]
+    print(f"\n=== {level['concurrency']} concurrent runs: {level['elapsed_seconds']:.1f}s, "
+          f"{'within' if level['within_slo'] else 'OUTSIDE'} the SLO ===")
+    print(f"Runs: {runs['completed']} completed, {runs['failed']} failed, {runs['timeout']} timed out, "
+          f"{runs['rejected']} rejected (429); duration p50 {runs['duration_p50_s']}s, p99 {runs['duration_p99_s']}s; "
+          f"{runs['per_minute']} runs/min.")
+    print(f"{'endpoint':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, endpoint in level["endpoints"].items():
+        cells = [endpoint[key] if endpoint[key] is not None else "-" for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{name:<18}{endpoint['requests']:>9}{endpoint['errors']:>8}" + "".join(f"{cell:>9}" for cell in cells))
+    websocket = level["websocket"]
+    print(f"WebSockets: {websocket['clients']} clients, {websocket['messages']} messages ({websocket['chars']:,} chars); "
+          f"first output p50 {websocket['first_message_p50_ms']} ms, p99 {websocket['first_message_p99_ms']} ms.")
+    lag = server["loop_lag_ms"]
+    print(f"Server: loop lag p50 {lag['p50']} ms, p99 {lag['p99']} ms, max {lag['max']} ms; "
+          f"RSS {server['rss_start_bytes'] / 1024 ** 2:.1f} -> peak {server['rss_peak_bytes'] / 1024 ** 2:.1f} MiB; "
+          f"{server['threads_peak']} threads, {server['fds_peak']} fds at peak; "
+          f"{server['busy_workers_peak']} busy workers, queue depth {server['queue_depth_peak']} at peak.")
+    if level["client_loop_lag_ms"]["p99"] and level["client_loop_lag_ms"]["p99"] > 50:
+        print(f"Warning: the load driver's own loop lag p99 was {level['client_loop_lag_ms']['p99']} ms; "
+              f"client-side delay is included in the latencies.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the API with the mock LLM provider and a fake Docker client.")
+    parser.add_argument("--levels", default="1,4,8,16", help="Comma-separated numbers of concurrent runs, one server per level.")
+    parser.add_argument("--pollers", type=int, default=1, help="Status pollers per run.")
+    parser.add_argument("--poll-interval-ms", type=float, default=250, help="Pause between a poller's requests.")
+    parser.add_argument("--ws-clients", type=int, default=2, help="Terminal WebSocket subscribers per run.")
+    parser.add_argument("--readers", type=int, default=4, help="Clients reading a workspace file in a loop while the runs go.")
+    parser.add_argument("--read-interval-ms", type=float, default=50, help="Pause between a reader's requests.")
+    parser.add_argument("--file-kb", type=int, default=64, help="Size of the workspace file the readers read.")
+    parser.add_argument("--file-name", default="loadtest_sample.py", help="Name of that file in the workspace.")
+    parser.add_argument("--latency", default="fixed:100", help="The mock LLM's latency distribution, e.g. 'lognormal:800,0.5'.")
+    parser.add_argument("--seed", default="0", help="Seed of the mock's latency samples.")
+    parser.add_argument("--script", help="A mock LLM script (JSON) extending the default one.")
+    parser.add_argument("--request", default="Build a small command-line greeter in Python.", help="The initial request of every run.")
+    parser.add_argument("--sandbox-ms", type=float, default=200, help="How long a fake sandbox command takes.")
+    parser.add_argument("--sandbox-lines", type=int, default=20, help="Lines of output a fake sandbox command streams.")
+    parser.add_argument("--run-workers", type=int, help="RUN_WORKERS of the server (its default otherwise).")
+    parser.add_argument("--queue-size", type=int, help="RUN_QUEUE_SIZE of the server (its default otherwise).")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout of a single request.")
+    parser.add_argument("--run-timeout", type=float, default=600, help="Give up on a run after this many seconds.")
+    parser.add_argument("--startup-timeout", type=float, default=180, help="How long to wait for the server to start.")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="p99 latency an endpoint may reach within the SLO.")
+    parser.add_argument("--lag-slo-ms", type=float, default=100, help="p99 event-loop lag the server may reach within the SLO.")
+    parser.add_argument("--results", default=os.path.join(_ROOT, "benchmarks", "results", "api_load.jsonl"),
+                        help="The results history (JSON lines) to append to and compare with.")
+    parser.add_argument("--label", help="The label of these results, e.g. a release; defaults to `git describe`.")
+    parser.add_argument("--compare-to", help="Compare with the latest entry with this label instead of the latest of the same configuration.")
+    parser.add_argument("--regression-threshold", type=float, default=0.2, help="Relative change of a compared figure that counts as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if a figure regressed.")
+    parser.add_argument("--no-save", action="store_true", help="Do not append the results to the history.")
+    parser.add_argument("--keep-dir", action="store_true", help="Keep the servers' working directories (with their logs).")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args)
+        return
+
+    config = {key: getattr(args, key) for key in ("pollers", "poll_interval_ms", "ws_clients", "readers", "read_interval_ms",
+                                                  "file_kb", "latency", "seed", "script", "request", "sandbox_ms",
+                                                  "sandbox_lines", "run_workers", "queue_size")}
+    results = {"label": args.label or _git_label(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+               "python": sys.version.split()[0], "cpus": os.cpu_count(), "config": config, "levels": []}
+
+    work_dir = tempfile.mkdtemp(prefix="api-load-")
+    try:
+        for concurrency in (int(level) for level in args.levels.split(",") if level.strip()):
+            level_dir = os.path.join(work_dir, f"level-{concurrency}")
+            process, base_url = _start_server(args, level_dir)
+            try:
+                level = asyncio.run(_run_level(base_url, concurrency, args))
+            finally:
+                _stop_server(process)
+            results["levels"].append(level)
+            _print_level(level)
+    finally:
+        if args.keep_dir:
+            print(f"\nWorking directories kept at {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    within = [level["concurrency"] for level in results["levels"] if level["within_slo"]]
+    results["sustained_concurrency"] = max(within) if within else 0
+    print(f"\nSustained concurrency (highest level within the SLO): {results['sustained_concurrency']} runs.")
+
+    history = _load_history(args.results)
+    if args.compare_to:
+        candidates = [entry for entry in history if entry["label"] == args.compare_to]
+    else:
+        candidates = [entry for entry in history if entry["config"] == config]
+    regressions = _compare(results, candidates[-1], args.regression_threshold) if candidates else []
+    if not candidates:
+        print("\nNo earlier results to compare with.")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(results) + "\n")
+        print(f"Results appended to {args.results} as '{results['label']}'.")
+    if regressions and args.fail_on_regression:
+        print(f"{len(regressions)} figures regressed by more than {args.regression_threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# This script measures the throughput of the sandbox error parser
+# (backend/utils/error_parser.py) on multi-megabyte logs: mostly ordinary build
+# and test output with error reports of every supported language mixed in.
+#
+# Usage (from the repository root):
+#   python benchmarks/error_parser_throughput.py --size-mb 16 --repeat 5
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.error_parser import ErrorLogParser, parse_error_log  # noqa: E402
+
+_NOISE = [
+    "   Compiling serde v1.0.{n} (/home/agentuser/.cargo/registry/src/serde-1.0.{n})",
+    "npm info run core-js@3.{n}.0 postinstall node_modules/core-js node -e \"try{{require('./postinstall')}}catch(e){{}}\"",
+    "tests/test_module_{n}.py ....................................... [ {n}%]",
+    "Collecting package-{n}==1.{n}.0 (from -r requirements.txt (line {n}))",
+    "  Downloading package_{n}-1.{n}.0-py3-none-any.whl (120 kB)",
+    "ok      example.com/app/pkg{n}     0.0{n}s",
+    "[{n}/400] Building C object CMakeFiles/app.dir/src/module_{n}.c.o",
+    " PASS  src/components/Widget{n}.test.tsx (1.{n} s)",
+    "2024-05-01T12:00:{n}Z INFO  request handled path=/api/items/{n} status=200 duration_ms={n}",
+]
+
+_ERROR_BLOCKS = [
+    # Python
+    'Traceback (most recent call last):\n'
+    '  File "/home/agentuser/workspace/app/main.py", line 10, in <module>\n    main()\n'
+    '  File "/home/agentuser/workspace/app/service.py", line 42, in main\n    load()\n'
+    '  File "/usr/lib/python3.11/json/__init__.py", line 346, in loads\n    return _default_decoder.decode(s)\n'
+    'json.decoder.JSONDecodeError: Expecting value: line 1 column 1 (char 0)\n',
+    # pytest
+    '___________________________________ test_add ___________________________________\n\n'
+    '    def test_add():\n>       assert add(1, 2) == 4\nE       assert 3 == 4\n\n'
+    'tests/test_calc.py:5: AssertionError\n',
+    # Node
+    'TypeError: Cannot read properties of undefined (reading \'id\')\n'
+    '    at getUser (/home/agentuser/workspace/src/users.js:14:22)\n'
+    '    at Object.<anonymous> (/home/agentuser/workspace/src/index.js:5:1)\n'
+    '    at Module._compile (node:internal/modules/cjs/loader:1256:14)\n',
+    # TypeScript
+    "src/app.ts(12,5): error TS2322: Type 'string' is not assignable to type 'number'.\n",
+    # Jest
+    '  ● sum › adds 1 + 2 to equal 3\n\n    expect(received).toBe(expected) // Object.is equality\n\n'
+    '    > 4 |   expect(sum(1, 2)).toBe(4);\n\n      at Object.toBe (src/sum.test.js:4:21)\n\n',
+    # Go
+    './main.go:12:5: undefined: foo\n',
+    'panic: runtime error: index out of range [5] with length 3\n\ngoroutine 1 [running]:\n'
+    'main.main()\n\t/home/agentuser/workspace/main.go:13 +0x1d\nexit status 2\n',
+    # Rust
+    'error[E0425]: cannot find value `x` in this scope\n --> src/main.rs:2:20\n  |\n'
+    '2 |     println!("{}", x);\n  |                    ^ not found in this scope\n\n',
+    # gcc
+    "main.c:5:10: error: 'x' undeclared (first use in this function)\n",
+]
+
+
+def build_log(size_bytes: int, error_every: int, seed: int = 7) -> str:
+    """Builds a log of about `size_bytes`, with an error block every `error_every` lines."""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    line_count = 0
+    while total < size_bytes:
+        if line_count and line_count % error_every == 0:
+            text = rng.choice(_ERROR_BLOCKS)
+        else:
+            text = rng.choice(_NOISE).format(n=rng.randint(1, 99)) + "\n"
+        parts.append(text)
+        total += len(text)
+        line_count += 1
+    return "".join(parts)
+
+
+def _parse_whole(log: str):
+    return parse_error_log(log)
+
+
+def _parse_chunks(log: str, chunk_size: int = 4096):
+    parser = ErrorLogParser()
+    for start in range(0, len(log), chunk_size):
+        parser.feed(log[start:start + chunk_size])
+    return parser.finish()
+
+
+def _parse_lines(log: str):
+    parser = ErrorLogParser()
+    for line in log.splitlines():
+        parser.feed_line(line)
+    return parser.finish()
+
+
+def _best_of(function, log: str, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(log)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the throughput of the sandbox error parser.")
+    parser.add_argument("--size-mb", type=float, default=8.0, help="Size of the generated log in MB.")
+    parser.add_argument("--error-every", type=int, default=200, help="Insert an error report every N lines.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the best time is reported.")
+    args = parser.parse_args()
+
+    log = build_log(int(args.size_mb * 1024 * 1024), args.error_every)
+    size_mb = len(log.encode("utf-8")) / (1024 * 1024)
+    line_count = log.count("\n")
+    print(f"Log: {size_mb:.1f} MB, {line_count} lines, an error report every {args.error_every} lines.\n")
+    print(f"{'mode':<28}{'seconds':>10}{'MB/s':>10}{'lines/s':>14}{'errors':>9}")
+
+    modes = [
+        ("whole log (parse_error_log)", _parse_whole),
+        ("streamed, 4 KiB chunks", _parse_chunks),
+        ("line by line (feed_line)", _parse_lines),
+    ]
+    for name, function in modes:
+        seconds, result = _best_of(function, log, args.repeat)
+        errors = len(result["errors"]) + result["dropped_errors"]
+        print(f"{name:<28}{seconds:>10.3f}{size_mb / seconds:>10.1f}{line_count / seconds:>14,.0f}{errors:>9}")
+
+
+if __name__ == "__main__":
+    main()
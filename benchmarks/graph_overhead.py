@@ -0,0 +1,190 @@
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# This script measures the orchestration overhead of the workflow, separately
+# from provider latency: it drives `backend.graph.app` end to end with the
+# mock LLM provider (backend/mock_llm.py), fully offline, and reports
+#
+# - the time to import and compile the graph,
+# - per node: the step latency (the node and the routing decision after it),
+#   how much of it was simulated LLM latency, and the rest, the overhead
+#   (state copying, checkpointing, agent executor construction, tools,
+#   indexing, sandbox commands, tracing),
+# - p50/p99 step latency over all steps,
+# - process memory (RSS) after each run, and its growth per run; with
+#   --tracemalloc also the allocation sites that grew the most.
+#
+# Every run works in a throwaway directory (workspace, run data, logs), is
+# marked as trusted so simple sandbox commands run locally, and uses the mock's
+# default script unless --script is given. Commands that need Docker fail fast
+# if it is not available, and indexing is skipped if the embedding model is
+# not already downloaded.
+#
+# Usage (from the repository root):
+#   python benchmarks/graph_overhead.py --runs 5 --latency fixed:0
+#   python benchmarks/graph_overhead.py --runs 3 --latency lognormal:400,0.5 --json results.json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def _rss_bytes() -> int:
+    """The process's current resident set size (its peak where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _initial_state(run_id: str, request: str) -> dict:
+    """A fresh run's state, with every field of AgentState present, as in step 17's reset."""
+    from backend.state import AgentState
+
+    state = {key: None for key in AgentState.__annotations__}
+    state.update({"initial_request": request, "history_log": [], "dispute_raised": False, "run_id": run_id})
+    return state
+
+
+def _simulated_seconds(mock_llm) -> float:
+    return sum(stats["latency_seconds"] for stats in mock_llm.stats().values())
+
+
+def _run_once(app, mock_llm, sandbox_usage, run_id: str, request: str):
+    """Runs the workflow once and returns (node, wall seconds, simulated LLM seconds) per step."""
+    sandbox_usage.set_run_trust(run_id, "trusted")
+    steps = []
+    last, last_simulated = time.perf_counter(), _simulated_seconds(mock_llm)
+    for update in app.stream(_initial_state(run_id, request), config={"configurable": {"thread_id": run_id}}, stream_mode="updates"):
+        now, simulated = time.perf_counter(), _simulated_seconds(mock_llm)
+        steps.append((next(iter(update)), now - last, simulated - last_simulated))
+        last, last_simulated = now, simulated
+    return steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the workflow's orchestration overhead with the mock LLM provider.")
+    parser.add_argument("--runs", type=int, default=5, help="Measured runs of the whole workflow.")
+    parser.add_argument("--warmup", type=int, default=1, help="Runs before measuring (imports, caches, worker pools).")
+    parser.add_argument("--latency", default="fixed:0", help="The mock's latency distribution, e.g. 'fixed:200' or 'lognormal:800,0.5'.")
+    parser.add_argument("--seed", default="0", help="Seed of the mock's latency samples.")
+    parser.add_argument("--script", help="A mock LLM script (JSON) extending the default one.")
+    parser.add_argument("--request", default="Build a small command-line greeter in Python.", help="The initial request of every run.")
+    parser.add_argument("--compile-repeat", type=int, default=20, help="How often the graph is compiled to time it.")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report the allocation sites that grew the most (slower).")
+    parser.add_argument("--json", help="Write the results to this file as well.")
+    parser.add_argument("--keep-dir", action="store_true", help="Keep the working directory of the runs.")
+    args = parser.parse_args()
+
+    # The mock and the offline settings must be in place before the backend is imported.
+    os.environ.update({"MOCK_LLM": "1", "MOCK_LLM_LATENCY": args.latency, "MOCK_LLM_SEED": args.seed})
+    if args.script:
+        os.environ["MOCK_LLM_SCRIPT"] = os.path.abspath(args.script)
+    for key in ("LITELLM_LOCAL_MODEL_COST_MAP", "HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE"):
+        os.environ.setdefault(key, "True" if key == "LITELLM_LOCAL_MODEL_COST_MAP" else "1")
+    json_path = os.path.abspath(args.json) if args.json else None
+    work_dir = tempfile.mkdtemp(prefix="graph-overhead-")
+    os.chdir(work_dir)
+
+    try:
+        started = time.perf_counter()
+        from backend.graph import app, workflow  # noqa: E402
+        import_seconds = time.perf_counter() - started
+        from backend.checkpointing import checkpointer  # noqa: E402
+        from backend.mock_llm import mock_llm  # noqa: E402
+        from tools.local_executor import local_executor  # noqa: E402
+        from tools.sandbox_resources import sandbox_usage  # noqa: E402
+
+        compile_timings = []
+        for _ in range(args.compile_repeat):
+            started = time.perf_counter()
+            workflow.compile(checkpointer=checkpointer)
+            compile_timings.append(time.perf_counter() - started)
+
+        for i in range(args.warmup):
+            _run_once(app, mock_llm, sandbox_usage, f"warmup-{i}", args.request)
+        gc.collect()
+        rss = [_rss_bytes()]
+        if args.tracemalloc:
+            tracemalloc.start(10)
+            snapshot = tracemalloc.take_snapshot()
+
+        steps, run_seconds = [], []
+        for i in range(args.runs):
+            started = time.perf_counter()
+            steps += _run_once(app, mock_llm, sandbox_usage, f"run-{i}", args.request)
+            run_seconds.append(time.perf_counter() - started)
+            gc.collect()
+            rss.append(_rss_bytes())
+        growth = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:10] if args.tracemalloc else []
+        local_executor.shutdown()
+    finally:
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        if args.keep_dir:
+            print(f"Working directory kept at {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    nodes = {}
+    for node, wall, simulated in steps:
+        nodes.setdefault(node, []).append((wall, simulated))
+    results = {
+        "latency": args.latency,
+        "runs": args.runs,
+        "import_seconds": round(import_seconds, 3),
+        "compile_ms": round(statistics.mean(compile_timings) * 1000, 2) if compile_timings else None,
+        "run_seconds_mean": round(statistics.mean(run_seconds), 3),
+        "nodes": {},
+        "rss_bytes": rss,
+        "rss_growth_per_run_bytes": (rss[-1] - rss[0]) // max(1, args.runs),
+    }
+
+    print(f"\nImport (incl. graph compile): {import_seconds:.2f}s; compile alone: {results['compile_ms']} ms (mean of {args.compile_repeat}).")
+    print(f"{args.runs} runs, {len(steps) // max(1, args.runs)} steps each, mock latency '{args.latency}': {results['run_seconds_mean']:.2f}s per run.\n")
+    print(f"{'node':<34}{'steps':>6}{'p50 ms':>9}{'p99 ms':>9}{'llm ms':>9}{'overhead ms':>13}{'overhead':>10}")
+    for node, samples in sorted(nodes.items(), key=lambda item: -statistics.mean(wall for wall, _ in item[1])):
+        walls = sorted(wall for wall, _ in samples)
+        simulated = statistics.mean(sim for _, sim in samples)
+        overhead = statistics.mean(wall - sim for wall, sim in samples)
+        share = overhead / statistics.mean(walls) if statistics.mean(walls) else 0.0
+        results["nodes"][node] = {"steps": len(samples), "p50_ms": round(_percentile(walls, 0.5) * 1000, 2),
+                                  "p99_ms": round(_percentile(walls, 0.99) * 1000, 2), "llm_ms": round(simulated * 1000, 2),
+                                  "overhead_ms": round(overhead * 1000, 2)}
+        print(f"{node:<34}{len(samples):>6}{_percentile(walls, 0.5) * 1000:>9.1f}{_percentile(walls, 0.99) * 1000:>9.1f}"
+              f"{simulated * 1000:>9.1f}{overhead * 1000:>13.1f}{share:>9.0%}")
+
+    walls = sorted(wall for _, wall, _ in steps)
+    overheads = sorted(wall - simulated for _, wall, simulated in steps)
+    results.update({
+        "step_p50_ms": round(_percentile(walls, 0.5) * 1000, 2), "step_p99_ms": round(_percentile(walls, 0.99) * 1000, 2),
+        "overhead_p50_ms": round(_percentile(overheads, 0.5) * 1000, 2), "overhead_p99_ms": round(_percentile(overheads, 0.99) * 1000, 2),
+    })
+    print(f"\nAll steps: p50 {results['step_p50_ms']} ms, p99 {results['step_p99_ms']} ms; "
+          f"overhead p50 {results['overhead_p50_ms']} ms, p99 {results['overhead_p99_ms']} ms.")
+    print(f"RSS: {rss[0] / 1024 ** 2:.1f} MiB after warm-up, {rss[-1] / 1024 ** 2:.1f} MiB after {args.runs} runs "
+          f"({results['rss_growth_per_run_bytes'] / 1024:.1f} KiB per run).")
+    if growth:
+        print("\nLargest allocation growth:")
+        for stat in growth:
+            print(f"  {stat.size_diff / 1024:>10.1f} KiB  {stat.traceback[0]}")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
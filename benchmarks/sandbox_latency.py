@@ -0,0 +1,120 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# This script compares the latency of the two sandbox backends of
+# `execute_in_sandbox` on short commands: a Docker container per command (as
+# in tools/agent_tools.py, with the same resource limits) and the local
+# subprocess backend (tools/local_executor.py). The commands run in a
+# throwaway workspace with one small module and its unit test. The Docker
+# backend is skipped if Docker is not available.
+#
+# Usage (from the repository root):
+#   python benchmarks/sandbox_latency.py --repeat 20
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.local_executor import LocalExecutor  # noqa: E402
+from tools.sandbox_resources import container_limits, default_limits  # noqa: E402
+
+_COMMANDS = [
+    "ls",
+    "cat calc.py",
+    'python -c "print(sum(range(1000)))"',
+    "python -m unittest test_calc.CalcTest.test_add",
+]
+
+_FILES = {
+    "calc.py": "def add(a, b):\n    return a + b\n",
+    "test_calc.py": (
+        "import unittest\n\nfrom calc import add\n\n\n"
+        "class CalcTest(unittest.TestCase):\n    def test_add(self):\n        self.assertEqual(add(1, 2), 3)\n"
+    ),
+}
+
+
+def _docker_runner(workspace_dir: str, limits: dict):
+    """Returns a function that runs a command in a fresh sandbox container, or None without Docker."""
+    from tools.sandbox_images import _DOCKER_IMAGE_NAME, docker_client, sandbox_images
+
+    if docker_client is None:
+        return None
+    sandbox_images.ensure_base()
+
+    def run(command: str) -> int:
+        container = docker_client.containers.run(
+            image=_DOCKER_IMAGE_NAME,
+            command=["/bin/sh", "-c", command],
+            volumes={workspace_dir: {"bind": "/home/agentuser/workspace", "mode": "rw"}},
+            working_dir="/home/agentuser/workspace",
+            detach=True,
+            **container_limits(limits),
+        )
+        try:
+            exit_code = container.wait()["StatusCode"]
+            container.logs(stdout=True, stderr=False)
+            container.logs(stdout=False, stderr=True)
+            return exit_code
+        finally:
+            container.remove(force=True)
+
+    return run
+
+
+def _measure(run, command: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        exit_code = run(command)
+        timings.append(time.perf_counter() - started)
+        if exit_code != 0:
+            raise RuntimeError(f"'{command}' exited with {exit_code}.")
+    timings.sort()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the latency of the Docker and local sandbox backends.")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per command and backend.")
+    parser.add_argument("--workers", type=int, default=2, help="Pre-warmed workers of the local backend.")
+    parser.add_argument("--skip-docker", action="store_true", help="Only measure the local backend.")
+    args = parser.parse_args()
+
+    workspace_dir = tempfile.mkdtemp(prefix="sandbox-latency-")
+    for name, content in _FILES.items():
+        with open(os.path.join(workspace_dir, name), "w", encoding="utf-8") as f:
+            f.write(content)
+    limits = default_limits()
+    executor = LocalExecutor(workers=args.workers)
+    try:
+        started = time.perf_counter()
+        executor.warm()
+        print(f"Local backend: {args.workers} workers warmed up in {time.perf_counter() - started:.2f}s (isolation: {executor.isolation}).")
+        backends = [("local", lambda command: executor.run(command, workspace_dir, limits)["exit_code"])]
+        docker_run = None if args.skip_docker else _docker_runner(workspace_dir, limits)
+        if docker_run:
+            backends.append(("docker", docker_run))
+        elif not args.skip_docker:
+            print("Docker is not available; only the local backend is measured.")
+
+        print(f"\n{'command':<50}{'backend':<9}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+        for command in _COMMANDS:
+            results = {}
+            for name, run in backends:
+                timings = _measure(run, command, args.repeat)
+                results[name] = statistics.median(timings)
+                p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+                print(f"{command:<50}{name:<9}{results[name] * 1000:>9.1f}{p95 * 1000:>9.1f}{statistics.mean(timings) * 1000:>9.1f}")
+            if len(results) == 2:
+                print(f"{'':<50}{'speedup':<9}{results['docker'] / results['local']:>8.1f}x")
+    finally:
+        executor.shutdown()
+        shutil.rmtree(workspace_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# Makes the repository root importable from the tests (tests/), as in the
+# application's image: `import tools...`, `import backend...`.
+
+# The application's module-level stores must not write to data/ while tests import them.
+os.environ.setdefault("RUN_STORE_BACKEND", "memory")
+os.environ.setdefault("SEARCH_CACHE_BACKEND", "memory")
+_DATA_DIR = tempfile.mkdtemp(prefix="tests-data-")
+os.environ.setdefault("DIAGRAM_CACHE_PATH", os.path.join(_DATA_DIR, "diagram_cache.sqlite3"))
+os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(_DATA_DIR, "checkpoints.sqlite3"))
+os.environ.setdefault("LLM_USAGE_PATH", os.path.join(_DATA_DIR, "llm_usage.sqlite3"))
+os.environ.setdefault("TRACE_DIR", os.path.join(_DATA_DIR, "traces"))
+os.environ.setdefault("QA_RESULTS_PATH", os.path.join(_DATA_DIR, "qa"))
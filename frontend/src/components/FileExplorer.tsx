@@ -20,15 +20,45 @@ const getLanguageFromExtension = (filename: string): string => {
   }
 };
 
+interface TreeEntry {
+  path: string;
+  name: string;
+  is_dir: boolean;
+  size: number | null;
+  mtime: number | null;
+  depth: number;
+}
+
+const TREE_DEPTH = 16; // How deep the explorer lists the workspace in one request
+
 const FileExplorer: React.FC<FileExplorerProps> = ({ onFileSelect, refreshKey }) => {
-  const [files, setFiles] = useState<string[]>([]);
+  const [files, setFiles] = useState<TreeEntry[]>([]);
   const [error, setError] = useState<string | null>(null);
+  const [changeTick, setChangeTick] = useState(0); // Bumped whenever the workspace changes on disk
+
+  // Reload the tree when the server reports changes (from agents, the editor or the terminal).
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE_URL}/workspace/changes`);
+    const reload = () => setChangeTick((tick) => tick + 1);
+    source.addEventListener('workspace_changes', reload);
+    source.addEventListener('resync', reload);
+    return () => source.close();
+  }, []);
 
   useEffect(() => {
     const fetchFiles = async () => {
       try {
-        const response = await axios.get(`${API_BASE_URL}/workspace/files`);
-        setFiles(response.data.files || []);
+        // The whole tree comes back in depth-first order, a page at a time.
+        const entries: TreeEntry[] = [];
+        let cursor: string | null = null;
+        do {
+          const response: any = await axios.get(`${API_BASE_URL}/workspace/tree`, {
+            params: { depth: TREE_DEPTH, ...(cursor ? { cursor } : {}) },
+          });
+          entries.push(...response.data.entries);
+          cursor = response.data.next_cursor;
+        } while (cursor);
+        setFiles(entries);
         setError(null); // Clear previous errors on successful fetch
       } catch (err) {
         console.error("Error fetching file list:", err);
@@ -36,16 +66,29 @@ const FileExplorer: React.FC<FileExplorerProps> = ({ onFileSelect, refreshKey })
       }
     };
     fetchFiles();
-  }, [refreshKey]); // This effect now re-runs whenever refreshKey changes
+  }, [refreshKey, changeTick]); // Re-runs whenever refreshKey changes or the workspace changes
 
 
   const handleFileClick = async (filePath: string) => {
     try {
-        const response = await axios.get(`${API_BASE_URL}/workspace/file`, {
-            params: { path: filePath }
-        });
+        // Large files arrive in windows; keep reading from next_offset until eof.
+        let content = '';
+        let offset = 0;
+        let eof = false;
+        while (!eof) {
+            const response = await axios.get(`${API_BASE_URL}/workspace/file`, {
+                params: { path: filePath, offset }
+            });
+            if (response.data.encoding !== 'utf-8') {
+                content = '(Binary file)';
+                break;
+            }
+            content += response.data.content;
+            offset = response.data.next_offset;
+            eof = response.data.eof;
+        }
         const language = getLanguageFromExtension(filePath);
-        onFileSelect(response.data.content, language);
+        onFileSelect(content, language);
     } catch (err) {
         console.error(`Error fetching file content for ${filePath}:`, err);
         setError(`Could not fetch content for ${filePath}.`);
@@ -58,9 +101,13 @@ const FileExplorer: React.FC<FileExplorerProps> = ({ onFileSelect, refreshKey })
       {error && <div className="error">{error}</div>}
       <ul>
         {files.length > 0 ? (
-          files.map((file, index) => (
-            <li key={index} onClick={() => handleFileClick(file)}>
-              📄 {file}
+          files.map((entry) => (
+            <li
+              key={entry.path}
+              style={{ paddingLeft: `${(entry.depth - 1) * 12}px` }}
+              onClick={entry.is_dir ? undefined : () => handleFileClick(entry.path)}
+            >
+              {entry.is_dir ? '📁' : '📄'} {entry.name}
             </li>
           ))
         ) : (
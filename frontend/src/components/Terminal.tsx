@@ -10,6 +10,18 @@ interface TerminalProps {
 }
 
 // --- WebSocket Connection Hook ---
+const RECONNECT_DELAY_MS = 2000;
+// Closes after which the stream is still worth following: the server went away
+// or restarted, or the connection dropped without a close frame.
+const RECONNECT_CODES = new Set([1001, 1006, 1012]);
+// The server closes with 1013 when we fell behind, with the offset to resume from.
+const FELL_BEHIND_CODE = 1013;
+
+// The messages of /ws/terminal/{run_id} (see api/streaming.py).
+type TerminalFrame =
+  | { type: 'output'; offset: number; next_offset: number; text: string }
+  | { type: 'notice'; text: string };
+
 const useTerminalSocket = (runId: string | null, termRef: React.RefObject<XTerm | null>) => {
     useEffect(() => {
         const terminal = termRef.current?.terminal;
@@ -17,15 +29,54 @@ const useTerminalSocket = (runId: string | null, termRef: React.RefObject<XTerm
 
         terminal.clear();
         terminal.writeln('~ Establishing connection to agent activity stream...');
-        
-        const ws = new WebSocket(`ws://127.0.0.1:8000/ws/terminal/${run_id}`);
 
-        ws.onopen = () => terminal.writeln('~ ✅ Connection established. Awaiting agent activity...');
-        ws.onmessage = (event) => terminal.write(event.data);
-        ws.onclose = () => terminal.writeln('\r\n~ ❌ Connection to agent activity stream closed.');
-        ws.onerror = () => terminal.writeln('\r\n~ ❌ WebSocket connection error.');
-        
-        return () => ws.close();
+        // The server addresses the run's output by code point offset and tells us
+        // the offset after every output frame, so a reconnect resumes exactly
+        // where we left off. Notice frames are not part of the output.
+        let received = 0;
+        let ws: WebSocket | null = null;
+        let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+        let closedByUs = false;
+
+        const connect = () => {
+            const offsetParam = received > 0 ? `?offset=${received}` : '';
+            ws = new WebSocket(`ws://127.0.0.1:8000/ws/terminal/${runId}${offsetParam}`);
+
+            ws.onopen = () => {
+                if (received === 0) terminal.writeln('~ ✅ Connection established. Awaiting agent activity...');
+            };
+            ws.onmessage = (event) => {
+                const frame: TerminalFrame = JSON.parse(event.data);
+                if (frame.type === 'output') received = frame.next_offset;
+                terminal.write(frame.text);
+            };
+            ws.onclose = (event) => {
+                if (closedByUs) return;
+                const resumeFrom = event.code === FELL_BEHIND_CODE ? event.reason.match(/offset (\d+)/) : null;
+                if (resumeFrom) {
+                    terminal.writeln(`\r\n~ [Stream] ${Number(resumeFrom[1]) - received} characters skipped because the connection was too slow.`);
+                    received = Number(resumeFrom[1]);
+                    connect();
+                } else if (RECONNECT_CODES.has(event.code)) {
+                    terminal.writeln('\r\n~ ❌ Connection to agent activity stream lost. Reconnecting...');
+                    reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+                } else if (event.code === 4404) {
+                    terminal.writeln('\r\n~ ❌ Project run not found.');
+                } else if (event.code !== 1000) {
+                    // 1000: the run finished and we have all of its output.
+                    terminal.writeln(`\r\n~ ❌ Connection to agent activity stream closed (${event.code}).`);
+                }
+            };
+            ws.onerror = () => terminal.writeln('\r\n~ ❌ WebSocket connection error.');
+        };
+
+        connect();
+
+        return () => {
+            closedByUs = true;
+            if (reconnectTimer) clearTimeout(reconnectTimer);
+            ws?.close();
+        };
     }, [runId, termRef]);
 };
 
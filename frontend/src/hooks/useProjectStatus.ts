@@ -2,7 +2,19 @@ import { useState, useEffect } from 'react';
 import axios from 'axios';
 
 const API_BASE_URL = 'http://127.0.0.1:8000';
-const POLLING_INTERVAL = 3000; // Poll every 3 seconds
+const LONG_POLL_WAIT_SECONDS = 25; // The server holds each request until the run changes or this passes
+const RETRY_DELAY = 3000; // Wait before retrying after a failed request
+const FINISHED_STATUSES = ['completed', 'failed', 'cancelled'];
+
+// Applies a `?since=` response to the locally held state: `changed` fields are
+// replaced, `appended` entries are added to the end of list fields.
+const applyChanges = (previous: any, changes: any) => {
+    const next = changes.full ? { ...changes.changed } : { ...(previous || {}), ...changes.changed };
+    for (const [key, entries] of Object.entries(changes.appended || {})) {
+        next[key] = [...(next[key] || []), ...(entries as any[])];
+    }
+    return next;
+};
 
 export const useProjectStatus = (runId: string | null) => {
     const [agentState, setAgentState] = useState<any>(null);
@@ -10,43 +22,54 @@ export const useProjectStatus = (runId: string | null) => {
     const [isPolling, setIsPolling] = useState<boolean>(false);
 
     useEffect(() => {
-        let intervalId: NodeJS.Timeout | null = null;
+        let cancelled = false;
+        const controller = new AbortController();
 
         if (runId) {
             setIsPolling(true);
-            
-            const fetchStatus = async () => {
-                try {
-                    const response = await axios.get(`${API_BASE_URL}/project/${runId}/status`);
-                    const lastNodeState = response.data[Object.keys(response.data)[0]]; // Get the inner state object
-                    setAgentState(lastNodeState);
-
-                    // Stop polling if the agent reaches a terminal state
-                    if (lastNodeState.last_completed_step === 'step_17_reengage_workflow' || lastNodeState.last_completed_step === 'END') {
-                        setIsPolling(false);
+
+            const poll = async () => {
+                let seq = 0; // 0 asks for the full state first
+                let state: any = null;
+                while (!cancelled) {
+                    try {
+                        const response = await axios.get(`${API_BASE_URL}/project/${runId}/status`, {
+                            params: { since: seq, wait: LONG_POLL_WAIT_SECONDS },
+                            signal: controller.signal,
+                        });
+                        const changes = response.data;
+                        if (changes.full || changes.seq !== seq) {
+                            state = applyChanges(state, changes);
+                            seq = changes.seq;
+                            setAgentState(state);
+                        }
+
+                        // Stop polling if the agent reaches a terminal state
+                        if (FINISHED_STATUSES.includes(changes.status) || state?.last_completed_step === 'step_17_reengage_workflow') {
+                            setIsPolling(false);
+                            return;
+                        }
+                    } catch (err) {
+                        if (cancelled) return;
+                        console.error("Error fetching project status:", err);
+                        setError("Could not retrieve project status.");
+                        await new Promise((resolve) => setTimeout(resolve, RETRY_DELAY));
                     }
-                } catch (err) {
-                    console.error("Error fetching project status:", err);
-                    setError("Could not retrieve project status.");
-                    setIsPolling(false);
                 }
             };
-            
-            // Fetch immediately on new runId, then start polling
-            fetchStatus();
-            intervalId = setInterval(fetchStatus, POLLING_INTERVAL);
+
+            poll();
         } else {
             setIsPolling(false);
         }
 
-        // Cleanup function: clear interval when the component unmounts or runId changes
+        // Cleanup function: abort the pending request when the component unmounts or runId changes
         return () => {
-            if (intervalId) {
-                clearInterval(intervalId);
-            }
+            cancelled = true;
+            controller.abort();
         };
 
     }, [runId]);
 
     return { agentState, error, isPolling };
-};
\ No newline at end of file
+};
@@ -3,6 +3,7 @@ from backend.state import AgentState
 from backend.config import load_api_keys
 from backend.llm_router import activate_llm_portfolio
 import pprint
+import uuid
 
 # This is the main entry point for running our Agentic AI Developer.
 # It initializes all necessary configurations and then invokes the graph
@@ -52,7 +53,8 @@ def run_phase_1_test():
     print("--- [Main] Invoking the workflow graph... ---\n")
     
     # The config dictionary tells the graph to start with our initial state.
-    config = {"recursion_limit": 50} 
+    # The graph is checkpointed, so every run needs its own thread_id.
+    config = {"recursion_limit": 50, "configurable": {"thread_id": f"cli-{uuid.uuid4()}"}}
     
     final_state = None
     for event in app.stream(initial_state, config=config):
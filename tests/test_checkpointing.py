@@ -0,0 +1,77 @@
+from typing import List, TypedDict
+
+import pytest
+from langgraph.graph import END, StateGraph
+
+from backend.checkpointing import SQLiteCheckpointSaver
+
+
+class _State(TypedDict):
+    steps: List[str]
+    plan: str
+
+
+def _step(name):
+    return lambda state: {"steps": state["steps"] + [f"{name}:{state['plan']}"]}
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"))
+
+
+@pytest.fixture
+def graph(saver):
+    builder = StateGraph(_State)
+    for name in ("a", "b", "c"):
+        builder.add_node(name, _step(name))
+    builder.set_entry_point("a")
+    builder.add_edge("a", "b")
+    builder.add_edge("b", "c")
+    builder.add_edge("c", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _checkpoint_before(graph, thread_id, node):
+    return next(snapshot for snapshot in graph.get_state_history(_config(thread_id)) if snapshot.next == (node,))
+
+
+def test_run_is_checkpointed_after_every_node(graph):
+    assert graph.invoke({"steps": [], "plan": "x"}, _config("run"))["steps"] == ["a:x", "b:x", "c:x"]
+    history = list(graph.get_state_history(_config("run")))
+    assert [snapshot.next for snapshot in history] == [(), ("c",), ("b",), ("a",), ("__start__",)]
+    assert graph.get_state(_config("run")).values == {"steps": ["a:x", "b:x", "c:x"], "plan": "x"}
+
+
+def test_resume_from_an_earlier_checkpoint(graph):
+    graph.invoke({"steps": [], "plan": "x"}, _config("run"))
+    before_c = _checkpoint_before(graph, "run", "c")
+    assert graph.invoke(None, before_c.config)["steps"] == ["a:x", "b:x", "c:x"]
+
+
+def test_fork_continues_without_recomputing_earlier_steps(graph, saver):
+    graph.invoke({"steps": [], "plan": "x"}, _config("run"))
+    before_b = _checkpoint_before(graph, "run", "b")
+    checkpoint_id = before_b.config["configurable"]["checkpoint_id"]
+
+    config = saver.fork_thread("run", checkpoint_id, "fork", values={"plan": "y"})
+    assert config["configurable"] == {"thread_id": "fork", "checkpoint_ns": "", "checkpoint_id": checkpoint_id}
+    forked = graph.get_state(config)
+    assert forked.next == ("b",)
+    assert forked.values == {"steps": ["a:x"], "plan": "y"}
+
+    assert graph.invoke(None, config)["steps"] == ["a:x", "b:y", "c:y"]
+    # The original run is untouched by the fork.
+    assert graph.get_state(_config("run")).values == {"steps": ["a:x", "b:x", "c:x"], "plan": "x"}
+
+
+def test_fork_of_an_unknown_checkpoint_and_delete(graph, saver):
+    graph.invoke({"steps": [], "plan": "x"}, _config("run"))
+    with pytest.raises(KeyError):
+        saver.fork_thread("run", "missing", "fork")
+    saver.delete_thread("run")
+    assert saver.get_tuple(_config("run")) is None
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+import tools.diagram_service as diagrams
+from tools.diagram_service import DiagramGenerationError, DiagramService, extract_mermaid, render_markdown, validate_mermaid
+
+
+@pytest.mark.parametrize("code", [
+    "flowchart TD\n  A[Start] --> B{Is it?}\n  B -->|Yes (mostly)| C((Done))\n  B -- No --> D>Retry]",
+    "graph LR\n  subgraph one\n    a1 --> a2\n  end\n  a2 -.-> b1 ==> c1",
+    "sequenceDiagram\n  Alice->>Bob: Hello (again)\n  loop Every minute\n    Bob-)Alice: Not so good :(\n  end",
+    "classDiagram\n  class Animal {\n    +String name\n    +eat()\n  }\n  Animal <|-- Duck",
+    "erDiagram\n  CUSTOMER ||--o{ ORDER : places\n  ORDER ||--|{ LINE-ITEM : contains",
+    "%% a comment\npie title Pets\n  \"Dogs\" : 386\n  \"Cats\" : 85",
+])
+def test_valid_diagrams(code):
+    assert validate_mermaid(code) == []
+
+
+@pytest.mark.parametrize("code, problem", [
+    ("", "empty"),
+    ("flowchart", "no content"),
+    ("diagram TD\n  A --> B", "'diagram' is not a Mermaid diagram type"),
+    ("flowchart XY\n  A --> B", "'XY' is not a flowchart direction"),
+    ("flowchart TD\n  A[Start --> B", "Line 2: missing ']'"),
+    ("flowchart TD\n  A(Start] --> B", "Line 2: unbalanced ']'"),
+    ("flowchart TD\n  A[\"Start] --> B", "Line 2: unclosed quote"),
+    ("flowchart TD\n  subgraph one\n    A --> B", "Line 2: 'subgraph' is never closed"),
+    ("sequenceDiagram\n  Alice->>Bob: Hi\n  end", "Line 3: 'end' without an open block"),
+    ("classDiagram\n  class A {\n    +x", "Line 2: '{' is never closed"),
+    ("classDiagram\n  }", "'}' without an open '{' block"),
+])
+def test_invalid_diagrams(code, problem):
+    errors = validate_mermaid(code)
+    assert errors and problem in errors[0]
+
+
+def test_extract_and_render():
+    assert extract_mermaid("Here:\n```mermaid\ngraph TD\n  A --> B\n```\nDone.") == "graph TD\n  A --> B"
+    assert extract_mermaid("  graph TD\n  A --> B  ") == "graph TD\n  A --> B"
+    assert render_markdown("graph TD") == "```mermaid\ngraph TD\n```\n"
+
+
+def _response(content, tokens=100):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                           usage=SimpleNamespace(total_tokens=tokens))
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    answers = []
+    monkeypatch.setattr(diagrams.litellm, "completion", lambda **kwargs: answers.pop(0))
+    service = DiagramService(str(tmp_path / "diagrams.sqlite3"), model="test-model", max_attempts=2)
+    service.answers = answers
+    return service
+
+
+def test_valid_output_is_cached(service):
+    service.answers.append(_response("```mermaid\nflowchart TD\n  A --> B\n```"))
+    first = service.generate("Two  boxes")
+    second = service.generate("Two boxes")
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["code"] == first["code"] == "flowchart TD\n  A --> B"
+    assert service.get_stats()["tokens_saved"] == 100
+
+
+def test_invalid_output_is_retried_and_never_cached(service):
+    service.answers += [_response("flowchart TD\n  A[Start --> B"), _response("flowchart TD\n  A[Start] --> B")]
+    result = service.generate("start box")
+    assert (result["code"], result["tokens"], result["warnings"]) == ("flowchart TD\n  A[Start] --> B", 200, [])
+    assert service.get_stats()["retries"] == 1
+
+    service.answers += [_response("flowchart TD\n  A[x"), _response("flowchart TD\n  A[y")]
+    result = service.generate("broken")
+    assert result["code"] == "flowchart TD\n  A[y" and result["warnings"]
+    service.answers += [_response("")] * 2
+    with pytest.raises(DiagramGenerationError):
+        service.generate("broken")
@@ -0,0 +1,127 @@
+from backend.utils.error_parser import ErrorLogParser, parse_error_for_location, parse_error_log
+
+PYTHON_TRACEBACK = """\
+Traceback (most recent call last):
+  File "/home/agentuser/workspace/app/main.py", line 10, in <module>
+    run()
+  File "/home/agentuser/workspace/app/core.py", line 4, in run
+    json.loads(data)
+  File "/usr/lib/python3.11/json/__init__.py", line 346, in loads
+    return _default_decoder.decode(s)
+json.decoder.JSONDecodeError: Expecting value: line 1 column 1 (char 0)
+"""
+
+
+def test_python_traceback():
+    result = parse_error_log(PYTHON_TRACEBACK)
+    [error] = result["errors"]
+    assert error["language"] == "python"
+    assert error["error_type"] == "json.decoder.JSONDecodeError"
+    assert error["message"] == "Expecting value: line 1 column 1 (char 0)"
+    assert [frame["file_path"] for frame in error["frames"]] == ["app/main.py", "app/core.py", "/usr/lib/python3.11/json/__init__.py"]
+    # The innermost frame of the project's own code comes first, not the library's.
+    best = result["locations"][0]
+    assert (best["file_path"], best["line_number"], best["function"]) == ("app/core.py", 4, "run")
+
+
+def test_output_split_across_chunks():
+    parser = ErrorLogParser()
+    for start in range(0, len(PYTHON_TRACEBACK), 7):
+        parser.feed(PYTHON_TRACEBACK[start:start + 7])
+    assert parser.finish() == parse_error_log(PYTHON_TRACEBACK)
+
+
+def test_pytest_failure_and_summary():
+    output = """\
+=================================== FAILURES ===================================
+___________________________________ test_add ___________________________________
+
+    def test_add():
+>       assert add(1, 2) == 4
+E       assert 3 == 4
+
+tests/test_math.py:5: AssertionError
+=========================== short test summary info ============================
+FAILED tests/test_math.py::test_add - assert 3 == 4
+1 failed in 0.01s
+"""
+    [error] = parse_error_log(output)["errors"]
+    assert (error["language"], error["test"], error["error_type"]) == ("pytest", "test_add", "AssertionError")
+    assert error["message"] == "assert 3 == 4"
+    assert error["frames"][0]["file_path"] == "tests/test_math.py"
+    assert error["frames"][0]["line_number"] == 5
+
+
+def test_node_stack_trace():
+    output = """\
+TypeError: Cannot read properties of undefined (reading 'id')
+    at getUser (/home/agentuser/workspace/src/users.js:12:18)
+    at Object.<anonymous> (/home/agentuser/workspace/src/index.js:3:1)
+    at Module._compile (node:internal/modules/cjs/loader:1256:14)
+"""
+    result = parse_error_log(output)
+    [error] = result["errors"]
+    assert (error["language"], error["error_type"]) == ("node", "TypeError")
+    assert error["message"] == "Cannot read properties of undefined (reading 'id')"
+    assert [frame["in_user_code"] for frame in error["frames"]] == [True, True, False]
+    best = result["locations"][0]
+    assert (best["file_path"], best["line_number"], best["column"]) == ("src/users.js", 12, 18)
+
+
+def test_compiler_diagnostics():
+    output = """\
+src/app.ts(7,5): error TS2322: Type 'string' is not assignable to type 'number'.
+main.c:3:10: warning: unused variable 'x'
+main.c:9:1: error: expected ';' before '}' token
+main.go:14:2: undefined: foo
+"""
+    errors = parse_error_log(output)["errors"]
+    assert [(e["language"], e["error_type"], e["severity"]) for e in errors] == [
+        ("typescript", "TS2322", "error"), ("c", "warning", "warning"), ("c", "error", "error"), ("go", "build error", "error"),
+    ]
+    locations = parse_error_log(output)["locations"]
+    # Errors rank above warnings, earlier errors above later ones.
+    assert [location["file_path"] for location in locations][:3] == ["src/app.ts", "main.c", "main.go"]
+    assert locations[-1]["error_type"] == "warning"
+
+
+def test_rust_and_go_panics():
+    rust = """\
+thread 'main' panicked at src/main.rs:5:13:
+index out of bounds: the len is 3 but the index is 7
+"""
+    [error] = parse_error_log(rust)["errors"]
+    assert (error["language"], error["error_type"], error["message"]) == ("rust", "panic", "index out of bounds: the len is 3 but the index is 7")
+    assert (error["frames"][0]["file_path"], error["frames"][0]["line_number"]) == ("src/main.rs", 5)
+
+    go = """\
+panic: runtime error: integer divide by zero
+
+goroutine 1 [running]:
+main.divide(...)
+\t/home/agentuser/workspace/main.go:8
+main.main()
+\t/home/agentuser/workspace/main.go:12 +0x1d
+exit status 2
+"""
+    [error] = parse_error_log(go)["errors"]
+    assert (error["language"], error["message"]) == ("go", "runtime error: integer divide by zero")
+    assert [(frame["function"], frame["line_number"]) for frame in error["frames"]] == [("main.divide", 8), ("main.main", 12)]
+
+
+def test_ansi_codes_and_no_errors():
+    [error] = parse_error_log("\x1b[31msrc/a.ts(1,2): error TS1005: ';' expected.\x1b[0m\n")["errors"]
+    assert (error["frames"][0]["file_path"], error["message"]) == ("src/a.ts", "';' expected.")
+    assert parse_error_for_location("") is None
+    assert parse_error_for_location("all good\n") is None
+    location = parse_error_for_location('  File "app.py", line 2, in f\nSyntaxError: invalid syntax\n')
+    assert (location["file_path"], location["line_number"]) == ("app.py", 2)
+
+
+def test_error_count_is_bounded():
+    parser = ErrorLogParser()
+    parser.feed("".join(f"src/f{i}.ts(1,1): error TS1005: ';' expected.\n" for i in range(150)))
+    result = parser.finish()
+    assert len(result["errors"]) == 100
+    assert result["dropped_errors"] == 50
+    assert len(result["locations"]) == 20
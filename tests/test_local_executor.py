@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from tools.local_executor import choose_backend, is_lightweight_command
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "a.txt").write_text("b\na\n")
+    (tmp_path / "a.py").write_text("print('ok')\n")
+    os.symlink("/etc/passwd", tmp_path / "passwd")
+    os.symlink("/etc", tmp_path / "etc")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("command", [
+    "ls -la",
+    "cat a.txt",
+    "grep -rn foo .",
+    "grep -e x a.txt",
+    "sort -n a.txt",
+    "head -n -5 a.txt",
+    "find . -name a.txt",
+    "wc -l a.txt",
+])
+def test_simple_commands_run_locally(workspace, command):
+    assert is_lightweight_command(command, workspace)
+
+
+@pytest.mark.parametrize("command", [
+    # Paths outside the workspace, as operands or attached to options.
+    "cat /etc/passwd",
+    "cat ../secret",
+    "cat ~/.ssh/id_rsa",
+    "sort -o/tmp/evil a.txt",
+    "sort --output=/tmp/evil a.txt",
+    "diff --from-file=/etc/hostname a.txt",
+    "grep -f/etc/passwd a.txt",
+    "grep -rf/etc/passwd .",
+    "wc --files0-from=/tmp/list",
+    # Symbolic links leading out of the workspace.
+    "cat passwd",
+    "grep root etc/passwd",
+    "sort -opasswd a.txt",
+    # Options that read or write other files, even inside the workspace.
+    "sort -o out.txt a.txt",
+    "sort --output out.txt a.txt",
+    "sort --out=out.txt a.txt",
+    "sort --compress-program=gzip a.txt",
+    "grep -f patterns.txt a.txt",
+    "grep --file=patterns.txt a.txt",
+    "diff --to-file=a.txt b.txt",
+    "du --files0-from=list",
+    "wc --files0-from=list",
+    "find . -fprint0 x",
+    "find . -fprint x",
+    "find . -exec rm {} ;",
+    "find . -delete",
+    # Options that follow the links found while recursing.
+    "grep -Rn foo .",
+    "find -L .",
+    "du -L .",
+    "diff -ru a b",
+    # Anything but a single allowlisted program.
+    "cat a.txt | sh",
+    "cat a.txt > b.txt",
+    "ls; rm -rf .",
+    "echo $(id)",
+    "pip install requests",
+    "X=1 ls",
+])
+def test_unsafe_commands_stay_in_docker(workspace, command):
+    assert not is_lightweight_command(command, workspace)
+    assert not is_lightweight_command(command, workspace, isolated=True)
+
+
+@pytest.mark.parametrize("command", [
+    "python -c \"print(open('/etc/hostname').read())\"",
+    "python a.py",
+    "python -m pytest tests/test_a.py",
+    "node -e 1",
+    "ls *.py",
+])
+def test_interpreters_and_patterns_need_isolation(workspace, command):
+    assert not is_lightweight_command(command, workspace, isolated=False)
+    assert is_lightweight_command(command, workspace, isolated=True)
+
+
+def test_choose_backend(workspace):
+    assert choose_backend("ls", "trusted", workspace_dir=workspace, backend="auto") == "local"
+    assert choose_backend("ls", "untrusted", workspace_dir=workspace, backend="auto") == "docker"
+    assert choose_backend("ls", "untrusted", workspace_dir=workspace, backend="local") == "local"
+    assert choose_backend("ls", "trusted", workspace_dir=workspace, backend="docker") == "docker"
+    # Dependencies are only installed in the sandbox.
+    assert choose_backend("python a.py", "trusted", True, "auto", workspace, isolated=True) == "docker"
+    assert choose_backend("python a.py", "trusted", False, "auto", workspace, isolated=True) == "local"
+    assert choose_backend("python a.py", "trusted", False, "auto", workspace, isolated=False) == "docker"
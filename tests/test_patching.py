@@ -0,0 +1,83 @@
+import pytest
+
+from backend.utils.patching import PatchError, apply_patch
+
+SOURCE = "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n"
+
+
+def test_unified_diff():
+    patch = "--- a/m.py\n+++ b/m.py\n@@ -5,2 +5,2 @@\n def sub(a, b):\n-    return a - b\n+    return b - a\n"
+    content, summary = apply_patch(SOURCE, patch)
+    assert content == SOURCE.replace("a - b", "b - a")
+    assert summary["hunks"] == 1
+    assert summary["changed_lines"] == (6, 6)
+    assert summary["matched"] == ["exact"]
+
+
+def test_search_replace_blocks():
+    patch = (
+        "<<<<<<< SEARCH\n    return a + b\n=======\n    return a + b  # sum\n>>>>>>> REPLACE\n"
+        "<<<<<<< SEARCH\n    return a - b\n=======\n    return a - b  # difference\n>>>>>>> REPLACE\n"
+    )
+    content, summary = apply_patch(SOURCE, patch)
+    assert "a + b  # sum" in content and "a - b  # difference" in content
+    assert summary["hunks"] == 2
+
+
+def test_wrong_line_numbers_are_located_by_context():
+    patch = "@@ -40,2 +40,2 @@\n def add(a, b):\n-    return a + b\n+    return b + a\n"
+    content, _ = apply_patch(SOURCE, patch)
+    assert content.startswith("def add(a, b):\n    return b + a\n")
+
+
+def test_whitespace_and_fuzzy_matches():
+    patch = "<<<<<<< SEARCH\nreturn a + b\n=======\n    return sum((a, b))\n>>>>>>> REPLACE\n"
+    content, summary = apply_patch(SOURCE, patch)
+    assert "return sum((a, b))" in content and summary["matched"] == ["whitespace"]
+
+    patch = "@@ -1,2 +1,2 @@\n def add(a, bb):\n-    return a + b\n+    return a + b + 0\n"
+    content, summary = apply_patch(SOURCE, patch)
+    assert "return a + b + 0" in content and summary["matched"][0].startswith("fuzzy")
+
+
+def test_new_file_and_line_endings():
+    content, summary = apply_patch("", "@@ -0,0 +1,2 @@\n+first\n+second\n")
+    assert content == "first\nsecond\n"
+    assert summary["changed_lines"] == (1, 2)
+
+    content, _ = apply_patch("a\r\nb\r\n", "<<<<<<< SEARCH\nb\n=======\nc\n>>>>>>> REPLACE\n")
+    assert content == "a\r\nc\r\n"
+
+
+def test_later_hunks_follow_earlier_shifts():
+    lines = "".join(f"line {i}\n" for i in range(1, 21))
+    patch = (
+        "@@ -2,1 +2,3 @@\n-line 2\n+line 2a\n+line 2b\n+line 2c\n"
+        "@@ -10,1 +12,1 @@\n-line 10\n+line ten\n"
+    )
+    content, _ = apply_patch(lines, patch)
+    assert content.splitlines()[11] == "line ten"
+
+
+@pytest.mark.parametrize("patch, message", [
+    ("just some text", "contains no hunks"),
+    ("<<<<<<< SEARCH\nx\n=======\ny\n", "missing its '>>>>>>> REPLACE'"),
+    ("--- a/x\n+++ b/x\n@@ -1 +1 @@\n-a\n+b\n--- a/y\n+++ b/y\n", "more than one file"),
+    ("<<<<<<< SEARCH\nnot in the file at all\n=======\ny\n>>>>>>> REPLACE\n", "does not match the file"),
+])
+def test_errors(patch, message):
+    with pytest.raises(PatchError, match=message):
+        apply_patch(SOURCE, patch)
+
+
+def test_ambiguous_search_and_atomicity():
+    content = "x = 1\ny = 2\nx = 1\n"
+    with pytest.raises(PatchError, match="matches 2 places"):
+        apply_patch(content, "<<<<<<< SEARCH\nx = 1\n=======\nx = 3\n>>>>>>> REPLACE\n")
+    # The first hunk applies, the second does not: the error reports it and nothing is returned.
+    patch = (
+        "<<<<<<< SEARCH\ny = 2\n=======\ny = 3\n>>>>>>> REPLACE\n"
+        "<<<<<<< SEARCH\nz = 9\n=======\nz = 0\n>>>>>>> REPLACE\n"
+    )
+    with pytest.raises(PatchError, match="(?s)Hunk 2 .*does not match the file. No changes were made"):
+        apply_patch(content, patch)
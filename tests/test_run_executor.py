@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from backend.run_executor import QueueFullError, RunExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = RunExecutor(max_workers=1, max_queue_size=2)
+    yield executor
+    executor.shutdown()
+
+
+def _blocking_run(started, release, cancelled=None):
+    def run(cancel_event):
+        started.set()
+        while not release.wait(0.01):
+            if cancel_event.is_set():
+                if cancelled is not None:
+                    cancelled.set()
+                return
+    return run
+
+
+def test_priority_order_and_bounded_queue(executor):
+    started, release = threading.Event(), threading.Event()
+    order = []
+    executor.submit("busy", _blocking_run(started, release))
+    assert started.wait(2)
+
+    assert executor.submit("low", lambda cancel: order.append("low"), priority=5) == 0
+    assert executor.submit("high", lambda cancel: order.append("high"), priority=1) == 0
+    assert executor.queue_position("low") == 1
+    with pytest.raises(QueueFullError):
+        executor.submit("overflow", lambda cancel: None)
+    assert executor.active_runs() == ["busy", "high", "low"]
+
+    release.set()
+    deadline = time.time() + 2
+    while executor.active_runs() and time.time() < deadline:
+        time.sleep(0.01)
+    assert order == ["high", "low"]
+    assert executor.stats()["workers"][0]["runs_completed"] == 3
+
+
+def test_cancel_queued_and_running_runs(executor):
+    started, release, cancelled = threading.Event(), threading.Event(), threading.Event()
+    executor.submit("running", _blocking_run(started, release, cancelled))
+    assert started.wait(2)
+    executor.submit("queued", lambda cancel: None)
+
+    assert executor.cancel("queued") == "dequeued"
+    assert not executor.is_active("queued")
+    assert executor.cancel("running") == "cancelling"
+    assert cancelled.wait(2)
+    assert executor.cancel("unknown") is None
+
+
+def test_a_failing_run_does_not_stop_the_worker(executor):
+    done = threading.Event()
+
+    def failing(cancel):
+        raise RuntimeError("boom")
+
+    executor.submit("failing", failing)
+    executor.submit("next", lambda cancel: done.set())
+    assert done.wait(2)
+
+
+def test_shutdown_rejects_new_runs_and_cancels_running_ones():
+    executor = RunExecutor(max_workers=1, max_queue_size=2)
+    started, release, cancelled = threading.Event(), threading.Event(), threading.Event()
+    executor.submit("running", _blocking_run(started, release, cancelled))
+    assert started.wait(2)
+    executor.submit("queued", lambda cancel: None)
+
+    executor.shutdown()
+    assert cancelled.wait(2)
+    assert executor.queue_position("queued") is None
+    with pytest.raises(RuntimeError):
+        executor.submit("late", lambda cancel: None)
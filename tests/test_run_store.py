@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from backend.run_store import InMemoryRunStore, SQLiteRunStore
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteRunStore(str(tmp_path / "runs.sqlite3"))
+    return InMemoryRunStore()
+
+
+def test_steps_record_deltas_and_appends(store):
+    store.create_run("r1", {"initial_request": "x", "history_log": [], "plan": None})
+    store.append_step("r1", "plan", {"plan": "p", "history_log": ["a"]})
+    store.append_step("r1", "code", {"plan": "p", "history_log": ["a", "b"]})
+    changes = store.get_changes("r1", since=1)
+    assert changes["seq"] == 2 and not changes["full"]
+    assert changes["changed"] == {} and changes["appended"] == {"history_log": ["b"]}
+    assert store.get_run("r1")["state"]["history_log"] == ["a", "b"]
+
+
+def test_a_live_lease_blocks_other_workers(store):
+    store.create_run("r1", {}, owner="worker-a")
+    assert not store.claim_run("r1", "worker-b")
+    assert store.claim_run("r1", "worker-a")
+    assert store.claim_expired_runs("worker-b") == []
+
+
+def test_expired_leases_are_claimed_once(store):
+    store.create_run("r1", {}, owner="worker-a")
+    store.create_run("r2", {}, status="running", owner="worker-a")
+    store.renew_leases("worker-a", ["r1", "r2"], lease_seconds=-1)
+    claimed = store.claim_expired_runs("worker-b")
+    assert [run["run_id"] for run in claimed] == ["r1", "r2"]
+    assert store.claim_expired_runs("worker-c") == []
+    # The former owner cannot renew a lease it lost.
+    store.renew_leases("worker-a", ["r1"], lease_seconds=-1)
+    assert not store.claim_run("r1", "worker-a")
+
+
+def test_finished_runs_are_not_claimed_and_free_to_resume(store):
+    store.create_run("r1", {}, status="running", owner="worker-a")
+    store.set_status("r1", "failed", error="boom")
+    assert store.claim_expired_runs("worker-b") == []
+    assert store.claim_run("r1", "worker-b")
+
+
+def test_runs_without_an_owner_are_claimed(store):
+    store.create_run("r1", {})
+    time.sleep(0.01)
+    assert [run["run_id"] for run in store.claim_expired_runs("worker-a")] == ["r1"]
+
+
+def test_list_runs_pages_newest_first(store):
+    for i in range(5):
+        store.create_run(f"r{i}", {})
+        time.sleep(0.001)
+    page, cursor = store.list_runs(limit=2)
+    assert [run["run_id"] for run in page] == ["r4", "r3"]
+    page, cursor = store.list_runs(limit=2, cursor=cursor)
+    assert [run["run_id"] for run in page] == ["r2", "r1"]
+    page, cursor = store.list_runs(limit=2, cursor=cursor)
+    assert [run["run_id"] for run in page] == ["r0"] and cursor is None
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from tools.search_cache import (
+    CachedSearch,
+    FixtureSearchBackend,
+    InMemorySearchCacheStore,
+    SearchBackend,
+    SearchFailure,
+    SQLiteSearchCacheStore,
+    normalize_query,
+)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("  Best Python web frameworks?", "best python web frameworks"),
+    ("best   python\tweb frameworks!!", "best python web frameworks"),
+    ("C++ vs C# performance", "c++ vs c# performance"),
+    ("Node.js @types/node", "node.js @types/node"),
+    ("ｆｕｌｌｗｉｄｔｈ", "fullwidth"),
+    ("what is rust...", "what is rust"),
+])
+def test_normalize_query(query, expected):
+    assert normalize_query(query) == expected
+
+
+class CountingBackend(SearchBackend):
+    def __init__(self, fail=False, delay=0.0):
+        self.calls = 0
+        self.fail = fail
+        self.delay = delay
+
+    def search(self, query):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("rate limited")
+        return f"results for {query}"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSearchCacheStore(str(tmp_path / "search_cache.sqlite3"))
+    return InMemorySearchCacheStore()
+
+
+def test_results_are_cached_by_normalized_query(store):
+    backend = CountingBackend()
+    search = CachedSearch(backend, store)
+    assert search.search("Python frameworks?") == "results for Python frameworks?"
+    assert search.search("python   FRAMEWORKS") == "results for Python frameworks?"
+    assert backend.calls == 1
+    assert (search.get_stats()["hits"], search.get_stats()["misses"]) == (1, 1)
+
+
+def test_failures_are_cached_briefly(store):
+    backend = CountingBackend(fail=True)
+    search = CachedSearch(backend, store, negative_ttl=0.2)
+    with pytest.raises(RuntimeError):
+        search.search("flaky")
+    with pytest.raises(SearchFailure, match="rate limited"):
+        search.search("flaky")
+    assert backend.calls == 1
+    time.sleep(0.3)
+    with pytest.raises(RuntimeError):
+        search.search("flaky")
+    assert backend.calls == 2
+
+
+def test_expired_results_are_searched_again(store):
+    backend = CountingBackend()
+    search = CachedSearch(backend, store, ttl=0.1)
+    search.search("query")
+    time.sleep(0.2)
+    search.search("query")
+    assert backend.calls == 2
+    assert store.purge_expired() == 0
+    time.sleep(0.2)
+    assert store.purge_expired() == 1
+
+
+def test_concurrent_identical_queries_share_one_request():
+    backend = CountingBackend(delay=0.2)
+    search = CachedSearch(backend, InMemorySearchCacheStore())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(search.search("same query"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["results for same query"] * 5
+    assert backend.calls == 1
+    assert search.get_stats()["deduplicated"] == 4
+
+
+def test_a_failing_store_does_not_fail_the_search():
+    class BrokenStore(InMemorySearchCacheStore):
+        def put(self, *args, **kwargs):
+            raise OSError("disk full")
+
+    search = CachedSearch(CountingBackend(), BrokenStore())
+    assert search.search("query") == "results for query"
+
+
+def test_fixture_backend():
+    backend = FixtureSearchBackend({"Rust Async?": "tokio"})
+    assert backend.search("rust async") == "tokio"
+    with pytest.raises(LookupError):
+        backend.search("unknown")
@@ -0,0 +1,118 @@
+import json
+import os
+
+from backend.utils.test_results import (
+    JEST_REPORT,
+    JUNIT_REPORT,
+    build_test_command,
+    load_test_report,
+    parse_jest_json,
+    parse_junit_xml,
+    parse_unittest_output,
+    rerun_command,
+    results_dir,
+)
+
+JUNIT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" tests="3">
+  <testcase classname="tests.test_math.TestAdd" name="test_ok" file="tests/test_math.py" time="0.010"/>
+  <testcase classname="tests.test_math" name="test_bad" file="tests/test_math.py" time="0.020">
+    <failure message="assert 3 == 4">def test_bad(): assert 3 == 4</failure>
+  </testcase>
+  <testcase classname="tests.test_io" name="test_skip" file="tests/test_io.py" time="0">
+    <skipped message="no network"/>
+  </testcase>
+</testsuite></testsuites>
+"""
+
+
+def test_junit_xml():
+    tests = parse_junit_xml(JUNIT)
+    assert [(test["id"], test["outcome"]) for test in tests] == [
+        ("tests/test_math.py::TestAdd::test_ok", "passed"),
+        ("tests/test_math.py::test_bad", "failed"),
+        ("tests/test_io.py::test_skip", "skipped"),
+    ]
+    assert tests[1]["message"].startswith("assert 3 == 4\n")
+    assert tests[2]["message"] == "no network"
+
+
+def test_jest_json():
+    report = {"testResults": [
+        {"name": "/home/agentuser/workspace/src/sum.test.js", "status": "failed", "assertionResults": [
+            {"fullName": "sum adds", "status": "passed", "duration": 5},
+            {"fullName": "sum fails", "status": "failed", "duration": 7, "failureMessages": ["expected 3"]},
+            {"fullName": "sum later", "status": "pending"},
+        ]},
+        {"name": "/home/agentuser/workspace/src/broken.test.js", "status": "failed", "message": "SyntaxError"},
+    ]}
+    tests = parse_jest_json(json.dumps(report))
+    assert [(test["id"], test["outcome"]) for test in tests] == [
+        ("src/sum.test.js::sum adds", "passed"),
+        ("src/sum.test.js::sum fails", "failed"),
+        ("src/sum.test.js::sum later", "skipped"),
+        ("src/broken.test.js", "error"),
+    ]
+    assert (tests[1]["duration"], tests[1]["message"]) == (0.007, "expected 3")
+
+
+def test_unittest_output():
+    output = """\
+test_a (tests.test_x.TestX.test_a) ... ok
+test_b (tests.test_x.TestX.test_b) ... FAIL
+test_c (tests.test_x.TestX.test_c) ... skipped 'later'
+
+======================================================================
+FAIL: test_b (tests.test_x.TestX.test_b)
+----------------------------------------------------------------------
+Traceback (most recent call last):
+  File "tests/test_x.py", line 9, in test_b
+    self.assertEqual(1, 2)
+AssertionError: 1 != 2
+
+----------------------------------------------------------------------
+Ran 3 tests in 0.001s
+"""
+    tests = parse_unittest_output(output)
+    assert [(test["id"], test["outcome"]) for test in tests] == [
+        ("tests.test_x.TestX.test_a", "passed"),
+        ("tests.test_x.TestX.test_b", "failed"),
+        ("tests.test_x.TestX.test_c", "skipped"),
+    ]
+    assert tests[1]["message"] == "AssertionError: 1 != 2"
+
+
+def test_commands_write_reports_outside_the_workspace(tmp_path):
+    runner, command = build_test_command(str(tmp_path), coverage=True)
+    assert runner == "python"
+    assert f"--junitxml=/home/agentuser/qa-results/{JUNIT_REPORT}" in command
+    assert ".qa" not in command
+
+    (tmp_path / "package.json").write_text(json.dumps({"devDependencies": {"jest": "^29"}}))
+    runner, command = build_test_command(str(tmp_path), test_ids=["src/a.test.js::adds (1+1)"])
+    assert runner == "jest"
+    assert f"--outputFile=/home/agentuser/qa-results/{JEST_REPORT}" in command
+    assert "-t '^(adds \\(1\\+1\\))$'" in command
+
+
+def test_rerun_commands():
+    assert rerun_command("python", ["tests/test_x.py::test_a"]) == "python -m pytest -q tests/test_x.py::test_a"
+    assert rerun_command("jest", ["src/a.test.js::adds"]) == "npx jest src/a.test.js -t '^(adds)$'"
+    assert rerun_command("python", []) == ""
+
+
+def test_load_test_report(tmp_path):
+    (tmp_path / JUNIT_REPORT).write_text(JUNIT)
+    report = load_test_report("python", str(tmp_path), "", command="pytest")
+    assert report["format"] == "junit-xml"
+    assert report["summary"]["total"] == 3 and report["summary"]["failed"] == 1
+    assert report["failed_test_ids"] == ["tests/test_math.py::test_bad"]
+    assert report["rerun_command"] == "python -m pytest -q tests/test_math.py::test_bad"
+
+    report = load_test_report("python", str(tmp_path / "missing"), "nothing to parse")
+    assert (report["format"], report["tests"]) == (None, [])
+
+
+def test_results_dir_is_per_run():
+    assert results_dir("run-1") != results_dir("run-2")
+    assert os.path.dirname(results_dir("..")) == os.path.dirname(results_dir("run-1"))
@@ -0,0 +1,81 @@
+import base64
+import os
+
+import pytest
+
+from backend.utils.workspace_files import etag_matches, file_etag, iter_file_range, parse_range, read_window
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=500-5000", (500, 999)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-1", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_etags(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("hello")
+    etag = file_etag(os.stat(path))
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_iter_file_range(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)))
+    chunks = list(iter_file_range(str(path), 10, 109, chunk_size=32))
+    assert [len(chunk) for chunk in chunks] == [32, 32, 32, 4]
+    assert b"".join(chunks) == bytes(range(10, 110))
+
+
+def test_windows_never_split_characters(tmp_path):
+    text = "aé€😀" * 50
+    path = tmp_path / "utf8.txt"
+    path.write_text(text, encoding="utf-8")
+    pieces, offset = [], 0
+    while True:
+        window = read_window(str(path), offset, 7)
+        assert window["encoding"] == "utf-8" and "�" not in window["content"]
+        pieces.append(window["content"])
+        offset = window["next_offset"]
+        if window["eof"]:
+            break
+    assert "".join(pieces) == text
+
+
+def test_window_starting_inside_a_character(tmp_path):
+    path = tmp_path / "utf8.txt"
+    path.write_text("€abc", encoding="utf-8")
+    # Offset 1 is inside the three bytes of '€': the window starts at the next character.
+    window = read_window(str(path), 1, 10)
+    assert (window["content"], window["offset"], window["next_offset"], window["eof"]) == ("abc", 3, 6, True)
+
+
+def test_binary_windows_and_bounds(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(b"\x89PNG\x00\x01\x02\x03")
+    window = read_window(str(path), 2, 4)
+    assert window["encoding"] == "base64"
+    assert base64.b64decode(window["content"]) == b"NG\x00\x01"
+    assert (window["next_offset"], window["eof"]) == (6, False)
+
+    window = read_window(str(path), 100, 4)
+    assert (window["offset"], window["content"], window["eof"]) == (8, "", True)
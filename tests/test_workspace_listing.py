@@ -0,0 +1,52 @@
+import pytest
+
+from backend.utils.workspace_listing import decode_cursor, list_tree
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for path in ["b.txt", "a.py", "src/main.py", "src/util/x.py", "src/util/y.txt", "node_modules/dep/index.js"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(path)
+    return str(tmp_path)
+
+
+def _paths(listing):
+    return [entry["path"] for entry in listing["entries"]]
+
+
+def test_directories_first_in_pre_order(tree):
+    assert _paths(list_tree(tree, max_depth=3)) == [
+        "src", "src/util", "src/util/x.py", "src/util/y.txt", "src/main.py", "a.py", "b.txt",
+    ]
+
+
+def test_depth_and_glob(tree):
+    assert _paths(list_tree(tree)) == ["src", "a.py", "b.txt"]
+    assert _paths(list_tree(tree, max_depth=3, glob="*.py")) == ["src", "src/util", "src/util/x.py", "src/main.py", "a.py"]
+
+
+def test_pages_cover_the_tree_once(tree):
+    full = _paths(list_tree(tree, max_depth=3))
+    paths, cursor = [], None
+    while True:
+        page = list_tree(tree, max_depth=3, cursor=cursor, limit=2)
+        paths += _paths(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert paths == full
+
+
+def test_etag_follows_changes(tree, tmp_path):
+    etag = list_tree(tree)["etag"]
+    assert list_tree(tree)["etag"] == etag
+    (tmp_path / "c.txt").write_text("new")
+    assert list_tree(tree)["etag"] != etag
+
+
+def test_invalid_arguments(tree):
+    with pytest.raises(ValueError):
+        list_tree(tree, limit=0)
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
@@ -1,123 +1,220 @@
-from langchain_community.tools import DuckDuckGoSearchRun
 from langchain.tools import tool
-import litellm
 import docker
+import threading
 import time
-from typing import Callable, Optional, Dict, Any
-
-# Import our new error parser
-from backend.utils.error_parser import parse_error_for_location
+from typing import Dict, Any, List
+
+# Import our error parser (it consumes the output incrementally, as it streams)
+from backend.utils.error_parser import ErrorLogParser
+from backend.utils.test_results import RESULTS_DIR, results_dir
+# Sandbox output is streamed live to anyone watching the run
+from backend.event_bus import event_bus
+# Every tool call is a tracing span (see backend/tracing.py)
+from backend.tracing import BACKGROUND_RUN, tracer
+# Persistent pip/npm/node_modules/virtualenv caches mounted into sandbox containers
+from tools.sandbox_cache import sandbox_caches
+# Resource limits for sandbox commands, and the ledger of what each command consumed
+from tools.sandbox_resources import container_limits, current_sandbox_run, read_container_usage, sandbox_usage, usage_from_docker_stats, with_usage_probe
 
 # ... (other tools like search, file I/O, etc. remain the same) ...
 
 
 # --- Tool 4: Secure Code Execution Sandbox (Upgraded for Structured Output) ---
 
-# Initialize the Docker client from the environment.
-try:
-    _docker_client = docker.from_env()
-except docker.errors.DockerException:
-    print("--- [Tool] WARNING: Docker is not running or accessible. The 'execute_in_sandbox' tool will not be available.")
-    _docker_client = None
-
-_DOCKER_IMAGE_NAME = "agentic_sandbox:latest"
-
-def _build_sandbox_image_if_needed():
-    """Helper function to build the Docker image if it doesn't already exist."""
-    if not _docker_client: return
+# The Docker client, and the sandbox images: the base image and per-project
+# images with the dependencies preinstalled (see tools/sandbox_images.py).
+from tools.sandbox_images import docker_client as _docker_client, manifest_hash, sandbox_images
+# The local fast path for simple commands of trusted runs (see tools/local_executor.py)
+from tools.local_executor import choose_backend, local_executor
+
+def _sandbox_response(exit_code: int, stdout: str, stderr: str, error_parser: ErrorLogParser, fed: bool,
+                      timed_out: bool, oom_killed: bool, limits: Dict[str, Any], resources: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds the result of `execute_in_sandbox`, the same for every backend."""
+    tracer.set_attributes(exit_code=exit_code, timed_out=timed_out, oom_killed=oom_killed, cpu_seconds=resources.get("cpu_seconds"),
+                          peak_rss_bytes=resources.get("peak_rss_bytes"), output_bytes=len(stdout) + len(stderr))
+    if exit_code == 0 and not timed_out:
+        return {"status": "success", "stdout": stdout, "stderr": stderr, "resources": resources}
+    # If the command failed, extract the errors and rank their locations.
+    # Test runners and compilers often report failures on stdout, so both are parsed.
+    if not fed:
+        error_parser.feed(stdout)
+        error_parser.feed("\n")
+        error_parser.feed(stderr)
+    parsed = error_parser.finish()
+    locations = parsed["locations"]
+    response = {
+        "status": "error", 
+        "stdout": stdout, 
+        "stderr": stderr,
+        "error_details": locations[0] if locations else None,  # The most likely location, or None
+        "error_locations": locations[:10],  # Ranked, best first
+        "errors": [
+            {key: error[key] for key in ("language", "error_type", "message", "test")}
+            for error in parsed["errors"][:10]
+        ],
+        "resources": resources,
+    }
+    if timed_out:
+        response["error"] = f"The command exceeded its time limit of {limits['timeout_seconds']:g}s and was killed."
+    elif oom_killed:
+        response["error"] = f"The command exceeded its memory limit of {limits['memory'] // 1024 ** 2} MB and was killed."
+    return response
+
+def _execute_locally(command: str, run_id: str, workspace_volume_path: str, limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs a lightweight command of a trusted run as a restricted subprocess (see tools/local_executor.py)."""
     try:
-        _docker_client.images.get(_DOCKER_IMAGE_NAME)
-    except docker.errors.ImageNotFound:
-        print(f"--- [Tool] Sandbox image '{_DOCKER_IMAGE_NAME}' not found. Building now...")
-        try:
-            _docker_client.images.build(path="./sandbox", tag=_DOCKER_IMAGE_NAME, rm=True)
-            print(f"--- [Tool] Sandbox image built successfully. ---")
-        except docker.errors.BuildError as e:
-            print(f"--- [Tool] CRITICAL ERROR: Could not build Docker image. Error: {e}")
-            raise
+        print(f"--- [Tool] Running locally for run '{run_id}': '{command}' ---")
+        result = local_executor.run(command, workspace_volume_path, limits)
+        resources = sandbox_usage.record(run_id, "local", command, result["exit_code"], result["timed_out"],
+                                         result["duration"], result["usage"], limits)
+        # The local backend has no memory cgroup; exceeding RLIMIT_DATA shows up as a MemoryError or a failed allocation.
+        resources["oom_killed"] = False
+        if event_bus.has_subscribers(run_id):
+            for text in (result["stdout"], result["stderr"]):
+                if text:
+                    event_bus.publish(run_id, "sandbox_output", group="sandbox", text=text)
+        event_bus.publish(run_id, "sandbox_usage", group="sandbox", **resources)
+        print(f"--- [Tool] Local execution finished with exit code: {result['exit_code']} in {result['duration']:.2f}s. ---")
+        return _sandbox_response(result["exit_code"], result["stdout"], result["stderr"], ErrorLogParser(), False,
+                                 result["timed_out"], False, limits, resources)
+    except Exception as e:
+        return {"status": "error", "error": f"An unexpected error occurred: {e}"}
 
-STREAM_CALLBACKS: dict[str, Optional[Callable]] = {}
+# How long before a command's deadline its usage is sampled, in case it has to be killed.
+_USAGE_SAMPLE_LEAD_SECONDS = 3.0
 
 @tool
-def execute_in_sandbox(command: str, run_id: str) -> Dict[str, Any]:
+@tracer.traced("tool.execute_in_sandbox", kind="tool", record_io=True)
+def execute_in_sandbox(command: str) -> Dict[str, Any]:
     """
     Executes a shell command inside a secure, isolated Docker sandbox.
     It streams the output in real-time and returns a structured object
     indicating success or failure, including parsed error locations.
+    Simple commands of trusted runs (`ls`, `cat`, `python -c`, a single test)
+    run as restricted local subprocesses instead, with the same result.
     
     Args:
         command: The shell command to execute.
-        run_id: The unique ID of the agent run for real-time streaming.
         
     Returns:
         A dictionary with the execution status, logs, and optional error details.
     """
+    # The run executing this command, set by its agent group; never an argument the model could choose.
+    run_id = current_sandbox_run() or BACKGROUND_RUN
+    workspace_volume_path = os.path.abspath(_WORKSPACE_DIR)
+    # cgroup limits (rlimits locally) and the wall-clock timeout; the defaults, or the run's own (see tools/sandbox_resources.py)
+    limits = sandbox_usage.get_limits(run_id)
+    backend = choose_backend(command, sandbox_usage.get_run_trust(run_id), manifest_hash(workspace_volume_path) is not None,
+                             workspace_dir=workspace_volume_path, isolated=local_executor.isolation == "bwrap")
+    tracer.set_attributes(backend=backend, command=command)
+    if backend == "local":
+        return _execute_locally(command, run_id, workspace_volume_path, limits)
+
     if not _docker_client:
         return {"status": "error", "error": "Docker not available."}
         
-    _build_sandbox_image_if_needed()
-    
-    workspace_volume_path = os.path.abspath(_WORKSPACE_DIR)
+    # Never waits for a dependency image build; the base image is used until it is ready.
+    image, image_provides = sandbox_images.image_for(workspace_volume_path)
     container = None
+    cache_lease = sandbox_caches.acquire(workspace_volume_path, image_provides)
+    timeout = {"fired": False, "usage": None}
+    timers = []
+    volumes = {workspace_volume_path: {'bind': '/home/agentuser/workspace', 'mode': 'rw'}, **cache_lease.volumes}
+    if RESULTS_DIR in command:
+        # Test reports go to the run's results directory, never into the workspace.
+        run_results_dir = os.path.abspath(results_dir(run_id))
+        os.makedirs(run_results_dir, exist_ok=True)
+        volumes[run_results_dir] = {'bind': RESULTS_DIR, 'mode': 'rw'}
     
     try:
         print(f"--- [Tool] Creating sandbox container for run '{run_id}' to execute: '{command}' ---")
+        started = time.perf_counter()
         container = _docker_client.containers.run(
-            image=_DOCKER_IMAGE_NAME,
-            command=["/bin/sh", "-c", command],
-            volumes={workspace_volume_path: {'bind': '/home/agentuser/workspace', 'mode': 'rw'}},
+            image=image,
+            command=["/bin/sh", "-c", with_usage_probe(cache_lease.wrap(command))],
+            volumes=volumes,
+            environment=cache_lease.environment,
             working_dir='/home/agentuser/workspace',
             detach=True,
-            remove=False
+            remove=False,
+            **container_limits(limits),
         )
-        
-        # Stream logs in real-time
-        stream_callback = STREAM_CALLBACKS.get(run_id)
-        if stream_callback:
+
+        # The usage probe never runs in a killed container, so a timed-out command's usage is
+        # what docker measured shortly before the deadline. A stats sample takes a second or
+        # two, so it is taken ahead of time and on its own: the kill never waits for it.
+        def _sample_usage():
+            try:
+                timeout["usage"] = usage_from_docker_stats(container.stats(stream=False))
+            except docker.errors.APIError as e:
+                print(f"--- [Tool] Warning: Could not sample the usage of container '{container.short_id}'. Error: {e}")
+
+        def _kill_on_timeout():
+            timeout["fired"] = True
+            try:
+                container.kill()
+            except docker.errors.APIError as e:
+                print(f"--- [Tool] Warning: Could not kill timed-out container '{container.short_id}'. Error: {e}")
+
+        timers = [
+            threading.Timer(max(0.0, limits["timeout_seconds"] - _USAGE_SAMPLE_LEAD_SECONDS), _sample_usage),
+            threading.Timer(limits["timeout_seconds"], _kill_on_timeout),
+        ]
+        for timer in timers:
+            timer.daemon = True
+            timer.start()
+        
+        # Stream logs in real-time to the run's event bus, parsing errors as they arrive
+        error_parser = ErrorLogParser()
+        streamed = event_bus.has_subscribers(run_id)
+        if streamed:
             for line in container.logs(stream=True, follow=True):
-                stream_callback(line.decode('utf-8'))
+                text = line.decode('utf-8', errors='replace')
+                event_bus.publish(run_id, "sandbox_output", group="sandbox", text=text)
+                error_parser.feed(text)
         
         # Get final results
         result = container.wait()
+        for timer in timers:
+            timer.cancel()
+        duration = time.perf_counter() - started
         exit_code = result['StatusCode']
         stdout = container.logs(stdout=True, stderr=False).decode('utf-8')
         stderr = container.logs(stdout=False, stderr=True).decode('utf-8')
-        
-        print(f"--- [Tool] Sandbox execution finished with exit code: {exit_code}. ---")
 
-        if exit_code == 0:
-            return {"status": "success", "stdout": stdout, "stderr": stderr}
+        container.reload()
+        oom_killed = bool(container.attrs.get("State", {}).get("OOMKilled"))
+        if timeout["fired"]:
+            # Empty if the sample was not ready in time.
+            usage = timeout["usage"] or usage_from_docker_stats({})
         else:
-            # If the command failed, try to parse the error location from stderr
-            error_location = parse_error_for_location(stderr)
-            return {
-                "status": "error", 
-                "stdout": stdout, 
-                "stderr": stderr,
-                "error_details": error_location  # This will be None or {'file_path': '...', 'line_number': ...}
-            }
+            usage = read_container_usage(container)
+        resources = sandbox_usage.record(run_id, "docker", command, exit_code, timeout["fired"], duration, usage, limits)
+        resources["oom_killed"] = oom_killed
+        event_bus.publish(run_id, "sandbox_usage", group="sandbox", **resources)
+        
+        print(f"--- [Tool] Sandbox execution finished with exit code: {exit_code} in {duration:.1f}s. ---")
+        return _sandbox_response(exit_code, stdout, stderr, error_parser, streamed, timeout["fired"], oom_killed, limits, resources)
 
     except Exception as e:
         return {"status": "error", "error": f"An unexpected error occurred: {e}"}
     finally:
+        for timer in timers:
+            timer.cancel()
         if container:
             try:
                 container.stop(timeout=5)
                 container.remove()
             except docker.errors.APIError as e:
                 print(f"--- [Tool] Warning: Could not clean up container '{container.short_id}'. Error: {e}")
+        sandbox_caches.release(cache_lease)
 # --- Tool 3: Sketching / Diagramming Tool ---
 
-# A concise prompt to instruct the LLM on how to generate Mermaid syntax.
-_MERMAID_PROMPT_TEMPLATE = """
-You are a specialist in creating diagrams. Your sole task is to convert a user's description into valid Mermaid.js syntax.
-You must only output the Mermaid code itself, inside a '```mermaid' code block. Do not include any other text, explanations, or apologies.
-
-Description:
-"{description}"
-"""
+# Generation, memoization and validation live in the diagram service (tools/diagram_service.py).
+from tools.diagram_service import DiagramGenerationError, diagram_service, render_markdown
 
 @tool
+@tracer.traced("tool.generate_mermaid_syntax", kind="tool", record_io=True)
 def generate_mermaid_syntax(description: str, file_path: str) -> str:
     """
     Takes a natural language description of a process or structure,
@@ -131,33 +228,31 @@ def generate_mermaid_syntax(description: str, file_path: str) -> str:
     """
     print(f"--- [Tool] Generating Mermaid syntax for: '{description}' ---")
     try:
-        # Use a fast and free LLM for this specialized task.
-        # We call litellm directly here as it's a simple, self-contained task.
-        response = litellm.completion(
-            model="fast-router", # Uses the alias from our config.yaml
-            messages=[{
-                "role": "user",
-                "content": _MERMAID_PROMPT_TEMPLATE.format(description=description)
-            }],
-            temperature=0.0
-        )
-        
-        # Extract the content from the response
-        mermaid_syntax = response.choices.message.content
-        
-        # Clean up the output to ensure it's just the code block
-        if "```mermaid" in mermaid_syntax:
-             mermaid_syntax = "```mermaid" + mermaid_syntax.split("```mermaid")[1]
-        if "```" in mermaid_syntax:
-            mermaid_syntax = mermaid_syntax.split("```")[0] + "```"
+        # Identical descriptions are answered from the cache; new output is validated
+        # locally and only regenerated if it is not valid Mermaid.
+        diagram = diagram_service.generate(description)
+        content = render_markdown(diagram["code"])
+
+        # Skip the write (and the re-index) if the file already holds this diagram.
+        safe_path = _get_safe_path(file_path)
+        if os.path.isfile(safe_path):
+            with open(safe_path, 'r', encoding='utf-8') as f:
+                if f.read() == content:
+                    diagram_service.record_skipped_write()
+                    return f"Mermaid diagram for this description is already saved at '{file_path}'. No changes were made."
 
         print(f"--- [Tool] Syntax generated. Writing to file: '{file_path}' ---")
         
         # Use our existing, secure write_file tool to save the output
-        write_result = write_file(path=file_path, content=mermaid_syntax)
+        write_result = write_file.invoke({"path": file_path, "content": content})
         
+        if diagram["warnings"]:
+            return (f"Mermaid diagram syntax generated and saved, but it may not render. Validation warnings: "
+                    f"{'; '.join(diagram['warnings'])}. File system response: '{write_result}'")
         return f"Mermaid diagram syntax generated and saved. File system response: '{write_result}'"
         
+    except DiagramGenerationError as e:
+        return f"Could not generate a Mermaid diagram: {e}"
     except Exception as e:
         return f"An error occurred during Mermaid diagram generation: {e}"
 # This file will contain the implementation of the core, custom-wrapped tools
@@ -165,11 +260,12 @@ def generate_mermaid_syntax(description: str, file_path: str) -> str:
 
 # --- Tool 1: Advanced Web Search ---
 
-# First, we initialize the base tool from the community library.
-# We do this once here so it can be reused.
-_search_tool_instance = DuckDuckGoSearchRun()
+# Searches go through a persistent result cache with in-flight deduplication
+# (see tools/search_cache.py), which wraps the DuckDuckGo tool from the community library.
+from tools.search_cache import cached_search
 
 @tool
+@tracer.traced("tool.advanced_web_search", kind="tool", record_io=True)
 def advanced_web_search(query: str) -> str:
     """
     Performs a web search using DuckDuckGo to find information on a given topic.
@@ -180,21 +276,24 @@ def advanced_web_search(query: str) -> str:
     """
     print(f"--- [Tool] Executing Web Search for: '{query}' ---")
     try:
-        # We call the .run() method of the initialized tool instance.
-        results = _search_tool_instance.run(query)
+        # Identical (normalized) queries are answered from the cache.
+        results = cached_search.search(query)
         print(f"--- [Tool] Web Search completed. ---")
         return results
     except Exception as e:
         print(f"--- [Tool] ERROR in Web Search: {e} ---")
         return f"An error occurred during the web search: {e}"
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Tool 2: Secure File I/O Suite ---
 
 # Define a dedicated, sandboxed directory for the agent's file operations.
 # This is a critical security measure to prevent the agent from accessing
 # unintended files on the host system.
-_WORKSPACE_DIR = os.path.join(os.getcwd(), "workspace")
+# Resolved, so paths derived from it match the ones _get_safe_path returns.
+_WORKSPACE_DIR = os.path.realpath(os.path.join(os.getcwd(), "workspace"))
 
 # Ensure the workspace directory exists upon module load.
 os.makedirs(_WORKSPACE_DIR, exist_ok=True)
@@ -213,21 +312,73 @@ def _get_safe_path(path: str) -> str:
     Raises:
         ValueError: If the path is outside the workspace.
     """
-    # os.path.join handles the initial path construction.
-    # os.path.normpath cleans up the path (e.g., a/b/../c -> a/c).
-    absolute_path = os.path.normpath(os.path.join(_WORKSPACE_DIR, path))
+    # os.path.realpath cleans up the path (e.g., a/b/../c -> a/c) and follows
+    # symlinks, so a link inside the workspace cannot point outside of it.
+    absolute_path = os.path.realpath(os.path.join(_WORKSPACE_DIR, path))
     
-    # The most important check: ensure the resolved path still starts with
-    # our designated WORKSPACE_DIR path.
-    if not absolute_path.startswith(_WORKSPACE_DIR):
+    # The most important check: ensure the resolved path is our designated
+    # WORKSPACE_DIR or inside it. A plain prefix check would let a sibling
+    # such as '../workspace_other' through.
+    if os.path.commonpath([_WORKSPACE_DIR, absolute_path]) != _WORKSPACE_DIR:
         raise ValueError(f"Security Error: Path '{path}' attempts to access files outside of the designated workspace.")
         
     return absolute_path
+
+# The bulk file tools (read_files / write_files) do their I/O on this pool.
+_FILE_IO_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("FILE_IO_WORKERS", 8)), thread_name_prefix="file-io"
+)
+
+def _atomic_write(safe_path: str, content: str) -> None:
+    """
+    Writes a file by writing a temporary file next to it and renaming it into
+    place, so readers (the indexer, the sandbox, the editor) never see a
+    half-written file.
+    """
+    directory = os.path.dirname(safe_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(safe_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        # mkstemp creates the file as 0600; keep the mode of the file being replaced.
+        os.chmod(temp_path, os.stat(safe_path).st_mode & 0o777 if os.path.exists(safe_path) else 0o644)
+        os.replace(temp_path, safe_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def _validate_paths(paths: List[str]) -> Dict[str, str]:
+    """
+    Resolves several workspace paths at once.
+
+    Returns:
+        A dict mapping each path to its absolute, safe path.
+
+    Raises:
+        ValueError: Listing every invalid path, if there are any.
+    """
+    resolved: Dict[str, str] = {}
+    problems = []
+    for path in paths:
+        try:
+            resolved[path] = _get_safe_path(path)
+        except ValueError as e:
+            problems.append(str(e))
+    if problems:
+        raise ValueError("\n".join(problems))
+    return resolved
+
 # Import the single-file indexer at the top of the file
 from backend.rag_components.indexer import index_file as trigger_file_index
+from backend.rag_components.indexer import index_files as trigger_files_index
+from backend.rag_components.indexer import reindex_changed_chunks
+from backend.utils.patching import PatchError, apply_patch
 
 # Find the `write_file` tool and modify it to call the indexer
 @tool
+@tracer.traced("tool.write_file", kind="tool", record_io=True)
 def write_file(path: str, content: str) -> str:
     """
     Writes content to a specified file within the secure workspace.
@@ -237,10 +388,7 @@ def write_file(path: str, content: str) -> str:
     print(f"--- [Tool] Attempting to write to file: '{path}' ---")
     try:
         safe_path = _get_safe_path(path)
-        os.makedirs(os.path.dirname(safe_path), exist_ok=True)
-        
-        with open(safe_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        _atomic_write(safe_path, content)
         
         # --- RAG INTEGRATION ---
         # After a successful write, trigger the indexing process for this file.
@@ -254,6 +402,7 @@ def write_file(path: str, content: str) -> str:
         return f"An error occurred while writing to file: {e}"
 
 @tool
+@tracer.traced("tool.read_file", kind="tool", record_io=True)
 def read_file(path: str) -> str:
     """
     Reads the entire content from a specified file within the secure workspace.
@@ -275,6 +424,135 @@ def read_file(path: str) -> str:
         return f"An error occurred while reading file: {e}"
 
 @tool
+@tracer.traced("tool.read_files", kind="tool", record_io=True)
+def read_files(paths: List[str]) -> str:
+    """
+    Reads several files from the secure workspace in one call. Prefer this over
+    calling `read_file` repeatedly when you need more than one file.
+    
+    Args:
+        paths: The relative paths of the files to read (e.g., ['src/app.py', 'src/models.py']).
+    """
+    print(f"--- [Tool] Attempting to read {len(paths)} files. ---")
+    if not paths:
+        return "Error: No paths were given."
+    try:
+        resolved = _validate_paths(paths)
+    except ValueError as e:
+        return f"Error: No files were read.\n{e}"
+
+    def _read(path: str) -> str:
+        safe_path = resolved[path]
+        if not os.path.isfile(safe_path):
+            return f"Error: File not found at path '{path}'."
+        try:
+            with open(safe_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception as e:
+            return f"An error occurred while reading file: {e}"
+
+    contents = list(_FILE_IO_POOL.map(_read, paths))
+    return "\n\n".join(f"--- File: {path} ---\n{content}" for path, content in zip(paths, contents))
+
+@tool
+@tracer.traced("tool.write_files", kind="tool", record_io=True)
+def write_files(files: Dict[str, str]) -> str:
+    """
+    Writes several files within the secure workspace in one call, e.g. to
+    scaffold a project. Missing directories are created, each file is replaced
+    atomically, and all written files are indexed together afterwards.
+    Prefer this over calling `write_file` repeatedly.
+    
+    Args:
+        files: A mapping of relative file path to the full content of that file
+               (e.g., {'src/app.py': '...', 'README.md': '...'}).
+    """
+    print(f"--- [Tool] Attempting to write {len(files)} files. ---")
+    if not files:
+        return "Error: No files were given."
+    try:
+        resolved = _validate_paths(list(files))
+    except ValueError as e:
+        return f"Error: No files were written.\n{e}"
+    targets = list(resolved.values())
+    duplicates = sorted({path for path, safe_path in resolved.items() if targets.count(safe_path) > 1})
+    if duplicates:
+        return f"Error: No files were written. These paths refer to the same file: {', '.join(duplicates)}"
+
+    def _write(path: str) -> str:
+        try:
+            _atomic_write(resolved[path], files[path])
+            return ""
+        except Exception as e:
+            return str(e)
+
+    errors = dict(zip(files, _FILE_IO_POOL.map(_write, files)))
+    written = [path for path, error in errors.items() if not error]
+
+    # --- RAG INTEGRATION ---
+    # One batch for all written files: a single embedding call and a single upsert.
+    if written:
+        print(f"--- [Tool] {len(written)} files written. Triggering RAG indexing... ---")
+        trigger_files_index([resolved[path] for path in written], workspace_root=_WORKSPACE_DIR)
+
+    report = [f"Successfully wrote {len(written)} of {len(files)} files and triggered indexing."]
+    report += [f"- Failed to write {path}: {error}" for path, error in errors.items() if error]
+    return "\n".join(report)
+
+@tool
+@tracer.traced("tool.edit_file", kind="tool", record_io=True)
+def edit_file(path: str, patch: str) -> str:
+    """
+    Edits a file within the secure workspace by applying a patch, so only the
+    changed lines need to be sent instead of the whole file. Use this rather
+    than `write_file` to change part of an existing file.
+    The patch is either a unified diff (with '@@ -l,n +l,n @@' hunk headers and
+    a few lines of context), or one or more blocks of the form:
+    <<<<<<< SEARCH
+    exact lines currently in the file
+    =======
+    the lines to replace them with
+    >>>>>>> REPLACE
+    Hunks are matched by their content (tolerating small differences). If any
+    hunk cannot be applied, the file is left unchanged.
+    
+    Args:
+        path: The relative path of the file to edit (e.g., 'src/app.py').
+        patch: The unified diff or SEARCH/REPLACE blocks to apply.
+    """
+    print(f"--- [Tool] Attempting to patch file: '{path}' ---")
+    try:
+        safe_path = _get_safe_path(path)
+        content = ""
+        if os.path.exists(safe_path):
+            with open(safe_path, 'r', encoding='utf-8', newline='') as f:
+                content = f.read()
+
+        new_content, summary = apply_patch(content, patch)
+        if new_content == content:
+            return f"The patch made no changes to {path}."
+        _atomic_write(safe_path, new_content)
+
+        # --- RAG INTEGRATION ---
+        # Only the chunks whose text changed are embedded again.
+        embedded, total_chunks = reindex_changed_chunks(safe_path, workspace_root=_WORKSPACE_DIR)
+
+        first, last = summary["changed_lines"]
+        file_size = len(new_content.encode('utf-8'))
+        return (
+            f"Successfully applied {summary['hunks']} hunk(s) to {path} "
+            f"(matched: {', '.join(summary['matched'])}). Changed lines {first}-{last}; "
+            f"{summary['changed_bytes']} bytes of new content in a {file_size}-byte file. "
+            f"Re-indexed {embedded} of {total_chunks} chunks."
+        )
+
+    except PatchError as e:
+        return f"Error: The patch could not be applied to {path}: {e}"
+    except Exception as e:
+        return f"An error occurred while patching file: {e}"
+
+@tool
+@tracer.traced("tool.list_files", kind="tool", record_io=True)
 def list_files(path: str = ".") -> str:
     """
     Lists all files and subdirectories within a given path inside the secure workspace.
@@ -307,6 +585,7 @@ from backend.rag_components.vector_store import collection as vector_store_colle
 # --- Tool 5: Context Retrieval (The Agent's Memory) ---
 
 @tool
+@tracer.traced("tool.retrieve_context", kind="tool", record_io=True)
 def retrieve_context(query: str, n_results: int = 5) -> str:
     """
     Searches the project's vector database to retrieve code chunks and
@@ -324,13 +603,16 @@ def retrieve_context(query: str, n_results: int = 5) -> str:
         
     try:
         # 1. Embed the query
-        query_embedding = embedding_model.encode(query).tolist()
+        with tracer.span("rag.embed_query", kind="tool"):
+            query_embedding = embedding_model.encode(query).tolist()
         
         # 2. Query ChromaDB for the most similar chunks
-        results = vector_store_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        with tracer.span("rag.vector_query", kind="tool", n_results=n_results) as span:
+            results = vector_store_collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results
+            )
+            span.set_attribute("results", len(((results or {}).get("documents") or [[]])[0]))
         
         # 3. Format the results into a single, clean string for the LLM
         context_str = "--- CONTEXTUAL INFORMATION ---\n\n"
@@ -353,60 +635,3 @@ def retrieve_context(query: str, n_results: int = 5) -> str:
         error_message = f"An error occurred while retrieving context: {e}"
         print(f"--- [Tool] ERROR: {error_message} ---")
         return error_message
-        
-import litellm
-
-# --- Tool 3: Sketching / Diagramming Tool ---
-
-# A concise prompt to instruct the LLM on how to generate Mermaid syntax.
-_MERMAID_PROMPT_TEMPLATE = """
-You are a specialist in creating diagrams. Your sole task is to convert a user's description into valid Mermaid.js syntax.
-You must only output the Mermaid code itself, inside a '```mermaid' code block. Do not include any other text, explanations, or apologies.
-
-Description:
-"{description}"
-"""
-
-@tool
-def generate_mermaid_syntax(description: str, file_path: str) -> str:
-    """
-    Takes a natural language description of a process or structure,
-    converts it into Mermaid.js diagram syntax, and saves it to a file.
-    
-    Args:
-        description: A clear description of the diagram to create 
-                     (e.g., "A flowchart with three steps: A goes to B, B goes to C").
-        file_path: The relative path within the workspace to save the .md file
-                   (e.g., 'diagrams/workflow.md').
-    """
-    print(f"--- [Tool] Generating Mermaid syntax for: '{description}' ---")
-    try:
-        # Use a fast and free LLM for this specialized task.
-        # We call litellm directly here as it's a simple, self-contained task.
-        response = litellm.completion(
-            model="fast-router", # Uses the alias from our config.yaml
-            messages=[{
-                "role": "user",
-                "content": _MERMAID_PROMPT_TEMPLATE.format(description=description)
-            }],
-            temperature=0.0
-        )
-        
-        # Extract the content from the response
-        mermaid_syntax = response.choices.message.content
-        
-        # Clean up the output to ensure it's just the code block
-        if "```mermaid" in mermaid_syntax:
-             mermaid_syntax = "```mermaid" + mermaid_syntax.split("```mermaid")[1]
-        if "```" in mermaid_syntax:
-            mermaid_syntax = mermaid_syntax.split("```")[0] + "```"
-
-        print(f"--- [Tool] Syntax generated. Writing to file: '{file_path}' ---")
-        
-        # Use our existing, secure write_file tool to save the output
-        write_result = write_file(path=file_path, content=mermaid_syntax)
-        
-        return f"Mermaid diagram syntax generated and saved. File system response: '{write_result}'"
-        
-    except Exception as e:
-        return f"An error occurred during Mermaid diagram generation: {e}"
\ No newline at end of file
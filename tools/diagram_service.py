@@ -0,0 +1,289 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import litellm
+
+from backend.llm_usage import usage_metadata
+from backend.tracing import llm_attributes, tracer
+
+# This file implements the diagram service behind the `generate_mermaid_syntax`
+# tool. Turning a description into Mermaid costs an LLM call, so:
+#
+# - Outputs are memoized by a hash of the (normalized) description and model,
+#   in a SQLite file that survives restarts.
+# - Every output is checked by a small local validator; the model is asked
+#   again (with the problems found) only when its output is invalid, and
+#   invalid output is never cached.
+# - The service counts the tokens that cache hits saved.
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+
+# --- Configuration ---
+_DIAGRAM_MODEL = os.environ.get("DIAGRAM_MODEL", "fast-router")  # An alias from our config.yaml
+_DIAGRAM_MAX_ATTEMPTS = int(os.environ.get("DIAGRAM_MAX_ATTEMPTS", 3))
+_DIAGRAM_CACHE_PATH = os.environ.get("DIAGRAM_CACHE_PATH", os.path.join(_DATA_DIR, "diagram_cache.sqlite3"))
+
+# A concise prompt to instruct the LLM on how to generate Mermaid syntax.
+_MERMAID_PROMPT_TEMPLATE = """
+You are a specialist in creating diagrams. Your sole task is to convert a user's description into valid Mermaid.js syntax.
+You must only output the Mermaid code itself, inside a '```mermaid' code block. Do not include any other text, explanations, or apologies.
+
+Description:
+"{description}"
+"""
+
+_RETRY_PROMPT_TEMPLATE = """
+Your previous output is not valid Mermaid syntax. The problems were:
+{errors}
+
+Output the corrected diagram, again only the Mermaid code inside a '```mermaid' code block.
+"""
+
+# The first keyword of each supported diagram type.
+_DIAGRAM_TYPES = {
+    "graph", "flowchart", "sequenceDiagram", "classDiagram", "stateDiagram", "stateDiagram-v2",
+    "erDiagram", "gantt", "pie", "journey", "gitGraph", "mindmap", "timeline", "quadrantChart",
+    "requirementDiagram", "C4Context", "C4Container", "C4Component", "C4Dynamic", "C4Deployment",
+    "sankey-beta", "xychart-beta", "block-beta",
+}
+_FLOWCHART_DIRECTIONS = {"TB", "TD", "BT", "RL", "LR"}
+# Keywords that open a block closed by 'end', per diagram type.
+_BLOCK_KEYWORDS = {
+    "graph": {"subgraph"},
+    "flowchart": {"subgraph"},
+    "sequenceDiagram": {"alt", "opt", "loop", "par", "critical", "break", "rect", "box"},
+}
+_BRACKETS = {"(": ")", "[": "]", "{": "}"}
+# Diagram types whose lines define nodes with bracketed shapes ('A[text]', 'B((text))').
+_NODE_SHAPE_TYPES = {"graph", "flowchart"}
+# Arrows and links (e.g. '-->', '->>', '-)', '--x', '<-->', '==>', '-.->'), and
+# ER cardinalities like '}|' or 'o{', none of which are brackets.
+_ARROWS = re.compile(r"<?[-=.]+(?:>+|\)|x\b|o\b)|<[-=.]+|[-=.]*>+|\|\{|\}\||\|o|o\||\}o|o\{")
+# Flowchart edge labels: '-->|text|'.
+_EDGE_LABEL = re.compile(r"\|[^|]*\|")
+# The asymmetric flowchart shape 'A>text]': a '>' right after a node id opens it.
+_ASYMMETRIC_SHAPE = re.compile(r"(?<=[\w])>(?=[^>\s])")
+_FENCE = re.compile(r"```(?:mermaid)?[ \t]*\n(.*?)(?:\n```|$)", re.DOTALL)
+
+
+def extract_mermaid(text: str) -> str:
+    """Returns the Mermaid code from a model's answer, with or without a ```mermaid fence."""
+    match = _FENCE.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+def _strip_strings(line: str) -> Tuple[str, bool]:
+    """Removes quoted labels from a line; the flag is False if a quote is left open."""
+    stripped = re.sub(r'"[^"]*"', '""', line)
+    return stripped, stripped.count('"') % 2 == 0
+
+
+def validate_mermaid(code: str) -> List[str]:
+    """
+    Checks Mermaid code for the mistakes models commonly make. This is not a
+    full parser: it checks the diagram type, flowchart direction, balanced
+    quotes per line, balanced brackets of flowchart node shapes, and that
+    blocks are closed by 'end' (or '}'). Free text (message and label text
+    after ':', flowchart edge labels) is not checked for brackets.
+
+    Args:
+        code: The Mermaid code, without the ``` fence.
+
+    Returns:
+        The problems found, each mentioning its line; empty if the code looks valid.
+    """
+    lines = [(number, line.strip()) for number, line in enumerate(code.splitlines(), start=1)]
+    lines = [(number, line) for number, line in lines if line and not line.startswith("%%")]
+    if not lines:
+        return ["The diagram is empty."]
+
+    header_number, header = lines[0]
+    parts = header.split()
+    diagram_type = parts[0]
+    if diagram_type not in _DIAGRAM_TYPES:
+        return [f"Line {header_number}: '{diagram_type}' is not a Mermaid diagram type (e.g. 'flowchart TD', 'sequenceDiagram')."]
+    errors: List[str] = []
+    if diagram_type in ("graph", "flowchart") and len(parts) > 1 and parts[1] not in _FLOWCHART_DIRECTIONS:
+        errors.append(f"Line {header_number}: '{parts[1]}' is not a flowchart direction (TD, TB, BT, RL or LR).")
+    if len(lines) == 1:
+        errors.append("The diagram has no content after its type.")
+
+    block_keywords = _BLOCK_KEYWORDS.get(diagram_type, set())
+    open_blocks: List[Tuple[int, str]] = []
+    open_braces: List[int] = []
+    for number, line in lines[1:]:
+        syntax = line
+        if diagram_type not in _NODE_SHAPE_TYPES:
+            # 'Bob->>Alice: Not so good :(' - what follows the first ':' is free text.
+            syntax = line.split(":", 1)[0].rstrip()
+        stripped, quotes_closed = _strip_strings(syntax)
+        if not quotes_closed:
+            errors.append(f"Line {number}: unclosed quote in '{line}'.")
+            continue
+        # Class bodies, ER entities and composite states span lines: 'class A {' ... '}'.
+        if stripped == "}":
+            if not open_braces:
+                errors.append(f"Line {number}: '}}' without an open '{{' block.")
+            else:
+                open_braces.pop()
+            continue
+        if stripped.endswith("{"):
+            open_braces.append(number)
+            stripped = stripped[:-1]
+        if diagram_type in _NODE_SHAPE_TYPES:
+            stripped = _ASYMMETRIC_SHAPE.sub("[", _EDGE_LABEL.sub(" ", stripped))
+            stripped = _ARROWS.sub(" ", stripped)
+            stack: List[str] = []
+            for char in stripped:
+                if char in _BRACKETS:
+                    stack.append(_BRACKETS[char])
+                elif char in _BRACKETS.values():
+                    if not stack or stack.pop() != char:
+                        errors.append(f"Line {number}: unbalanced '{char}' in '{line}'.")
+                        break
+            else:
+                if stack:
+                    errors.append(f"Line {number}: missing '{stack[-1]}' in '{line}'.")
+
+        keyword = line.split()[0]
+        if keyword in block_keywords:
+            open_blocks.append((number, keyword))
+        elif keyword == "end" and block_keywords:
+            if not open_blocks:
+                errors.append(f"Line {number}: 'end' without an open block.")
+            else:
+                open_blocks.pop()
+    for number, keyword in open_blocks:
+        errors.append(f"Line {number}: '{keyword}' is never closed with 'end'.")
+    for number in open_braces:
+        errors.append(f"Line {number}: '{{' is never closed with '}}'.")
+    return errors
+
+
+class DiagramGenerationError(Exception):
+    """Raised when the model does not produce any diagram within the allowed attempts."""
+
+
+class DiagramService:
+    """
+    Generates Mermaid diagrams from descriptions, memoized and validated.
+    Thread-safe.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS diagrams (
+            description_hash TEXT PRIMARY KEY,
+            description TEXT NOT NULL,
+            code TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = _DIAGRAM_CACHE_PATH, model: str = _DIAGRAM_MODEL, max_attempts: int = _DIAGRAM_MAX_ATTEMPTS):
+        self.path = path
+        self.model = model
+        self.max_attempts = max_attempts
+        self.stats = {"hits": 0, "misses": 0, "retries": 0, "invalid_outputs": 0, "writes_skipped": 0, "tokens_saved": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self._SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def description_hash(self, description: str) -> str:
+        normalized = " ".join(description.split())
+        return hashlib.sha256(f"{self.model}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += amount
+
+    def generate(self, description: str) -> Dict[str, Any]:
+        """
+        Returns the Mermaid code for a description, from the cache if possible.
+
+        Returns:
+            A dict with the `code`, whether it was `cached`, the `tokens` the
+            generation cost (or saved, for a cached diagram) and the validator's
+            `warnings`. If every attempt failed validation, the last output is
+            returned with its problems as warnings (and not cached): the
+            validator is a heuristic and may reject valid diagrams.
+
+        Raises:
+            DiagramGenerationError: If the model produced no diagram at all.
+        """
+        key = self.description_hash(description)
+        row = self._connect().execute("SELECT code, tokens FROM diagrams WHERE description_hash = ?", (key,)).fetchone()
+        tracer.set_attributes(cache_hit=bool(row))
+        if row:
+            self._count("hits")
+            self._count("tokens_saved", row[1])
+            print(f"--- [Diagrams] Cache hit; saved ~{row[1]} tokens. ---")
+            return {"code": row[0], "cached": True, "tokens": row[1], "warnings": []}
+
+        self._count("misses")
+        messages = [{"role": "user", "content": _MERMAID_PROMPT_TEMPLATE.format(description=description)}]
+        tokens = 0
+        code, errors = "", []
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._count("retries")
+            with tracer.span("llm.completion", kind="llm", model=self.model, attempt=attempt + 1) as span:
+                response = litellm.completion(model=self.model, messages=messages, temperature=0.0,
+                                              metadata=usage_metadata("diagram_service"))
+                span.set_attributes(**llm_attributes(response))
+            usage = getattr(response, "usage", None)
+            tokens += getattr(usage, "total_tokens", 0) or 0
+            answer = response.choices[0].message.content or ""
+            code = extract_mermaid(answer)
+            errors = validate_mermaid(code)
+            if not errors:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO diagrams (description_hash, description, code, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, description, code, tokens, time.time()),
+                    )
+                return {"code": code, "cached": False, "tokens": tokens, "warnings": []}
+
+            self._count("invalid_outputs")
+            print(f"--- [Diagrams] Attempt {attempt + 1} produced invalid Mermaid: {errors[0]} ---")
+            messages += [
+                {"role": "assistant", "content": answer},
+                {"role": "user", "content": _RETRY_PROMPT_TEMPLATE.format(errors="\n".join(f"- {e}" for e in errors))},
+            ]
+        if not code:
+            raise DiagramGenerationError(f"No diagram after {self.max_attempts} attempts.")
+        print(f"--- [Diagrams] Warning: keeping the last output despite {len(errors)} validation problem(s). ---")
+        return {"code": code, "cached": False, "tokens": tokens, "warnings": errors}
+
+    def record_skipped_write(self) -> None:
+        """Counts a save that was skipped because the file already held the diagram."""
+        self._count("writes_skipped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
+
+
+def render_markdown(code: str) -> str:
+    """Wraps Mermaid code in the fenced block that is saved to the workspace."""
+    return f"```mermaid\n{code}\n```\n"
+
+
+# A single instance for the application to import and use.
+diagram_service = DiagramService()
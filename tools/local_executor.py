@@ -0,0 +1,333 @@
+import math
+import multiprocessing
+import os
+import re
+import resource
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# This file implements the local fast path of `execute_in_sandbox`. Starting a
+# Docker container costs 0.5-2s, which dominates short commands such as
+# `python -c ...`, `ls`, `cat` or a single unit test. Those can instead run as
+# restricted subprocesses on the host:
+#
+# - A policy (`choose_backend`) decides per command: only runs marked as
+#   trusted, and only simple read-mostly commands from an allowlist whose paths
+#   stay inside the workspace, use the local backend. Everything else (installs,
+#   pipelines, redirections, network tools) still runs in Docker.
+# - Commands are launched from a pool of pre-warmed worker processes started
+#   with the forkserver method. The workers are single-threaded, so they can
+#   safely apply rlimits (CPU time, data size, file size, open files) between
+#   fork and exec, and each one reports its child's exact resource usage (wait4).
+# - If bubblewrap (`bwrap`) is installed, the command additionally runs in new
+#   namespaces with only the system directories (read-only) and the workspace
+#   bind-mounted, at the same path as in the Docker sandbox. Without it, the
+#   policy and the rlimits are the only restrictions, so the policy is stricter:
+#   interpreters (`python`, `node`), which could do anything as the API's user,
+#   stay in Docker, as do shell patterns, whose matches cannot be checked.
+# - Path arguments, and values attached to options, are resolved with their
+#   symbolic links, so a link in the workspace cannot lead a command outside of
+#   it. Options that make a program follow the links it finds while recursing,
+#   or read or write files other than its operands (`sort -o`, `grep -f`), are
+#   refused.
+
+# --- Configuration ---
+# "docker" (always), "local" (whenever the policy allows, for any run) or
+# "auto" (the policy decides, for trusted runs only).
+_SANDBOX_BACKEND = os.environ.get("SANDBOX_BACKEND", "auto")
+_LOCAL_EXECUTOR_WORKERS = int(os.environ.get("LOCAL_EXECUTOR_WORKERS", 4))
+# "auto" (bubblewrap if installed), "bwrap" (required) or "none". Without
+# bubblewrap, interpreters never run locally (see `is_lightweight_command`).
+_LOCAL_EXECUTOR_ISOLATION = os.environ.get("LOCAL_EXECUTOR_ISOLATION", "auto")
+_LOCAL_EXECUTOR_MAX_FILE_BYTES = int(float(os.environ.get("LOCAL_EXECUTOR_MAX_FILE_MB", 256)) * 1024 ** 2)
+
+_SANDBOX_WORKSPACE = "/home/agentuser/workspace"
+_SIMPLE_COMMANDS = {"ls", "cat", "head", "tail", "wc", "grep", "find", "echo", "pwd", "true", "stat", "du", "diff", "sort", "uniq"}
+# Command substitution and line breaks (which separate commands) are rejected
+# even inside quotes; operators outside quotes are found by the tokenizer.
+_SUBSTITUTION = re.compile(r"`|\$\(|\$\{|[\n\r\\]")
+_OPERATOR_CHARS = set(";&|<>()")
+_FIND_ACTIONS = {"-exec", "-execdir", "-delete", "-ok", "-okdir", "-fprint", "-fprint0", "-fprintf", "-fls", "-files0-from"}
+# The options with which a program reads or writes files other than its operands, or runs another program.
+_FILE_OPTIONS = {
+    "sort": ("-o", "--output", "-T", "--temporary-directory", "--files0-from", "--compress-program", "--random-source"),
+    "grep": ("-f", "--file", "--exclude-from"),
+    "diff": ("-X", "--exclude-from", "--from-file", "--to-file"),
+    "du": ("-X", "--exclude-from", "--files0-from"),
+    "wc": ("--files0-from",),
+}
+_SYSTEM_DIRS = ("/usr", "/bin", "/lib", "/lib64", "/lib32", "/sbin", "/etc")
+_INTERPRETERS = ("python", "python3", "node")
+_GLOB = re.compile(r"[*?\[]")
+# The options with which a program follows the symbolic links it finds in the directories it is given:
+# a single-letter flag (which may be bundled, as in `-Rn`) and its long form.
+_FOLLOWS_LINKS = {"grep": ("R", "--dereference-recursive"), "ls": ("L", "--dereference"),
+                  "du": ("L", "--dereference"), "diff": ("r", "--recursive")}
+
+
+def _leaves_workspace(arg: str, workspace_dir: Optional[str]) -> bool:
+    if arg.startswith(("/", "~")) or ".." in arg.split("/"):
+        return True
+    if workspace_dir is None:
+        return False
+    # Symbolic links are resolved: `cat link` must not read what a link to /etc/passwd points to.
+    workspace_dir = os.path.realpath(workspace_dir)
+    return os.path.commonpath([workspace_dir, os.path.realpath(os.path.join(workspace_dir, arg))]) != workspace_dir
+
+
+def _option_values(arg: str) -> List[str]:
+    """
+    Returns what an option may carry as an attached value: the part after
+    `=` of `--option=value`, and every suffix of a short option, since any
+    of its letters may take the rest of the word as its value (`-o/tmp/x`).
+    """
+    if arg.startswith("--"):
+        return [arg.split("=", 1)[1]] if "=" in arg else []
+    if arg.startswith("-"):
+        return [arg[i:] for i in range(2, len(arg))]
+    return []
+
+
+def _uses_file_options(program: str, args: List[str]) -> bool:
+    for option in _FILE_OPTIONS.get(program, ()):
+        for arg in args:
+            if option.startswith("--"):
+                # GNU programs accept any unambiguous prefix of a long option, such as `--out` for `--output`.
+                name = arg.split("=", 1)[0]
+                if len(name) > 2 and name.startswith("--") and option.startswith(name):
+                    return True
+            elif arg.startswith("-") and not arg.startswith("--") and option[1] in arg[1:]:
+                return True
+    return False
+
+
+def _follows_links(program: str, args: List[str]) -> bool:
+    if program == "find":
+        return bool({"-L", "-follow"} & set(args))
+    if program not in _FOLLOWS_LINKS:
+        return False
+    flag, option = _FOLLOWS_LINKS[program]
+    return any(arg == option or (arg.startswith("-") and not arg.startswith("--") and flag in arg[1:]) for arg in args)
+
+
+def is_lightweight_command(command: str, workspace_dir: Optional[str] = None, isolated: bool = False) -> bool:
+    """
+    Returns True if a command is simple enough for the local backend: a
+    single allowlisted program without pipes, redirections, chaining or
+    substitutions, whose arguments (including values attached to options) do
+    not refer to paths outside the workspace, and without the options that
+    read or write other files.
+
+    Args:
+        command: The shell command.
+        workspace_dir: The workspace on the host; if given, the arguments are
+            also resolved in it, following symbolic links.
+        isolated: Whether the command would run in bubblewrap. Without it,
+            interpreters and shell patterns are refused.
+    """
+    if _SUBSTITUTION.search(command):
+        return False
+    try:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        words = list(lexer)
+    except ValueError:
+        return False
+    if not words or "=" in words[0]:
+        return False
+    # With punctuation_chars, operators outside quotes come out as tokens of their own.
+    if any(word and set(word) <= _OPERATOR_CHARS for word in words):
+        return False
+    program, args = words[0], words[1:]
+    # Paths can also be attached to options, as in `--from-file=/etc/hostname`.
+    paths = args + [value for arg in args for value in _option_values(arg)]
+    if any(_leaves_workspace(path, workspace_dir) for path in paths if path):
+        return False
+    if _follows_links(program, args) or _uses_file_options(program, args):
+        return False
+    if not isolated and (program in _INTERPRETERS or any(_GLOB.search(word) for word in words)):
+        return False
+    if program in _SIMPLE_COMMANDS:
+        return not (program == "find" and _FIND_ACTIONS & set(args))
+    if program in ("python", "python3"):
+        # `python -c ...`, a script, or the test runners; never pip or other -m modules.
+        if not args:
+            return False
+        if args[0] == "-m":
+            return len(args) > 1 and args[1] in ("pytest", "unittest")
+        return args[0] == "-c" or args[0].endswith(".py")
+    if program == "node":
+        return bool(args) and (args[0] == "-e" or args[0].endswith((".js", ".mjs", ".cjs")))
+    return False
+
+
+def choose_backend(command: str, trust: str, has_dependencies: bool = False, backend: str = _SANDBOX_BACKEND,
+                   workspace_dir: Optional[str] = None, isolated: bool = False) -> str:
+    """
+    Decides where a command runs.
+
+    Args:
+        command: The shell command.
+        trust: The run's trust level ("trusted" or "untrusted").
+        has_dependencies: Whether the workspace declares dependencies; they are
+            only installed in the sandbox, so `python` and `node` then stay in Docker.
+        backend: The SANDBOX_BACKEND setting ("auto", "docker" or "local").
+        workspace_dir: The workspace on the host, to resolve path arguments in.
+        isolated: Whether the local backend runs commands in bubblewrap
+            (`LocalExecutor.isolation`); without it, interpreters stay in Docker.
+
+    Returns:
+        "local" or "docker".
+    """
+    if backend == "docker" or not is_lightweight_command(command, workspace_dir, isolated):
+        return "docker"
+    if has_dependencies and shlex.split(command)[0] in _INTERPRETERS:
+        return "docker"
+    if backend == "local" or (trust == "trusted" and backend == "auto"):
+        return "local"
+    return "docker"
+
+
+def _bwrap_prefix(workspace_dir: str) -> List[str]:
+    prefix = ["bwrap", "--unshare-all", "--die-with-parent", "--new-session", "--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp"]
+    for directory in _SYSTEM_DIRS:
+        if os.path.isdir(directory):
+            prefix += ["--ro-bind", directory, directory]
+    return prefix + ["--bind", workspace_dir, _SANDBOX_WORKSPACE, "--chdir", _SANDBOX_WORKSPACE, "--setenv", "HOME", "/tmp"]
+
+
+def _run_restricted(argv: List[str], cwd: str, env: Dict[str, str], limits: Dict[str, Any], max_file_bytes: int) -> Dict[str, Any]:
+    """
+    Runs one command with rlimits and returns its result and exact resource
+    usage. Executed inside a pool worker, which is single-threaded.
+    """
+    cpu_seconds = max(1, math.ceil(limits["timeout_seconds"] * limits["cpus"]))
+
+    def _apply_limits():
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        resource.setrlimit(resource.RLIMIT_DATA, (limits["memory"], limits["memory"]))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (max_file_bytes, max_file_bytes))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (1024, 1024))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            argv, cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr,
+            preexec_fn=_apply_limits, start_new_session=True,
+        )
+        timed_out = threading.Event()
+
+        def _kill():
+            timed_out.set()
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        timer = threading.Timer(limits["timeout_seconds"], _kill)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+        duration = time.perf_counter() - started
+        stdout.seek(0)
+        stderr.seek(0)
+        return {
+            "exit_code": process.returncode,
+            "stdout": stdout.read().decode("utf-8", errors="replace"),
+            "stderr": stderr.read().decode("utf-8", errors="replace"),
+            "timed_out": timed_out.is_set(),
+            "duration": duration,
+            "usage": {
+                "cpu_seconds": usage.ru_utime + usage.ru_stime,
+                "peak_rss_bytes": usage.ru_maxrss * 1024,  # Reported in KiB on Linux.
+                "io_read_bytes": usage.ru_inblock * 512,
+                "io_write_bytes": usage.ru_oublock * 512,
+            },
+        }
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+class LocalExecutor:
+    """
+    Runs commands as restricted subprocesses from a pool of pre-warmed
+    forkserver workers. Thread-safe.
+    """
+
+    def __init__(self, workers: int = _LOCAL_EXECUTOR_WORKERS, isolation: str = _LOCAL_EXECUTOR_ISOLATION,
+                 max_file_bytes: int = _LOCAL_EXECUTOR_MAX_FILE_BYTES):
+        self.workers = workers
+        self.max_file_bytes = max_file_bytes
+        use_bwrap = isolation == "bwrap" or (isolation == "auto" and shutil.which("bwrap") is not None)
+        if isolation == "bwrap" and shutil.which("bwrap") is None:
+            raise RuntimeError("LOCAL_EXECUTOR_ISOLATION is 'bwrap' but bubblewrap is not installed.")
+        self.isolation = "bwrap" if use_bwrap else "none"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Starts the worker pool on first use and waits until every worker is up."""
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context("forkserver")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                for future in [self._pool.submit(_warm) for _ in range(self.workers)]:
+                    future.result()
+                print(f"--- [LocalExecutor] {self.workers} workers ready (isolation: {self.isolation}). ---")
+            return self._pool
+
+    def warm(self) -> None:
+        """Starts the workers ahead of the first command, unless SANDBOX_BACKEND is 'docker'."""
+        if _SANDBOX_BACKEND != "docker":
+            self._get_pool()
+
+    def run(self, command: str, workspace_dir: str, limits: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Runs a shell command in the workspace.
+
+        Args:
+            command: The command; it should have passed `is_lightweight_command`.
+            workspace_dir: The workspace on the host.
+            limits: The run's limits (see tools/sandbox_resources.py); `pids` has
+                no rlimit equivalent and only applies in Docker.
+
+        Returns:
+            A dict with the `exit_code`, `stdout`, `stderr`, whether it
+            `timed_out`, the `duration` and the `usage`. Paths in the workspace
+            appear as in the Docker sandbox, under /home/agentuser/workspace.
+        """
+        env = {"PATH": os.environ.get("PATH", "/usr/local/bin:/usr/bin:/bin"), "LANG": "C.UTF-8", "PYTHONDONTWRITEBYTECODE": "1"}
+        argv = ["/bin/sh", "-c", command]
+        if self.isolation == "bwrap":
+            argv = _bwrap_prefix(workspace_dir) + argv
+        else:
+            env["HOME"] = workspace_dir
+        result = self._get_pool().submit(_run_restricted, argv, workspace_dir, env, limits, self.max_file_bytes).result()
+        if self.isolation == "none":
+            # So the error parser and the agents see the same paths as with Docker.
+            for stream in ("stdout", "stderr"):
+                result[stream] = result[stream].replace(workspace_dir, _SANDBOX_WORKSPACE)
+        return result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+# A single instance for the application to import and use.
+local_executor = LocalExecutor()
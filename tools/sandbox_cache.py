@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+# This file manages the persistent dependency caches mounted into sandbox
+# containers. Every container starts from the same clean image, so without
+# them each `pip install -r requirements.txt` or `npm install` downloads and
+# builds everything again. The caches are host directories under
+# SANDBOX_CACHE_DIR, bind-mounted into every container:
+#
+# - pip/                       the pip wheel and HTTP cache (PIP_CACHE_DIR)
+# - npm/                       the npm cache (npm_config_cache)
+# - node_modules/<lock hash>   the project's node_modules, keyed by the hash of
+#                              package-lock.json (or package.json)
+# - venvs/<requirements hash>  a virtualenv, keyed by the hash of
+#                              requirements.txt, activated for every command
+#
+# Each of these is a cache entry. When their total size exceeds
+# SANDBOX_CACHE_MAX_GB, the least recently used entries that no running
+# container is using are deleted. Hits (a keyed entry that already existed)
+# and misses are counted per kind.
+#
+# For working offline, SANDBOX_PACKAGE_MIRROR can point to a directory of
+# wheels and sdists (e.g. filled with `pip download -d <dir> -r requirements.txt`);
+# it is mounted read-only and pip installs from it instead of PyPI.
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+
+# --- Configuration ---
+_SANDBOX_CACHE_ENABLED = os.environ.get("SANDBOX_CACHE_ENABLED", "true").lower() == "true"
+_SANDBOX_CACHE_DIR = os.environ.get("SANDBOX_CACHE_DIR", os.path.join(_DATA_DIR, "sandbox_cache"))
+_SANDBOX_CACHE_MAX_BYTES = int(float(os.environ.get("SANDBOX_CACHE_MAX_GB", 10)) * 1024 ** 3)
+_SANDBOX_PACKAGE_MIRROR = os.environ.get("SANDBOX_PACKAGE_MIRROR")
+
+_HOME = "/home/agentuser"
+_WORKSPACE = f"{_HOME}/workspace"
+_VENV = f"{_HOME}/venv"
+_MIRROR = f"{_HOME}/package-mirror"
+_IMAGE_NODE_MODULES = f"{_HOME}/deps/node_modules"
+_INDEX_FILE = "index.json"
+# The caches keyed by a manifest hash, for which hits and misses are counted.
+_KEYED_KINDS = ("node_modules", "venv")
+
+
+def _hash_files(paths: List[str]) -> Optional[str]:
+    """Returns a short hash of the contents of the first existing file, or None if none exists."""
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()[:16]
+        except OSError:
+            continue
+    return None
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class CacheLease:
+    """The caches mounted into one container; return it with `SandboxCacheManager.release`."""
+
+    def __init__(self, entries: List[str], volumes: Dict[str, Dict[str, str]], environment: Dict[str, str], setup: str):
+        self.entries = entries
+        self.volumes = volumes
+        self.environment = environment
+        self.setup = setup
+
+    def wrap(self, command: str) -> str:
+        """Returns the command prefixed with the setup the caches need (e.g. activating the virtualenv)."""
+        return f"{self.setup}{command}" if self.setup else command
+
+
+class SandboxCacheManager:
+    """
+    Hands out cache mounts to sandbox containers and evicts the least recently
+    used caches when they grow too large. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        root: str = _SANDBOX_CACHE_DIR,
+        max_bytes: int = _SANDBOX_CACHE_MAX_BYTES,
+        mirror: Optional[str] = _SANDBOX_PACKAGE_MIRROR,
+        enabled: bool = _SANDBOX_CACHE_ENABLED,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.mirror = os.path.abspath(mirror) if mirror else None
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._in_use: Dict[str, int] = {}
+        # Sizes are measured (and eviction runs) off the request path, one scan at a time.
+        self._scanner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sandbox-cache")
+        self._index = self._load_index()
+
+    # --- Index ---
+
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.root, _INDEX_FILE), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            index = {}
+        index.setdefault("entries", {})
+        stats = index.setdefault("stats", {})
+        for name in ("hits", "misses"):
+            stats.setdefault(name, {kind: 0 for kind in _KEYED_KINDS})
+        stats.setdefault("evictions", 0)
+        stats.setdefault("bytes_evicted", 0)
+        return index
+
+    def _save_index(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, _INDEX_FILE)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, path)
+
+    def _use_entry(self, entry: str, kind: str) -> str:
+        """Marks an entry as used now and returns its directory, creating it on a miss."""
+        path = os.path.join(self.root, entry)
+        existed = os.path.isdir(path) and bool(os.listdir(path))
+        if kind in _KEYED_KINDS:
+            self._index["stats"]["hits" if existed else "misses"][kind] += 1
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+            # The sandbox user is not the host user that created the directory.
+            os.chmod(path, 0o777)
+        record = self._index["entries"].setdefault(entry, {"kind": kind, "size": 0, "created_at": time.time()})
+        record["last_used"] = time.time()
+        self._in_use[entry] = self._in_use.get(entry, 0) + 1
+        return path
+
+    # --- Leases ---
+
+    def acquire(self, workspace_dir: str, image_provides: Sequence[str] = ()) -> CacheLease:
+        """
+        Returns the cache mounts for a container that runs in `workspace_dir`.
+
+        Args:
+            workspace_dir: The workspace on the host, whose manifests select the keyed caches.
+            image_provides: The dependencies the container's image already has
+                installed (see tools/sandbox_images.py): with "venv" the image's
+                virtualenv is used instead of a cached one, and with
+                "node_modules" an empty node_modules cache is seeded from the image.
+        """
+        if not self.enabled:
+            return CacheLease([], {}, {}, "")
+
+        volumes: Dict[str, Dict[str, str]] = {}
+        environment: Dict[str, str] = {}
+        setup = ""
+        entries: List[str] = []
+        with self._lock:
+            pip_dir = self._use_entry("pip", "pip")
+            npm_dir = self._use_entry("npm", "npm")
+            entries += ["pip", "npm"]
+            volumes[pip_dir] = {"bind": f"{_HOME}/.cache/pip", "mode": "rw"}
+            volumes[npm_dir] = {"bind": f"{_HOME}/.npm", "mode": "rw"}
+            environment.update({"PIP_CACHE_DIR": f"{_HOME}/.cache/pip", "npm_config_cache": f"{_HOME}/.npm"})
+
+            if os.path.isfile(os.path.join(workspace_dir, "package.json")):
+                lock_hash = _hash_files([os.path.join(workspace_dir, name) for name in ("package-lock.json", "package.json")])
+                entry = f"node_modules/{lock_hash}"
+                volumes[self._use_entry(entry, "node_modules")] = {"bind": f"{_WORKSPACE}/node_modules", "mode": "rw"}
+                entries.append(entry)
+                if "node_modules" in image_provides:
+                    setup += f"[ -n \"$(ls -A node_modules 2>/dev/null)\" ] || cp -a {_IMAGE_NODE_MODULES}/. node_modules/; "
+
+            requirements_hash = _hash_files([os.path.join(workspace_dir, "requirements.txt")])
+            if requirements_hash and "venv" in image_provides:
+                setup += f". {_VENV}/bin/activate; "
+            elif requirements_hash:
+                entry = f"venvs/{requirements_hash}"
+                volumes[self._use_entry(entry, "venv")] = {"bind": _VENV, "mode": "rw"}
+                entries.append(entry)
+                # --system-site-packages keeps the tools preinstalled in the image (pytest, coverage) visible.
+                setup += f"[ -x {_VENV}/bin/python ] || python -m venv --system-site-packages {_VENV} >/dev/null; . {_VENV}/bin/activate; "
+            self._save_index()
+
+        if self.mirror and os.path.isdir(self.mirror):
+            volumes[self.mirror] = {"bind": _MIRROR, "mode": "ro"}
+            environment.update({"PIP_FIND_LINKS": _MIRROR, "PIP_NO_INDEX": "1", "npm_config_prefer_offline": "true"})
+        return CacheLease(entries, volumes, environment, setup)
+
+    def release(self, lease: CacheLease) -> None:
+        """Returns a lease once its container has finished; re-measures the caches it used and evicts if needed."""
+        if not lease.entries:
+            return
+        with self._lock:
+            for entry in lease.entries:
+                self._in_use[entry] -= 1
+                if not self._in_use[entry]:
+                    del self._in_use[entry]
+        self._scanner.submit(self._measure_and_evict, lease.entries)
+
+    def _measure_and_evict(self, entries: List[str]) -> None:
+        try:
+            sizes = {entry: _directory_size(os.path.join(self.root, entry)) for entry in entries}
+            with self._lock:
+                for entry, size in sizes.items():
+                    if entry in self._index["entries"]:
+                        self._index["entries"][entry]["size"] = size
+                self._evict_locked()
+                self._save_index()
+        except Exception as e:
+            print(f"--- [SandboxCache] Warning: could not update the cache index: {e} ---")
+
+    def _evict_locked(self) -> None:
+        records = self._index["entries"]
+        total = sum(record["size"] for record in records.values())
+        # Least recently used first; entries mounted in a running container are kept.
+        for entry in sorted(records, key=lambda name: records[name].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if entry in self._in_use:
+                continue
+            size = records[entry]["size"]
+            shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+            del records[entry]
+            total -= size
+            self._index["stats"]["evictions"] += 1
+            self._index["stats"]["bytes_evicted"] += size
+            print(f"--- [SandboxCache] Evicted '{entry}' ({size / 1024 ** 2:.1f} MB). ---")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            records = self._index["entries"]
+            stats = self._index["stats"]
+            return {
+                "enabled": self.enabled,
+                "size_bytes": sum(record["size"] for record in records.values()),
+                "max_bytes": self.max_bytes,
+                "entries": {entry: dict(record, in_use=entry in self._in_use) for entry, record in records.items()},
+                "hits": dict(stats["hits"]),
+                "misses": dict(stats["misses"]),
+                "evictions": stats["evictions"],
+                "bytes_evicted": stats["bytes_evicted"],
+                "mirror": self.mirror,
+            }
+
+
+# A single instance for the application to import and use.
+sandbox_caches = SandboxCacheManager()
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import docker
+
+# This file manages the sandbox images. The base image (agentic_sandbox:latest,
+# built from ./sandbox) is generic; a project's dependencies would have to be
+# installed in every fresh container. So for every set of dependency manifests
+# in the workspace (requirements.txt, package.json and lock files) a derived
+# image is built on top of the base image, with the dependencies preinstalled:
+#
+# - Python packages in a virtualenv at /home/agentuser/venv.
+# - node_modules at /home/agentuser/deps/node_modules, copied into the
+#   workspace's (cached) node_modules on first use, since the workspace is a
+#   bind mount that hides anything the image puts there.
+#
+# Derived images are tagged by a hash of the manifests, so they are reused
+# across runs and restarts. Builds run in the background: as soon as step 12a
+# produces the task list, and whenever the workspace watcher sees a manifest change.
+# Commands never wait for a derived image; until it is ready they run on the
+# base image (the dependency caches of tools/sandbox_cache.py still apply).
+
+# --- Configuration ---
+_DOCKER_IMAGE_NAME = "agentic_sandbox:latest"
+_SANDBOX_BUILD_CONTEXT = os.environ.get("SANDBOX_BUILD_CONTEXT", "./sandbox")
+_SANDBOX_PREBUILD_ENABLED = os.environ.get("SANDBOX_PREBUILD_ENABLED", "true").lower() == "true"
+# How many derived images are kept; older ones are removed after a build.
+_SANDBOX_IMAGES_KEPT = int(os.environ.get("SANDBOX_IMAGES_KEPT", 5))
+
+# Files whose contents determine the derived image.
+MANIFESTS = ("requirements.txt", "package.json", "package-lock.json", "yarn.lock", "pnpm-lock.yaml")
+_DERIVED_REPOSITORY = _DOCKER_IMAGE_NAME.split(":")[0]
+_MANIFEST_LABEL = "agentic.manifest_hash"
+_DEPS_DIR = "/home/agentuser/deps"
+_VENV = "/home/agentuser/venv"
+
+# Initialize the Docker client from the environment.
+try:
+    docker_client = docker.from_env()
+except docker.errors.DockerException:
+    print("--- [Tool] WARNING: Docker is not running or accessible. The 'execute_in_sandbox' tool will not be available.")
+    docker_client = None
+
+
+def manifest_hash(workspace_dir: str) -> Optional[str]:
+    """
+    Returns a hash of the dependency manifests in the workspace root, or None
+    if the project declares no dependencies (no requirements.txt or package.json).
+    """
+    digest = hashlib.sha256()
+    found = []
+    for name in MANIFESTS:
+        try:
+            with open(os.path.join(workspace_dir, name), "rb") as f:
+                content = f.read()
+        except OSError:
+            continue
+        found.append(name)
+        digest.update(f"{name}\0{len(content)}\0".encode("utf-8"))
+        digest.update(content)
+    if "requirements.txt" not in found and "package.json" not in found:
+        return None
+    return digest.hexdigest()[:16]
+
+
+def _dockerfile(base_image: str, present: Tuple[str, ...], key: str) -> str:
+    lines = [f"FROM {base_image}", f"LABEL {_MANIFEST_LABEL}={key}", f"WORKDIR {_DEPS_DIR}"]
+    if "requirements.txt" in present:
+        lines += [
+            f"COPY requirements.txt {_DEPS_DIR}/",
+            # --system-site-packages keeps the tools preinstalled in the base image (pytest, coverage) visible.
+            f"RUN python -m venv --system-site-packages {_VENV} && {_VENV}/bin/pip install --no-cache-dir -r requirements.txt",
+        ]
+    if "package.json" in present:
+        node_files = [name for name in present if name not in ("requirements.txt",)]
+        lines += [
+            f"COPY {' '.join(node_files)} {_DEPS_DIR}/",
+            "RUN (npm ci || npm install) && npm cache clean --force",
+        ]
+    lines.append("WORKDIR /home/agentuser/workspace")
+    return "\n".join(lines) + "\n"
+
+
+class SandboxImageManager:
+    """
+    Builds the base sandbox image and the per-project derived images, and picks
+    the image each command runs in. Thread-safe; builds of the same image are
+    deduplicated.
+    """
+
+    def __init__(self, client: Any = docker_client, build_context: str = _SANDBOX_BUILD_CONTEXT,
+                 enabled: bool = _SANDBOX_PREBUILD_ENABLED, images_kept: int = _SANDBOX_IMAGES_KEPT):
+        self.client = client
+        self.build_context = build_context
+        self.enabled = enabled
+        self.images_kept = images_kept
+        self.stats = {"builds": 0, "build_failures": 0, "derived_runs": 0, "base_runs": 0, "build_seconds": 0.0}
+        self._builds: Dict[str, Future] = {}
+        self._failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._base_lock = threading.Lock()
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sandbox-image")
+
+    def _image_exists(self, tag: str) -> bool:
+        try:
+            self.client.images.get(tag)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+
+    def _once(self, key: str, build: Any) -> Future:
+        """Returns the Future of the build under `key`, starting it on the builder thread if none is running."""
+        with self._lock:
+            future = self._builds.get(key)
+            if future is None or future.done() and future.exception() is not None:
+                future = self._builder.submit(build)
+                self._builds[key] = future
+            return future
+
+    # --- Base image ---
+
+    def ensure_base(self) -> None:
+        """Builds the base image if it does not exist yet, blocking until it does."""
+        if self._image_exists(_DOCKER_IMAGE_NAME):
+            return
+        # Built on the caller's thread: waiting behind a derived image build would defeat the point.
+        with self._base_lock:
+            if self._image_exists(_DOCKER_IMAGE_NAME):
+                return
+            print(f"--- [Tool] Sandbox image '{_DOCKER_IMAGE_NAME}' not found. Building now...")
+            try:
+                self.client.images.build(path=self.build_context, tag=_DOCKER_IMAGE_NAME, rm=True)
+                print(f"--- [Tool] Sandbox image built successfully. ---")
+            except docker.errors.BuildError as e:
+                print(f"--- [Tool] CRITICAL ERROR: Could not build Docker image. Error: {e}")
+                raise
+
+    # --- Derived images ---
+
+    def derived_tag(self, key: str) -> str:
+        return f"{_DERIVED_REPOSITORY}:deps-{key}"
+
+    def prebuild_async(self, workspace_dir: str) -> Optional[Future]:
+        """
+        Starts building the derived image for the workspace's current manifests
+        in the background, unless it exists or is being built.
+
+        Returns:
+            The build's Future, or None if there is nothing to build.
+        """
+        if not self.client or not self.enabled:
+            return None
+        key = manifest_hash(workspace_dir)
+        if key is None or key in self._failed:
+            return None
+        tag = self.derived_tag(key)
+        with self._lock:
+            future = self._builds.get(key)
+        if future is not None and (not future.done() or future.exception() is None):
+            return future
+        if self._image_exists(tag):
+            return None
+        # The manifests are copied now, so later edits do not leak into this build.
+        context = tempfile.mkdtemp(prefix="sandbox-deps-")
+        present = tuple(name for name in MANIFESTS if os.path.isfile(os.path.join(workspace_dir, name)))
+        for name in present:
+            shutil.copy2(os.path.join(workspace_dir, name), os.path.join(context, name))
+        print(f"--- [SandboxImages] Prebuilding '{tag}' for {', '.join(present)} in the background. ---")
+        return self._once(key, lambda: self._build_derived(key, tag, context, present))
+
+    def _build_derived(self, key: str, tag: str, context: str, present: Tuple[str, ...]) -> str:
+        started = time.perf_counter()
+        try:
+            self.ensure_base()
+            with open(os.path.join(context, "Dockerfile"), "w", encoding="utf-8") as f:
+                f.write(_dockerfile(_DOCKER_IMAGE_NAME, present, key))
+            self.client.images.build(path=context, tag=tag, rm=True, labels={_MANIFEST_LABEL: key})
+        except Exception as e:
+            with self._lock:
+                self.stats["build_failures"] += 1
+                # A failing manifest is not rebuilt over and over; commands keep using the base image.
+                self._failed[key] = str(e)
+            print(f"--- [SandboxImages] Could not build '{tag}': {e} ---")
+            raise
+        finally:
+            shutil.rmtree(context, ignore_errors=True)
+        with self._lock:
+            self.stats["builds"] += 1
+            self.stats["build_seconds"] += time.perf_counter() - started
+        print(f"--- [SandboxImages] '{tag}' is ready ({time.perf_counter() - started:.0f}s). ---")
+        self._prune()
+        return tag
+
+    def _prune(self) -> None:
+        """Removes the oldest derived images beyond SANDBOX_IMAGES_KEPT."""
+        try:
+            images = self.client.images.list(filters={"label": _MANIFEST_LABEL})
+            images.sort(key=lambda image: image.attrs.get("Created", ""), reverse=True)
+            for image in images[self.images_kept:]:
+                self.client.images.remove(image.id, force=False)
+        except docker.errors.APIError as e:
+            print(f"--- [SandboxImages] Warning: could not prune old images: {e} ---")
+
+    # --- Selection ---
+
+    def image_for(self, workspace_dir: str) -> Tuple[str, Tuple[str, ...]]:
+        """
+        Returns the image a command in this workspace should run in, without
+        waiting for any derived image build (one is started if needed).
+
+        Returns:
+            The image tag, and what it provides beyond the base image
+            ("venv" and/or "node_modules").
+        """
+        self.ensure_base()
+        key = manifest_hash(workspace_dir) if self.enabled else None
+        if key is not None:
+            tag = self.derived_tag(key)
+            if self._image_exists(tag):
+                with self._lock:
+                    self.stats["derived_runs"] += 1
+                provides = []
+                if os.path.isfile(os.path.join(workspace_dir, "requirements.txt")):
+                    provides.append("venv")
+                if os.path.isfile(os.path.join(workspace_dir, "package.json")):
+                    provides.append("node_modules")
+                return tag, tuple(provides)
+            self.prebuild_async(workspace_dir)
+        with self._lock:
+            self.stats["base_runs"] += 1
+        return _DOCKER_IMAGE_NAME, ()
+
+    def apply_workspace_changes(self, event: Dict[str, Any]) -> None:
+        """
+        Starts a prebuild when a dependency manifest in the workspace root
+        changes. Subscribed to the workspace watcher's change feed.
+        """
+        changed = {change.get("dest_path") or change["path"] for change in event.get("changes", [])}
+        if changed & set(MANIFESTS):
+            self.prebuild_async(os.path.join(os.getcwd(), "workspace"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "build_seconds": round(self.stats["build_seconds"], 1),
+                "building": [key for key, future in self._builds.items() if not future.done()],
+                "failed": dict(self._failed),
+            }
+
+
+# A single instance for the application to import and use.
+sandbox_images = SandboxImageManager()
@@ -0,0 +1,374 @@
+import contextvars
+import io
+import json
+import os
+import re
+import sqlite3
+import tarfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# This file implements resource limits and accounting for sandbox commands.
+#
+# - Every container runs with cgroup limits on memory, CPUs and processes, and
+#   is killed when it exceeds its wall-clock timeout. The defaults come from
+#   the SANDBOX_* settings below and can be overridden per run (the
+#   `sandbox_limits` of POST /project/start).
+# - After a command, what it consumed (CPU seconds, peak memory, bytes read
+#   and written, duration) is read from the container's own cgroup: the
+#   command is followed by a probe that copies the cgroup counters into a file
+#   of the stopped container. A killed container never runs the probe, so its
+#   usage comes from a `docker stats` snapshot taken just before the kill.
+# - The records are kept in SQLite, per run, and summed up for the run's status.
+#   The same database keeps each run's trust level, which decides whether its
+#   simple commands may skip Docker (see tools/local_executor.py).
+# - The run a command belongs to is never taken from the agents' tool calls:
+#   whoever runs the agents sets it with `sandbox_run`, and the sandbox tools
+#   read it with `current_sandbox_run`.
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+
+# --- Configuration ---
+_SANDBOX_MEMORY_LIMIT = os.environ.get("SANDBOX_MEMORY_LIMIT", "2g")
+_SANDBOX_CPUS = float(os.environ.get("SANDBOX_CPUS", 2))
+_SANDBOX_PIDS_LIMIT = int(os.environ.get("SANDBOX_PIDS_LIMIT", 512))
+_SANDBOX_TIMEOUT_SECONDS = float(os.environ.get("SANDBOX_TIMEOUT_SECONDS", 600))
+_SANDBOX_DEFAULT_TRUST = os.environ.get("SANDBOX_DEFAULT_TRUST", "untrusted")
+_SANDBOX_USAGE_PATH = os.environ.get("SANDBOX_USAGE_PATH", os.path.join(_DATA_DIR, "sandbox_usage.sqlite3"))
+
+LIMIT_KEYS = ("memory", "cpus", "pids", "timeout_seconds")
+TRUST_LEVELS = ("untrusted", "trusted")
+_MEMORY = re.compile(r"^(\d+(?:\.\d+)?)\s*([kmg]?)b?$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+# Where the usage probe leaves the cgroup counters inside the container.
+_USAGE_FILE = "/tmp/.sandbox_usage"
+# cgroup v2 files first, then their cgroup v1 equivalents.
+_CGROUP_FILES = ("cpu.stat", "memory.peak", "io.stat", "cpuacct/cpuacct.usage", "memory/memory.max_usage_in_bytes", "blkio/blkio.throttle.io_service_bytes")
+_USAGE_PROBE = (
+    f"for f in {' '.join(_CGROUP_FILES)}; do [ -r /sys/fs/cgroup/$f ] && {{ echo \"== $f\"; cat /sys/fs/cgroup/$f; }}; done "
+    f"> {_USAGE_FILE} 2>/dev/null"
+)
+
+
+def parse_memory(value: Any) -> int:
+    """
+    Parses a memory size such as '512m', '2g' or a number of bytes.
+
+    Raises:
+        ValueError: If the value is not a size.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    match = _MEMORY.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid memory size '{value}'. Use bytes or a number with k, m or g, e.g. '512m'.")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def validate_limits(limits: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validates and normalizes resource limits.
+
+    Args:
+        limits: Any of `memory` (a size like '1g'), `cpus`, `pids` and `timeout_seconds`.
+
+    Returns:
+        The limits, with `memory` in bytes.
+
+    Raises:
+        ValueError: If a key is unknown or a value is invalid.
+    """
+    unknown = set(limits) - set(LIMIT_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sandbox limits {sorted(unknown)}. Expected any of {list(LIMIT_KEYS)}.")
+    normalized: Dict[str, Any] = {}
+    if "memory" in limits:
+        normalized["memory"] = parse_memory(limits["memory"])
+        if normalized["memory"] < 6 * 1024 ** 2:
+            raise ValueError("The memory limit must be at least 6m.")
+    for key, cast in (("cpus", float), ("pids", int), ("timeout_seconds", float)):
+        if key in limits:
+            try:
+                normalized[key] = cast(limits[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid value for '{key}': {limits[key]!r}.")
+            if normalized[key] <= 0:
+                raise ValueError(f"'{key}' must be positive.")
+    return normalized
+
+
+def default_limits() -> Dict[str, Any]:
+    return {
+        "memory": parse_memory(_SANDBOX_MEMORY_LIMIT),
+        "cpus": _SANDBOX_CPUS,
+        "pids": _SANDBOX_PIDS_LIMIT,
+        "timeout_seconds": _SANDBOX_TIMEOUT_SECONDS,
+    }
+
+
+def container_limits(limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the `containers.run` arguments that apply the limits (all but the timeout)."""
+    return {
+        "mem_limit": limits["memory"],
+        "memswap_limit": limits["memory"],  # No swap beyond the memory limit.
+        "nano_cpus": int(limits["cpus"] * 1e9),
+        "pids_limit": limits["pids"],
+    }
+
+
+def with_usage_probe(command: str) -> str:
+    """
+    Appends the usage probe to a shell command, keeping the command's exit
+    status. The command runs in a subshell, so an `exit` in it still reaches the probe.
+    """
+    return f"(\n{command}\n)\nstatus=$?; {_USAGE_PROBE}; exit $status"
+
+
+# --- Reading usage ---
+
+def _empty_usage() -> Dict[str, Any]:
+    return {"cpu_seconds": None, "peak_rss_bytes": None, "io_read_bytes": None, "io_write_bytes": None}
+
+
+def parse_cgroup_usage(text: str) -> Dict[str, Any]:
+    """Parses the cgroup counters written by the usage probe (cgroup v2 or v1)."""
+    usage = _empty_usage()
+    section = None
+    read = write = 0
+    io_seen = False
+    for line in text.splitlines():
+        if line.startswith("== "):
+            section = line[3:].strip()
+            continue
+        parts = line.split()
+        if not parts:
+            continue
+        if section == "cpu.stat" and parts[0] == "usage_usec":
+            usage["cpu_seconds"] = int(parts[1]) / 1e6
+        elif section == "cpuacct/cpuacct.usage" and usage["cpu_seconds"] is None:
+            usage["cpu_seconds"] = int(parts[0]) / 1e9
+        elif section == "memory.peak":
+            usage["peak_rss_bytes"] = int(parts[0])
+        elif section == "memory/memory.max_usage_in_bytes" and usage["peak_rss_bytes"] is None:
+            usage["peak_rss_bytes"] = int(parts[0])
+        elif section == "io.stat":
+            io_seen = True
+            for field in parts[1:]:
+                name, _, value = field.partition("=")
+                if name == "rbytes":
+                    read += int(value)
+                elif name == "wbytes":
+                    write += int(value)
+        elif section == "blkio/blkio.throttle.io_service_bytes" and len(parts) == 3:
+            io_seen = True
+            if parts[1] == "Read":
+                read += int(parts[2])
+            elif parts[1] == "Write":
+                write += int(parts[2])
+    if io_seen:
+        usage["io_read_bytes"], usage["io_write_bytes"] = read, write
+    return usage
+
+
+def read_container_usage(container: Any) -> Dict[str, Any]:
+    """Reads the usage probe's file out of a finished container; empty usage if it is missing."""
+    try:
+        stream, _ = container.get_archive(_USAGE_FILE)
+        with tarfile.open(fileobj=io.BytesIO(b"".join(stream))) as archive:
+            member = archive.extractfile(archive.getmembers()[0])
+            return parse_cgroup_usage(member.read().decode("utf-8", errors="replace"))
+    except Exception:
+        return _empty_usage()
+
+
+def usage_from_docker_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts a `docker stats` snapshot (`container.stats(stream=False)`) into usage."""
+    usage = _empty_usage()
+    cpu_total = (stats.get("cpu_stats") or {}).get("cpu_usage", {}).get("total_usage")
+    if cpu_total is not None:
+        usage["cpu_seconds"] = cpu_total / 1e9
+    memory = stats.get("memory_stats") or {}
+    usage["peak_rss_bytes"] = memory.get("max_usage") or memory.get("usage")
+    entries = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    if entries:
+        usage["io_read_bytes"] = sum(entry["value"] for entry in entries if entry.get("op", "").lower() == "read")
+        usage["io_write_bytes"] = sum(entry["value"] for entry in entries if entry.get("op", "").lower() == "write")
+    return usage
+
+
+# --- The ledger ---
+
+# The run whose agents are executing; unset outside of a run.
+_current_run: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("sandbox_run", default=None)
+
+
+@contextmanager
+def sandbox_run(run_id: Optional[str]) -> Iterator[None]:
+    """Makes the enclosed sandbox commands count as `run_id`'s: its limits, trust level and usage records."""
+    token = _current_run.set(run_id)
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+
+
+def current_sandbox_run() -> Optional[str]:
+    """Returns the run set by the enclosing `sandbox_run`, or None outside of one."""
+    return _current_run.get()
+
+
+class SandboxUsageLedger:
+    """
+    Keeps per-run sandbox limits and trust levels, and the resource usage of
+    every command, in SQLite. Thread-safe.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS run_limits (
+            run_id TEXT PRIMARY KEY,
+            limits TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS run_trust (
+            run_id TEXT PRIMARY KEY,
+            trust TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS commands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            backend TEXT NOT NULL,
+            command TEXT NOT NULL,
+            exit_code INTEGER,
+            timed_out INTEGER NOT NULL,
+            duration_seconds REAL NOT NULL,
+            cpu_seconds REAL,
+            peak_rss_bytes INTEGER,
+            io_read_bytes INTEGER,
+            io_write_bytes INTEGER,
+            limits TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_commands_run_id ON commands (run_id);
+    """
+
+    def __init__(self, path: str = _SANDBOX_USAGE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self._SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def set_run_limits(self, run_id: str, limits: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Overrides the default limits for one run.
+
+        Raises:
+            ValueError: If the limits are invalid (see `validate_limits`).
+        """
+        normalized = validate_limits(limits)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO run_limits (run_id, limits) VALUES (?, ?)", (run_id, json.dumps(normalized)))
+        return normalized
+
+    def get_limits(self, run_id: str) -> Dict[str, Any]:
+        """Returns the limits that apply to a run's commands: the defaults, with the run's overrides."""
+        row = self._connect().execute("SELECT limits FROM run_limits WHERE run_id = ?", (run_id,)).fetchone()
+        return {**default_limits(), **(json.loads(row[0]) if row else {})}
+
+    def set_run_trust(self, run_id: str, trust: str) -> None:
+        """
+        Sets a run's trust level.
+
+        Raises:
+            ValueError: If the level is not one of TRUST_LEVELS.
+        """
+        if trust not in TRUST_LEVELS:
+            raise ValueError(f"Invalid sandbox trust level '{trust}'. Expected one of {list(TRUST_LEVELS)}.")
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO run_trust (run_id, trust) VALUES (?, ?)", (run_id, trust))
+
+    def get_run_trust(self, run_id: str) -> str:
+        """Returns a run's trust level: its own, or SANDBOX_DEFAULT_TRUST."""
+        row = self._connect().execute("SELECT trust FROM run_trust WHERE run_id = ?", (run_id,)).fetchone()
+        return row[0] if row else _SANDBOX_DEFAULT_TRUST
+
+    def record(self, run_id: str, backend: str, command: str, exit_code: Optional[int], timed_out: bool,
+               duration: float, usage: Dict[str, Any], limits: Dict[str, Any]) -> Dict[str, Any]:
+        """Stores the usage of one command and returns it as a record."""
+        record = {
+            "backend": backend,
+            "exit_code": exit_code,
+            "timed_out": timed_out,
+            "duration_seconds": round(duration, 3),
+            **usage,
+            "limits": limits,
+        }
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO commands (run_id, backend, command, exit_code, timed_out, duration_seconds, cpu_seconds, "
+                "peak_rss_bytes, io_read_bytes, io_write_bytes, limits, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, backend, command[:2000], exit_code, int(timed_out), duration, usage["cpu_seconds"],
+                 usage["peak_rss_bytes"], usage["io_read_bytes"], usage["io_write_bytes"], json.dumps(limits), time.time()),
+            )
+        return record
+
+    def summary(self, run_id: str, recent: int = 20) -> Dict[str, Any]:
+        """
+        Sums up a run's sandbox usage.
+
+        Returns:
+            The run's `limits` and `trust` level, the number of `commands` (and
+            how many `timed_out`, and how many ran on each of the `backends`), total `duration_seconds`, `cpu_seconds` and I/O
+            bytes, the highest `peak_rss_bytes`, and the most `recent_commands`.
+        """
+        conn = self._connect()
+        totals = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(timed_out), 0), COALESCE(SUM(duration_seconds), 0), SUM(cpu_seconds), "
+            "MAX(peak_rss_bytes), SUM(io_read_bytes), SUM(io_write_bytes) FROM commands WHERE run_id = ?",
+            (run_id,),
+        ).fetchone()
+        rows = conn.execute(
+            "SELECT backend, command, exit_code, timed_out, duration_seconds, cpu_seconds, peak_rss_bytes, io_read_bytes, "
+            "io_write_bytes, created_at FROM commands WHERE run_id = ? ORDER BY id DESC LIMIT ?",
+            (run_id, recent),
+        ).fetchall()
+        columns = ("backend", "command", "exit_code", "timed_out", "duration_seconds", "cpu_seconds", "peak_rss_bytes",
+                   "io_read_bytes", "io_write_bytes", "created_at")
+        backends = dict(conn.execute("SELECT backend, COUNT(*) FROM commands WHERE run_id = ? GROUP BY backend", (run_id,)).fetchall())
+        recent_commands: List[Dict[str, Any]] = [dict(zip(columns, row)) for row in rows]
+        for command in recent_commands:
+            command["timed_out"] = bool(command["timed_out"])
+        return {
+            "limits": self.get_limits(run_id),
+            "trust": self.get_run_trust(run_id),
+            "commands": totals[0],
+            "timed_out": totals[1],
+            "backends": backends,
+            "duration_seconds": round(totals[2], 3),
+            "cpu_seconds": round(totals[3], 3) if totals[3] is not None else None,
+            "peak_rss_bytes": totals[4],
+            "io_read_bytes": totals[5],
+            "io_write_bytes": totals[6],
+            "recent_commands": recent_commands,
+        }
+
+    def delete_run(self, run_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM commands WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM run_limits WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM run_trust WHERE run_id = ?", (run_id,))
+
+
+# A single instance for the application to import and use.
+sandbox_usage = SandboxUsageLedger()
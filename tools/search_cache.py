@@ -0,0 +1,316 @@
+import abc
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from backend.tracing import tracer
+
+# This file implements the cache in front of the `advanced_web_search` tool.
+# Research steps (the Analysts and Innovators groups, and step 6 again after
+# user feedback) repeat near-identical queries, so results are cached under a
+# normalized form of the query:
+#
+# - Successful results are kept for SEARCH_CACHE_TTL_HOURS.
+# - Failures are cached briefly too (negative caching), so a failing query is
+#   not retried by every agent in the same minute.
+# - Concurrent identical queries share one request to the search backend.
+#
+# The search backend is pluggable: DuckDuckGo by default, or a fixture backend
+# that answers from a local JSON file, for working without network access.
+
+_DATA_DIR = os.path.join(os.getcwd(), "data")
+
+# --- Configuration ---
+# "duckduckgo" (default) or "fixture" (answers from SEARCH_FIXTURES_PATH).
+_SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "duckduckgo")
+_SEARCH_FIXTURES_PATH = os.environ.get("SEARCH_FIXTURES_PATH", os.path.join(_DATA_DIR, "search_fixtures.json"))
+# "sqlite" (default, persistent) or "memory" (single process).
+_SEARCH_CACHE_BACKEND = os.environ.get("SEARCH_CACHE_BACKEND", "sqlite")
+_SEARCH_CACHE_PATH = os.environ.get("SEARCH_CACHE_PATH", os.path.join(_DATA_DIR, "search_cache.sqlite3"))
+_SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL_HOURS", 24)) * 3600
+_SEARCH_CACHE_NEGATIVE_TTL = float(os.environ.get("SEARCH_CACHE_NEGATIVE_TTL_SECONDS", 300))
+
+# Characters that carry meaning in technical queries (c++, c#, node.js, @types/node).
+_QUERY_NOISE = re.compile(r"[^\w\s+#./@-]")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Returns the cache key of a query: Unicode-normalized, lower-cased, with
+    punctuation and repeated whitespace removed, e.g.
+    '  Best Python web frameworks?' -> 'best python web frameworks'.
+    """
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = _QUERY_NOISE.sub(" ", query)
+    return " ".join(query.split()).strip(" .-")
+
+
+class SearchFailure(Exception):
+    """Raised for a query whose last attempt failed recently (a cached failure)."""
+
+
+# --- Search backends ---
+
+class SearchBackend(abc.ABC):
+    @abc.abstractmethod
+    def search(self, query: str) -> str:
+        """Runs a query and returns the results as text. Raises on failure."""
+
+
+class DuckDuckGoSearchBackend(SearchBackend):
+    def __init__(self):
+        self._tool = None
+
+    def search(self, query: str) -> str:
+        if self._tool is None:
+            from langchain_community.tools import DuckDuckGoSearchRun
+            self._tool = DuckDuckGoSearchRun()
+        return self._tool.run(query)
+
+
+class FixtureSearchBackend(SearchBackend):
+    """
+    Answers queries from a dict (or a JSON file) of query -> result text,
+    matched by normalized query. Unknown queries fail like a search error would.
+    """
+
+    def __init__(self, fixtures: Optional[Dict[str, str]] = None, path: Optional[str] = None):
+        if fixtures is None:
+            with open(path or _SEARCH_FIXTURES_PATH, "r", encoding="utf-8") as f:
+                fixtures = json.load(f)
+        self.fixtures = {normalize_query(query): result for query, result in fixtures.items()}
+
+    def search(self, query: str) -> str:
+        try:
+            return self.fixtures[normalize_query(query)]
+        except KeyError:
+            raise LookupError(f"No search fixture for query '{query}'.")
+
+
+# --- Cache stores ---
+
+# A cached entry: (result or error message, is_error, expires_at).
+_Entry = Tuple[str, bool, float]
+
+
+class SearchCacheStore(abc.ABC):
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[_Entry]:
+        """Returns the unexpired entry for a normalized query, if any."""
+
+    @abc.abstractmethod
+    def put(self, key: str, query: str, text: str, is_error: bool, ttl: float) -> None:
+        ...
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        """Deletes expired entries and returns how many were deleted."""
+
+
+class InMemorySearchCacheStore(SearchCacheStore):
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry if entry and entry[2] > time.time() else None
+
+    def put(self, key: str, query: str, text: str, is_error: bool, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (text, is_error, time.time() + ttl)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[2] <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+
+class SQLiteSearchCacheStore(SearchCacheStore):
+    """Keeps cached results in a SQLite file, shared by every process and kept across restarts."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS search_results (
+            query_key TEXT PRIMARY KEY,
+            query TEXT NOT NULL,
+            result TEXT NOT NULL,
+            is_error INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_search_results_expires_at ON search_results (expires_at);
+    """
+
+    def __init__(self, path: str = _SEARCH_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self._SCHEMA)
+        print(f"--- [SearchCache] SQLite search cache ready at: {path} ---")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[_Entry]:
+        row = self._connect().execute(
+            "SELECT result, is_error, expires_at FROM search_results WHERE query_key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return (row[0], bool(row[1]), row[2]) if row else None
+
+    def put(self, key: str, query: str, text: str, is_error: bool, ttl: float) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_results (query_key, query, result, is_error, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, query, text, int(is_error), now, now + ttl),
+            )
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM search_results WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+# --- The cached search ---
+
+class CachedSearch:
+    """
+    Runs web searches through the cache. Thread-safe; agents of concurrent
+    runs share one instance.
+    """
+
+    def __init__(
+        self,
+        backend: SearchBackend,
+        store: SearchCacheStore,
+        ttl: float = _SEARCH_CACHE_TTL,
+        negative_ttl: float = _SEARCH_CACHE_NEGATIVE_TTL,
+    ):
+        self.backend = backend
+        self.store = store
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "deduplicated": 0, "failures": 0}
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> str:
+        """
+        Returns the results of a query, from the cache if possible.
+
+        Raises:
+            SearchFailure: If the query failed recently and the failure is still cached.
+            Exception: Whatever the backend raised, if the query fails now.
+        """
+        key = normalize_query(query)
+        cached = self.store.get(key)
+        if cached is not None:
+            text, is_error, _ = cached
+            self._count("negative_hits" if is_error else "hits")
+            tracer.set_attributes(cache_hit=True, negative=is_error)
+            if is_error:
+                raise SearchFailure(text)
+            return text
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+        if not leader:
+            # An identical query is already being searched; wait for its result.
+            self._count("deduplicated")
+            tracer.set_attributes(cache_hit=False, deduplicated=True)
+            return future.result()
+
+        try:
+            # The previous leader may have finished between our cache lookup and taking over.
+            cached = self.store.get(key)
+            if cached is not None and not cached[1]:
+                self._count("hits")
+                tracer.set_attributes(cache_hit=True)
+                future.set_result(cached[0])
+                return cached[0]
+            self._count("misses")
+            tracer.set_attributes(cache_hit=False)
+            result = self.backend.search(query)
+        except Exception as e:
+            self._count("failures")
+            # Followers are released before persisting: a failing store must not leave them waiting.
+            future.set_exception(e)
+            self._put(key, query, str(e), True, self.negative_ttl)
+            raise
+        else:
+            future.set_result(result)
+            self._put(key, query, result, False, self.ttl)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _put(self, key: str, query: str, text: str, is_error: bool, ttl: float) -> None:
+        """Caches an entry. The cache is an optimization, so store errors are logged, not raised."""
+        try:
+            self.store.put(key, query, text, is_error, ttl)
+        except Exception as e:
+            print(f"--- [SearchCache] Warning: could not cache the results of '{query}': {e} ---")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._in_flight)}
+
+
+def create_search_backend(backend: str = _SEARCH_BACKEND) -> SearchBackend:
+    """
+    Creates the search backend selected by the SEARCH_BACKEND setting.
+
+    Args:
+        backend: "duckduckgo" or "fixture".
+    """
+    if backend == "duckduckgo":
+        return DuckDuckGoSearchBackend()
+    if backend == "fixture":
+        return FixtureSearchBackend()
+    raise ValueError(f"Unknown search backend '{backend}'. Expected 'duckduckgo' or 'fixture'.")
+
+
+def create_search_cache_store(backend: str = _SEARCH_CACHE_BACKEND) -> SearchCacheStore:
+    """
+    Creates the cache store selected by the SEARCH_CACHE_BACKEND setting.
+
+    Args:
+        backend: "sqlite" or "memory".
+    """
+    if backend == "sqlite":
+        return SQLiteSearchCacheStore()
+    if backend == "memory":
+        return InMemorySearchCacheStore()
+    raise ValueError(f"Unknown search cache backend '{backend}'. Expected 'sqlite' or 'memory'.")
+
+
+# A single instance for the application to import and use.
+cached_search = CachedSearch(create_search_backend(), create_search_cache_store())